@@ -28,13 +28,15 @@ bcrypt = Bcrypt()
 csrf = CSRFProtect()
 limiter = Limiter(
     key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
+    default_limits=["200 per day", "50 per hour"]
 )
 
 
 def create_app():
     """Application factory pattern"""
+    from app.startup import StartupTimer
+    timer = StartupTimer()
+
     app = Flask(__name__,
                 template_folder='../templates',
                 static_folder='../static')
@@ -63,10 +65,153 @@ def create_app():
         'pool_recycle': 3600,
         'pool_pre_ping': True,
     }
+    # Create missing tables at boot. Production schema comes from the deploy step (migrate.py),
+    # so workers start without inspecting the database.
+    app.config['DB_CREATE_ALL'] = config('DB_CREATE_ALL', default=not is_production, cast=bool)
 
     # Anthropic API Key
     app.config['ANTHROPIC_API_KEY'] = config('ANTHROPIC_API_KEY', default='')
 
+    # LLM response cache (opt-in) - 'memory' is per worker, 'database' is shared
+    app.config['LLM_CACHE_ENABLED'] = config('LLM_CACHE_ENABLED', default=False, cast=bool)
+    app.config['LLM_CACHE_BACKEND'] = config('LLM_CACHE_BACKEND', default='memory')
+    app.config['LLM_CACHE_TTL'] = config('LLM_CACHE_TTL', default=3600, cast=int)  # seconds
+    app.config['LLM_CACHE_MAX_ENTRIES'] = config('LLM_CACHE_MAX_ENTRIES', default=1000, cast=int)
+
+    # LLM call resilience - retries with jittered backoff, per-call deadline, circuit breakers
+    app.config['LLM_MAX_ATTEMPTS'] = config('LLM_MAX_ATTEMPTS', default=3, cast=int)
+    app.config['LLM_RETRY_BASE_DELAY'] = config('LLM_RETRY_BASE_DELAY', default=0.5, cast=float)  # seconds
+    app.config['LLM_RETRY_MAX_DELAY'] = config('LLM_RETRY_MAX_DELAY', default=8.0, cast=float)  # seconds
+    app.config['LLM_TIMEOUT_SECONDS'] = config('LLM_TIMEOUT_SECONDS', default=60.0, cast=float)  # across all retries
+    app.config['LLM_CIRCUIT_FAILURE_THRESHOLD'] = config('LLM_CIRCUIT_FAILURE_THRESHOLD', default=5, cast=int)
+    app.config['LLM_CIRCUIT_RECOVERY_SECONDS'] = config('LLM_CIRCUIT_RECOVERY_SECONDS', default=30.0, cast=float)
+
+    # LLM admission control (per worker) - in-flight caps and a bounded FIFO queue with a deadline
+    app.config['LLM_ADMISSION_ENABLED'] = config('LLM_ADMISSION_ENABLED', default=True, cast=bool)
+    app.config['LLM_MAX_IN_FLIGHT'] = config('LLM_MAX_IN_FLIGHT', default=32, cast=int)
+    app.config['LLM_MAX_IN_FLIGHT_PER_USER'] = config('LLM_MAX_IN_FLIGHT_PER_USER', default=2, cast=int)
+    app.config['LLM_MAX_IN_FLIGHT_PER_KEY'] = config('LLM_MAX_IN_FLIGHT_PER_KEY', default=4, cast=int)
+    app.config['LLM_ADMISSION_QUEUE_SIZE'] = config('LLM_ADMISSION_QUEUE_SIZE', default=64, cast=int)
+    app.config['LLM_ADMISSION_QUEUE_PER_USER'] = config('LLM_ADMISSION_QUEUE_PER_USER', default=4, cast=int)
+    app.config['LLM_ADMISSION_QUEUE_TIMEOUT'] = config('LLM_ADMISSION_QUEUE_TIMEOUT', default=10.0, cast=float)  # seconds
+    # Streaming chat in ASGI mode holds a coroutine per call, so the worker cap can be much higher
+    app.config['LLM_ASYNC_MAX_IN_FLIGHT'] = config('LLM_ASYNC_MAX_IN_FLIGHT', default=1000, cast=int)
+
+    # Local LLM provider - offline, deterministic answers with simulated latency and errors for tests,
+    # CI and benchmarks. Off in production unless enabled explicitly.
+    app.config['LLM_LOCAL_ENABLED'] = config('LLM_LOCAL_ENABLED', default=not is_production, cast=bool)
+    app.config['LLM_LOCAL_TTFT_MS'] = config('LLM_LOCAL_TTFT_MS', default=200.0, cast=float)
+    app.config['LLM_LOCAL_TOKENS_PER_SECOND'] = config('LLM_LOCAL_TOKENS_PER_SECOND', default=50.0, cast=float)
+    app.config['LLM_LOCAL_RESPONSE_TOKENS'] = config('LLM_LOCAL_RESPONSE_TOKENS', default=64, cast=int)
+    app.config['LLM_LOCAL_ERROR_RATE'] = config('LLM_LOCAL_ERROR_RATE', default=0.0, cast=float)  # 0.0-1.0
+    app.config['LLM_LOCAL_ERROR_TYPE'] = config('LLM_LOCAL_ERROR_TYPE', default='overloaded')
+    app.config['LLM_LOCAL_SEED'] = config('LLM_LOCAL_SEED', default=None, cast=lambda v: int(v) if v else None)
+    # Send every chat to one provider regardless of agent config (e.g. 'local' for offline runs)
+    app.config['LLM_PROVIDER_OVERRIDE'] = config('LLM_PROVIDER_OVERRIDE', default='')
+
+    # Usage ledger - events are buffered per worker and flushed in batches
+    app.config['USAGE_LEDGER_ENABLED'] = config('USAGE_LEDGER_ENABLED', default=True, cast=bool)
+    app.config['USAGE_FLUSH_INTERVAL'] = config('USAGE_FLUSH_INTERVAL', default=5.0, cast=float)  # seconds
+    app.config['USAGE_BATCH_SIZE'] = config('USAGE_BATCH_SIZE', default=500, cast=int)
+
+    # Rate limiting - counters are shared by every worker ('database://' batches writes to the app database;
+    # 'redis://host:6379' or 'memory://' also work). Every client also has an hourly request budget
+    # where LLM calls weigh RATELIMIT_LLM_COST units and everything else one.
+    app.config['RATELIMIT_STORAGE_URI'] = config('RATELIMIT_STORAGE_URI', default='database://')
+    if app.config['RATELIMIT_STORAGE_URI'].startswith('database://'):
+        # The app's engine is added once Flask-SQLAlchemy has resolved the URL (see below)
+        app.config['RATELIMIT_STORAGE_OPTIONS'] = {
+            'sync_interval': config('RATELIMIT_SYNC_INTERVAL', default=1.0, cast=float)  # seconds
+        }
+    app.config['RATELIMIT_STRATEGY'] = 'sliding-window-counter'
+    app.config['RATELIMIT_APPLICATION'] = config('RATELIMIT_REQUEST_BUDGET', default='2000 per hour')
+    app.config['RATELIMIT_LLM_COST'] = config('RATELIMIT_LLM_COST', default=10, cast=int)
+
+    # Prometheus metrics - served to local scrapers, or to anyone presenting METRICS_TOKEN
+    app.config['METRICS_ENABLED'] = config('METRICS_ENABLED', default=True, cast=bool)
+    app.config['METRICS_ALLOWED_IPS'] = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1').split(',')
+    app.config['METRICS_TOKEN'] = config('METRICS_TOKEN', default='')
+
+    # SQL instrumentation - statements and database time per request (metrics), slow statements logged
+    # with their route; X-DB-Query-Count / X-DB-Query-Time-Ms response headers outside production
+    app.config['QUERY_STATS_ENABLED'] = config('QUERY_STATS_ENABLED', default=True, cast=bool)
+    app.config['SLOW_QUERY_MS'] = config('SLOW_QUERY_MS', default=100.0, cast=float)
+    app.config['QUERY_STATS_HEADERS'] = config('QUERY_STATS_HEADERS', default=not is_production, cast=bool)
+
+    # Request profiling - wall-clock stack samples of a fraction of requests, written per route as
+    # collapsed stacks to PROFILING_DIR. Off until enabled here or by SIGUSR2 (toggles per worker);
+    # requests carrying X-Profile-Token: PROFILING_TOKEN are always profiled
+    app.config['PROFILING_ENABLED'] = config('PROFILING_ENABLED', default=False, cast=bool)
+    app.config['PROFILING_SAMPLE_RATE'] = config('PROFILING_SAMPLE_RATE', default=0.01, cast=float)  # 0.0-1.0
+    app.config['PROFILING_INTERVAL_MS'] = config('PROFILING_INTERVAL_MS', default=5.0, cast=float)
+    app.config['PROFILING_DIR'] = config('PROFILING_DIR', default='profiles')
+    app.config['PROFILING_TOKEN'] = config('PROFILING_TOKEN', default='')
+    app.config['PROFILING_SIGNAL'] = config('PROFILING_SIGNAL', default=True, cast=bool)
+
+    # Marketplace read model - listing pages read pre-joined marketplace_listing rows kept current on
+    # every write. When disabled rows stop being maintained; rebuild them before re-enabling.
+    app.config['MARKETPLACE_READ_MODEL'] = config('MARKETPLACE_READ_MODEL', default=True, cast=bool)
+
+    # Marketplace ranking - Bayesian-smoothed, recency-weighted scores recomputed every RANKING_INTERVAL
+    # seconds in each worker (one writer at a time on PostgreSQL); 0 leaves it to `python3 rank.py`
+    app.config['RANKING_INTERVAL'] = config('RANKING_INTERVAL', default=900.0 if is_production else 0.0, cast=float)
+    app.config['RANKING_PRIOR_WEIGHT'] = config('RANKING_PRIOR_WEIGHT', default=10.0, cast=float)
+    app.config['RANKING_HALF_LIFE_DAYS'] = config('RANKING_HALF_LIFE_DAYS', default=90.0, cast=float)
+    app.config['RANKING_POPULARITY_WEIGHT'] = config('RANKING_POPULARITY_WEIGHT', default=0.2, cast=float)  # 0.0-1.0
+
+    # "Customers also bought" - a co-purchase matrix (NumPy arrays saved in RECOMMENDATIONS_DIR) folds in
+    # new purchases every RECOMMENDATIONS_INTERVAL seconds and is rebuilt from scratch after
+    # RECOMMENDATIONS_REBUILD_HOURS; 0 leaves it to `python3 recommend.py`
+    app.config['RECOMMENDATIONS_INTERVAL'] = config('RECOMMENDATIONS_INTERVAL', default=600.0 if is_production else 0.0,
+                                                    cast=float)
+    app.config['RECOMMENDATIONS_REBUILD_HOURS'] = config('RECOMMENDATIONS_REBUILD_HOURS', default=24.0, cast=float)
+    app.config['RECOMMENDATIONS_TOP_N'] = config('RECOMMENDATIONS_TOP_N', default=20, cast=int)
+    app.config['RECOMMENDATIONS_MIN_SHARED_BUYERS'] = config('RECOMMENDATIONS_MIN_SHARED_BUYERS', default=2, cast=int)
+    app.config['RECOMMENDATIONS_DIR'] = config('RECOMMENDATIONS_DIR', default='recommendations')
+
+    # Similar agents - content vectors in a memory-mapped index under VECTOR_INDEX_DIR, updated on
+    # commit and rebuilt every SIMILARITY_INTERVAL seconds; VECTOR_ENCODER is 'hashing' (no model
+    # needed) or 'module:factory' for a local embedding model
+    app.config['VECTOR_INDEX_DIR'] = config('VECTOR_INDEX_DIR', default='vector_index')
+    app.config['VECTOR_ENCODER'] = config('VECTOR_ENCODER', default='hashing')
+    app.config['VECTOR_DIM'] = config('VECTOR_DIM', default=512, cast=int)  # Width of the hashing encoder
+    app.config['SIMILARITY_INTERVAL'] = config('SIMILARITY_INTERVAL', default=21600.0 if is_production else 0.0,
+                                               cast=float)
+    app.config['SIMILARITY_MIN_SCORE'] = config('SIMILARITY_MIN_SCORE', default=0.1, cast=float)
+    # Larger catalogs: VECTOR_QUANTIZE stores int8 rows (a quarter of the size) and VECTOR_IVF_LISTS > 0
+    # clusters each index at rebuild so a query scores only the VECTOR_IVF_PROBES closest clusters
+    app.config['VECTOR_QUANTIZE'] = config('VECTOR_QUANTIZE', default=False, cast=bool)
+    app.config['VECTOR_IVF_LISTS'] = config('VECTOR_IVF_LISTS', default=0, cast=int)
+    app.config['VECTOR_IVF_PROBES'] = config('VECTOR_IVF_PROBES', default=32, cast=int)
+
+    # Semantic search (/agents/?search=...&mode=semantic) - a vector index of agents' public text,
+    # rebuilt every SEARCH_INTERVAL seconds; scores are SEARCH_SEMANTIC_WEIGHT * cosine plus the
+    # rest * keyword match. SEARCH_MODE is used when a request does not choose
+    app.config['SEARCH_MODE'] = config('SEARCH_MODE', default='keyword')  # 'keyword' or 'semantic'
+    app.config['SEARCH_INTERVAL'] = config('SEARCH_INTERVAL', default=21600.0 if is_production else 0.0, cast=float)
+    app.config['SEARCH_SEMANTIC_WEIGHT'] = config('SEARCH_SEMANTIC_WEIGHT', default=0.7, cast=float)  # 0.0-1.0
+    app.config['SEARCH_CANDIDATES'] = config('SEARCH_CANDIDATES', default=100, cast=int)
+    app.config['SEARCH_MIN_SCORE'] = config('SEARCH_MIN_SCORE', default=0.15, cast=float)
+
+    # Search-as-you-type (/agents/suggest) - each worker holds a prefix index of listed agents in
+    # memory, updated by its own commits and reloaded every SUGGEST_INTERVAL seconds for the others'
+    app.config['SUGGEST_INTERVAL'] = config('SUGGEST_INTERVAL', default=300.0 if is_production else 0.0, cast=float)
+
+    # HTTP conditional requests on the catalog pages - ETag/Last-Modified validators answer repeat
+    # GETs with 304. Anonymous responses are public for HTTP_CACHE_MAX_AGE seconds, signed-in ones
+    # private; HTTP_CACHE_VERSION (e.g. the release's commit) stands in for fingerprinting the code
+    app.config['HTTP_CACHE_ENABLED'] = config('HTTP_CACHE_ENABLED', default=True, cast=bool)
+    app.config['HTTP_CACHE_MAX_AGE'] = config('HTTP_CACHE_MAX_AGE', default=60 if is_production else 0, cast=int)
+    app.config['HTTP_CACHE_VERSION'] = config('HTTP_CACHE_VERSION', default='')
+
+    # Response compression - gzip, or brotli when installed, for text responses of at least
+    # COMPRESS_MIN_SIZE bytes; streamed bodies are flushed chunk by chunk. Turn off when a proxy in
+    # front compresses (it would pass already-encoded bodies through anyway)
+    app.config['COMPRESS_ENABLED'] = config('COMPRESS_ENABLED', default=True, cast=bool)
+    app.config['COMPRESS_MIN_SIZE'] = config('COMPRESS_MIN_SIZE', default=500, cast=int)  # bytes
+    app.config['COMPRESS_LEVEL'] = config('COMPRESS_LEVEL', default=6, cast=int)  # gzip, 1-9
+    app.config['COMPRESS_BROTLI_QUALITY'] = config('COMPRESS_BROTLI_QUALITY', default=4, cast=int)  # 0-11
+
     # File upload configuration
     app.config['UPLOAD_FOLDER'] = config('UPLOAD_FOLDER', default='uploads/packages')
     app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
@@ -85,13 +230,65 @@ def create_app():
         app.logger.setLevel(logging.DEBUG)
         app.logger.info("Starting Special Agents in DEVELOPMENT mode")
 
+    timer.mark('config')
+
     # Initialize extensions with app
     db.init_app(app)
     login_manager.init_app(app)
     bcrypt.init_app(app)
     csrf.init_app(app)
+
+    from app.rate_limit import LLM_ENDPOINTS, request_cost  # registers the database:// limiter storage
+    app.config['RATELIMIT_ENDPOINT_COSTS'] = {endpoint: app.config['RATELIMIT_LLM_COST'] for endpoint in LLM_ENDPOINTS}
+    app.config['RATELIMIT_APPLICATION_COST'] = request_cost
+    if app.config['RATELIMIT_STORAGE_URI'].startswith('database://'):
+        # Same engine as the models: a relative sqlite URL means instance/, not the working directory
+        with app.app_context():
+            app.config['RATELIMIT_STORAGE_OPTIONS']['engine'] = db.engine
     limiter.init_app(app)
 
+    from app.llm_cache import response_cache
+    from app.llm_resilience import resilience
+    from app.admission import admission
+    from app.usage import usage_recorder
+    from app.local_llm import local_llm
+    from app.query_stats import query_stats
+    from app.profiling import profiler
+    from app.listings import listings
+    from app.reviews import rating_histograms
+    from app.ranking import ranking_job
+    from app.recommendations import recommendation_job
+    from app.similarity import similar_agents
+    from app.search import semantic_search
+    from app.suggest import suggestions
+    from app.http_cache import http_cache
+    from app.compression import compression
+    response_cache.init_app(app)
+    resilience.init_app(app)
+    admission.init_app(app)
+    local_llm.init_app(app)
+    # An override this worker cannot serve would fail every chat with a 500; refuse to boot instead
+    from app.llm_service import LLMService
+    override = app.config['LLM_PROVIDER_OVERRIDE']
+    if override and override not in LLMService.available_providers():
+        raise ValueError(f"LLM_PROVIDER_OVERRIDE={override!r} is not an available provider "
+                         f"({', '.join(LLMService.available_providers())}); "
+                         f"'local' also needs LLM_LOCAL_ENABLED")
+    usage_recorder.init_app(app)
+    query_stats.init_app(app)
+    profiler.init_app(app)
+    listings.init_app(app)
+    rating_histograms.init_app(app)
+    ranking_job.init_app(app)
+    recommendation_job.init_app(app)
+    similar_agents.init_app(app)
+    semantic_search.init_app(app)
+    suggestions.init_app(app)
+    http_cache.init_app(app)
+    compression.init_app(app)
+
+    timer.mark('extensions')
+
     # CORS configuration - restrictive
     CORS(app,
          origins=config('ALLOWED_ORIGINS', default='http://localhost:5000').split(','),
@@ -127,6 +324,7 @@ def create_app():
     app.register_blueprint(agents.bp)
     app.register_blueprint(chat.bp)
     app.register_blueprint(agent_creator.bp)
+    timer.mark('blueprints')
 
     # Health check endpoint (for monitoring)
     @app.route('/health')
@@ -151,6 +349,25 @@ def create_app():
             'version': '1.0.0'
         }), 200
 
+    # Prometheus metrics endpoint (per worker process)
+    @app.route('/metrics')
+    @limiter.exempt
+    def metrics():
+        """Expose LLM telemetry in Prometheus text format"""
+        from app.telemetry import registry
+
+        if not app.config['METRICS_ENABLED']:
+            return jsonify({'error': 'Resource not found'}), 404
+
+        token = app.config['METRICS_TOKEN']
+        authorized = request.remote_addr in app.config['METRICS_ALLOWED_IPS'] or (
+            token and secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+        )
+        if not authorized:
+            return jsonify({'error': 'Resource not found'}), 404
+
+        return registry.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
     # Error handlers
     @app.errorhandler(404)
     def not_found(error):
@@ -199,9 +416,14 @@ def create_app():
                     if 'multipart/form-data' not in request.content_type:
                         app.logger.warning(f"Invalid content type: {request.content_type}")
 
+    timer.mark('handlers')
+
     # Create database tables
-    with app.app_context():
-        db.create_all()
+    if app.config['DB_CREATE_ALL']:
+        with app.app_context():
+            db.create_all()
+        timer.mark('schema')
 
+    timer.log(app)
     app.logger.info("Special Agents initialized successfully")
     return app
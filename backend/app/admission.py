@@ -0,0 +1,285 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Admission control for outbound LLM calls
+Caps in-flight calls per worker, per user and per API key, and queues the rest
+in arrival order with a deadline so one heavy user cannot starve everyone else
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional, Tuple
+
+from app.llm_resilience import LLMError
+from app.telemetry import LLM_IN_FLIGHT, LLM_ADMISSION_QUEUE, LLM_ADMISSION_REJECTIONS
+
+logger = logging.getLogger(__name__)
+
+
+class LLMAdmissionError(LLMError):
+    """The call was turned away before reaching a provider (queue full or queue deadline passed)."""
+
+    def __init__(self, message: str, reason: str, retry_after: float = None):
+        super().__init__(message, retry_after=retry_after)
+        self.reason = reason
+
+
+def key_fingerprint(api_key: Optional[str]) -> Optional[str]:
+    """Stable identifier for an API key that does not keep the key itself in memory."""
+    if not api_key:
+        return None
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+
+class _Waiter:
+    __slots__ = ('user_key', 'api_key', 'event', 'loop', 'admitted')
+
+    def __init__(self, user_key, api_key, loop=None):
+        self.user_key = user_key
+        self.api_key = api_key
+        self.loop = loop
+        # Coroutine waiters are woken on their event loop, thread/greenlet waiters directly
+        self.event = asyncio.Event() if loop is not None else threading.Event()
+        self.admitted = False
+
+    def wake(self) -> None:
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.event.set)
+        else:
+            self.event.set()
+
+
+class AdmissionController:
+    """
+    Per-worker semaphores for LLM calls with fair FIFO queueing.
+
+    A call runs when the worker, its user and its API key are all below their
+    in-flight caps. Otherwise it waits in a single arrival-ordered queue; when a
+    slot frees up the oldest waiter that is allowed to run goes next, so a user
+    at their own cap never blocks the users queued behind them.
+    """
+
+    def __init__(self, max_in_flight: int = 32, max_per_user: int = 2, max_per_key: int = 4,
+                 max_queue: int = 64, max_queue_per_user: int = 4, queue_timeout: float = 10.0,
+                 enabled: bool = True):
+        self.max_in_flight = max_in_flight
+        self.max_per_user = max_per_user
+        self.max_per_key = max_per_key
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.queue_timeout = queue_timeout
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self._in_flight = 0
+        self._by_user = {}
+        self._by_key = {}
+        self._queued_by_user = {}
+
+    def init_app(self, app):
+        """Configure from app config and register on the app."""
+        self.enabled = app.config.get('LLM_ADMISSION_ENABLED', True)
+        self.max_in_flight = app.config.get('LLM_MAX_IN_FLIGHT', 32)
+        self.max_per_user = app.config.get('LLM_MAX_IN_FLIGHT_PER_USER', 2)
+        self.max_per_key = app.config.get('LLM_MAX_IN_FLIGHT_PER_KEY', 4)
+        self.max_queue = app.config.get('LLM_ADMISSION_QUEUE_SIZE', 64)
+        self.max_queue_per_user = app.config.get('LLM_ADMISSION_QUEUE_PER_USER', 4)
+        self.queue_timeout = app.config.get('LLM_ADMISSION_QUEUE_TIMEOUT', 10.0)
+        app.extensions['llm_admission'] = self
+
+    # --- bookkeeping (callers hold self._lock) ------------------------------
+
+    def _can_run(self, user_key, api_key) -> bool:
+        if self._in_flight >= self.max_in_flight:
+            return False
+        if user_key is not None and self._by_user.get(user_key, 0) >= self.max_per_user:
+            return False
+        if api_key is not None and self._by_key.get(api_key, 0) >= self.max_per_key:
+            return False
+        return True
+
+    def _grant(self, user_key, api_key) -> None:
+        self._in_flight += 1
+        if user_key is not None:
+            self._by_user[user_key] = self._by_user.get(user_key, 0) + 1
+        if api_key is not None:
+            self._by_key[api_key] = self._by_key.get(api_key, 0) + 1
+        LLM_IN_FLIGHT.set(self._in_flight)
+
+    @staticmethod
+    def _decrement(counts: dict, key) -> None:
+        if key is None:
+            return
+        remaining = counts.get(key, 0) - 1
+        if remaining > 0:
+            counts[key] = remaining
+        else:
+            counts.pop(key, None)
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        self._queue.remove(waiter)
+        self._decrement(self._queued_by_user, waiter.user_key)
+        LLM_ADMISSION_QUEUE.set(len(self._queue))
+
+    def _dispatch(self) -> None:
+        """Admit queued calls, oldest first, skipping those still blocked by their own caps."""
+        for waiter in list(self._queue):
+            if self._in_flight >= self.max_in_flight:
+                break
+            if self._can_run(waiter.user_key, waiter.api_key):
+                self._dequeue(waiter)
+                self._grant(waiter.user_key, waiter.api_key)
+                waiter.admitted = True
+                waiter.wake()
+
+    def _reject(self, reason: str, message: str, retry_after: float) -> LLMAdmissionError:
+        LLM_ADMISSION_REJECTIONS.inc(reason=reason)
+        logger.warning(f"LLM call rejected by admission control: {reason}")
+        return LLMAdmissionError(message, reason, retry_after=retry_after)
+
+    # --- public API -------------------------------------------------------
+
+    def acquire(self, user_key=None, api_key: str = None, timeout: float = None) -> Tuple:
+        """
+        Wait for an LLM call slot.
+
+        Args:
+            user_key: Identifier of the calling user (None skips the per-user cap)
+            api_key: Provider API key the call will use (None skips the per-key cap)
+            timeout: Longest time to wait in the queue (defaults to queue_timeout)
+
+        Returns:
+            tuple: Ticket to pass to release()
+
+        Raises:
+            LLMAdmissionError: The queue is full or the wait exceeded its deadline
+        """
+        ticket = (user_key, key_fingerprint(api_key))
+        waiter = self._enter(ticket, loop=None)
+        if waiter is None:
+            return ticket
+
+        timeout = self.queue_timeout if timeout is None else timeout
+        try:
+            waiter.event.wait(timeout)
+        except BaseException:
+            # GreenletExit or gevent.Timeout while queued
+            self._abandon(waiter, ticket)
+            raise
+        return self._leave_queue(waiter, ticket, timeout)
+
+    async def acquire_async(self, user_key=None, api_key: str = None, timeout: float = None) -> Tuple:
+        """Coroutine version of acquire() for the ASGI chat path; waiting never blocks the event loop."""
+        ticket = (user_key, key_fingerprint(api_key))
+        waiter = self._enter(ticket, loop=asyncio.get_running_loop())
+        if waiter is None:
+            return ticket
+
+        timeout = self.queue_timeout if timeout is None else timeout
+        try:
+            await asyncio.wait_for(waiter.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            self._abandon(waiter, ticket)
+            raise
+        return self._leave_queue(waiter, ticket, timeout)
+
+    def _enter(self, ticket: Tuple, loop) -> Optional[_Waiter]:
+        """Take a slot now (returns None) or join the queue (returns the waiter)."""
+        if not self.enabled:
+            return None
+
+        user_key, fingerprint = ticket
+        with self._lock:
+            # Everyone still queued is blocked by their own caps, so running now keeps FIFO order
+            if self._can_run(user_key, fingerprint):
+                self._grant(user_key, fingerprint)
+                return None
+
+            if len(self._queue) >= self.max_queue:
+                raise self._reject('queue_full', 'Too many chat requests in progress. Please retry shortly.',
+                                   retry_after=1.0)
+            if user_key is not None and self._queued_by_user.get(user_key, 0) >= self.max_queue_per_user:
+                raise self._reject('user_queue_full', 'You have too many chat requests in progress. '
+                                   'Please wait for them to finish.', retry_after=1.0)
+
+            waiter = _Waiter(user_key, fingerprint, loop=loop)
+            self._queue.append(waiter)
+            if user_key is not None:
+                self._queued_by_user[user_key] = self._queued_by_user.get(user_key, 0) + 1
+            LLM_ADMISSION_QUEUE.set(len(self._queue))
+            return waiter
+
+    def _abandon(self, waiter: _Waiter, ticket: Tuple) -> None:
+        """Caller went away while queued; leave the queue, or hand back a slot granted in the meantime."""
+        with self._lock:
+            if waiter.admitted:
+                self._release_locked(ticket)
+            else:
+                self._dequeue(waiter)
+
+    def _leave_queue(self, waiter: _Waiter, ticket: Tuple, timeout: float) -> Tuple:
+        with self._lock:
+            if waiter.admitted:
+                return ticket
+            self._dequeue(waiter)
+        raise self._reject('queue_timeout', 'Chat is busy right now. Please retry shortly.',
+                           retry_after=max(timeout, 1.0))
+
+    def release(self, ticket: Tuple) -> None:
+        """Free a slot taken by acquire() and admit the next eligible waiter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._release_locked(ticket)
+
+    def _release_locked(self, ticket: Tuple) -> None:
+        user_key, fingerprint = ticket
+        self._in_flight = max(self._in_flight - 1, 0)
+        self._decrement(self._by_user, user_key)
+        self._decrement(self._by_key, fingerprint)
+        self._dispatch()
+        LLM_IN_FLIGHT.set(self._in_flight)
+
+    @contextmanager
+    def admit(self, user_key=None, api_key: str = None):
+        """Hold an LLM call slot for the duration of the block."""
+        started = time.perf_counter()
+        ticket = self.acquire(user_key, api_key)
+        waited = time.perf_counter() - started
+        if waited > 1.0:
+            logger.info(f"LLM call waited {waited:.2f}s for admission")
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def admit_async(self, user_key=None, api_key: str = None):
+        """Hold an LLM call slot for the duration of an async block."""
+        ticket = await self.acquire_async(user_key, api_key)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> dict:
+        """Current occupancy for monitoring."""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'in_flight': self._in_flight,
+                'queued': len(self._queue),
+                'max_in_flight': self.max_in_flight
+            }
+
+
+# Shared instance, configured by create_app()
+admission = AdmissionController()
@@ -6,7 +6,6 @@ Special Agents Package (.sagent) handler
 Validates, extracts, and processes agent packages
 """
 import os
-import yaml
 import zipfile
 import tempfile
 import shutil
@@ -85,6 +84,8 @@ class AgentPackageValidator:
 
     def _validate_contents(self, package_dir):
         """Validate the contents of extracted package."""
+        import yaml  # deferred: only packaged agents need YAML
+
         metadata = {}
 
         # Check required files - first at root, then in single subdirectory
@@ -330,6 +331,8 @@ class AgentPackageExtractor:
                 'knowledge': combined knowledge base text
             }
         """
+        import yaml  # deferred: only packaged agents need YAML
+
         agent_dir = os.path.join(self.storage_path, str(agent_id))
 
         if not os.path.exists(agent_dir):
@@ -0,0 +1,411 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+ASGI server mode - async streaming chat alongside the Flask app
+
+    uvicorn --factory app.asgi:create_asgi_app --port 5000
+    gunicorn -k uvicorn.workers.UvicornWorker 'app.asgi:create_asgi_app()'
+
+POST /chat/agent/<id>/stream is served natively with the async provider SDKs as
+server-sent events; every other request goes to the Flask app on a thread of the
+event loop's default executor, one thread per request in flight. Sync routes
+that block (database, sync LLM calls) hold only their own thread, and the
+executor's size caps how many run at once.
+"""
+import asyncio
+import io
+import json
+import logging
+import re
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask import request, session
+from flask_login import current_user
+from werkzeug.exceptions import HTTPException
+
+from app.admission import AdmissionController, LLMAdmissionError
+from app.async_llm import AsyncLLMService
+from app.llm_cache import response_cache
+from app.llm_resilience import (
+    LLMError,
+    LLMAuthenticationError,
+    LLMRateLimitError,
+    LLMCircuitOpenError,
+    LLMOverloadedError,
+    LLMTimeoutError
+)
+from app.usage import usage_recorder
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = re.compile(r'^/chat/agent/(\d+)/stream$')
+
+# Same history window the sync chat route keeps in the session
+MAX_HISTORY_MESSAGES = 20
+MAX_BODY_BYTES = 1024 * 1024
+
+ERROR_STATUS = {
+    LLMAuthenticationError: 401,
+    LLMRateLimitError: 429,
+    LLMAdmissionError: 429,
+    LLMCircuitOpenError: 503,
+    LLMOverloadedError: 503,
+    LLMTimeoutError: 504
+}
+
+
+def clean_history(history) -> list:
+    """Keep well-formed user/assistant turns from client-held history (streams cannot update the session)."""
+    if not isinstance(history, list):
+        return []
+    cleaned = [
+        {'role': m['role'], 'content': m['content']}
+        for m in history
+        if isinstance(m, dict) and m.get('role') in ('user', 'assistant') and isinstance(m.get('content'), str)
+    ]
+    return cleaned[-MAX_HISTORY_MESSAGES:]
+
+
+def format_sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    """
+    One WSGI request, run on a pool thread.
+
+    asgiref runs WSGI apps thread-sensitively, on a single thread shared by every request,
+    so one slow Flask route would hold up all the others. asgiref's __call__ buffers the
+    body and awaits run_wsgi_app(body); the rest is ours, built on build_environ and
+    start_response, so the way asgiref decorates its own run_wsgi_app does not matter.
+    """
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self._run_wsgi_app, thread_sensitive=False)(body)
+
+    def _run_wsgi_app(self, body) -> None:
+        """Run the app and send its response (start_response is called on this same thread)."""
+        environ = self.build_environ(self.scope, body)
+        iterable = self.wsgi_application(environ, self.start_response)
+        try:
+            bytes_sent = 0
+            for output in iterable:
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                # Never send more than a Content-Length the app declared
+                if self.response_content_length is not None:
+                    output = output[:self.response_content_length - bytes_sent]
+                self.sync_send({'type': 'http.response.body', 'body': output, 'more_body': True})
+                bytes_sent += len(output)
+                if bytes_sent == self.response_content_length:
+                    break
+        finally:
+            # WSGI requires close(); it runs Flask's teardown for streamed responses
+            if hasattr(iterable, 'close'):
+                iterable.close()
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({'type': 'http.response.body'})
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi serving requests concurrently from the default executor."""
+
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+class ChatStreamApp:
+    """ASGI application: streaming chat natively, everything else through Flask."""
+
+    def __init__(self, flask_app, admission: AdmissionController = None):
+        self.flask_app = flask_app
+        self.admission = admission
+        self.wsgi = PooledWsgiToAsgi(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+
+        if scope['type'] == 'http' and scope['method'] == 'POST':
+            match = STREAM_PATH.match(scope['path'])
+            if match:
+                await self.stream_message(scope, receive, send, int(match.group(1)))
+                return
+
+        await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Flush buffered usage events before the worker exits
+                await asyncio.to_thread(usage_recorder.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # --- request handling -------------------------------------------------
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    def _prepare(self, environ, agent_id):
+        """
+        Authenticate and load everything the stream needs, in a Flask request context.
+
+        Runs the app's before_request hooks (rate limits, CSRF, request validation)
+        against the matching Flask route, then mirrors the sync chat route's checks.
+
+        Returns:
+            tuple: (chat parameters, None) or (None, (status, error payload))
+        """
+        from app import db
+        from app.models import Agent, Purchase
+        from app.local_llm import LOCAL_API_KEY
+        from app.routes.chat import agent_provider, get_fallback_keys
+
+        app = self.flask_app
+        with app.request_context(environ):
+            try:
+                early_response = app.preprocess_request()
+            except HTTPException as e:
+                return None, (e.code, {'error': e.description})
+            if early_response is not None:
+                response = app.make_response(early_response)
+                return None, (response.status_code, response.get_json(silent=True) or {'error': response.status})
+
+            if not current_user.is_authenticated:
+                return None, (401, {'error': 'Please log in to chat'})
+
+            agent = db.session.get(Agent, agent_id)
+            if agent is None:
+                return None, (404, {'error': 'Agent not found'})
+
+            has_purchased = Purchase.query.filter_by(
+                buyer_id=current_user.id,
+                agent_id=agent_id,
+                is_active=True
+            ).first()
+            if not has_purchased:
+                return None, (403, {'error': 'You must purchase this agent before chatting'})
+
+            data = request.get_json(silent=True) or {}
+            user_message = data.get('message')
+            if not user_message:
+                return None, (400, {'error': 'Message is required'})
+
+            provider = agent_provider(agent)
+            api_key = data.get('api_key') or session.get('anthropic_api_key')
+            if not api_key and provider == 'local':
+                api_key = LOCAL_API_KEY
+            if not api_key:
+                return None, (401, {'error': 'Please provide your Anthropic API key', 'require_api_key': True})
+
+            if not agent.config:
+                return None, (500, {'error': 'Agent configuration not found'})
+
+            return {
+                'user_id': current_user.id,
+                'agent_id': agent.id,
+                'creator_id': agent.creator_id,
+                'provider': provider,
+                'api_key': api_key,
+                'model': agent.config.llm_model,
+                'routing_policy': agent.config.routing_policy,
+                'allow_costlier_failover': agent.config.allow_costlier_failover is True,
+                'fallback_keys': get_fallback_keys(data, provider),
+                'system_prompt': agent.config.system_prompt,
+                # Streams cannot write the session back, so clients send the turns they hold
+                'history': clean_history(data.get('conversation_history',
+                                                  session.get(f'chat_history_{agent_id}', []))),
+                'message': user_message,
+                'use_cache': agent.config.cache_responses is not False
+            }, None
+
+    async def stream_message(self, scope, receive, send, agent_id):
+        body = await self._read_body(receive)
+        if body is None:
+            await self._send_json(send, 413, {'error': 'Request body too large'})
+            return
+
+        # Same WSGI environ the Flask routes get through WsgiToAsgi
+        builder = WsgiToAsgiInstance(self.flask_app)
+        builder.scope = scope
+        environ = builder.build_environ(scope, io.BytesIO(body))
+        # The body is already buffered, so chunked uploads get a length too
+        environ['CONTENT_LENGTH'] = str(len(body))
+        chat, error = await asyncio.to_thread(self._prepare, environ, agent_id)
+        if error is not None:
+            await self._send_json(send, *error)
+            return
+
+        # Cache and ledger writes use the database, which needs an app context (copied into to_thread)
+        with self.flask_app.app_context():
+            service = AsyncLLMService(
+                provider=chat['provider'],
+                api_key=chat['api_key'],
+                cache=response_cache,
+                model=chat['model'],
+                routing_policy=chat['routing_policy'],
+                allow_costlier_failover=chat['allow_costlier_failover'],
+                fallback_keys=chat['fallback_keys'],
+                admission=self.admission,
+                user_id=chat['user_id']
+            )
+            events = service.stream_chat(chat['system_prompt'], chat['history'], chat['message'],
+                                         use_cache=chat['use_cache'])
+
+            # Errors before the first token still get a proper status code. A client that leaves
+            # while the provider is still thinking stops the wait (and frees its admission slot).
+            first_event = asyncio.ensure_future(events.__anext__())
+            disconnect = asyncio.ensure_future(self._wait_for_disconnect(receive))
+            await asyncio.wait({first_event, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+            if not first_event.done():
+                await self._cancel(first_event)
+                await events.aclose()
+                logger.info(f"Chat stream for agent {agent_id} cancelled by client disconnect")
+                return
+            try:
+                first = first_event.result()
+            except LLMError as e:
+                disconnect.cancel()
+                await events.aclose()
+                await self._send_error(send, e)
+                return
+            except Exception:
+                disconnect.cancel()
+                logger.exception(f"Chat stream for agent {agent_id} failed")
+                await events.aclose()
+                await self._send_json(send, 500, {'error': 'Chat failed'})
+                return
+
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream; charset=utf-8'),
+                    (b'cache-control', b'no-cache'),
+                    # Stop proxies from buffering the stream
+                    (b'x-accel-buffering', b'no')
+                ]
+            })
+
+            pump = asyncio.ensure_future(self._pump(events, first, send, chat))
+            done, _ = await asyncio.wait({pump, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+            if pump in done:
+                disconnect.cancel()
+                pump.result()
+            else:
+                # Client went away; cancelling closes the provider stream and frees the admission slot
+                await self._cancel(pump)
+                logger.info(f"Chat stream for agent {agent_id} cancelled by client disconnect")
+
+    @staticmethod
+    async def _cancel(task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _pump(self, events, first, send, chat):
+        event = first
+        try:
+            while True:
+                if event['type'] == 'delta':
+                    await send({'type': 'http.response.body', 'body': format_sse('delta', {'text': event['text']}),
+                                'more_body': True})
+                else:
+                    event.pop('type')
+                    usage_recorder.record(
+                        user_id=chat['user_id'],
+                        agent_id=chat['agent_id'],
+                        creator_id=chat['creator_id'],
+                        provider=event['provider'],
+                        model=event['model'],
+                        usage=event['usage'],
+                        estimated_cost=event['estimated_cost'],
+                        cached=event['cached']
+                    )
+                    await send({'type': 'http.response.body', 'body': format_sse('done', event), 'more_body': True})
+                    break
+                event = await events.__anext__()
+        except LLMError as e:
+            # Headers are already sent; report the failure in-band
+            await send({'type': 'http.response.body', 'more_body': True,
+                        'body': format_sse('error', {'error': str(e), 'retryable': e.retryable})})
+        except Exception:
+            logger.exception(f"Chat stream for agent {chat['agent_id']} failed")
+            await send({'type': 'http.response.body', 'more_body': True,
+                        'body': format_sse('error', {'error': 'Chat failed', 'retryable': False})})
+        finally:
+            await events.aclose()
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    @staticmethod
+    async def _wait_for_disconnect(receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+    @staticmethod
+    async def _send_json(send, status: int, payload: dict, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+                       + (headers or [])
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _send_error(self, send, error: LLMError):
+        status = next((code for cls, code in ERROR_STATUS.items() if isinstance(error, cls)), 500)
+        payload = {'error': str(error)}
+        headers = []
+        if status == 401:
+            payload['require_api_key'] = True
+        elif status in (429, 503, 504):
+            payload['retryable'] = True
+            if error.retry_after:
+                headers.append((b'retry-after', str(int(error.retry_after) + 1).encode()))
+        await self._send_json(send, status, payload, headers)
+
+
+def create_asgi_app(flask_app=None):
+    """ASGI application factory (uvicorn --factory app.asgi:create_asgi_app)."""
+    if flask_app is None:
+        from app import create_app
+        flask_app = create_app()
+
+    config = flask_app.config
+    admission = AdmissionController(
+        max_in_flight=config.get('LLM_ASYNC_MAX_IN_FLIGHT', 1000),
+        max_per_user=config.get('LLM_MAX_IN_FLIGHT_PER_USER', 2),
+        max_per_key=config.get('LLM_MAX_IN_FLIGHT_PER_KEY', 4),
+        max_queue=config.get('LLM_ADMISSION_QUEUE_SIZE', 64),
+        max_queue_per_user=config.get('LLM_ADMISSION_QUEUE_PER_USER', 4),
+        queue_timeout=config.get('LLM_ADMISSION_QUEUE_TIMEOUT', 10.0),
+        enabled=config.get('LLM_ADMISSION_ENABLED', True)
+    )
+    return ChatStreamApp(flask_app, admission=admission)
@@ -0,0 +1,293 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Async LLM providers and streaming chat for the ASGI server mode
+Uses AsyncAnthropic/AsyncOpenAI so an open conversation costs a coroutine, not a greenlet or thread
+"""
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Dict, List
+
+from app.llm_resilience import LLMError, RetryPolicy, acall_with_resilience, classify_error, resilience
+from app.llm_router import estimate_tokens
+from app.llm_service import LLMService, AnthropicProvider, OpenAIProvider, LocalProvider
+from app.local_llm import local_llm, local_completion
+from app.telemetry import record_llm_call
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLLMProvider(ABC):
+    """Base class for streaming providers built on the async SDK clients."""
+
+    PROVIDER_ID = None
+    LABEL = None
+    DEFAULT_MODEL = None
+
+    def __init__(self, api_key: str, model: str = None, retry_policy: RetryPolicy = None, timeout: float = None):
+        self.client = self._create_client(api_key)
+        self.api_key = api_key
+        self.model = model or self.DEFAULT_MODEL
+        self.retry_policy = retry_policy
+        self.timeout = timeout
+
+    @abstractmethod
+    def _create_client(self, api_key: str):
+        pass
+
+    @abstractmethod
+    def stream(self, system_prompt: str, messages: List[Dict], max_tokens: int = 4096) -> AsyncIterator[Dict]:
+        """
+        Stream a completion.
+
+        Yields:
+            {'text': str} for each text delta, then one {'model': str, 'usage': dict}
+        """
+        pass
+
+    async def _open(self, request_func):
+        """Open the stream under the shared retry policy and circuit breaker (retries stop at the first token)."""
+        def attempt(remaining):
+            kwargs = {'timeout': remaining} if remaining is not None else {}
+            return request_func(**kwargs)
+
+        return await acall_with_resilience(
+            attempt,
+            provider=self.PROVIDER_ID,
+            breaker=resilience.breaker_for(self.PROVIDER_ID),
+            policy=self.retry_policy or resilience.retry_policy,
+            classify=lambda e: classify_error(e, self.PROVIDER_ID, self.LABEL),
+            deadline=self.timeout if self.timeout is not None else resilience.timeout
+        )
+
+
+class AsyncAnthropicProvider(AsyncLLMProvider):
+    """Anthropic Claude over AsyncAnthropic."""
+
+    PROVIDER_ID = 'anthropic'
+    LABEL = 'Claude'
+    DEFAULT_MODEL = AnthropicProvider.DEFAULT_MODEL
+
+    def _create_client(self, api_key: str):
+        import anthropic
+        # Retries are handled by llm_resilience, not the SDK
+        return anthropic.AsyncAnthropic(api_key=api_key, max_retries=0)
+
+    async def stream(self, system_prompt: str, messages: List[Dict], max_tokens: int = 4096) -> AsyncIterator[Dict]:
+        stream = await self._open(
+            lambda **kwargs: self.client.messages.create(
+                model=self.model,
+                max_tokens=max_tokens,
+                system=system_prompt,
+                messages=messages,
+                stream=True,
+                **kwargs
+            )
+        )
+
+        model = self.model
+        usage = {'input_tokens': 0, 'output_tokens': 0}
+        try:
+            async for event in stream:
+                if event.type == 'message_start':
+                    model = event.message.model
+                    usage['input_tokens'] = event.message.usage.input_tokens
+                elif event.type == 'content_block_delta' and getattr(event.delta, 'text', None):
+                    yield {'text': event.delta.text}
+                elif event.type == 'message_delta':
+                    usage['output_tokens'] = event.usage.output_tokens
+        except Exception as e:
+            logger.error(f"Anthropic stream error: {str(e)}")
+            raise classify_error(e, self.PROVIDER_ID, self.LABEL) from e
+        finally:
+            await stream.close()
+
+        usage['total_tokens'] = usage['input_tokens'] + usage['output_tokens']
+        yield {'model': model, 'usage': usage}
+
+
+class AsyncOpenAIProvider(AsyncLLMProvider):
+    """OpenAI GPT over AsyncOpenAI."""
+
+    PROVIDER_ID = 'openai'
+    LABEL = 'GPT'
+    DEFAULT_MODEL = OpenAIProvider.DEFAULT_MODEL
+
+    def _create_client(self, api_key: str):
+        from openai import AsyncOpenAI
+        # Retries are handled by llm_resilience, not the SDK
+        return AsyncOpenAI(api_key=api_key, max_retries=0)
+
+    async def stream(self, system_prompt: str, messages: List[Dict], max_tokens: int = 4096) -> AsyncIterator[Dict]:
+        # OpenAI expects the system message in the messages array
+        openai_messages = [{'role': 'system', 'content': system_prompt}]
+        openai_messages.extend(messages)
+
+        stream = await self._open(
+            lambda **kwargs: self.client.chat.completions.create(
+                model=self.model,
+                max_tokens=max_tokens,
+                messages=openai_messages,
+                stream=True,
+                stream_options={'include_usage': True},
+                **kwargs
+            )
+        )
+
+        model = self.model
+        usage = {'input_tokens': 0, 'output_tokens': 0}
+        try:
+            async for chunk in stream:
+                model = chunk.model or model
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield {'text': chunk.choices[0].delta.content}
+                if chunk.usage:
+                    # Sent in a final chunk with no choices
+                    usage['input_tokens'] = chunk.usage.prompt_tokens
+                    usage['output_tokens'] = chunk.usage.completion_tokens
+        except Exception as e:
+            logger.error(f"OpenAI stream error: {str(e)}")
+            raise classify_error(e, self.PROVIDER_ID, self.LABEL) from e
+        finally:
+            await stream.close()
+
+        usage['total_tokens'] = usage['input_tokens'] + usage['output_tokens']
+        yield {'model': model, 'usage': usage}
+
+
+class AsyncLocalProvider(AsyncLLMProvider):
+    """Local model streamed token by token at the configured rate (see app.local_llm)."""
+
+    PROVIDER_ID = 'local'
+    LABEL = 'Local model'
+    DEFAULT_MODEL = LocalProvider.DEFAULT_MODEL
+
+    def _create_client(self, api_key: str):
+        return None
+
+    async def stream(self, system_prompt: str, messages: List[Dict], max_tokens: int = 4096) -> AsyncIterator[Dict]:
+        async def first_token(timeout=None):
+            local_llm.maybe_fail()
+            await local_llm.simulate_async(local_llm.ttft, timeout)
+            return local_completion(system_prompt, messages, min(local_llm.response_tokens, max_tokens))
+
+        tokens = await self._open(first_token)
+        for index, token in enumerate(tokens):
+            if index:
+                await asyncio.sleep(local_llm.token_delay)
+            yield {'text': token}
+
+        input_tokens = estimate_tokens(system_prompt, messages)
+        yield {'model': self.model, 'usage': {
+            'input_tokens': input_tokens,
+            'output_tokens': len(tokens),
+            'total_tokens': input_tokens + len(tokens)
+        }}
+
+
+class AsyncLLMService(LLMService):
+    """LLMService whose providers stream over the async SDK clients."""
+
+    ASYNC_PROVIDER_CLASSES = {
+        'anthropic': AsyncAnthropicProvider,
+        'openai': AsyncOpenAIProvider,
+        'local': AsyncLocalProvider
+    }
+
+    def _provider_class(self, provider_id: str):
+        return self.ASYNC_PROVIDER_CLASSES[provider_id]
+
+    async def stream_chat(self, system_prompt: str, conversation_history: List[Dict], user_message: str,
+                          use_cache: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a reply to the user's message.
+
+        Routes are tried in order like LLMService.chat, but only until the first
+        token has been sent; after that a failure ends the stream.
+
+        Yields:
+            {'type': 'delta', 'text': str} chunks, then {'type': 'done', ...} with the
+            same fields LLMService.chat returns
+
+        Raises:
+            LLMError: Before the first delta, the primary route's error or LLMAdmissionError;
+                      after it, the error that interrupted the stream
+        """
+        started = time.perf_counter()
+
+        messages, routes = self._plan(system_prompt, conversation_history, user_message)
+        primary = routes[0]
+
+        cache_key = self._cache_key(primary, system_prompt, messages, use_cache)
+        # Database backend lookups must not block the event loop
+        verified = cache_key is not None and await asyncio.to_thread(self._key_verified, primary)
+        if verified:
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                result = self._cached_result(cached, primary)
+                yield {'type': 'delta', 'text': result['response']}
+                yield dict(result, type='done')
+                return
+
+        slot = (self.admission.admit_async(self.user_id, self.api_keys[self.provider_id])
+                if self.admission else nullcontext())
+        async with slot:
+            first_error = None
+            for index, route in enumerate(routes):
+                call_started = time.perf_counter()
+                first_token_at = None
+                parts = []
+                try:
+                    async for chunk in self._get_provider(route).stream(
+                            system_prompt, messages, max_tokens=self.DEFAULT_MAX_TOKENS):
+                        if 'text' in chunk:
+                            if first_token_at is None:
+                                first_token_at = time.perf_counter()
+                            parts.append(chunk['text'])
+                            yield {'type': 'delta', 'text': chunk['text']}
+                        else:
+                            final = chunk
+                    break
+                except LLMError as e:
+                    record_llm_call(route.provider, route.model, type(e).__name__, time.perf_counter() - call_started,
+                                    queue_wait=call_started - started)
+                    # Text already reached the client; another route would splice two answers together
+                    if parts:
+                        raise
+                    first_error = first_error or e
+                    if not self._should_failover(e, index) or index == len(routes) - 1:
+                        raise first_error
+                    logger.warning(f"{route.provider}/{route.model} failed ({type(e).__name__}), "
+                                   f"failing over to {routes[index + 1].provider}/{routes[index + 1].model}")
+
+        duration = time.perf_counter() - call_started
+        ttft = first_token_at - call_started if first_token_at is not None else duration
+        event = record_llm_call(route.provider, route.model, 'ok', duration, queue_wait=call_started - started,
+                                ttft=ttft, usage=final['usage'])
+
+        result = {
+            'response': ''.join(parts),
+            'model': final['model'],
+            'usage': final['usage'],
+            'provider': route.provider,
+            'cached': False,
+            'failover': route != primary,
+            'estimated_cost': event.get('estimated_cost_usd', 0.0)
+        }
+
+        if cache_key is not None:
+            await asyncio.to_thread(self._store, cache_key, verified, primary, route, result)
+
+        yield dict(result, type='done')
+
+    async def chat(self, system_prompt: str, conversation_history: List[Dict], user_message: str,
+                   use_cache: bool = True) -> Dict[str, Any]:
+        """Non-streaming form of stream_chat; returns what LLMService.chat returns."""
+        async for event in self.stream_chat(system_prompt, conversation_history, user_message, use_cache):
+            if event['type'] == 'done':
+                event.pop('type')
+                return event
@@ -0,0 +1,144 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Response compression - gzip, or brotli when the Brotli package is installed
+Text responses (HTML, JSON, CSS, JavaScript) of at least COMPRESS_MIN_SIZE bytes are compressed
+for clients that accept it, the encoding picked from Accept-Encoding. Streamed responses are
+compressed chunk by chunk, each flushed as it is written, so a client never waits on the
+compressor for text the app has already produced. A response that already carries a
+Content-Encoding (compressed upstream) or asks for no-transform is left alone. A proxy in front
+then sees the encoding and passes the body through rather than compressing it again.
+"""
+import zlib
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Optional dependency: gzip only
+    brotli = None
+
+# Compressed when the client accepts it; everything else (images, archives, event streams) is not
+DEFAULT_MIMETYPES = ('text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript',
+                     'application/javascript', 'application/json', 'application/xml', 'image/svg+xml')
+
+# No body, or a byte range of the uncompressed representation
+UNCOMPRESSED_STATUSES = (204, 206, 304)
+
+
+class Encoder(NamedTuple):
+    """One compression stream: compress(chunk), flush() at chunk ends, finish() at the end."""
+    compress: Callable[[bytes], bytes]
+    flush: Callable[[], bytes]
+    finish: Callable[[], bytes]
+
+
+def gzip_encoder(level: int) -> Encoder:
+    """A gzip stream (a sync flush ends each chunk on a byte boundary the client can decode)."""
+    stream = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return Encoder(stream.compress, lambda: stream.flush(zlib.Z_SYNC_FLUSH), stream.flush)
+
+
+def brotli_encoder(quality: int) -> Encoder:
+    """A brotli stream."""
+    stream = brotli.Compressor(quality=quality)
+    return Encoder(stream.process, stream.flush, stream.finish)
+
+
+def compressed_chunks(chunks: Iterable[bytes], encoder: Encoder, source=None):
+    """Compress a streamed body chunk by chunk, flushing each so it reaches the client at once."""
+    try:
+        for chunk in chunks:
+            if chunk:
+                yield encoder.compress(chunk) + encoder.flush()
+        yield encoder.finish()
+    finally:
+        # The body iterable being replaced still has to be closed (stream_with_context pops its context)
+        if hasattr(source, 'close'):
+            source.close()
+
+
+class ResponseCompression:
+    """Compresses text responses for clients that accept gzip or brotli."""
+
+    def __init__(self, enabled: bool = True, min_size: int = 500, level: int = 6, brotli_quality: int = 4,
+                 mimetypes: Iterable[str] = DEFAULT_MIMETYPES):
+        self.enabled = enabled
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.mimetypes = frozenset(mimetypes)
+
+    def init_app(self, app):
+        """Load settings from app config and compress the app's responses."""
+        self.enabled = app.config.get('COMPRESS_ENABLED', True)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+        self.level = app.config.get('COMPRESS_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+        self.mimetypes = frozenset(app.config.get('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES))
+        app.extensions['compression'] = self
+
+        # after_request hooks run last-registered first, so the header hooks create_app adds
+        # later see the response before it is compressed
+        app.after_request(self.compress)
+
+    @property
+    def encodings(self):
+        """Content codings offered, preferred first."""
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def negotiate(self, accept_encodings) -> Optional[str]:
+        """The coding to use for a request's Accept-Encoding, or None to send the body as is."""
+        qualities = {encoding: accept_encodings.quality(encoding) for encoding in self.encodings}
+        encoding = max(self.encodings, key=lambda name: qualities[name])
+        return encoding if qualities[encoding] > 0 else None
+
+    def encoder(self, encoding: str) -> Encoder:
+        """A fresh compression stream for encoding."""
+        return brotli_encoder(self.brotli_quality) if encoding == 'br' else gzip_encoder(self.level)
+
+    def compress(self, response):
+        """after_request hook: compress response in place when it qualifies."""
+        if (not self.enabled or response.mimetype not in self.mimetypes
+                or 'Content-Encoding' in response.headers or response.cache_control.no_transform):
+            return response
+
+        # Whether or not this client gets it compressed, caches must key on what it accepts
+        # (a 304 repeats the Vary of the response it revalidates)
+        response.vary.add('Accept-Encoding')
+        if response.status_code in UNCOMPRESSED_STATUSES or response.status_code < 200:
+            return response
+        encoding = self.negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed and not response.direct_passthrough:
+            source = response.response
+            response.response = compressed_chunks(response.iter_encoded(), self.encoder(encoding), source)
+            response.headers.pop('Content-Length', None)
+        else:
+            # Buffered bodies, and files sent with send_file, of a known size
+            length = response.content_length
+            if length is not None and length < self.min_size:
+                return response
+            response.direct_passthrough = False
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            encoder = self.encoder(encoding)
+            response.set_data(encoder.compress(data) + encoder.finish())
+
+        response.headers['Content-Encoding'] = encoding
+        # Ranges would address the uncompressed bytes
+        response.headers.pop('Accept-Ranges', None)
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # The compressed body is a different sequence of bytes with the same meaning
+            response.set_etag(etag, weak=True)
+        return response
+
+
+# Shared instance, configured by create_app()
+compression = ResponseCompression()
@@ -0,0 +1,146 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Marketplace facets - listed agents counted per (category, price band)
+marketplace_facet_count is adjusted by the listing refresh in the same transaction: each refreshed
+agent's old row subtracts one and its new row adds one, stamping the time of the change. Facet
+navigation then reads at most categories x bands rows, however many agents are listed.
+Searches, whose matches cannot be precomputed, are counted from the matching rows instead.
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, case, delete, func, insert, literal, select, update
+
+# (key, label, lower bound inclusive, upper bound exclusive); prices are in the listing currency
+PRICE_BANDS = (
+    ('free', 'Free', None, 0.0),
+    ('under_10', 'Under 10', 0.0, 10.0),
+    ('10_to_50', '10 to 50', 10.0, 50.0),
+    ('50_plus', '50 and up', 50.0, None),
+)
+PRICE_BAND_KEYS = tuple(band[0] for band in PRICE_BANDS)
+
+
+def price_band(price: Optional[float]) -> str:
+    """Band key for a price; zero (or no price) is 'free'."""
+    if not price or price <= 0:
+        return 'free'
+    for key, _, low, high in PRICE_BANDS[1:]:
+        if price >= low and (high is None or price < high):
+            return key
+    return PRICE_BANDS[-1][0]
+
+
+def price_band_condition(column, band: str):
+    """SQL condition selecting prices in band."""
+    if band == 'free':
+        return column <= 0
+    _, _, low, high = next(b for b in PRICE_BANDS if b[0] == band)
+    condition = column > 0 if low == 0 else column >= low
+    return condition if high is None else and_(condition, column < high)
+
+
+def price_band_case(column):
+    """SQL expression computing the band key of column."""
+    return case(*[(price_band_condition(column, key), key) for key in PRICE_BAND_KEYS[:-1]],
+                else_=PRICE_BAND_KEYS[-1])
+
+
+def apply_changes(connection, removed: Iterable[Tuple[str, float]], added: Iterable[Tuple[str, float]]) -> None:
+    """Adjust counts for listing rows removed and added, each given as (category, price)."""
+    delta = Counter()
+    for category, price in removed:
+        delta[(category, price_band(price))] -= 1
+    for category, price in added:
+        delta[(category, price_band(price))] += 1
+
+    for (category, band), amount in delta.items():
+        if amount:
+            _add(connection, category, band, amount)
+
+
+def rebuild(connection) -> None:
+    """Recount every facet from marketplace_listing."""
+    from app.models import MarketplaceFacetCount, MarketplaceListing
+
+    band = price_band_case(MarketplaceListing.price)
+    connection.execute(delete(MarketplaceFacetCount))
+    connection.execute(insert(MarketplaceFacetCount).from_select(
+        ['category', 'price_band', 'agent_count', 'updated_at'],
+        select(MarketplaceListing.category, band, func.count(), literal(datetime.utcnow()))
+        .group_by(MarketplaceListing.category, band)
+    ))
+
+
+def stored_counts(session) -> Counter:
+    """Precomputed counts keyed by (category, price band)."""
+    from app.models import MarketplaceFacetCount
+
+    rows = session.execute(
+        select(MarketplaceFacetCount.category, MarketplaceFacetCount.price_band, MarketplaceFacetCount.agent_count)
+        .where(MarketplaceFacetCount.agent_count > 0)
+    )
+    return Counter({(category, band): count for category, band, count in rows})
+
+
+def count_rows(rows: Iterable[Tuple[str, float]]) -> Counter:
+    """Counts keyed by (category, price band) for (category, price) rows, e.g. search matches."""
+    return Counter((category, price_band(price)) for category, price in rows)
+
+
+def summarize(counts: Counter, category: Optional[str] = None, band: Optional[str] = None) -> Dict:
+    """
+    Facet lists for the current selection.
+
+    Each facet is counted with the other facet's selection applied but not its own, so the
+    options stay visible after one is picked.
+    """
+    categories = Counter()
+    bands = Counter()
+    for (cat, price_key), count in counts.items():
+        if band is None or price_key == band:
+            categories[cat] += count
+        if category is None or cat == category:
+            bands[price_key] += count
+
+    total = sum(count for (cat, price_key), count in counts.items()
+                if (category is None or cat == category) and (band is None or price_key == band))
+    return {
+        'categories': [{'value': cat, 'count': count}
+                       for cat, count in sorted(categories.items(), key=lambda item: (-item[1], item[0]))],
+        'price_bands': [{'value': key, 'label': label, 'count': bands.get(key, 0)}
+                        for key, label, _, _ in PRICE_BANDS],
+        'total': total
+    }
+
+
+def _add(connection, category: str, band: str, amount: int) -> None:
+    """Add amount to one count, creating the row if needed (atomic upsert where supported)."""
+    from app.models import MarketplaceFacetCount
+
+    now = datetime.utcnow()
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        connection.execute(dialect_insert(MarketplaceFacetCount).values(
+            category=category, price_band=band, agent_count=amount, updated_at=now
+        ).on_conflict_do_update(
+            index_elements=['category', 'price_band'],
+            set_={'agent_count': MarketplaceFacetCount.agent_count + amount, 'updated_at': now}
+        ))
+        return
+
+    result = connection.execute(update(MarketplaceFacetCount).where(
+        MarketplaceFacetCount.category == category,
+        MarketplaceFacetCount.price_band == band
+    ).values(agent_count=MarketplaceFacetCount.agent_count + amount, updated_at=now))
+    if result.rowcount == 0:
+        connection.execute(insert(MarketplaceFacetCount).values(category=category, price_band=band,
+                                                                agent_count=amount, updated_at=now))
+
@@ -0,0 +1,124 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+HTTP conditional requests - ETag and Last-Modified validators for the catalog pages
+A view reads the version fields its body depends on (updated_at columns, stored counts) and calls
+conditional() before rendering anything. While the client's If-None-Match or If-Modified-Since
+still matches, it gets a 304 and the page is never rendered. Every ETag also covers the release
+(code and templates), the URL, JSON vs HTML and the signed-in user, whose name is in the page.
+Anonymous responses may be kept by shared caches; signed-in ones are private and revalidated on
+every use.
+"""
+import hashlib
+import os
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from flask import after_this_request, make_response, request, session
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+
+# Files fingerprinted as the release when HTTP_CACHE_VERSION is not set
+RELEASE_EXTENSIONS = ('.py', '.html')
+
+# Request headers that change a catalog response (the session cookie carries the user and flashes)
+VARY_HEADERS = ('Cookie', 'Content-Type')
+
+
+class ConditionalRequests:
+    """Answers repeat GETs of unchanged catalog pages with 304 Not Modified."""
+
+    def __init__(self, enabled: bool = True, max_age: int = 0, version: str = ''):
+        self.enabled = enabled
+        self.max_age = max_age
+        self.version = version
+        self._roots = ()
+        self._release = None
+
+    def init_app(self, app):
+        """Load settings from app config."""
+        self.enabled = app.config.get('HTTP_CACHE_ENABLED', True)
+        self.max_age = app.config.get('HTTP_CACHE_MAX_AGE', 0)
+        self.version = app.config.get('HTTP_CACHE_VERSION', '')
+        self._roots = (app.root_path, os.path.join(app.root_path, app.template_folder))
+        self._release = None
+        app.extensions['http_cache'] = self
+
+    def release(self) -> Tuple[str, Optional[datetime]]:
+        """
+        (token, newest file change) of the running code and templates, read once per process.
+
+        The token is HTTP_CACHE_VERSION when set, else a digest of the files themselves, so every
+        worker of a release agrees and a deploy that changes a page changes its validators.
+        """
+        if self._release is None:
+            digest = hashlib.sha256()
+            newest = 0.0
+            for root in self._roots:
+                for directory, subdirectories, files in os.walk(root):
+                    subdirectories[:] = sorted(name for name in subdirectories if name != '__pycache__')
+                    for name in sorted(files):
+                        if not name.endswith(RELEASE_EXTENSIONS):
+                            continue
+                        path = os.path.join(directory, name)
+                        newest = max(newest, os.path.getmtime(path))
+                        if not self.version:
+                            digest.update(os.path.relpath(path, root).encode())
+                            with open(path, 'rb') as handle:
+                                digest.update(handle.read())
+            modified = datetime.fromtimestamp(newest, timezone.utc).replace(tzinfo=None) if newest else None
+            self._release = (self.version or digest.hexdigest()[:16], modified)
+        return self._release
+
+    def conditional(self, *parts, last_modified: Optional[datetime] = None):
+        """
+        A 304 response when the client's copy is current, else None and the view renders as usual.
+
+        The rendered response gets the validators and caching headers on the way out.
+
+        Args:
+            parts: What the body depends on beyond the URL and the user, e.g. updated_at values
+            last_modified: Newest change among them (naive UTC), when known
+        """
+        if not self.enabled or request.method not in ('GET', 'HEAD') or '_flashes' in session:
+            # A pending flash message is part of the page, and shown only once
+            return None
+
+        token, released = self.release()
+        user = current_user.get_id() if current_user.is_authenticated else None
+        etag = hashlib.sha256(repr(
+            (token, request.full_path, request.is_json, user, last_modified, parts)
+        ).encode()).hexdigest()[:32]
+        if released and (last_modified is None or released > last_modified):
+            last_modified = released
+
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            return self._with_headers(make_response('', 304), etag, last_modified)
+
+        @after_this_request
+        def add_validators(response):
+            if response.status_code == 200:
+                self._with_headers(response, etag, last_modified)
+            return response
+
+        return None
+
+    def _with_headers(self, response, etag: str, last_modified: Optional[datetime]):
+        # Weak: compressed and identity bodies of one page share the tag
+        response.set_etag(etag, weak=True)
+        if last_modified:
+            response.last_modified = last_modified
+        if current_user.is_authenticated:
+            response.headers['Cache-Control'] = 'private, no-cache'
+        elif self.max_age:
+            response.headers['Cache-Control'] = f'public, max-age={self.max_age}'
+        else:
+            response.headers['Cache-Control'] = 'public, no-cache'
+        for header in VARY_HEADERS:
+            response.vary.add(header)
+        return response
+
+
+# Shared instance, configured by create_app()
+http_cache = ConditionalRequests()
@@ -0,0 +1,108 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Periodic background jobs - a native thread per worker that calls run() every interval seconds
+The thread starts with the worker's first request (never under app.testing), and each run gets
+its own app context and session: committed on success, rolled back and logged on failure.
+
+Under the gevent worker, threading.Thread is monkey patched into a greenlet on the worker's hub,
+where a CPU-bound run (scoring, matrix folds, re-encoding every agent) would stall every request
+the worker is serving. Jobs therefore start with the unpatched _thread.start_new_thread and sleep
+with the unpatched time.sleep, the way app.profiling runs its sampler, and get a real OS thread
+that the interpreter switches away from. A separate Procfile process would also work but would
+need its own dyno and would not refresh the per-worker in-memory indexes.
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Optional
+
+from gevent import monkey
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# The originals when gevent has monkey patched them (the functions themselves otherwise)
+_start_new_thread = monkey.get_original('_thread', 'start_new_thread')
+_sleep = monkey.get_original('time', 'sleep')
+
+
+class PeriodicJob:
+    """Base class; subclasses set name, implement run(session) and call super().init_app()."""
+
+    name = 'job'
+
+    # Held while a run writes on PostgreSQL so workers never run the same job at once
+    advisory_lock_id: Optional[int] = None
+
+    def __init__(self, interval: float = 0.0):
+        self.interval = interval
+        self.last_run: Optional[datetime] = None
+
+        self._app = None
+        self._lock = threading.Lock()
+        self._thread = None  # Ident of the scheduler thread while it runs
+        self._stopping = threading.Event()
+
+    def init_app(self, app, interval: float = 0.0):
+        """Register on the app; the schedule starts with the first request when interval > 0."""
+        self._app = app
+        self.interval = interval
+        app.extensions[f'{self.name}_job'] = self
+
+        if self.interval > 0:
+            app.before_request(self._ensure_scheduler)
+
+    def run(self, session) -> int:
+        raise NotImplementedError
+
+    def run_at_start(self) -> bool:
+        """Whether the first run goes ahead without waiting an interval (e.g. its state is missing)."""
+        return False
+
+    def acquire(self, session) -> bool:
+        """Take the job's transaction-scoped lock on PostgreSQL (always True elsewhere)."""
+        if self.advisory_lock_id is None or session.get_bind().dialect.name != 'postgresql':
+            return True
+        if session.execute(text('SELECT pg_try_advisory_xact_lock(:id)'), {'id': self.advisory_lock_id}).scalar():
+            return True
+        logger.info(f'{self.name}_skipped', extra={'event': f'{self.name}_skipped', 'reason': 'locked'})
+        return False
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def _ensure_scheduler(self) -> None:
+        if self._app.testing or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping.clear()
+            # Like a daemon thread, it does not hold up interpreter exit
+            self._thread = _start_new_thread(self._run_scheduler, ())
+
+    def _run_scheduler(self) -> None:
+        from app import db
+
+        try:
+            wait = not self.run_at_start()
+            while True:
+                # Not Event.wait: the patched Event would block on the hub of another thread
+                if wait:
+                    _sleep(self.interval)
+                wait = True
+                if self._stopping.is_set():
+                    return
+                with self._app.app_context():
+                    try:
+                        self.run(db.session)
+                        db.session.commit()
+                    except Exception:
+                        db.session.rollback()
+                        logger.exception(f'{self.name}_failed', extra={'event': f'{self.name}_failed'})
+                    finally:
+                        db.session.remove()
+        finally:
+            self._thread = None
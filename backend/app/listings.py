@@ -0,0 +1,198 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Marketplace read model - one flat row per approved, active agent in marketplace_listing
+Rows are refreshed inside the transaction that changes their sources: a session after_flush hook
+collects the agents a flush touched (agent, agent_pricing, agent_stats, or a creator's username)
+and rebuilds just their rows with one DELETE and one INSERT ... SELECT. Listing pages then read
+a single table in index order instead of joining four tables and sorting the approved set.
+The same refresh keeps the facet counts in app.facets current.
+"""
+import logging
+from datetime import datetime
+from itertools import chain
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import delete, event, func, insert, literal, select
+from sqlalchemy.orm import Session, attributes
+
+from app import facets
+
+logger = logging.getLogger(__name__)
+
+# Longer descriptions are cut to this many characters in the listing row
+SHORT_DESCRIPTION_LENGTH = 300
+
+# Agent IDs per DELETE / INSERT ... SELECT when many rows change in one flush
+REFRESH_CHUNK_SIZE = 500
+
+LISTING_COLUMNS = ('agent_id', 'name', 'short_description', 'description', 'category', 'price', 'currency',
+                   'average_rating', 'purchase_count', 'ranking_score', 'stamped_score', 'creator_username',
+                   'updated_at')
+
+# What pages show of a listing; ranking_score only orders them and updated_at also follows it
+SHOWN_COLUMNS = ('agent_id', 'name', 'short_description', 'description', 'category', 'price', 'currency',
+                 'average_rating', 'purchase_count', 'creator_username')
+
+
+def listing_source(agent_ids: Optional[Iterable[int]] = None):
+    """SELECT producing listing rows from the source tables (for every listed agent when agent_ids is None)."""
+    from app.models import Agent, AgentPricing, AgentStats, User
+
+    statement = select(
+        Agent.id,
+        Agent.name,
+        func.substr(Agent.description, 1, SHORT_DESCRIPTION_LENGTH),
+        Agent.description,
+        Agent.category,
+        func.coalesce(AgentPricing.price, 0.0),
+        func.coalesce(AgentPricing.currency, 'USD'),
+        func.coalesce(AgentStats.average_rating, 0.0),
+        func.coalesce(AgentStats.purchase_count, 0),
+        func.coalesce(AgentStats.ranking_score, 0.0),
+        func.coalesce(AgentStats.ranking_score, 0.0),
+        User.username,
+        literal(datetime.utcnow())
+    ).join(User, User.id == Agent.creator_id).outerjoin(
+        AgentPricing, AgentPricing.agent_id == Agent.id
+    ).outerjoin(
+        AgentStats, AgentStats.agent_id == Agent.id
+    ).where(Agent.is_approved.is_(True), Agent.is_active.is_(True))
+
+    if agent_ids is not None:
+        statement = statement.where(Agent.id.in_(list(agent_ids)))
+    return statement
+
+
+def shown_values(listing) -> tuple:
+    """The values a page shows of listing, as a version for pages the ranking does not change."""
+    return tuple(getattr(listing, column) for column in SHOWN_COLUMNS)
+
+
+class MarketplaceListings:
+    """Keeps marketplace_listing in step with the source tables and serves listing reads."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._listening = False
+
+    def init_app(self, app):
+        """Load settings from app config and start maintaining rows on flush."""
+        self.enabled = app.config.get('MARKETPLACE_READ_MODEL', True)
+        app.extensions['marketplace_listings'] = self
+
+        # Session-class listener covers every session, like the engine listeners in query_stats
+        if not self._listening:
+            event.listen(Session, 'after_flush', self._after_flush)
+            self._listening = True
+
+    def refresh(self, connection, agent_ids: Iterable[int]) -> None:
+        """Rebuild the rows of agent_ids; agents no longer listed lose theirs."""
+        from app.models import MarketplaceListing
+
+        ids = sorted(set(agent_ids))
+        table = MarketplaceListing.__table__
+        for start in range(0, len(ids), REFRESH_CHUNK_SIZE):
+            chunk = ids[start:start + REFRESH_CHUNK_SIZE]
+            facet_rows = select(table.c.category, table.c.price).where(table.c.agent_id.in_(chunk))
+            removed = connection.execute(facet_rows).all()
+            connection.execute(delete(table).where(table.c.agent_id.in_(chunk)))
+            connection.execute(insert(table).from_select(LISTING_COLUMNS, listing_source(chunk)))
+            facets.apply_changes(connection, removed, connection.execute(facet_rows).all())
+
+    def rebuild(self, connection) -> int:
+        """
+        Rebuild every row and the facet counts, e.g. after approvals made directly in the database.
+
+        Returns:
+            int: Agents listed
+        """
+        from app.models import MarketplaceListing
+
+        table = MarketplaceListing.__table__
+        connection.execute(delete(table))
+        connection.execute(insert(table).from_select(LISTING_COLUMNS, listing_source()))
+        facets.rebuild(connection)
+        count = connection.execute(select(func.count()).select_from(table)).scalar()
+        logger.info('marketplace_listing_rebuilt', extra={'event': 'marketplace_listing_rebuilt', 'agents': count})
+        return count
+
+    def last_modified(self, session) -> Optional[datetime]:
+        """
+        When the listings last changed: a row written, or one removed (its facet count is stamped).
+
+        Two index reads, however many agents are listed; None while nothing is listed.
+        """
+        from app.models import MarketplaceFacetCount, MarketplaceListing
+
+        written, removed = session.execute(select(
+            select(func.max(MarketplaceListing.updated_at)).scalar_subquery(),
+            select(func.max(MarketplaceFacetCount.updated_at)).scalar_subquery()
+        )).one()
+        return max((stamp for stamp in (written, removed) if stamp), default=None)
+
+    def get(self, agent):
+        """
+        Listing row for agent.
+
+        Agents that are not listed (pending approval, deactivated) get an unsaved row built from
+        their related objects, so owners previewing them see the same fields.
+        """
+        from app import db
+        from app.models import MarketplaceListing
+
+        listing = db.session.get(MarketplaceListing, agent.id) if self.enabled else None
+        if listing is not None:
+            return listing
+        return MarketplaceListing(
+            agent_id=agent.id,
+            name=agent.name,
+            short_description=(agent.description or '')[:SHORT_DESCRIPTION_LENGTH],
+            description=agent.description or '',
+            category=agent.category,
+            price=agent.pricing.price if agent.pricing else 0.0,
+            currency=agent.pricing.currency if agent.pricing else 'USD',
+            average_rating=agent.stats.average_rating if agent.stats else 0.0,
+            purchase_count=agent.stats.purchase_count if agent.stats else 0,
+            ranking_score=agent.stats.ranking_score if agent.stats else 0.0,
+            creator_username=agent.creator.username
+        )
+
+    def _after_flush(self, session, flush_context) -> None:
+        if not self.enabled:
+            return
+        agent_ids = self._affected_agents(session)
+        if agent_ids:
+            self.refresh(session.connection(), agent_ids)
+
+    @staticmethod
+    def _affected_agents(session) -> Set[int]:
+        """Agents whose listing row the flush may have changed (new/dirty/deleted still hold pre-flush state)."""
+        from app.models import Agent, AgentPricing, AgentStats, MarketplaceListing, User
+
+        agent_ids: Set[int] = set()
+        creator_ids: List[int] = []
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if isinstance(obj, MarketplaceListing):
+                continue
+            if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+                continue
+            if isinstance(obj, Agent):
+                agent_ids.add(obj.id)
+            elif isinstance(obj, (AgentPricing, AgentStats)):
+                agent_ids.add(obj.agent_id)
+            elif isinstance(obj, User) and obj in session.dirty and \
+                    attributes.get_history(obj, 'username').has_changes():
+                creator_ids.append(obj.id)
+
+        if creator_ids:
+            agent_ids.update(session.connection().execute(
+                select(Agent.id).where(Agent.creator_id.in_(creator_ids))
+            ).scalars())
+        agent_ids.discard(None)
+        return agent_ids
+
+
+# Shared instance, configured by create_app()
+listings = MarketplaceListings()
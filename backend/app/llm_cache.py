@@ -0,0 +1,299 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Response cache for deterministic LLM requests
+Identical (provider, model, system prompt, history, message) requests reuse a stored response.
+Hits go only to API keys that have made a successful provider call, so a made-up key cannot
+read responses other users paid for; a hash of each such key is kept in the same backend.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+
+from app.telemetry import LLM_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """Abstract storage for cached LLM responses."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached value for key, or None if missing or expired."""
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any], ttl: int) -> None:
+        """Store value under key for ttl seconds."""
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every cached entry."""
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process LRU cache with TTL expiry."""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            # Mark as most recently used
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+
+            # Evict least recently used entries beyond the size bound
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DatabaseCacheBackend(CacheBackend):
+    """
+    Cache shared by every worker, stored in the llm_cache_entry table.
+
+    Each call runs in its own short transaction on the engine, never on the request's session,
+    so a lookup cannot commit (or, on a failed write, poison) what the route has pending.
+    """
+
+    # Size pruning runs once every PRUNE_INTERVAL writes to keep inserts cheap
+    PRUNE_INTERVAL = 100
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._writes = 0
+
+    @property
+    def _table(self):
+        from app.models import LLMCacheEntry
+        return LLMCacheEntry.__table__
+
+    @staticmethod
+    def _engine():
+        from app import db
+        return db.engine
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        table = self._table
+        now = datetime.utcnow()
+        with self._engine().begin() as connection:
+            row = connection.execute(
+                select(table.c.response_json, table.c.expires_at).where(table.c.cache_key == key)
+            ).first()
+            if row is None:
+                return None
+            if row.expires_at <= now:
+                connection.execute(delete(table).where(table.c.cache_key == key, table.c.expires_at <= now))
+                return None
+            connection.execute(update(table).where(table.c.cache_key == key).values(last_accessed_at=now))
+        return json.loads(row.response_json)
+
+    def set(self, key: str, value: Dict[str, Any], ttl: int) -> None:
+        table = self._table
+        now = datetime.utcnow()
+        row = {'cache_key': key, 'response_json': json.dumps(value), 'created_at': now,
+               'last_accessed_at': now, 'expires_at': now + timedelta(seconds=ttl)}
+
+        with self._engine().begin() as connection:
+            dialect = connection.dialect.name
+            if dialect in ('postgresql', 'sqlite'):
+                if dialect == 'postgresql':
+                    from sqlalchemy.dialects.postgresql import insert as dialect_insert
+                else:
+                    from sqlalchemy.dialects.sqlite import insert as dialect_insert
+                # Concurrent misses for one prompt both store it; the last write wins
+                statement = dialect_insert(table).values(row)
+                connection.execute(statement.on_conflict_do_update(
+                    index_elements=['cache_key'],
+                    set_={column: statement.excluded[column] for column in row if column != 'cache_key'}
+                ))
+            elif not connection.execute(update(table).where(table.c.cache_key == key).values(row)).rowcount:
+                connection.execute(insert(table).values(row))
+
+        self._writes += 1
+        if self._writes % self.PRUNE_INTERVAL == 0:
+            self.prune()
+
+    def prune(self) -> int:
+        """Delete expired entries and the least recently used ones beyond max_entries."""
+        table = self._table
+        with self._engine().begin() as connection:
+            removed = connection.execute(delete(table).where(table.c.expires_at <= datetime.utcnow())).rowcount
+
+            overflow = connection.execute(select(func.count()).select_from(table)).scalar() - self.max_entries
+            if overflow > 0:
+                stale_ids = connection.execute(
+                    select(table.c.id).order_by(table.c.last_accessed_at.asc()).limit(overflow)
+                ).scalars().all()
+                removed += connection.execute(delete(table).where(table.c.id.in_(stale_ids))).rowcount
+                self.evictions += len(stale_ids)
+        return removed
+
+    def clear(self) -> None:
+        with self._engine().begin() as connection:
+            connection.execute(delete(self._table))
+
+    def __len__(self) -> int:
+        with self._engine().connect() as connection:
+            return connection.execute(select(func.count()).select_from(self._table)).scalar()
+
+
+class LLMResponseCache:
+    """Opt-in cache for LLM responses keyed by a hash of the normalized request."""
+
+    BACKENDS = {
+        'memory': MemoryCacheBackend,
+        'database': DatabaseCacheBackend
+    }
+
+    def __init__(self, backend: CacheBackend = None, ttl: int = 3600, enabled: bool = False):
+        self.backend = backend or MemoryCacheBackend()
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure the cache from app config and register it on the app."""
+        backend_name = app.config.get('LLM_CACHE_BACKEND', 'memory')
+        if backend_name not in self.BACKENDS:
+            raise ValueError(f"Unsupported LLM cache backend: {backend_name}")
+
+        self.backend = self.BACKENDS[backend_name](max_entries=app.config.get('LLM_CACHE_MAX_ENTRIES', 1000))
+        self.ttl = app.config.get('LLM_CACHE_TTL', 3600)
+        self.enabled = app.config.get('LLM_CACHE_ENABLED', False)
+        self.hits = 0
+        self.misses = 0
+        app.extensions['llm_cache'] = self
+
+    @staticmethod
+    def make_key(provider: str, model: str, system_prompt: str, messages: List[Dict], max_tokens: int) -> str:
+        """
+        Build a deterministic cache key for a chat request.
+
+        Messages are reduced to role/content and surrounding whitespace is stripped,
+        so cosmetic differences do not defeat the cache.
+        """
+        normalized = {
+            'provider': provider,
+            'model': model,
+            'system': (system_prompt or '').strip(),
+            'messages': [
+                {'role': str(m.get('role', '')).lower(), 'content': str(m.get('content', '')).strip()}
+                for m in messages
+            ],
+            'max_tokens': max_tokens
+        }
+        payload = json.dumps(normalized, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def key_fingerprint(provider: str, api_key: str) -> str:
+        """Backend key recording that api_key works (the key itself is never stored)."""
+        return hashlib.sha256(f'api-key:{provider}:{api_key}'.encode('utf-8')).hexdigest()
+
+    def has_verified_key(self, provider: str, api_key: str) -> bool:
+        """Whether api_key made a successful call within the TTL, and may be served cached responses."""
+        try:
+            return self.backend.get(self.key_fingerprint(provider, api_key)) is not None
+        except Exception as e:
+            logger.warning(f"LLM cache key lookup failed: {str(e)}")
+            return False
+
+    def verify_key(self, provider: str, api_key: str) -> None:
+        """Record that api_key just made a successful provider call."""
+        try:
+            self.backend.set(self.key_fingerprint(provider, api_key), {'verified': True}, self.ttl)
+        except Exception as e:
+            logger.warning(f"LLM cache key store failed: {str(e)}")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached response, recording a hit or miss."""
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            # A broken cache must never break chat
+            logger.warning(f"LLM cache lookup failed: {str(e)}")
+            value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        LLM_CACHE_LOOKUPS.inc(result='miss' if value is None else 'hit')
+
+        logger.debug(f"LLM cache {'hit' if value is not None else 'miss'} for {key[:12]}")
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a response under key."""
+        try:
+            self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            logger.warning(f"LLM cache store failed: {str(e)}")
+
+    def clear(self) -> None:
+        """Drop all cached responses and reset counters."""
+        self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': getattr(self.backend, 'evictions', 0)
+        }
+
+
+# Shared instance, configured by create_app()
+response_cache = LLMResponseCache()
@@ -0,0 +1,380 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Resilience layer for LLM provider calls
+Typed errors, jittered exponential backoff, per-provider circuit breakers and call deadlines
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+
+class LLMError(Exception):
+    """Base class for LLM provider failures."""
+
+    # Safe to try the same request again
+    retryable = False
+    # Indicates the provider itself is unhealthy (feeds the circuit breaker)
+    provider_fault = False
+
+    def __init__(self, message: str, provider: str = None, status_code: int = None, retry_after: float = None):
+        super().__init__(message)
+        self.provider = provider
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class LLMAuthenticationError(LLMError):
+    """API key rejected (401/403)."""
+
+
+class LLMBadRequestError(LLMError):
+    """Request rejected by the provider (other 4xx)."""
+
+
+class LLMRateLimitError(LLMError):
+    """Rate limited (429). Limits are per API key, so this does not trip the breaker."""
+    retryable = True
+
+
+class LLMOverloadedError(LLMError):
+    """Provider overloaded or failing (5xx, Anthropic 529)."""
+    retryable = True
+    provider_fault = True
+
+
+class LLMTimeoutError(LLMError):
+    """Call timed out or the deadline was exhausted."""
+    retryable = True
+    provider_fault = True
+
+
+class LLMConnectionError(LLMError):
+    """Could not reach the provider."""
+    retryable = True
+    provider_fault = True
+
+
+class LLMCircuitOpenError(LLMError):
+    """Provider circuit is open; failing fast without calling it."""
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Read a retry delay in seconds from retry-after-ms / retry-after headers."""
+    if not headers:
+        return None
+
+    try:
+        retry_after_ms = headers.get('retry-after-ms')
+        if retry_after_ms:
+            return max(float(retry_after_ms) / 1000.0, 0.0)
+
+        retry_after = headers.get('retry-after')
+        if not retry_after:
+            return None
+
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            # HTTP-date form
+            retry_at = parsedate_to_datetime(retry_after)
+            return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except Exception:
+        return None
+
+
+def classify_error(error: Exception, provider: str, label: str) -> LLMError:
+    """
+    Map an SDK exception onto the typed LLMError hierarchy.
+
+    Works by duck typing (class name, status_code, response headers) so the
+    SDKs do not need to be imported here.
+
+    Args:
+        error: Exception raised by the provider SDK
+        provider: Provider ID ('anthropic', 'openai')
+        label: Human-readable model family used in the message ('Claude', 'GPT')
+    """
+    if isinstance(error, LLMError):
+        return error
+
+    message = f"Failed to communicate with {label}: {str(error)}"
+    status_code = getattr(error, 'status_code', None)
+    response = getattr(error, 'response', None)
+    retry_after = parse_retry_after(getattr(response, 'headers', None))
+    error_name = type(error).__name__
+
+    if 'Timeout' in error_name or isinstance(error, TimeoutError):
+        error_class = LLMTimeoutError
+    elif error_name == 'APIConnectionError' or isinstance(error, ConnectionError):
+        error_class = LLMConnectionError
+    elif status_code in (401, 403):
+        error_class = LLMAuthenticationError
+    elif status_code == 429:
+        error_class = LLMRateLimitError
+    elif isinstance(status_code, int) and status_code >= 500:
+        error_class = LLMOverloadedError
+    elif isinstance(status_code, int) and status_code >= 400:
+        error_class = LLMBadRequestError
+    else:
+        error_class = LLMError
+
+    return error_class(message, provider=provider, status_code=status_code, retry_after=retry_after)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honoring provider retry-after hints."""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def compute_delay(self, attempt: int, retry_after: float = None) -> float:
+        """
+        Delay before the next attempt.
+
+        Args:
+            attempt: Number of the attempt that just failed (1-based)
+            retry_after: Server-requested delay in seconds, if any
+        """
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        if retry_after is not None:
+            return max(retry_after, backoff)
+        return backoff
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+
+    CLOSED: calls flow; consecutive provider faults are counted.
+    OPEN: calls fail fast until recovery_timeout has elapsed.
+    HALF_OPEN: a limited number of probe calls decide whether to close or re-open.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = self.CLOSED
+        self.failure_count = 0
+        self.opened_at = None
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Return True if a call may proceed (reserving a probe slot when half-open)."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._half_open_calls = 0
+                logger.info(f"Circuit '{self.name}' half-open, probing provider")
+
+            if self.state == self.HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    return False
+                self._half_open_calls += 1
+
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+            self.state = self.CLOSED
+            self.failure_count = 0
+            self._half_open_calls = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failure_count += 1
+            if self.state == self.HALF_OPEN or self.failure_count >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit '{self.name}' opened after {self.failure_count} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._half_open_calls = 0
+
+    def release(self) -> None:
+        """Give back a probe slot without recording an outcome."""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def retry_in(self) -> float:
+        """Seconds until the breaker will allow a probe."""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(self.recovery_timeout - (time.monotonic() - self.opened_at), 0.0)
+
+
+def _begin_attempt(provider: str, breaker: CircuitBreaker, deadline: Optional[float], start: float) -> Optional[float]:
+    """Fail fast on an open circuit or spent deadline; otherwise return the remaining budget."""
+    if not breaker.allow_request():
+        retry_in = breaker.retry_in()
+        raise LLMCircuitOpenError(
+            f"{provider} is temporarily unavailable, please retry in {int(retry_in) + 1}s",
+            provider=provider, retry_after=retry_in
+        )
+
+    if deadline is None:
+        return None
+    remaining = deadline - (time.monotonic() - start)
+    if remaining <= 0:
+        breaker.release()
+        raise LLMTimeoutError(f"{provider} call exceeded its {deadline}s deadline", provider=provider)
+    return remaining
+
+
+def _backoff_after_failure(e: Exception, *, provider: str, breaker: CircuitBreaker, policy: RetryPolicy,
+                           classify: Callable[[Exception], LLMError], deadline: Optional[float], start: float,
+                           attempt: int) -> float:
+    """Record a failed attempt and return how long to wait before the next one, or raise the typed error."""
+    error = classify(e)
+    if error.provider_fault:
+        breaker.record_failure()
+    else:
+        # The provider answered (e.g. bad key); it is healthy
+        breaker.record_success()
+
+    if not error.retryable or attempt >= policy.max_attempts:
+        raise error from e
+
+    delay = policy.compute_delay(attempt, error.retry_after)
+    if deadline is not None and (time.monotonic() - start) + delay >= deadline:
+        raise error from e
+
+    logger.warning(f"{provider} attempt {attempt} failed ({type(error).__name__}), retrying in {delay:.2f}s")
+    return delay
+
+
+def call_with_resilience(func: Callable[[Optional[float]], Any], *, provider: str, breaker: CircuitBreaker,
+                         policy: RetryPolicy, classify: Callable[[Exception], LLMError],
+                         deadline: float = None, sleep: Callable[[float], None] = time.sleep) -> Any:
+    """
+    Run a provider call with retries, a circuit breaker and an overall deadline.
+
+    Args:
+        func: Performs one attempt; receives the remaining time budget in seconds (or None)
+        provider: Provider ID, used in error messages
+        breaker: Circuit breaker for the provider
+        policy: Retry/backoff policy
+        classify: Maps raw SDK exceptions to LLMError
+        deadline: Total seconds allowed across all attempts (None for no deadline)
+        sleep: Sleep function (gevent-patched time.sleep by default)
+
+    Raises:
+        LLMError: Typed failure after retries are exhausted or when failing fast
+    """
+    start = time.monotonic()
+    attempt = 0
+
+    while True:
+        attempt += 1
+        remaining = _begin_attempt(provider, breaker, deadline, start)
+
+        try:
+            result = func(remaining)
+        except Exception as e:
+            sleep(_backoff_after_failure(e, provider=provider, breaker=breaker, policy=policy, classify=classify,
+                                         deadline=deadline, start=start, attempt=attempt))
+            continue
+        except BaseException:
+            # gevent.Timeout or GreenletExit killed the call; give back a half-open probe slot
+            breaker.release()
+            raise
+
+        breaker.record_success()
+        return result
+
+
+async def acall_with_resilience(func: Callable[[Optional[float]], Awaitable[Any]], *, provider: str,
+                                breaker: CircuitBreaker, policy: RetryPolicy,
+                                classify: Callable[[Exception], LLMError], deadline: float = None,
+                                sleep: Callable[[float], Awaitable[None]] = asyncio.sleep) -> Any:
+    """Coroutine version of call_with_resilience; func returns an awaitable and backoff never blocks the loop."""
+    start = time.monotonic()
+    attempt = 0
+
+    while True:
+        attempt += 1
+        remaining = _begin_attempt(provider, breaker, deadline, start)
+
+        try:
+            result = await func(remaining)
+        except asyncio.CancelledError:
+            # Client went away mid-call; give back a half-open probe slot
+            breaker.release()
+            raise
+        except Exception as e:
+            await sleep(_backoff_after_failure(e, provider=provider, breaker=breaker, policy=policy,
+                                               classify=classify, deadline=deadline, start=start, attempt=attempt))
+            continue
+
+        breaker.record_success()
+        return result
+
+
+class ResilienceSettings:
+    """Retry, deadline and circuit breaker configuration shared by all providers in a worker."""
+
+    def __init__(self):
+        self.retry_policy = RetryPolicy()
+        self.timeout = 60.0
+        self.failure_threshold = 5
+        self.recovery_timeout = 30.0
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Load settings from app config and register on the app."""
+        self.retry_policy = RetryPolicy(
+            max_attempts=app.config.get('LLM_MAX_ATTEMPTS', 3),
+            base_delay=app.config.get('LLM_RETRY_BASE_DELAY', 0.5),
+            max_delay=app.config.get('LLM_RETRY_MAX_DELAY', 8.0)
+        )
+        self.timeout = app.config.get('LLM_TIMEOUT_SECONDS', 60.0)
+        self.failure_threshold = app.config.get('LLM_CIRCUIT_FAILURE_THRESHOLD', 5)
+        self.recovery_timeout = app.config.get('LLM_CIRCUIT_RECOVERY_SECONDS', 30.0)
+        self.reset()
+        app.extensions['llm_resilience'] = self
+
+    def breaker_for(self, provider: str) -> CircuitBreaker:
+        """Get (or create) the circuit breaker for a provider."""
+        with self._lock:
+            breaker = self._breakers.get(provider)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    provider,
+                    failure_threshold=self.failure_threshold,
+                    recovery_timeout=self.recovery_timeout
+                )
+                self._breakers[provider] = breaker
+            return breaker
+
+    def reset(self) -> None:
+        """Forget all circuit breaker state."""
+        with self._lock:
+            self._breakers = {}
+
+
+# Shared instance, configured by create_app()
+resilience = ResilienceSettings()
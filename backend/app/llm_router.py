@@ -0,0 +1,161 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Model routing for LLM requests
+Picks a provider/model per request from agent preferences, prompt size and a latency/cost policy
+Failover routes never cost more than the primary unless the agent opts in: a fallback runs on the
+user's own key, and a silent jump to a pricier model would bill them for something they did not pick.
+"""
+from typing import List, Dict, NamedTuple
+
+# Relative latency (1 = fastest), relative quality (3 = best) and list price in USD per 1M tokens
+MODEL_CATALOG = {
+    'claude-3-5-sonnet-20241022': {
+        'provider': 'anthropic', 'context_window': 200000, 'latency': 2, 'quality': 3,
+        'input_cost': 3.00, 'output_cost': 15.00
+    },
+    'claude-3-5-haiku-20241022': {
+        'provider': 'anthropic', 'context_window': 200000, 'latency': 1, 'quality': 2,
+        'input_cost': 0.80, 'output_cost': 4.00
+    },
+    'gpt-4o': {
+        'provider': 'openai', 'context_window': 128000, 'latency': 2, 'quality': 3,
+        'input_cost': 2.50, 'output_cost': 10.00
+    },
+    'gpt-4o-mini': {
+        'provider': 'openai', 'context_window': 128000, 'latency': 1, 'quality': 2,
+        'input_cost': 0.15, 'output_cost': 0.60
+    },
+    'gpt-4-turbo': {
+        'provider': 'openai', 'context_window': 128000, 'latency': 3, 'quality': 3,
+        'input_cost': 10.00, 'output_cost': 30.00
+    },
+    'gpt-3.5-turbo': {
+        'provider': 'openai', 'context_window': 16385, 'latency': 1, 'quality': 1,
+        'input_cost': 0.50, 'output_cost': 1.50
+    },
+    # Offline provider for tests and benchmarks (app.local_llm)
+    'local-standard': {
+        'provider': 'local', 'context_window': 200000, 'latency': 2, 'quality': 2,
+        'input_cost': 0.0, 'output_cost': 0.0
+    },
+    'local-fast': {
+        'provider': 'local', 'context_window': 200000, 'latency': 1, 'quality': 1,
+        'input_cost': 0.0, 'output_cost': 0.0
+    },
+}
+
+ROUTING_POLICIES = ('quality', 'balanced', 'latency', 'cost')
+
+# Routes tried per request before giving up
+MAX_ROUTES = 3
+
+
+class Route(NamedTuple):
+    """A provider/model pair to try."""
+    provider: str
+    model: str
+
+
+def estimate_tokens(system_prompt: str, messages: List[Dict]) -> int:
+    """Rough prompt size (about 4 characters per token plus per-message overhead)."""
+    chars = len(system_prompt or '') + sum(len(str(m.get('content', ''))) for m in messages)
+    return chars // 4 + 4 * len(messages)
+
+
+def models_for_provider(provider: str) -> List[str]:
+    """All catalogued models served by provider."""
+    return [model for model, info in MODEL_CATALOG.items() if info['provider'] == provider]
+
+
+def list_price(model: str) -> float:
+    """Input plus output list price per 1M tokens, the price routes are compared by."""
+    info = MODEL_CATALOG[model]
+    return info['input_cost'] + info['output_cost']
+
+
+class ModelRouter:
+    """Orders candidate provider/model routes for a request."""
+
+    def __init__(self, policy: str = None, preferred_model: str = None, max_routes: int = MAX_ROUTES,
+                 allow_costlier: bool = False):
+        self.policy = policy if policy in ROUTING_POLICIES else 'quality'
+        self.preferred_model = preferred_model if preferred_model in MODEL_CATALOG else None
+        self.max_routes = max_routes
+        self.allow_costlier = allow_costlier
+
+    def _sort_key(self, model: str):
+        info = MODEL_CATALOG[model]
+        cost = list_price(model)
+        if self.policy == 'latency':
+            return (info['latency'], cost)
+        if self.policy == 'cost':
+            return (cost, info['latency'])
+        if self.policy == 'balanced':
+            return (info['latency'] - info['quality'], cost)
+        return (-info['quality'], info['latency'], cost)
+
+    def rank_models(self, provider: str, needed_tokens: int = 0) -> List[str]:
+        """
+        Rank a provider's models for this policy.
+
+        Models whose context window cannot hold the request are dropped; if none
+        fit, the largest-context model is returned so the provider can decide.
+        """
+        candidates = models_for_provider(provider)
+        fitting = [m for m in candidates if MODEL_CATALOG[m]['context_window'] >= needed_tokens]
+        if not fitting:
+            return sorted(candidates, key=lambda m: -MODEL_CATALOG[m]['context_window'])[:1]
+
+        ranked = sorted(fitting, key=self._sort_key)
+        if self.preferred_model in ranked:
+            ranked.remove(self.preferred_model)
+            ranked.insert(0, self.preferred_model)
+        return ranked
+
+    def plan(self, primary_provider: str, available_providers: List[str], prompt_tokens: int = 0,
+             max_tokens: int = 0) -> List[Route]:
+        """
+        Build the ordered list of routes to try.
+
+        Fallback routes are limited to models no pricier than the primary unless allow_costlier.
+
+        Args:
+            primary_provider: Provider configured for the agent
+            available_providers: Providers the user has API keys for
+            prompt_tokens: Estimated prompt size
+            max_tokens: Completion budget
+
+        Returns:
+            list of Route, primary first
+        """
+        needed = prompt_tokens + max_tokens
+        primary_models = self.rank_models(primary_provider, needed)
+        routes = [Route(primary_provider, primary_models[0])]
+        budget = list_price(primary_models[0])
+
+        def affordable(models):
+            return [m for m in models if self.allow_costlier or list_price(m) <= budget]
+
+        # Another provider is the most likely to succeed during an outage
+        for provider in available_providers:
+            if provider != primary_provider:
+                ranked = affordable(self.rank_models(provider, needed))
+                if ranked:
+                    routes.append(Route(provider, ranked[0]))
+
+        # Then a different model on the primary provider
+        others = affordable(primary_models[1:])
+        if others:
+            routes.append(Route(primary_provider, others[0]))
+
+        return routes[:self.max_routes]
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int):
+    """Estimated USD cost of a call at list prices, or None for uncatalogued models."""
+    info = MODEL_CATALOG.get(model)
+    if info is None:
+        return None
+    return round((input_tokens * info['input_cost'] + output_tokens * info['output_cost']) / 1_000_000, 6)
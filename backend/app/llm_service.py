@@ -5,8 +5,22 @@
 Unified LLM service supporting multiple providers (Anthropic, OpenAI, etc.)
 """
 import logging
+import time
 from abc import ABC, abstractmethod
+from contextlib import nullcontext
 from typing import List, Dict, Any
+from app.llm_resilience import (
+    resilience,
+    call_with_resilience,
+    classify_error,
+    LLMError,
+    LLMAuthenticationError,
+    LLMCircuitOpenError,
+    RetryPolicy
+)
+from app.llm_router import ModelRouter, Route, estimate_tokens, models_for_provider
+from app.local_llm import local_llm, local_completion
+from app.telemetry import record_llm_call
 
 logger = logging.getLogger(__name__)
 
@@ -34,22 +48,51 @@ class LLMProvider(ABC):
         """Validate API key format."""
         pass
 
+    def _call(self, request_func, provider_id: str, label: str):
+        """
+        Run request_func under the shared retry policy, circuit breaker and deadline.
+
+        request_func receives SDK keyword arguments (the per-attempt timeout, if any).
+        """
+        def attempt(remaining):
+            kwargs = {'timeout': remaining} if remaining is not None else {}
+            return request_func(**kwargs)
+
+        return call_with_resilience(
+            attempt,
+            provider=provider_id,
+            breaker=resilience.breaker_for(provider_id),
+            policy=self.retry_policy or resilience.retry_policy,
+            classify=lambda e: classify_error(e, provider_id, label),
+            deadline=self.timeout if self.timeout is not None else resilience.timeout
+        )
+
 
 class AnthropicProvider(LLMProvider):
     """Anthropic Claude provider."""
 
-    def __init__(self, api_key: str):
+    DEFAULT_MODEL = "claude-3-5-sonnet-20241022"
+
+    def __init__(self, api_key: str, model: str = None, retry_policy: RetryPolicy = None, timeout: float = None):
         import anthropic
-        self.client = anthropic.Anthropic(api_key=api_key)
+        # Retries are handled by llm_resilience, not the SDK
+        self.client = anthropic.Anthropic(api_key=api_key, max_retries=0)
         self.api_key = api_key
+        self.model = model or self.DEFAULT_MODEL
+        self.retry_policy = retry_policy
+        self.timeout = timeout
 
     def chat(self, system_prompt: str, messages: List[Dict], max_tokens: int = 4096) -> Dict[str, Any]:
         try:
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=max_tokens,
-                system=system_prompt,
-                messages=messages
+            response = self._call(
+                lambda **kwargs: self.client.messages.create(
+                    model=self.model,
+                    max_tokens=max_tokens,
+                    system=system_prompt,
+                    messages=messages,
+                    **kwargs
+                ),
+                'anthropic', 'Claude'
             )
 
             return {
@@ -61,9 +104,9 @@ class AnthropicProvider(LLMProvider):
                     'total_tokens': response.usage.input_tokens + response.usage.output_tokens
                 }
             }
-        except Exception as e:
+        except LLMError as e:
             logger.error(f"Anthropic API error: {str(e)}")
-            raise Exception(f"Failed to communicate with Claude: {str(e)}")
+            raise
 
     def validate_api_key(self, api_key: str) -> bool:
         return api_key.startswith('sk-ant-')
@@ -72,10 +115,16 @@ class AnthropicProvider(LLMProvider):
 class OpenAIProvider(LLMProvider):
     """OpenAI GPT provider."""
 
-    def __init__(self, api_key: str):
+    DEFAULT_MODEL = "gpt-4o"  # Latest GPT-4 model
+
+    def __init__(self, api_key: str, model: str = None, retry_policy: RetryPolicy = None, timeout: float = None):
         from openai import OpenAI
-        self.client = OpenAI(api_key=api_key)
+        # Retries are handled by llm_resilience, not the SDK
+        self.client = OpenAI(api_key=api_key, max_retries=0)
         self.api_key = api_key
+        self.model = model or self.DEFAULT_MODEL
+        self.retry_policy = retry_policy
+        self.timeout = timeout
 
     def chat(self, system_prompt: str, messages: List[Dict], max_tokens: int = 4096) -> Dict[str, Any]:
         try:
@@ -83,10 +132,14 @@ class OpenAIProvider(LLMProvider):
             openai_messages = [{'role': 'system', 'content': system_prompt}]
             openai_messages.extend(messages)
 
-            response = self.client.chat.completions.create(
-                model="gpt-4o",  # Latest GPT-4 model
-                max_tokens=max_tokens,
-                messages=openai_messages
+            response = self._call(
+                lambda **kwargs: self.client.chat.completions.create(
+                    model=self.model,
+                    max_tokens=max_tokens,
+                    messages=openai_messages,
+                    **kwargs
+                ),
+                'openai', 'GPT'
             )
 
             return {
@@ -98,78 +151,249 @@ class OpenAIProvider(LLMProvider):
                     'total_tokens': response.usage.total_tokens
                 }
             }
-        except Exception as e:
+        except LLMError as e:
             logger.error(f"OpenAI API error: {str(e)}")
-            raise Exception(f"Failed to communicate with GPT: {str(e)}")
+            raise
 
     def validate_api_key(self, api_key: str) -> bool:
         return api_key.startswith('sk-') and not api_key.startswith('sk-ant-')
 
 
+class LocalProvider(LLMProvider):
+    """Offline provider with deterministic responses and simulated latency/errors (see app.local_llm)."""
+
+    DEFAULT_MODEL = "local-standard"
+
+    def __init__(self, api_key: str, model: str = None, retry_policy: RetryPolicy = None, timeout: float = None):
+        self.api_key = api_key
+        self.model = model or self.DEFAULT_MODEL
+        self.retry_policy = retry_policy
+        self.timeout = timeout
+
+    def chat(self, system_prompt: str, messages: List[Dict], max_tokens: int = 4096) -> Dict[str, Any]:
+        def generate(timeout=None):
+            local_llm.maybe_fail()
+            tokens = local_completion(system_prompt, messages, min(local_llm.response_tokens, max_tokens))
+            local_llm.simulate(local_llm.generation_time(len(tokens)), timeout, time.sleep)
+            return tokens
+
+        tokens = self._call(generate, 'local', 'Local model')
+        input_tokens = estimate_tokens(system_prompt, messages)
+        return {
+            'response': ''.join(tokens),
+            'model': self.model,
+            'usage': {
+                'input_tokens': input_tokens,
+                'output_tokens': len(tokens),
+                'total_tokens': input_tokens + len(tokens)
+            }
+        }
+
+    def validate_api_key(self, api_key: str) -> bool:
+        return True
+
+
 class LLMService:
     """Unified LLM service supporting multiple providers."""
 
     SUPPORTED_PROVIDERS = {
         'anthropic': {
             'name': 'Anthropic Claude',
-            'models': ['claude-3-5-sonnet-20241022', 'claude-3-opus-20240229', 'claude-3-sonnet-20240229'],
+            'models': models_for_provider('anthropic'),
             'key_prefix': 'sk-ant-',
             'provider_class': AnthropicProvider
         },
         'openai': {
             'name': 'OpenAI GPT',
-            'models': ['gpt-4o', 'gpt-4-turbo', 'gpt-3.5-turbo'],
+            'models': models_for_provider('openai'),
             'key_prefix': 'sk-',
             'provider_class': OpenAIProvider
+        },
+        'local': {
+            'name': 'Local model (offline)',
+            'models': models_for_provider('local'),
+            'key_prefix': '',
+            'provider_class': LocalProvider
         }
     }
 
-    def __init__(self, provider: str, api_key: str):
+    DEFAULT_MAX_TOKENS = 4096
+
+    def __init__(self, provider: str, api_key: str, cache=None, model: str = None,
+                 routing_policy: str = None, fallback_keys: Dict[str, str] = None, admission=None,
+                 user_id: int = None, allow_costlier_failover: bool = False):
         """
         Initialize LLM service with specified provider.
 
         Args:
             provider: Provider ID ('anthropic', 'openai', etc.)
             api_key: API key for the provider
+            cache: Optional LLMResponseCache for repeated identical requests
+            model: Preferred model (agent config); None for the policy's choice
+            routing_policy: 'quality', 'balanced', 'latency' or 'cost'
+            fallback_keys: API keys for other providers, enabling cross-provider failover
+            admission: Optional AdmissionController bounding concurrent calls
+            user_id: Calling user, for per-user admission limits
+            allow_costlier_failover: Let failover use models pricier than the primary (agent opt-in)
 
         Raises:
             ValueError: If provider is not supported
         """
-        if provider not in self.SUPPORTED_PROVIDERS:
+        if provider not in self.available_providers():
             raise ValueError(f"Unsupported LLM provider: {provider}")
 
         self.provider_id = provider
         self.provider_info = self.SUPPORTED_PROVIDERS[provider]
 
-        # Initialize provider
-        provider_class = self.provider_info['provider_class']
-        self.provider = provider_class(api_key)
-
-    def chat(self, system_prompt: str, conversation_history: List[Dict], user_message: str) -> Dict[str, Any]:
+        self.api_keys = {provider: api_key}
+        for fallback_provider, fallback_key in (fallback_keys or {}).items():
+            if fallback_provider in self.available_providers() and fallback_key:
+                self.api_keys.setdefault(fallback_provider, fallback_key)
+
+        self.router = ModelRouter(policy=routing_policy, preferred_model=model, allow_costlier=allow_costlier_failover)
+        self._providers = {}
+
+        # Initialize primary provider
+        self.provider = self._get_provider(Route(provider, self._provider_class(provider).DEFAULT_MODEL))
+        self.cache = cache
+        self.admission = admission
+        self.user_id = user_id
+
+    def _provider_class(self, provider_id: str):
+        return self.SUPPORTED_PROVIDERS[provider_id]['provider_class']
+
+    def _get_provider(self, route: Route) -> LLMProvider:
+        """Provider client for a route (created on first use)."""
+        if route not in self._providers:
+            provider_class = self._provider_class(route.provider)
+            self._providers[route] = provider_class(self.api_keys[route.provider], model=route.model)
+        return self._providers[route]
+
+    @staticmethod
+    def _should_failover(error: LLMError, route_index: int) -> bool:
+        """Transient and outage errors move on to the next route; a bad fallback key is skipped."""
+        if error.retryable or isinstance(error, LLMCircuitOpenError):
+            return True
+        return route_index > 0 and isinstance(error, LLMAuthenticationError)
+
+    def chat(self, system_prompt: str, conversation_history: List[Dict], user_message: str,
+             use_cache: bool = True) -> Dict[str, Any]:
         """
         Send a message to the LLM.
 
+        Routes are tried in order (see ModelRouter.plan); later routes are only
+        used when an earlier one fails with an outage-type error.
+
         Args:
             system_prompt: The agent's system prompt
             conversation_history: Previous messages
             user_message: New message from user
+            use_cache: Set False to bypass the response cache (e.g. per-agent opt-out)
 
         Returns:
-            dict: {'response': str, 'model': str, 'usage': dict, 'provider': str}
+            dict: {'response': str, 'model': str, 'usage': dict, 'provider': str, 'cached': bool,
+                   'failover': bool, 'estimated_cost': float}
+
+        Raises:
+            LLMAdmissionError: Too many concurrent calls for this user, key or worker
         """
-        # Build messages
+        started = time.perf_counter()
+
+        messages, routes = self._plan(system_prompt, conversation_history, user_message)
+        primary = routes[0]
+
+        # Serve identical requests from the cache when enabled, to keys known to work
+        cache_key = self._cache_key(primary, system_prompt, messages, use_cache)
+        verified = cache_key is not None and self._key_verified(primary)
+        if verified:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return self._cached_result(cached, primary)
+
+        # Wait for a call slot (per worker, user and API key); cache hits never queue
+        slot = self.admission.admit(self.user_id, self.api_keys[self.provider_id]) if self.admission else nullcontext()
+        with slot:
+            # Call providers in route order
+            first_error = None
+            for index, route in enumerate(routes):
+                call_started = time.perf_counter()
+                try:
+                    result = self._get_provider(route).chat(system_prompt, messages, max_tokens=self.DEFAULT_MAX_TOKENS)
+                    duration = time.perf_counter() - call_started
+                    # Non-streaming: the first token arrives with the full response
+                    event = record_llm_call(route.provider, route.model, 'ok', duration, queue_wait=call_started - started,
+                                            ttft=duration, usage=result.get('usage'))
+                    break
+                except LLMError as e:
+                    record_llm_call(route.provider, route.model, type(e).__name__, time.perf_counter() - call_started,
+                                    queue_wait=call_started - started)
+                    first_error = first_error or e
+                    if not self._should_failover(e, index) or index == len(routes) - 1:
+                        raise first_error
+                    logger.warning(f"{route.provider}/{route.model} failed ({type(e).__name__}), "
+                                   f"failing over to {routes[index + 1].provider}/{routes[index + 1].model}")
+
+        result['provider'] = route.provider
+        result['cached'] = False
+        result['failover'] = route != primary
+        result['estimated_cost'] = event.get('estimated_cost_usd', 0.0)
+
+        self._store(cache_key, verified, primary, route, result)
+        return result
+
+    def _plan(self, system_prompt: str, conversation_history: List[Dict], user_message: str):
+        """Build the provider messages and the ordered routes to try."""
         messages = conversation_history.copy()
         messages.append({
             'role': 'user',
             'content': user_message
         })
 
-        # Call provider
-        result = self.provider.chat(system_prompt, messages)
-        result['provider'] = self.provider_id
-
+        routes = self.router.plan(
+            self.provider_id,
+            list(self.api_keys),
+            prompt_tokens=estimate_tokens(system_prompt, messages),
+            max_tokens=self.DEFAULT_MAX_TOKENS
+        )
+        return messages, routes
+
+    def _cache_key(self, primary: Route, system_prompt: str, messages: List[Dict], use_cache: bool):
+        """Cache key for the request, or None when caching does not apply."""
+        if not use_cache or self.cache is None or not self.cache.enabled:
+            return None
+        return self.cache.make_key(primary.provider, primary.model, system_prompt, messages, self.DEFAULT_MAX_TOKENS)
+
+    def _key_verified(self, route: Route) -> bool:
+        return self.cache.has_verified_key(route.provider, self.api_keys[route.provider])
+
+    def _store(self, cache_key, verified: bool, primary: Route, route: Route, result: Dict[str, Any]) -> None:
+        """After a successful call: note that route's key works, and cache the primary route's response."""
+        if cache_key is None:
+            return
+        if route != primary or not verified:
+            self.cache.verify_key(route.provider, self.api_keys[route.provider])
+        if route == primary:
+            self.cache.set(cache_key, {
+                'response': result['response'],
+                'model': result['model']
+            })
+
+    @staticmethod
+    def _cached_result(cached: Dict[str, Any], primary: Route) -> Dict[str, Any]:
+        result = dict(cached)
+        # No tokens were spent on this request
+        result['usage'] = {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0}
+        result['provider'] = primary.provider
+        result['cached'] = True
+        result['failover'] = False
+        result['estimated_cost'] = 0.0
         return result
 
+    @classmethod
+    def available_providers(cls) -> List[str]:
+        """Provider IDs usable in this worker (the local provider only when enabled)."""
+        return [p for p in cls.SUPPORTED_PROVIDERS if p != 'local' or local_llm.enabled]
+
     @classmethod
     def get_provider_name(cls, provider_id: str) -> str:
         """Get human-readable provider name."""
@@ -188,7 +412,7 @@ class LLMService:
     @classmethod
     def validate_api_key(cls, provider: str, api_key: str) -> bool:
         """Validate API key format for provider."""
-        if provider not in cls.SUPPORTED_PROVIDERS:
+        if provider not in cls.available_providers():
             return False
 
         provider_class = cls.SUPPORTED_PROVIDERS[provider]['provider_class']
@@ -0,0 +1,124 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Local LLM provider settings - offline chat for tests, CI and benchmarks
+Responses are deterministic for a given prompt; latency (time to first token,
+tokens per second) and provider errors are simulated from config
+"""
+import asyncio
+import hashlib
+import json
+import random
+import threading
+from typing import Callable, Dict, List, Optional
+
+from app.llm_resilience import (
+    LLMAuthenticationError,
+    LLMBadRequestError,
+    LLMConnectionError,
+    LLMOverloadedError,
+    LLMRateLimitError,
+    LLMTimeoutError
+)
+
+PROVIDER_ID = 'local'
+LABEL = 'Local model'
+
+# Placeholder key; the local provider needs none
+LOCAL_API_KEY = 'local'
+
+# Injectable failures, mapped to the errors the real SDKs are classified into
+ERROR_TYPES = {
+    'overloaded': (LLMOverloadedError, 529),
+    'rate_limit': (LLMRateLimitError, 429),
+    'timeout': (LLMTimeoutError, None),
+    'connection': (LLMConnectionError, None),
+    'auth': (LLMAuthenticationError, 401),
+    'bad_request': (LLMBadRequestError, 400)
+}
+
+VOCABULARY = [
+    'the', 'agent', 'can', 'help', 'you', 'with', 'that', 'plan', 'a', 'simple', 'step', 'first', 'then',
+    'consider', 'your', 'goal', 'and', 'budget', 'here', 'is', 'an', 'idea', 'to', 'start', 'try', 'this',
+    'approach', 'for', 'best', 'results', 'keep', 'it', 'short', 'clear', 'practical', 'next', 'review',
+    'each', 'option', 'carefully', 'good', 'question', 'let', 'me', 'explain', 'briefly', 'in', 'summary'
+]
+
+
+def local_completion(system_prompt: str, messages: List[Dict], length: int) -> List[str]:
+    """Deterministic text tokens for a prompt (the same conversation always gets the same answer)."""
+    digest = hashlib.sha256(json.dumps([system_prompt, messages], sort_keys=True).encode('utf-8')).hexdigest()
+    rng = random.Random(digest)
+    return [('' if i == 0 else ' ') + rng.choice(VOCABULARY) for i in range(length)]
+
+
+class LocalLLMSettings:
+    """Latency and failure behaviour of the local provider, shared by a worker."""
+
+    def __init__(self, enabled: bool = True, ttft: float = 0.2, tokens_per_second: float = 50.0,
+                 response_tokens: int = 64, error_rate: float = 0.0, error_type: str = 'overloaded',
+                 seed: Optional[int] = None):
+        self.enabled = enabled
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate
+        self.error_type = error_type
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Load settings from app config and register on the app."""
+        error_type = app.config.get('LLM_LOCAL_ERROR_TYPE', 'overloaded')
+        if error_type not in ERROR_TYPES:
+            raise ValueError(f"LLM_LOCAL_ERROR_TYPE must be one of: {', '.join(ERROR_TYPES)}")
+
+        self.enabled = app.config.get('LLM_LOCAL_ENABLED', True)
+        self.ttft = app.config.get('LLM_LOCAL_TTFT_MS', 200.0) / 1000.0
+        self.tokens_per_second = app.config.get('LLM_LOCAL_TOKENS_PER_SECOND', 50.0)
+        self.response_tokens = app.config.get('LLM_LOCAL_RESPONSE_TOKENS', 64)
+        self.error_rate = app.config.get('LLM_LOCAL_ERROR_RATE', 0.0)
+        self.error_type = error_type
+        self._rng = random.Random(app.config.get('LLM_LOCAL_SEED'))
+        app.extensions['llm_local'] = self
+
+    @property
+    def token_delay(self) -> float:
+        """Seconds between streamed tokens."""
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def generation_time(self, tokens: int) -> float:
+        """Seconds a non-streaming call takes to return tokens."""
+        return self.ttft + tokens * self.token_delay
+
+    def maybe_fail(self) -> None:
+        """Raise the configured error for error_rate of calls (seeded, so runs are repeatable)."""
+        if self.error_rate <= 0:
+            return
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.error_rate:
+            error_class, status_code = ERROR_TYPES[self.error_type]
+            raise error_class(f"Injected {self.error_type} error from {LABEL}", provider=PROVIDER_ID,
+                              status_code=status_code)
+
+    @staticmethod
+    def simulate(duration: float, timeout: Optional[float], sleep: Callable[[float], None]) -> None:
+        """Sleep for duration, or fail like an SDK timeout when the attempt budget is shorter."""
+        if timeout is not None and duration > timeout:
+            sleep(timeout)
+            raise LLMTimeoutError(f"{LABEL} call timed out after {timeout:.2f}s", provider=PROVIDER_ID)
+        sleep(duration)
+
+    @staticmethod
+    async def simulate_async(duration: float, timeout: Optional[float]) -> None:
+        """Coroutine version of simulate() for the streaming path."""
+        if timeout is not None and duration > timeout:
+            await asyncio.sleep(timeout)
+            raise LLMTimeoutError(f"{LABEL} call timed out after {timeout:.2f}s", provider=PROVIDER_ID)
+        await asyncio.sleep(duration)
+
+
+# Shared instance, configured by create_app()
+local_llm = LocalLLMSettings()
@@ -0,0 +1,317 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Versioned schema migrations
+Each module in app/migrations/versions is one numbered migration with an upgrade(op) function.
+Applied versions are recorded in the schema_migrations table, so an up-to-date database costs
+one query per deploy. Operations are idempotent and online-safe: indexes on PostgreSQL are
+built CONCURRENTLY, and backfills run in small committed batches with a pause between them.
+"""
+import importlib
+import logging
+import pkgutil
+import re
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table, inspect, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+logger = logging.getLogger(__name__)
+
+VERSION_TABLE = 'schema_migrations'
+
+# Held for the whole upgrade on PostgreSQL so two deploys never migrate at once
+ADVISORY_LOCK_ID = 7412983
+
+_version_metadata = MetaData()
+schema_migrations = Table(
+    VERSION_TABLE, _version_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+    Column('duration_ms', Float)
+)
+
+_MODULE_NAME = re.compile(r'^(\d{4})_(\w+)$')
+
+
+class Migration(NamedTuple):
+    """One numbered migration module."""
+    version: int
+    name: str
+    module: object
+
+    @property
+    def transactional(self) -> bool:
+        """False for migrations that build indexes concurrently or commit backfill batches."""
+        return getattr(self.module, 'TRANSACTIONAL', True)
+
+    @property
+    def description(self) -> str:
+        """First line of the module docstring."""
+        doc = (self.module.__doc__ or '').strip()
+        return doc.splitlines()[0] if doc else self.name
+
+
+def discover(package: str = 'app.migrations.versions') -> List[Migration]:
+    """All migrations in package, ordered by version."""
+    versions = importlib.import_module(package)
+    migrations = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        match = _MODULE_NAME.match(info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f'{package}.{info.name}')
+        migrations.append(Migration(int(match.group(1)), match.group(2), module))
+
+    migrations.sort(key=lambda m: m.version)
+    seen = set()
+    for migration in migrations:
+        if migration.version in seen:
+            raise ValueError(f"Duplicate migration version {migration.version:04d}")
+        seen.add(migration.version)
+    return migrations
+
+
+class Operations:
+    """
+    Schema operations available to upgrade(op).
+
+    Every operation is safe to repeat, so a migration interrupted halfway can simply be re-run.
+    In dry-run mode statements are collected in .statements instead of executed.
+    """
+
+    def __init__(self, connection, metadata: MetaData, transactional: bool = True, dry_run: bool = False,
+                 sleep=time.sleep):
+        self.connection = connection
+        self.metadata = metadata
+        self.transactional = transactional
+        self.dry_run = dry_run
+        self.statements: List[str] = []
+        self._sleep = sleep
+
+    @property
+    def dialect(self) -> str:
+        return self.connection.dialect.name
+
+    @property
+    def is_postgres(self) -> bool:
+        return self.dialect == 'postgresql'
+
+    def execute(self, sql: str, **params):
+        """Run one statement (or record it in dry-run mode)."""
+        sql = ' '.join(sql.split())
+        if self.dry_run:
+            self.statements.append(sql)
+            return None
+        return self.connection.execute(text(sql), params)
+
+    def scalars(self, sql: str, **params) -> list:
+        """First column of a read-only query, run in dry-run mode too."""
+        return self.connection.execute(text(' '.join(sql.split())), params).scalars().all()
+
+    def has_table(self, table: str) -> bool:
+        return inspect(self.connection).has_table(table)
+
+    def has_column(self, table: str, column: str) -> bool:
+        if not self.has_table(table):
+            return False
+        return column in {c['name'] for c in inspect(self.connection).get_columns(table)}
+
+    def has_index(self, table: str, index: str) -> bool:
+        if not self.has_table(table):
+            return False
+        return index in {i['name'] for i in inspect(self.connection).get_indexes(table)}
+
+    def create_tables(self, *tables: str) -> None:
+        """Create the named model tables (all of them when none are given) if they are missing."""
+        selected = [self.metadata.tables[name] for name in tables] if tables else self.metadata.sorted_tables
+        for table in selected:
+            if self.has_table(table.name):
+                continue
+            if self.dry_run:
+                for ddl in [CreateTable(table)] + [CreateIndex(index) for index in table.indexes]:
+                    self.statements.append(' '.join(str(ddl.compile(self.connection)).split()))
+            else:
+                table.create(self.connection, checkfirst=True)
+
+    def add_column(self, table: str, column: str, definition: str) -> None:
+        """ALTER TABLE ... ADD COLUMN, skipped when the column exists (or the table does not yet)."""
+        if not self.has_table(table) or self.has_column(table, column):
+            return
+        self.execute(f'ALTER TABLE "{table}" ADD COLUMN {column} {definition}')
+
+    def create_index(self, name: str, table: str, columns: List[str], unique: bool = False,
+                     where: Optional[str] = None) -> None:
+        """
+        Create an index without blocking writes where the database allows it.
+
+        On PostgreSQL, non-transactional migrations build the index CONCURRENTLY; an invalid
+        index left behind by an interrupted concurrent build is dropped and rebuilt.
+        """
+        concurrently = self.is_postgres and not self.transactional
+        if concurrently and not self.dry_run:
+            valid = self.connection.execute(text(
+                "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+            ), {'name': name}).scalar()
+            if valid is False:
+                self.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+        sql = 'CREATE {unique}INDEX {concurrently}IF NOT EXISTS "{name}" ON "{table}" ({columns})'.format(
+            unique='UNIQUE ' if unique else '',
+            concurrently='CONCURRENTLY ' if concurrently else '',
+            name=name,
+            table=table,
+            columns=', '.join(columns)
+        )
+        if where:
+            sql += f' WHERE {where}'
+        self.execute(sql)
+
+    def drop_index(self, name: str) -> None:
+        concurrently = 'CONCURRENTLY ' if self.is_postgres and not self.transactional else ''
+        self.execute(f'DROP INDEX {concurrently}IF EXISTS "{name}"')
+
+    def backfill(self, table: str, assignments: str, where: str, batch_size: int = 1000,
+                 pause: float = 0.05, key: str = 'id', **params) -> int:
+        """
+        UPDATE rows matching where in batches of batch_size, pausing between batches.
+
+        assignments must make where false for updated rows, or the loop would not end.
+        In non-transactional migrations each batch commits on its own, so row locks are
+        short and a long backfill does not hold one huge transaction open.
+
+        Returns:
+            int: Rows updated
+        """
+        sql = (f'UPDATE "{table}" SET {assignments} WHERE {key} IN '
+               f'(SELECT {key} FROM "{table}" WHERE {where} LIMIT {int(batch_size)})')
+        if self.dry_run:
+            self.statements.append(f'{sql} -- repeated until no rows match, {pause:.2f}s apart')
+            return 0
+
+        total = 0
+        while True:
+            updated = self.connection.execute(text(sql), params).rowcount
+            total += updated
+            if updated < batch_size:
+                break
+            logger.info(f"Backfilled {total} rows of {table}")
+            self._sleep(pause)
+        return total
+
+
+    def delete_rows(self, table: str, where: str, batch_size: int = 1000, pause: float = 0.05,
+                    key: str = 'id', **params) -> int:
+        """
+        DELETE rows matching where in batches of batch_size, pausing between batches.
+
+        Like backfill, each batch commits on its own in non-transactional migrations.
+
+        Returns:
+            int: Rows deleted
+        """
+        sql = (f'DELETE FROM "{table}" WHERE {key} IN '
+               f'(SELECT {key} FROM "{table}" WHERE {where} LIMIT {int(batch_size)})')
+        if self.dry_run:
+            self.statements.append(f'{sql} -- repeated until no rows match, {pause:.2f}s apart')
+            return 0
+
+        total = 0
+        while True:
+            deleted = self.connection.execute(text(sql), params).rowcount
+            total += deleted
+            if deleted < batch_size:
+                break
+            logger.info(f"Deleted {total} rows of {table}")
+            self._sleep(pause)
+        return total
+
+
+class MigrationRunner:
+    """Applies pending migrations to one engine."""
+
+    def __init__(self, engine, metadata: MetaData, migrations: Optional[List[Migration]] = None,
+                 sleep=time.sleep):
+        self.engine = engine
+        self.metadata = metadata
+        self.migrations = discover() if migrations is None else migrations
+        self._sleep = sleep
+
+    def applied_versions(self) -> Dict[int, datetime]:
+        """Versions already applied (none before the version table exists)."""
+        with self.engine.connect() as conn:
+            if not inspect(conn).has_table(VERSION_TABLE):
+                return {}
+            rows = conn.execute(schema_migrations.select()).fetchall()
+        return {row.version: row.applied_at for row in rows}
+
+    def pending(self) -> List[Migration]:
+        applied = self.applied_versions()
+        return [m for m in self.migrations if m.version not in applied]
+
+    def plan(self) -> List[Dict]:
+        """Pending migrations and the SQL each would run (nothing is changed)."""
+        plan = []
+        for migration in self.pending():
+            with self.engine.connect() as conn:
+                op = Operations(conn, self.metadata, transactional=migration.transactional, dry_run=True)
+                migration.module.upgrade(op)
+                conn.rollback()
+            plan.append({
+                'version': migration.version,
+                'name': migration.name,
+                'description': migration.description,
+                'transactional': migration.transactional,
+                'statements': op.statements
+            })
+        return plan
+
+    def upgrade(self, log=print) -> List[Migration]:
+        """Apply every pending migration in order; returns the ones applied."""
+        with self.engine.connect() as lock_conn:
+            if self.engine.dialect.name == 'postgresql':
+                lock_conn.execute(text('SELECT pg_advisory_lock(:id)'), {'id': ADVISORY_LOCK_ID})
+                lock_conn.commit()
+            try:
+                with self.engine.begin() as conn:
+                    schema_migrations.create(conn, checkfirst=True)
+                pending = self.pending()
+                if not pending:
+                    log("Database schema is up to date")
+                for migration in pending:
+                    self._apply(migration, log)
+                return pending
+            finally:
+                if self.engine.dialect.name == 'postgresql':
+                    lock_conn.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': ADVISORY_LOCK_ID})
+                    lock_conn.commit()
+
+    def _apply(self, migration: Migration, log) -> None:
+        log(f"Applying {migration.version:04d}_{migration.name}: {migration.description}")
+        start = time.perf_counter()
+
+        if migration.transactional:
+            with self.engine.begin() as conn:
+                migration.module.upgrade(Operations(conn, self.metadata, sleep=self._sleep))
+                self._record(conn, migration, start)
+        else:
+            # CONCURRENTLY cannot run inside a transaction block; batches commit themselves
+            with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                migration.module.upgrade(Operations(conn, self.metadata, transactional=False, sleep=self._sleep))
+            with self.engine.begin() as conn:
+                self._record(conn, migration, start)
+
+        log(f"  done in {time.perf_counter() - start:.2f}s")
+
+    @staticmethod
+    def _record(conn, migration: Migration, start: float) -> None:
+        conn.execute(schema_migrations.insert().values(
+            version=migration.version,
+            name=migration.name,
+            applied_at=datetime.utcnow(),
+            duration_ms=round((time.perf_counter() - start) * 1000, 1)
+        ))
@@ -0,0 +1,13 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Create any missing tables from the models (the whole schema on a fresh database)
+
+Databases from before versioned migrations keep their tables; the migrations that follow
+add the columns the old migrate_* scripts used to add.
+"""
+
+
+def upgrade(op):
+    op.create_tables()
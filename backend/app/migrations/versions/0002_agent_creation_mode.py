@@ -0,0 +1,12 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Track how agents were created and store example conversations
+"""
+
+
+def upgrade(op):
+    op.add_column('agent_config', 'creation_mode', "VARCHAR(20) DEFAULT 'web_form'")
+    op.add_column('agent_config', 'template_id', 'VARCHAR(50)')
+    op.add_column('agent_config', 'example_conversations', 'TEXT')
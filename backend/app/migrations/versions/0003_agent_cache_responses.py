@@ -0,0 +1,10 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Per-agent opt-out of the LLM response cache
+"""
+
+
+def upgrade(op):
+    op.add_column('agent_config', 'cache_responses', 'BOOLEAN DEFAULT TRUE' if op.is_postgres else 'BOOLEAN DEFAULT 1')
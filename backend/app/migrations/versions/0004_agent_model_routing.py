@@ -0,0 +1,11 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Per-agent model preference and routing policy
+"""
+
+
+def upgrade(op):
+    op.add_column('agent_config', 'llm_model', 'VARCHAR(100)')
+    op.add_column('agent_config', 'routing_policy', "VARCHAR(20) DEFAULT 'quality'")
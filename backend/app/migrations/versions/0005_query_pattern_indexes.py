@@ -0,0 +1,43 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Composite indexes for the hot purchase, review and marketplace queries; one review per user per agent
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Indexes are built CONCURRENTLY on PostgreSQL, and the duplicate reviews are deleted batch by batch
+TRANSACTIONAL = False
+
+# Every review but the latest of its (reviewer, agent) pair
+SUPERSEDED = 'id NOT IN (SELECT MAX(id) FROM review GROUP BY reviewer_id, agent_id)'
+
+
+def upgrade(op):
+    op.create_index('ix_purchase_buyer_agent_active', 'purchase', ['buyer_id', 'agent_id', 'is_active'])
+    op.create_index('ix_purchase_buyer_active_purchased', 'purchase', ['buyer_id', 'is_active', 'purchased_at'])
+    op.create_index('ix_review_agent_visible_created', 'review', ['agent_id', 'is_visible', 'created_at'])
+
+    # Older rows may repeat a (reviewer, agent) pair; keep the latest review of each before enforcing uniqueness
+    agent_ids = op.scalars(
+        'SELECT DISTINCT agent_id FROM review GROUP BY reviewer_id, agent_id HAVING COUNT(*) > 1'
+    ) if op.has_table('review') else []
+    if agent_ids:
+        deleted = op.delete_rows('review', SUPERSEDED)
+        logger.warning(f"Deleted {deleted} superseded reviews of {len(agent_ids)} agents")
+        if op.has_table('agent_stats'):
+            # Same average the review route kept: visible reviews, rounded to two places
+            op.execute(f"""
+                UPDATE agent_stats SET average_rating = COALESCE((
+                    SELECT ROUND(AVG(r.rating), 2) FROM review r
+                    WHERE r.agent_id = agent_stats.agent_id AND r.is_visible = TRUE
+                ), 0.0)
+                WHERE agent_id IN ({', '.join(str(int(agent_id)) for agent_id in agent_ids)})
+            """)
+    op.create_index('uq_review_reviewer_agent', 'review', ['reviewer_id', 'agent_id'], unique=True)
+
+    op.create_index('ix_agent_listing', 'agent', ['is_approved', 'is_active', 'category'])
+    # Leading column of ix_agent_listing, so the single-column index only costs writes
+    op.drop_index('ix_agent_is_approved')
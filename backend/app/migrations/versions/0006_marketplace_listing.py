@@ -0,0 +1,23 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Marketplace listing read model, filled from the currently listed agents
+"""
+
+
+def upgrade(op):
+    op.create_tables('marketplace_listing')
+    op.execute("""
+        INSERT INTO marketplace_listing (agent_id, name, short_description, description, category, price,
+                                         currency, average_rating, purchase_count, creator_username, updated_at)
+        SELECT a.id, a.name, SUBSTR(a.description, 1, 300), a.description, a.category, COALESCE(p.price, 0.0),
+               COALESCE(p.currency, 'USD'), COALESCE(s.average_rating, 0.0), COALESCE(s.purchase_count, 0),
+               u.username, CURRENT_TIMESTAMP
+        FROM agent a
+        JOIN "user" u ON u.id = a.creator_id
+        LEFT JOIN agent_pricing p ON p.agent_id = a.id
+        LEFT JOIN agent_stats s ON s.agent_id = a.id
+        WHERE a.is_approved = TRUE AND a.is_active = TRUE
+          AND NOT EXISTS (SELECT 1 FROM marketplace_listing m WHERE m.agent_id = a.id)
+    """)
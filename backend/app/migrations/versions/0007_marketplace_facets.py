@@ -0,0 +1,24 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Marketplace facet counts per category and price band, counted from the listing read model
+"""
+
+
+def upgrade(op):
+    op.create_tables('marketplace_facet_count')
+    op.execute("""
+        INSERT INTO marketplace_facet_count (category, price_band, agent_count)
+        SELECT category, band, COUNT(*)
+        FROM (
+            SELECT category,
+                   CASE WHEN price <= 0 THEN 'free'
+                        WHEN price < 10 THEN 'under_10'
+                        WHEN price < 50 THEN '10_to_50'
+                        ELSE '50_plus' END AS band
+            FROM marketplace_listing
+        ) banded
+        WHERE NOT EXISTS (SELECT 1 FROM marketplace_facet_count)
+        GROUP BY category, band
+    """)
@@ -0,0 +1,21 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Ranking score on agent stats and listings; listing indexes ordered by score
+"""
+
+# Indexes are built CONCURRENTLY on PostgreSQL
+TRANSACTIONAL = False
+
+
+def upgrade(op):
+    op.add_column('agent_stats', 'ranking_score', 'FLOAT DEFAULT 0.0')
+    op.add_column('marketplace_listing', 'ranking_score', 'FLOAT NOT NULL DEFAULT 0')
+
+    op.create_index('ix_marketplace_listing_score', 'marketplace_listing',
+                    ['ranking_score', 'average_rating', 'purchase_count'])
+    op.create_index('ix_marketplace_listing_category_score', 'marketplace_listing',
+                    ['category', 'ranking_score', 'average_rating', 'purchase_count'])
+    op.drop_index('ix_marketplace_listing_rank')
+    op.drop_index('ix_marketplace_listing_category_rank')
@@ -0,0 +1,10 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+"Customers also bought" lists (filled by the recommendations job)
+"""
+
+
+def upgrade(op):
+    op.create_tables('agent_recommendation')
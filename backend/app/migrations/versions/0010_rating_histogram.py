@@ -0,0 +1,21 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Star rating histogram on agent stats, counted from the visible reviews
+"""
+
+# The backfill commits batch by batch
+TRANSACTIONAL = False
+
+
+def upgrade(op):
+    for stars in range(1, 6):
+        op.add_column('agent_stats', f'rating_{stars}_count', 'INTEGER')
+
+    counts = ', '.join(
+        f'rating_{stars}_count = (SELECT COUNT(*) FROM review r WHERE r.agent_id = agent_stats.agent_id '
+        f'AND r.is_visible = TRUE AND r.rating = {stars})'
+        for stars in range(1, 6)
+    )
+    op.backfill('agent_stats', counts, 'rating_1_count IS NULL')
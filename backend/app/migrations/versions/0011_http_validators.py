@@ -0,0 +1,14 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Change times for the marketplace's HTTP validators: facet counts stamped, listings indexed by updated_at
+"""
+
+# Indexes are built CONCURRENTLY on PostgreSQL
+TRANSACTIONAL = False
+
+
+def upgrade(op):
+    op.add_column('marketplace_facet_count', 'updated_at', 'TIMESTAMP')
+    op.create_index('ix_marketplace_listing_updated', 'marketplace_listing', ['updated_at'])
@@ -0,0 +1,14 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Score at each listing's last updated_at stamp, so small ranking changes add up to a new version
+"""
+
+# The backfill commits batch by batch
+TRANSACTIONAL = False
+
+
+def upgrade(op):
+    op.add_column('marketplace_listing', 'stamped_score', 'FLOAT')
+    op.backfill('marketplace_listing', 'stamped_score = ranking_score', 'stamped_score IS NULL', key='agent_id')
@@ -0,0 +1,17 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Full agent description on marketplace listings, next to the shortened one
+"""
+
+# The backfill commits batch by batch
+TRANSACTIONAL = False
+
+
+def upgrade(op):
+    op.add_column('marketplace_listing', 'description', 'TEXT')
+    op.backfill('marketplace_listing',
+                "description = COALESCE((SELECT a.description FROM agent a "
+                "WHERE a.id = marketplace_listing.agent_id), '')",
+                'description IS NULL', key='agent_id')
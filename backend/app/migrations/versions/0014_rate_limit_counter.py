@@ -0,0 +1,10 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Rate limit counters shared by every worker (the database limiter storage)
+"""
+
+
+def upgrade(op):
+    op.create_tables('rate_limit_counter')
@@ -0,0 +1,11 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Per-agent opt-in to failover routes that cost more than the primary model
+"""
+
+
+def upgrade(op):
+    op.add_column('agent_config', 'allow_costlier_failover',
+                  'BOOLEAN DEFAULT FALSE' if op.is_postgres else 'BOOLEAN DEFAULT 0')
@@ -0,0 +1,6 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Numbered migrations (NNNN_name.py), applied in order by app.migrations.MigrationRunner
+"""
@@ -50,6 +50,10 @@ class User(UserMixin, db.Model):
 class Agent(db.Model):
     """AI Agent model - core information."""
     __tablename__ = 'agent'
+    __table_args__ = (
+        # Marketplace listing: approved, active agents, optionally narrowed to one category
+        db.Index('ix_agent_listing', 'is_approved', 'is_active', 'category'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False, index=True)
@@ -63,7 +67,7 @@ class Agent(db.Model):
 
     # Status
     is_active = db.Column(db.Boolean, default=True, index=True)
-    is_approved = db.Column(db.Boolean, default=False, index=True)
+    is_approved = db.Column(db.Boolean, default=False)  # Leading column of ix_agent_listing
 
     # Relationships (1:1 with related tables)
     config = db.relationship('AgentConfig', backref='agent', uselist=False, cascade='all, delete-orphan')
@@ -89,12 +93,18 @@ class AgentConfig(db.Model):
     # AI Configuration
     system_prompt = db.Column(db.Text, nullable=False)
     llm_provider = db.Column(db.String(50), nullable=False, default='anthropic')  # 'anthropic', 'openai', etc.
+    llm_model = db.Column(db.String(100))  # Preferred model; None lets the routing policy choose
+    routing_policy = db.Column(db.String(20), default='quality')  # 'quality', 'balanced', 'latency', 'cost'
+    allow_costlier_failover = db.Column(db.Boolean, default=False)  # Failover may pick pricier models
 
     # Creation tracking
     creation_mode = db.Column(db.String(20), default='web_form')  # 'web_form', 'template', 'package', 'ai_assistant'
     template_id = db.Column(db.String(50))  # If created from template, which one
     example_conversations = db.Column(db.Text)  # JSON array of example interactions
 
+    # Response caching (set False for agents whose replies must never be reused)
+    cache_responses = db.Column(db.Boolean, default=True)
+
     # Moderation
     approval_notes = db.Column(db.Text)
 
@@ -143,11 +153,28 @@ class AgentStats(db.Model):
     # Stats
     purchase_count = db.Column(db.Integer, default=0)
     average_rating = db.Column(db.Float, default=0.0)
+    ranking_score = db.Column(db.Float, default=0.0)  # Written by app.ranking
+
+    # Visible reviews per star rating, kept by app.reviews
+    rating_1_count = db.Column(db.Integer, default=0)
+    rating_2_count = db.Column(db.Integer, default=0)
+    rating_3_count = db.Column(db.Integer, default=0)
+    rating_4_count = db.Column(db.Integer, default=0)
+    rating_5_count = db.Column(db.Integer, default=0)
 
     # Future stats
     # view_count = db.Column(db.Integer, default=0)
     # last_purchased_at = db.Column(db.DateTime)
 
+    @property
+    def rating_histogram(self):
+        """Visible reviews per star rating, {1: count, ..., 5: count}."""
+        return {stars: getattr(self, f'rating_{stars}_count') or 0 for stars in range(1, 6)}
+
+    @property
+    def review_count(self):
+        return sum(self.rating_histogram.values())
+
     def __repr__(self):
         return f'<AgentStats {self.agent_id}: {self.purchase_count} purchases, {self.average_rating} rating>'
 
@@ -155,6 +182,12 @@ class AgentStats(db.Model):
 class Purchase(db.Model):
     """Purchase/Transaction model."""
     __tablename__ = 'purchase'
+    __table_args__ = (
+        # Access checks: has this buyer an active purchase of this agent?
+        db.Index('ix_purchase_buyer_agent_active', 'buyer_id', 'agent_id', 'is_active'),
+        # My purchases: a buyer's active purchases, newest first
+        db.Index('ix_purchase_buyer_active_purchased', 'buyer_id', 'is_active', 'purchased_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     buyer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -175,6 +208,12 @@ class Purchase(db.Model):
 class Review(db.Model):
     """Review and rating model for agents."""
     __tablename__ = 'review'
+    __table_args__ = (
+        # Agent detail page: visible reviews, newest first
+        db.Index('ix_review_agent_visible_created', 'agent_id', 'is_visible', 'created_at'),
+        # One review per user per agent; also serves the "already reviewed?" lookup
+        db.Index('uq_review_reviewer_agent', 'reviewer_id', 'agent_id', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     agent_id = db.Column(db.Integer, db.ForeignKey('agent.id'), nullable=False)
@@ -193,3 +232,140 @@ class Review(db.Model):
 
     def __repr__(self):
         return f'<Review {self.id}: {self.rating} stars for Agent {self.agent_id}>'
+
+
+class MarketplaceListing(db.Model):
+    """Marketplace read model - one flat row per approved, active agent (maintained by app.listings)."""
+    __tablename__ = 'marketplace_listing'
+    __table_args__ = (
+        # Listing order, overall and within a category, as index walks
+        db.Index('ix_marketplace_listing_score', 'ranking_score', 'average_rating', 'purchase_count'),
+        db.Index('ix_marketplace_listing_category_score', 'category', 'ranking_score', 'average_rating',
+                 'purchase_count'),
+        # Newest change, for the marketplace's HTTP validators
+        db.Index('ix_marketplace_listing_updated', 'updated_at'),
+    )
+
+    agent_id = db.Column(db.Integer, db.ForeignKey('agent.id', ondelete='CASCADE'), primary_key=True)
+
+    # Copied from agent, agent_pricing, agent_stats and user
+    name = db.Column(db.String(200), nullable=False)
+    short_description = db.Column(db.String(300), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    price = db.Column(db.Float, nullable=False, default=0.0)
+    currency = db.Column(db.String(3), nullable=False, default='USD')
+    average_rating = db.Column(db.Float, nullable=False, default=0.0)
+    purchase_count = db.Column(db.Integer, nullable=False, default=0)
+    ranking_score = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    # ranking_score when updated_at was last moved; the ranking job compares against it
+    stamped_score = db.Column(db.Float)
+    creator_username = db.Column(db.String(80), nullable=False)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<MarketplaceListing {self.agent_id}: {self.name}>'
+
+
+class MarketplaceFacetCount(db.Model):
+    """Listed agents per category and price band (maintained with marketplace_listing)."""
+    __tablename__ = 'marketplace_facet_count'
+
+    category = db.Column(db.String(100), primary_key=True)
+    price_band = db.Column(db.String(20), primary_key=True)  # See app.facets.PRICE_BANDS
+    agent_count = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)  # Moves when a listing enters or leaves
+
+    def __repr__(self):
+        return f'<MarketplaceFacetCount {self.category}/{self.price_band}: {self.agent_count}>'
+
+
+class AgentRecommendation(db.Model):
+    """Top-N "customers also bought" list per agent (written by app.recommendations)."""
+    __tablename__ = 'agent_recommendation'
+
+    agent_id = db.Column(db.Integer, db.ForeignKey('agent.id', ondelete='CASCADE'), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)  # 0 = most similar
+    recommended_agent_id = db.Column(db.Integer, db.ForeignKey('agent.id', ondelete='CASCADE'), nullable=False)
+
+    score = db.Column(db.Float, nullable=False)  # Cosine similarity of the two buyer sets
+    shared_buyers = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<AgentRecommendation {self.agent_id}#{self.position}: {self.recommended_agent_id}>'
+
+
+class LLMCacheEntry(db.Model):
+    """Cached LLM response shared across workers (database cache backend)."""
+    __tablename__ = 'llm_cache_entry'
+
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), unique=True, nullable=False, index=True)  # SHA-256 of normalized request
+    response_json = db.Column(db.Text, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    last_accessed_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<LLMCacheEntry {self.cache_key[:12]}>'
+
+
+class UsageEvent(db.Model):
+    """Raw token usage per chat response - append-only, written in batches."""
+    __tablename__ = 'usage_event'
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    agent_id = db.Column(db.Integer, db.ForeignKey('agent.id'), nullable=False)
+    creator_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # Denormalized from agent
+
+    provider = db.Column(db.String(50), nullable=False)
+    model = db.Column(db.String(100))
+    input_tokens = db.Column(db.Integer, default=0)
+    output_tokens = db.Column(db.Integer, default=0)
+    estimated_cost = db.Column(db.Float, default=0.0)  # USD at list prices
+    cached = db.Column(db.Boolean, default=False)
+
+    def __repr__(self):
+        return f'<UsageEvent {self.id}: Agent {self.agent_id} {self.input_tokens}+{self.output_tokens} tokens>'
+
+
+class UsageRollup(db.Model):
+    """Pre-aggregated usage per hour/day bucket, maintained incrementally from usage events."""
+    __tablename__ = 'usage_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'dimension', 'dimension_key', 'bucket_start',
+                            name='uq_usage_rollup_bucket'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)  # 'hour', 'day'
+    dimension = db.Column(db.String(20), nullable=False)  # 'agent', 'creator', 'provider'
+    dimension_key = db.Column(db.String(64), nullable=False)  # Agent ID, creator user ID or provider ID
+    bucket_start = db.Column(db.DateTime, nullable=False)
+
+    request_count = db.Column(db.Integer, default=0, nullable=False)
+    cached_count = db.Column(db.Integer, default=0, nullable=False)
+    input_tokens = db.Column(db.BigInteger, default=0, nullable=False)
+    output_tokens = db.Column(db.BigInteger, default=0, nullable=False)
+    estimated_cost = db.Column(db.Float, default=0.0, nullable=False)
+
+    def __repr__(self):
+        return f'<UsageRollup {self.granularity} {self.dimension}={self.dimension_key} {self.bucket_start}>'
+
+
+class RateLimitCounter(db.Model):
+    """Rate limit counter shared by every worker (database limiter storage)."""
+    __tablename__ = 'rate_limit_counter'
+
+    limit_key = db.Column(db.String(255), primary_key=True)  # Flask-Limiter key incl. window
+    count = db.Column(db.Integer, default=0, nullable=False)
+    expires_at = db.Column(db.Float, nullable=False, index=True)  # Unix timestamp
+
+    def __repr__(self):
+        return f'<RateLimitCounter {self.limit_key}: {self.count}>'
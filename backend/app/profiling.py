@@ -0,0 +1,196 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Sampling request profiler - wall-clock stacks per route in collapsed-stack format
+A native thread samples the request's stack every few milliseconds. Under gevent the
+request greenlet is sampled even while it is switched out waiting on I/O, so time spent
+blocked on the database or an LLM provider shows up under the call that is waiting.
+Output files load directly into flamegraph.pl, speedscope or inferno.
+"""
+import logging
+import os
+import random
+import re
+import secrets
+import signal
+import sys
+import threading
+from collections import Counter
+from typing import Optional
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# Admins force profiling of one request with this header set to PROFILING_TOKEN
+PROFILE_HEADER = 'X-Profile-Token'
+
+# Longest stack kept per sample (deep recursion is truncated at the root end)
+MAX_STACK_DEPTH = 128
+
+try:
+    import greenlet
+except ImportError:  # pragma: no cover - installed with gevent
+    greenlet = None
+
+
+def _native(module: str, name: str):
+    """The unpatched function when gevent has monkey patched module."""
+    try:
+        from gevent import monkey
+        return monkey.get_original(module, name)
+    except ImportError:  # pragma: no cover - gevent is a hard dependency
+        return getattr(sys.modules[module], name)
+
+
+def frame_label(frame) -> str:
+    """module:function for one frame (';' separates frames in collapsed stacks)."""
+    module = frame.f_globals.get('__name__', '?')
+    return f"{module}:{frame.f_code.co_qualname}".replace(';', ':')
+
+
+def collapse(frame, root: str) -> str:
+    """One sample as 'root;outermost;...;innermost'."""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    labels.append(root)
+    return ';'.join(reversed(labels))
+
+
+class StackSampler:
+    """Samples one thread (or greenlet) from a native background thread until stopped."""
+
+    def __init__(self, root: str, interval: float):
+        self.root = root
+        self.interval = interval
+        self.samples = Counter()
+        self.thread_id = threading.get_ident()
+        self.greenlet = greenlet.getcurrent() if greenlet else None
+        self._stopped = False
+        self._sleep = _native('time', 'sleep')
+        # Shared with the native sampling thread, so not a (possibly gevent-patched) threading.Lock
+        self._lock = _native('_thread', 'allocate_lock')()
+
+    def start(self) -> 'StackSampler':
+        _native('_thread', 'start_new_thread')(self._run, ())
+        return self
+
+    def stop(self) -> Counter:
+        with self._lock:
+            self._stopped = True
+            return Counter(self.samples)
+
+    def _current_frame(self):
+        # A switched-out greenlet keeps its frame in gr_frame; a running one is on the thread's stack
+        if self.greenlet is not None and self.greenlet.gr_frame is not None:
+            return self.greenlet.gr_frame
+        return sys._current_frames().get(self.thread_id)
+
+    def sample(self) -> None:
+        frame = self._current_frame()
+        if frame is not None:
+            stack = collapse(frame, self.root)
+            with self._lock:
+                if not self._stopped:
+                    self.samples[stack] += 1
+
+    def _run(self):
+        while not self._stopped:
+            self._sleep(self.interval)
+            self.sample()
+
+
+class RequestProfiler:
+    """Opt-in profiling of a sampled fraction of requests, switched on at runtime."""
+
+    def __init__(self, enabled: bool = False, sample_rate: float = 0.01, interval: float = 0.005,
+                 output_dir: str = 'profiles', token: str = ''):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.output_dir = output_dir
+        self.token = token
+        self._write_lock = threading.Lock()
+        self._signal_installed = False
+
+    def init_app(self, app):
+        """Load settings from app config and hook request handling."""
+        self.enabled = app.config.get('PROFILING_ENABLED', False)
+        self.sample_rate = app.config.get('PROFILING_SAMPLE_RATE', 0.01)
+        self.interval = app.config.get('PROFILING_INTERVAL_MS', 5.0) / 1000.0
+        self.output_dir = app.config.get('PROFILING_DIR', 'profiles')
+        self.token = app.config.get('PROFILING_TOKEN', '')
+        app.extensions['profiler'] = self
+
+        # Two attribute checks per request while profiling is off
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+
+        if app.config.get('PROFILING_SIGNAL', True):
+            self.install_signal()
+
+    def install_signal(self) -> None:
+        """SIGUSR2 toggles sampling in this worker (kill -USR2 <pid>)."""
+        if self._signal_installed or not hasattr(signal, 'SIGUSR2'):
+            return
+        if threading.current_thread() is not threading.main_thread():
+            return
+        signal.signal(signal.SIGUSR2, lambda signum, frame: self.toggle())
+        self._signal_installed = True
+
+    def toggle(self) -> bool:
+        """Flip sampling on or off; returns the new state."""
+        self.enabled = not self.enabled
+        logger.warning('profiling_toggled', extra={
+            'event': 'profiling_toggled', 'enabled': self.enabled, 'pid': os.getpid()
+        })
+        return self.enabled
+
+    def _forced(self) -> bool:
+        supplied = request.headers.get(PROFILE_HEADER)
+        return bool(supplied) and secrets.compare_digest(supplied, self.token)
+
+    def should_profile(self) -> bool:
+        """Profile this request? (sampled while enabled, or forced by an admin with the token)."""
+        if self.enabled and random.random() < self.sample_rate:
+            return True
+        return bool(self.token) and self._forced()
+
+    def _start_request(self):
+        if not self.enabled and not self.token:
+            return
+        if self.should_profile():
+            g.profile_sampler = StackSampler(request.endpoint or 'unmatched', self.interval).start()
+
+    def _finish_request(self, exc=None):
+        sampler = g.pop('profile_sampler', None)
+        if sampler is not None:
+            self.write(sampler.root, sampler.stop())
+
+    def profile_path(self, endpoint: str) -> str:
+        """Collapsed-stack file for endpoint in this worker."""
+        safe = re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint)
+        return os.path.join(self.output_dir, f'{safe}.{os.getpid()}.collapsed')
+
+    def write(self, endpoint: str, samples: Counter) -> Optional[str]:
+        """Append samples to the endpoint's file (flamegraph tools sum repeated stacks)."""
+        if not samples:
+            return None
+        path = self.profile_path(endpoint)
+        lines = ''.join(f'{stack} {count}\n' for stack, count in samples.items())
+        try:
+            with self._write_lock:
+                os.makedirs(self.output_dir, exist_ok=True)
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(lines)
+        except OSError as e:
+            logger.error(f"Failed to write profile {path}: {e}")
+            return None
+        return path
+
+
+# Shared instance, configured by create_app()
+profiler = RequestProfiler()
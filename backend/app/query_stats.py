@@ -0,0 +1,172 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+SQL query instrumentation - statement count and database time per request
+SQLAlchemy cursor events feed whichever trackers are open on the current thread
+(one per request, plus any opened by tests); slow statements are logged with their route
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+QUERY_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Longest statement text kept in logs and test failure messages
+MAX_STATEMENT_LENGTH = 500
+
+DB_QUERIES = registry.histogram(
+    'db_queries_per_request', 'SQL statements issued per request', ('endpoint',), buckets=QUERY_COUNT_BUCKETS)
+DB_TIME = registry.histogram(
+    'db_query_seconds_per_request', 'Time spent in SQL statements per request', ('endpoint',),
+    buckets=QUERY_TIME_BUCKETS)
+DB_SLOW_QUERIES = registry.counter(
+    'db_slow_queries_total', 'SQL statements slower than SLOW_QUERY_MS', ('endpoint',))
+
+
+class QueryTracker:
+    """Statements seen while the tracker is open."""
+
+    def __init__(self, record_statements: bool = False):
+        self.count = 0
+        self.duration = 0.0
+        self.record_statements = record_statements
+        self.statements: List[Tuple[str, float]] = []
+
+    def add(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        if self.record_statements:
+            self.statements.append((statement[:MAX_STATEMENT_LENGTH], duration))
+
+
+_local = threading.local()
+
+
+def _active_trackers() -> List[QueryTracker]:
+    trackers = getattr(_local, 'trackers', None)
+    if trackers is None:
+        trackers = _local.trackers = []
+    return trackers
+
+
+@contextmanager
+def track_queries(record_statements: bool = False):
+    """
+    Count the statements run on this thread inside the block.
+
+    Args:
+        record_statements: Also keep the statement text (for test failure messages)
+
+    Yields:
+        QueryTracker
+    """
+    tracker = QueryTracker(record_statements)
+    trackers = _active_trackers()
+    trackers.append(tracker)
+    try:
+        yield tracker
+    finally:
+        trackers.remove(tracker)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start_time')
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    for tracker in _active_trackers():
+        tracker.add(statement, duration)
+    query_stats.check_slow(statement, duration)
+
+
+class QueryStats:
+    """Per-request query counting, slow query logging and the X-DB-* debug headers."""
+
+    def __init__(self, enabled: bool = True, slow_query_ms: float = 100.0, headers: bool = False):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.headers = headers
+        self._listening = False
+
+    def init_app(self, app):
+        """Load settings from app config and hook request handling."""
+        self.enabled = app.config.get('QUERY_STATS_ENABLED', True)
+        self.slow_query_ms = app.config.get('SLOW_QUERY_MS', 100.0)
+        self.headers = app.config.get('QUERY_STATS_HEADERS', False)
+        app.extensions['query_stats'] = self
+
+        if not self.enabled:
+            return
+
+        # Engine-class listeners cover every engine, including ones created after this call
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            self._listening = True
+
+        app.before_request(self._start_request)
+        app.after_request(self._add_headers)
+        app.teardown_request(self._finish_request)
+
+    def check_slow(self, statement: str, duration: float) -> None:
+        """Log a statement that took longer than the threshold."""
+        if not self.enabled or duration * 1000 < self.slow_query_ms:
+            return
+
+        endpoint = _current_endpoint()
+        DB_SLOW_QUERIES.inc(endpoint=endpoint)
+        logger.warning('slow_query', extra={
+            'event': 'slow_query',
+            'endpoint': endpoint,
+            'duration_ms': round(duration * 1000, 1),
+            'statement': statement[:MAX_STATEMENT_LENGTH]
+        })
+
+    def _start_request(self):
+        g.query_tracker = QueryTracker()
+        _active_trackers().append(g.query_tracker)
+
+    def _add_headers(self, response):
+        tracker = g.get('query_tracker')
+        if self.headers and tracker is not None:
+            response.headers['X-DB-Query-Count'] = str(tracker.count)
+            response.headers['X-DB-Query-Time-Ms'] = f'{tracker.duration * 1000:.1f}'
+        return response
+
+    def _finish_request(self, exc=None):
+        tracker = g.pop('query_tracker', None)
+        if tracker is None:
+            return
+        _active_trackers().remove(tracker)
+
+        endpoint = _current_endpoint()
+        DB_QUERIES.observe(tracker.count, endpoint=endpoint)
+        DB_TIME.observe(tracker.duration, endpoint=endpoint)
+
+
+def _current_endpoint() -> str:
+    """Route label for metrics and logs ('-' outside a request)."""
+    try:
+        return request.endpoint or 'unmatched'
+    except RuntimeError:
+        return '-'
+
+
+# Shared instance, configured by create_app()
+query_stats = QueryStats()
@@ -0,0 +1,218 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Marketplace ranking - a Bayesian-smoothed, recency-weighted score per agent, computed in batches
+Reviews and purchases are aggregated per agent and day in SQL, then scored for every agent at once
+with NumPy and written to agent_stats.ranking_score and marketplace_listing.ranking_score, which
+listing pages walk by index. A rating is pulled towards the marketplace mean until enough recent
+reviews back it, so one 5-star review no longer outranks a popular 4.8.
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import bindparam, case, func, select, update
+
+from app.jobs import PeriodicJob
+
+logger = logging.getLogger(__name__)
+
+# Mean rating assumed before the marketplace has any reviews
+DEFAULT_MEAN_RATING = 3.0
+
+# Agents per UPDATE batch when scores are written
+WRITE_BATCH_SIZE = 1000
+
+# Smallest score change that moves a listing's updated_at (the marketplace's HTTP validators).
+# Changes are measured from the score at the last stamp, so recency decay, which nudges every
+# score a little on each run, still stamps once the nudges add up to a possible reorder.
+SCORE_EPSILON = 1e-3
+
+# Held while scores are written on PostgreSQL so workers do not rank at the same time
+ADVISORY_LOCK_ID = 7412984
+
+
+class RankingWeights(NamedTuple):
+    """Tunable parameters of the score."""
+    prior_weight: float = 10.0  # Reviews' worth of marketplace-mean rating every agent starts with
+    half_life_days: float = 90.0  # Age at which a review or purchase counts half
+    popularity_weight: float = 0.2  # Share of the score from purchases (the rest is rating)
+
+    @classmethod
+    def from_config(cls, config) -> 'RankingWeights':
+        return cls(
+            prior_weight=config.get('RANKING_PRIOR_WEIGHT', cls._field_defaults['prior_weight']),
+            half_life_days=config.get('RANKING_HALF_LIFE_DAYS', cls._field_defaults['half_life_days']),
+            popularity_weight=config.get('RANKING_POPULARITY_WEIGHT', cls._field_defaults['popularity_weight'])
+        )
+
+
+def load_signals(session, as_of: Optional[datetime] = None) -> Dict:
+    """
+    Per-agent, per-day review and purchase aggregates as NumPy arrays.
+
+    Only events before as_of count, so past orderings can be replayed.
+    """
+    import numpy as np
+    from app.models import AgentStats, Purchase, Review
+
+    as_of = as_of or datetime.utcnow()
+
+    def daily(model, timestamp, visible, *aggregates):
+        day = func.date(timestamp)
+        rows = session.execute(
+            select(model.agent_id, day, *aggregates).where(visible.is_(True), timestamp < as_of)
+            .group_by(model.agent_id, day)
+        ).all()
+        columns = list(zip(*rows)) if rows else [()] * (2 + len(aggregates))
+        days = np.array([str(value)[:10] for value in columns[1]], dtype='datetime64[D]')
+        age = (np.datetime64(as_of.date(), 'D') - days).astype(np.float64)
+        return (np.array(columns[0], dtype=np.int64), age,
+                *[np.array(column, dtype=np.float64) for column in columns[2:]])
+
+    review_agent, review_age, review_count, review_sum = daily(
+        Review, Review.created_at, Review.is_visible, func.count(), func.sum(Review.rating))
+    purchase_agent, purchase_age, purchase_count = daily(
+        Purchase, Purchase.purchased_at, Purchase.is_active, func.count())
+
+    agent_ids = np.array(sorted(session.execute(select(AgentStats.agent_id)).scalars()), dtype=np.int64)
+    return {
+        'agent_ids': agent_ids,
+        'review_agent': review_agent, 'review_age': review_age,
+        'review_count': review_count, 'review_sum': review_sum,
+        'purchase_agent': purchase_agent, 'purchase_age': purchase_age, 'purchase_count': purchase_count
+    }
+
+
+def compute_scores(signals: Dict, weights: RankingWeights = RankingWeights()):
+    """
+    Score every agent in signals['agent_ids'] (scores between 0 and 1, same order).
+
+    rating:     (prior_weight * mean + sum of decayed ratings) / (prior_weight + decayed review count)
+    popularity: log(1 + decayed purchases), scaled so the most bought agent gets 1
+    score:      (1 - popularity_weight) * rating / 5 + popularity_weight * popularity
+    """
+    import numpy as np
+
+    agent_ids = signals['agent_ids']
+    n = len(agent_ids)
+    if n == 0:
+        return np.zeros(0)
+
+    def per_agent(agents, age, values):
+        # Events of agents without a stats row are dropped
+        index = np.searchsorted(agent_ids, agents)
+        known = (index < n) & (agent_ids[np.minimum(index, n - 1)] == agents)
+        decay = np.power(0.5, age[known] / weights.half_life_days)
+        return np.bincount(index[known], weights=values[known] * decay, minlength=n)
+
+    review_count = per_agent(signals['review_agent'], signals['review_age'], signals['review_count'])
+    review_sum = per_agent(signals['review_agent'], signals['review_age'], signals['review_sum'])
+    purchases = per_agent(signals['purchase_agent'], signals['purchase_age'], signals['purchase_count'])
+
+    total_reviews = review_count.sum()
+    mean = review_sum.sum() / total_reviews if total_reviews > 0 else DEFAULT_MEAN_RATING
+    rating = (weights.prior_weight * mean + review_sum) / (weights.prior_weight + review_count)
+
+    popularity = np.log1p(purchases)
+    if popularity.max() > 0:
+        popularity /= popularity.max()
+
+    return np.round((1 - weights.popularity_weight) * rating / 5 + weights.popularity_weight * popularity, 6)
+
+
+def compare_orderings(agent_ids, baseline_scores, candidate_scores, top: int = 20) -> Dict:
+    """
+    How far two score vectors for the same agents disagree.
+
+    Returns:
+        dict: Both top-N orderings, their overlap and the Spearman correlation of the full rankings
+    """
+    import numpy as np
+
+    def ranks(scores):
+        # Highest score gets rank 0; ties keep agent ID order
+        order = np.lexsort((agent_ids, -scores))
+        positions = np.empty(len(scores), dtype=np.int64)
+        positions[order] = np.arange(len(scores))
+        return order, positions
+
+    baseline_order, baseline_ranks = ranks(baseline_scores)
+    candidate_order, candidate_ranks = ranks(candidate_scores)
+    baseline_top = [int(agent_ids[i]) for i in baseline_order[:top]]
+    candidate_top = [int(agent_ids[i]) for i in candidate_order[:top]]
+
+    correlation = 1.0
+    if len(agent_ids) > 1:
+        correlation = float(np.corrcoef(baseline_ranks, candidate_ranks)[0, 1])
+    return {
+        'baseline_top': baseline_top,
+        'candidate_top': candidate_top,
+        'top_overlap': len(set(baseline_top) & set(candidate_top)) / max(len(baseline_top), 1),
+        'spearman': round(correlation, 4)
+    }
+
+
+class RankingJob(PeriodicJob):
+    """Recomputes ranking scores on a schedule (per worker, at most one writer at a time)."""
+
+    name = 'ranking'
+    advisory_lock_id = ADVISORY_LOCK_ID
+
+    def __init__(self, interval: float = 0.0, weights: RankingWeights = RankingWeights()):
+        super().__init__(interval)
+        self.weights = weights
+
+    def init_app(self, app):
+        """Load settings from app config; the schedule starts with the first request."""
+        self.weights = RankingWeights.from_config(app.config)
+        super().init_app(app, interval=app.config.get('RANKING_INTERVAL', 0.0))
+
+    def run(self, session, as_of: Optional[datetime] = None) -> int:
+        """
+        Score all agents and store the scores (the caller commits). Requires an app context.
+
+        Returns:
+            int: Agents scored, or 0 when another worker holds the ranking lock
+        """
+        from app.models import AgentStats, MarketplaceListing
+
+        if not self.acquire(session):
+            return 0
+
+        start = time.perf_counter()
+        signals = load_signals(session, as_of)
+        scores = compute_scores(signals, self.weights)
+
+        rows = [{'ranked_agent_id': int(agent_id), 'score': float(score)}
+                for agent_id, score in zip(signals['agent_ids'], scores)]
+        connection = session.connection()
+        listing = MarketplaceListing.__table__
+        stats_statement = update(AgentStats.__table__).where(
+            AgentStats.__table__.c.agent_id == bindparam('ranked_agent_id')
+        ).values(ranking_score=bindparam('score'))
+        # SET expressions see the row as it was, so both stamps use the same comparison
+        moved = func.abs(func.coalesce(listing.c.stamped_score, listing.c.ranking_score) - bindparam('score')) \
+            > SCORE_EPSILON
+        listing_statement = update(listing).where(listing.c.agent_id == bindparam('ranked_agent_id')).values(
+            ranking_score=bindparam('score'),
+            updated_at=case((moved, datetime.utcnow()), else_=listing.c.updated_at),
+            stamped_score=case((moved, bindparam('score')), else_=listing.c.stamped_score)
+        )
+        for statement in (stats_statement, listing_statement):
+            for offset in range(0, len(rows), WRITE_BATCH_SIZE):
+                connection.execute(statement, rows[offset:offset + WRITE_BATCH_SIZE])
+
+        self.last_run = datetime.utcnow()
+        logger.info('ranking_updated', extra={
+            'event': 'ranking_updated',
+            'agents': len(rows),
+            'duration_ms': round((time.perf_counter() - start) * 1000, 1)
+        })
+        return len(rows)
+
+
+# Shared instance, configured by create_app()
+ranking_job = RankingJob()
@@ -0,0 +1,289 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Rate limit storage shared across workers
+Counters live in the database; each worker batches its increments locally and
+syncs them in one transaction per interval. Most requests are answered from the
+local view, but the request that finds a sync due runs it inline: an upsert of the
+batched keys and a read of the keys used since the last sync, plus a DELETE of
+expired rows every PRUNE_INTERVAL syncs. That request pays the transaction's
+latency (one round trip per statement, and the DELETE's scan on a large table),
+once per worker per interval.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from math import floor
+from typing import Dict, Tuple
+
+from flask import current_app, request
+from limits.storage import Storage, SlidingWindowCounterSupport
+from limits.storage.base import TimestampedSlidingWindow
+from sqlalchemy import create_engine, case, delete, insert, select, text, update
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+# Requests hitting an LLM provider cost this many units of the per-client request budget
+LLM_ENDPOINTS = ('chat.send_message', 'chat.stream_message', 'agent_creator.preview_agent')
+
+
+def request_cost() -> int:
+    """Weight of the current request against the application-wide budget (browsing costs 1)."""
+    costs = current_app.config.get('RATELIMIT_ENDPOINT_COSTS', {})
+    return costs.get(request.endpoint, 1)
+
+
+class DatabaseStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """
+    limits storage backed by the rate_limit_counter table.
+
+    Increments are applied to a local view immediately and written to the shared
+    table in batches every ``sync_interval`` seconds; each sync also refreshes the
+    fleet-wide counts. Between syncs a worker does not see other workers' hits, so
+    a limit can be overshot by at most what the other workers admit in one interval.
+    Only keys hit or read since the last sync are refreshed, and idle ones are dropped
+    from the local view, so a sync costs what the last interval's traffic touched, not
+    one read per client seen in the last day. ``sync_interval=0`` syncs on every call
+    for exact limits.
+    """
+
+    STORAGE_SCHEME = ['database']
+
+    # Expired rows are deleted once every PRUNE_INTERVAL syncs
+    PRUNE_INTERVAL = 60
+
+    def __init__(self, uri: str = None, wrap_exceptions: bool = False, url: str = None, engine=None,
+                 sync_interval: float = 1.0, **options):
+        if engine is None:
+            if not url:
+                raise ValueError("DatabaseStorage needs a database url or engine")
+            engine = create_engine(url, pool_pre_ping=True)
+        self.engine = engine
+        self.sync_interval = float(sync_interval)
+
+        self._pending = Counter()  # key -> hits not yet written
+        self._pending_expiry = {}  # key -> expires_at for keys first seen locally
+        self._shared = {}  # key -> (count, expires_at) as of the last sync, for keys in use
+        self._touched = set()  # keys hit or read since the last sync
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._last_sync = 0.0
+        self._syncs = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return SQLAlchemyError
+
+    @property
+    def _table(self):
+        from app.models import RateLimitCounter
+        return RateLimitCounter.__table__
+
+    # --- local view -----------------------------------------------------
+
+    def _local_count(self, key: str, now: float) -> int:
+        count, expires_at = self._shared.get(key, (0, 0.0))
+        if expires_at <= now:
+            count = 0
+        if self._pending_expiry.get(key, now + 1) <= now:
+            # The window rolled over before we synced; those hits no longer count
+            self._pending.pop(key, None)
+            self._pending_expiry.pop(key, None)
+        return count + self._pending.get(key, 0)
+
+    def _maybe_sync(self) -> None:
+        if time.monotonic() - self._last_sync < self.sync_interval:
+            return
+        # The calling request waits for the sync; concurrent ones keep serving from the local view
+        if self._sync_lock.acquire(blocking=False):
+            try:
+                self.sync()
+            finally:
+                self._sync_lock.release()
+
+    # --- Storage API ----------------------------------------------------
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        with self._lock:
+            self._touched.add(key)
+            if self._local_count(key, now) == 0:
+                self._pending_expiry[key] = now + expiry
+            elif key not in self._pending_expiry:
+                self._pending_expiry[key] = self._shared.get(key, (0, now + expiry))[1]
+            self._pending[key] += amount
+
+        # Syncing after the hit lets sync_interval=0 publish it before returning
+        self._maybe_sync()
+        with self._lock:
+            return self._local_count(key, time.time())
+
+    def decr(self, key: str, amount: int = 1) -> int:
+        now = time.time()
+        with self._lock:
+            self._pending[key] -= amount
+            return max(self._local_count(key, now), 0)
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            self._touched.add(key)
+        self._maybe_sync()
+        with self._lock:
+            return self._local_count(key, time.time())
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        with self._lock:
+            expires_at = self._shared.get(key, (0, 0.0))[1]
+            if expires_at <= now:
+                expires_at = self._pending_expiry.get(key, now)
+            return expires_at
+
+    def check(self) -> bool:
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+            return True
+        except SQLAlchemyError:
+            return False
+
+    def reset(self) -> int:
+        with self._lock:
+            self._pending.clear()
+            self._pending_expiry.clear()
+            self._shared.clear()
+            self._touched.clear()
+        with self.engine.begin() as connection:
+            return connection.execute(delete(self._table)).rowcount
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+            self._pending_expiry.pop(key, None)
+            self._shared.pop(key, None)
+            self._touched.discard(key)
+        with self.engine.begin() as connection:
+            connection.execute(delete(self._table).where(self._table.c.limit_key == key))
+
+    # --- sliding window counter -------------------------------------------
+
+    def _sliding_window(self, key: str, expiry: int, now: float) -> Tuple[int, float, int, float]:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous_count = self.get(previous_key)
+        current_count = self.get(current_key)
+        previous_ttl = 0.0 if previous_count == 0 else (1 - (((now - expiry) / expiry) % 1)) * expiry
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        previous_count, previous_ttl, current_count, _ = self._sliding_window(key, expiry, now)
+        weighted_count = previous_count * previous_ttl / expiry + current_count
+        if floor(weighted_count) + amount > limit:
+            return False
+
+        # Counters outlive their own window because the next window weighs them
+        _, current_key = self.sliding_window_keys(key, expiry, now)
+        self.incr(current_key, 2 * expiry, amount=amount)
+        return True
+
+    def get_sliding_window(self, key: str, expiry: int) -> Tuple[int, float, int, float]:
+        return self._sliding_window(key, expiry, time.time())
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        for window_key in self.sliding_window_keys(key, expiry, time.time()):
+            self.clear(window_key)
+
+    # --- syncing ----------------------------------------------------------
+
+    def sync(self) -> None:
+        """Write pending increments in one transaction and refresh the shared counts."""
+        with self._lock:
+            pending = {key: amount for key, amount in self._pending.items() if amount}
+            expiries = {key: self._pending_expiry[key] for key in pending if key in self._pending_expiry}
+            self._pending.clear()
+            self._pending_expiry.clear()
+            now = time.time()
+            # Only keys in use are re-read; the rest drop out of _shared below
+            watched = set(pending) | self._touched
+            self._touched = set()
+        self._last_sync = time.monotonic()
+
+        try:
+            with self.engine.begin() as connection:
+                if pending:
+                    self._apply_increments(connection, pending, expiries, now)
+                fresh = self._read_counts(connection, watched, now)
+                self._syncs += 1
+                if self._syncs % self.PRUNE_INTERVAL == 0:
+                    connection.execute(delete(self._table).where(self._table.c.expires_at <= now))
+        except SQLAlchemyError as e:
+            # Fail open on the local view and retry the writes on the next sync
+            with self._lock:
+                for key, amount in pending.items():
+                    self._pending[key] += amount
+                    self._pending_expiry.setdefault(key, expiries.get(key, now + self.sync_interval))
+                self._touched |= watched
+            logger.warning(f"Rate limit storage sync failed: {str(e)}")
+            return
+
+        with self._lock:
+            self._shared = fresh
+
+    def _apply_increments(self, connection, pending: Dict[str, int], expiries: Dict[str, float],
+                          now: float) -> None:
+        table = self._table
+        rows = [
+            {'limit_key': key, 'count': amount, 'expires_at': expiries.get(key, now + self.sync_interval)}
+            for key, amount in pending.items()
+        ]
+
+        dialect = connection.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            statement = dialect_insert(table)
+            expired = table.c.expires_at <= now
+            # An expired row starts a new window instead of adding to the old one
+            statement = statement.on_conflict_do_update(
+                index_elements=['limit_key'],
+                set_={
+                    'count': case((expired, statement.excluded['count']),
+                                  else_=table.c['count'] + statement.excluded['count']),
+                    'expires_at': case((expired, statement.excluded.expires_at), else_=table.c.expires_at)
+                }
+            )
+            connection.execute(statement, rows)
+            return
+
+        for row in rows:
+            result = connection.execute(
+                update(table).where(table.c.limit_key == row['limit_key'], table.c.expires_at > now)
+                .values(count=table.c['count'] + row['count'])
+            )
+            if result.rowcount == 0:
+                connection.execute(delete(table).where(table.c.limit_key == row['limit_key']))
+                connection.execute(insert(table).values(**row))
+
+    def _read_counts(self, connection, keys, now: float) -> Dict[str, Tuple[int, float]]:
+        table = self._table
+        counts = {}
+        keys = list(keys)
+        # Chunked to stay under bind parameter limits
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = connection.execute(
+                select(table.c.limit_key, table.c['count'], table.c.expires_at)
+                .where(table.c.limit_key.in_(chunk), table.c.expires_at > now)
+            )
+            for limit_key, count, expires_at in rows:
+                counts[limit_key] = (count, expires_at)
+        return counts
@@ -0,0 +1,387 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+"Customers also bought" - agents bought by the same people, from a co-purchase matrix
+A background job keeps a sparse agent x agent co-occurrence matrix as sorted NumPy arrays, saved
+between runs under RECOMMENDATIONS_DIR. Each run folds in only the purchases made since the last
+one (a full rebuild happens when there is no saved matrix or it is older than
+RECOMMENDATIONS_REBUILD_HOURS) and rewrites the top-N list of every agent it touched in
+agent_recommendation, which requests read by primary key.
+"""
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.jobs import PeriodicJob
+
+logger = logging.getLogger(__name__)
+
+# Only a buyer's most recent purchases pair up, so a few huge baskets cannot dominate the matrix
+MAX_BASKET = 100
+
+# Agents per DELETE / INSERT batch when top-N lists are written
+WRITE_BATCH_SIZE = 1000
+
+# Recent purchases a user's recommendations are drawn from
+USER_HISTORY = 20
+
+STATE_FILE = 'co_purchase.npz'
+
+ADVISORY_LOCK_ID = 7412985
+
+_LOW_BITS = (1 << 32) - 1
+
+
+class CoPurchaseMatrix(NamedTuple):
+    """Sparse co-occurrence counts: pair_keys are (agent << 32 | other agent), sorted."""
+    pair_keys: object
+    pair_counts: object
+    agent_ids: object  # Sorted
+    buyer_counts: object  # Distinct buyers per agent
+    watermark: int  # Highest purchase ID folded in
+    built_at: float  # Unix time of the last full rebuild
+
+    def save(self, path: str) -> None:
+        """Write atomically, so a reader never sees a half-written file."""
+        import numpy as np
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(tmp, pair_keys=self.pair_keys, pair_counts=self.pair_counts, agent_ids=self.agent_ids,
+                 buyer_counts=self.buyer_counts, watermark=self.watermark, built_at=self.built_at)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['CoPurchaseMatrix']:
+        import numpy as np
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data['pair_keys'], data['pair_counts'], data['agent_ids'], data['buyer_counts'],
+                       int(data['watermark']), float(data['built_at']))
+
+
+def baskets(buyers, agents, purchase_ids, max_basket: int = MAX_BASKET):
+    """
+    Distinct (buyer, agent) purchases grouped by buyer, newest first, at most max_basket per buyer.
+
+    Returns:
+        tuple: (buyers, agents) arrays sorted by buyer
+    """
+    import numpy as np
+
+    order = np.lexsort((-purchase_ids, buyers))
+    buyers, agents = buyers[order], agents[order]
+    # First occurrence of each (buyer, agent) is its newest purchase
+    _, first = np.unique((buyers << 32) | agents, return_index=True)
+    first.sort()
+    buyers, agents = buyers[first], agents[first]
+
+    if len(buyers) == 0:
+        return buyers, agents
+    starts = np.flatnonzero(np.r_[True, buyers[1:] != buyers[:-1]])
+    lengths = np.diff(np.r_[starts, len(buyers)])
+    position = np.arange(len(buyers)) - np.repeat(starts, lengths)
+    keep = position < max_basket
+    return buyers[keep], agents[keep]
+
+
+def co_purchase_pairs(buyers, agents):
+    """Every ordered (agent, other agent) pair within each buyer's basket, as pair keys."""
+    import numpy as np
+
+    if len(buyers) == 0:
+        return np.zeros(0, np.int64)
+    starts = np.flatnonzero(np.r_[True, buyers[1:] != buyers[:-1]])
+    lengths = np.diff(np.r_[starts, len(buyers)])
+
+    # Element i pairs with every element of its basket: repeat it basket-size times
+    basket_size = np.repeat(lengths, lengths)
+    left = np.repeat(np.arange(len(buyers)), basket_size)
+    offset = np.arange(len(left)) - np.repeat(np.cumsum(basket_size) - basket_size, basket_size)
+    right = np.repeat(np.repeat(starts, lengths), basket_size) + offset
+
+    distinct = left != right
+    return (agents[left[distinct]] << 32) | agents[right[distinct]]
+
+
+def count_keys(keys, weights=None):
+    """Sorted distinct keys and their (weighted) counts."""
+    import numpy as np
+
+    unique, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse, weights=weights, minlength=len(unique))
+    return unique, np.rint(counts).astype(np.int64)
+
+
+def build_matrix(buyers, agents, purchase_ids, max_basket: int = MAX_BASKET) -> CoPurchaseMatrix:
+    """Co-occurrence counts from scratch for (buyer, agent, purchase id) arrays of active purchases."""
+    buyers, basket_agents = baskets(buyers, agents, purchase_ids, max_basket)
+    pair_keys, pair_counts = count_keys(co_purchase_pairs(buyers, basket_agents))
+    agent_ids, buyer_counts = count_keys(basket_agents)
+    watermark = int(purchase_ids.max()) if len(purchase_ids) else 0
+    return CoPurchaseMatrix(pair_keys, pair_counts, agent_ids, buyer_counts, watermark, time.time())
+
+
+def merge(matrix: CoPurchaseMatrix, before, after, watermark: int) -> CoPurchaseMatrix:
+    """
+    Replace some buyers' old baskets with their new ones.
+
+    before and after are (buyers, agents) basket arrays for the same buyers.
+    """
+    import numpy as np
+
+    old_pairs, new_pairs = co_purchase_pairs(*before), co_purchase_pairs(*after)
+    pair_keys, pair_counts = count_keys(
+        np.concatenate([matrix.pair_keys, old_pairs, new_pairs]),
+        np.concatenate([matrix.pair_counts, -np.ones(len(old_pairs)), np.ones(len(new_pairs))])
+    )
+    agent_ids, buyer_counts = count_keys(
+        np.concatenate([matrix.agent_ids, before[1], after[1]]),
+        np.concatenate([matrix.buyer_counts, -np.ones(len(before[1])), np.ones(len(after[1]))])
+    )
+    pairs, agents = pair_counts > 0, buyer_counts > 0
+    return CoPurchaseMatrix(pair_keys[pairs], pair_counts[pairs], agent_ids[agents], buyer_counts[agents],
+                            watermark, matrix.built_at)
+
+
+def top_similar(matrix: CoPurchaseMatrix, top_n: int, agents=None, min_shared: int = 1) -> Dict:
+    """
+    The top_n most co-purchased agents per agent (of agents, or all of them).
+
+    Similarity is cosine over buyer sets: shared buyers / sqrt(buyers of one * buyers of the other).
+
+    Returns:
+        dict of equal-length arrays: agent_id, position, recommended_agent_id, score, shared_buyers
+    """
+    import numpy as np
+
+    keys, shared = matrix.pair_keys, matrix.pair_counts
+    left, right = keys >> 32, keys & _LOW_BITS
+    mask = shared >= min_shared
+    if agents is not None:
+        mask &= np.isin(left, agents)
+    left, right, shared = left[mask], right[mask], shared[mask]
+
+    buyers_left = matrix.buyer_counts[np.searchsorted(matrix.agent_ids, left)]
+    buyers_right = matrix.buyer_counts[np.searchsorted(matrix.agent_ids, right)]
+    score = shared / np.sqrt(buyers_left * buyers_right)
+
+    order = np.lexsort((right, -score, left))
+    left, right, score, shared = left[order], right[order], score[order], shared[order]
+    if len(left) == 0:
+        position = np.zeros(0, np.int64)
+    else:
+        starts = np.flatnonzero(np.r_[True, left[1:] != left[:-1]])
+        lengths = np.diff(np.r_[starts, len(left)])
+        position = np.arange(len(left)) - np.repeat(starts, lengths)
+    keep = position < top_n
+    return {
+        'agent_id': left[keep], 'position': position[keep], 'recommended_agent_id': right[keep],
+        'score': np.round(score[keep], 6), 'shared_buyers': shared[keep]
+    }
+
+
+def also_bought(session, agent_id: int, limit: int = 5) -> List:
+    """Listed agents most often bought together with agent_id (primary key range read)."""
+    from app.models import AgentRecommendation, MarketplaceListing
+
+    return session.execute(
+        select(MarketplaceListing).join(
+            AgentRecommendation, AgentRecommendation.recommended_agent_id == MarketplaceListing.agent_id
+        ).where(AgentRecommendation.agent_id == agent_id).order_by(AgentRecommendation.position).limit(limit)
+    ).scalars().all()
+
+
+def for_user(session, user_id: int, limit: int = 10) -> List:
+    """
+    Listed agents bought together with the user's recent purchases, excluding ones they own.
+
+    Returns:
+        list of (MarketplaceListing, score), best first
+    """
+    from app.models import AgentRecommendation, MarketplaceListing, Purchase
+
+    owned = session.execute(
+        select(Purchase.agent_id).where(Purchase.buyer_id == user_id, Purchase.is_active.is_(True))
+        .order_by(Purchase.purchased_at.desc())
+    ).scalars().all()
+    if not owned:
+        return []
+
+    score = func.sum(AgentRecommendation.score).label('score')
+    rows = session.execute(
+        select(MarketplaceListing, score).join(
+            AgentRecommendation, AgentRecommendation.recommended_agent_id == MarketplaceListing.agent_id
+        ).where(
+            AgentRecommendation.agent_id.in_(owned[:USER_HISTORY]),
+            AgentRecommendation.recommended_agent_id.notin_(owned)
+        ).group_by(MarketplaceListing.agent_id).order_by(score.desc(), MarketplaceListing.agent_id).limit(limit)
+    ).all()
+    return [(listing, round(total, 6)) for listing, total in rows]
+
+
+class RecommendationJob(PeriodicJob):
+    """Folds new purchases into the co-purchase matrix and refreshes affected top-N lists."""
+
+    name = 'recommendations'
+    advisory_lock_id = ADVISORY_LOCK_ID
+
+    def __init__(self, interval: float = 0.0, top_n: int = 20, min_shared: int = 2,
+                 state_dir: str = 'recommendations', rebuild_hours: float = 24.0):
+        super().__init__(interval)
+        self.top_n = top_n
+        self.min_shared = min_shared
+        self.state_dir = state_dir
+        self.rebuild_hours = rebuild_hours
+        self._listening = False
+
+    def init_app(self, app):
+        """Load settings from app config; the schedule starts with the first request."""
+        self.top_n = app.config.get('RECOMMENDATIONS_TOP_N', 20)
+        self.min_shared = app.config.get('RECOMMENDATIONS_MIN_SHARED_BUYERS', 2)
+        self.state_dir = app.config.get('RECOMMENDATIONS_DIR', 'recommendations')
+        self.rebuild_hours = app.config.get('RECOMMENDATIONS_REBUILD_HOURS', 24.0)
+        super().init_app(app, interval=app.config.get('RECOMMENDATIONS_INTERVAL', 0.0))
+        self._listen()
+
+    def _listen(self) -> None:
+        if not self._listening:
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_soft_rollback', self._after_rollback)
+            self._listening = True
+
+    @property
+    def state_path(self) -> str:
+        return os.path.join(self.state_dir, STATE_FILE)
+
+    def run(self, session, full: bool = False) -> int:
+        """
+        Update the matrix and store top-N lists (the caller commits). Requires an app context.
+
+        A full rebuild also drops refunded purchases, which incremental runs do not subtract.
+        The matrix (and its purchase watermark) is saved only once the caller commits the lists,
+        so purchases behind a failed commit are folded in again by the next run.
+
+        Returns:
+            int: Agents whose lists were rewritten
+        """
+        if not self.acquire(session):
+            return 0
+
+        start = time.perf_counter()
+        matrix = None if full else CoPurchaseMatrix.load(self.state_path)
+        if matrix is not None and time.time() - matrix.built_at > self.rebuild_hours * 3600:
+            matrix = None
+
+        if matrix is None:
+            matrix = build_matrix(*self._purchases(session))
+            affected = None
+        else:
+            matrix, affected = self._fold_in_new_purchases(session, matrix)
+
+        written = self._write(session, matrix, affected)
+        self._listen()
+        session.info[self.pending_key] = (matrix, self.state_path)
+
+        self.last_run = datetime.utcnow()
+        logger.info('recommendations_updated', extra={
+            'event': 'recommendations_updated',
+            'full': affected is None,
+            'agents': written,
+            'pairs': len(matrix.pair_keys),
+            'duration_ms': round((time.perf_counter() - start) * 1000, 1)
+        })
+        return written
+
+    @property
+    def pending_key(self) -> str:
+        """Session.info key holding the matrix to save once the transaction commits."""
+        return f'{self.name}_pending'
+
+    def _after_commit(self, session) -> None:
+        pending = session.info.pop(self.pending_key, None)
+        if pending is None:
+            return
+        matrix, path = pending
+        # The lists are committed either way; an unsaved matrix means the next run folds those purchases again
+        try:
+            matrix.save(path)
+        except Exception:
+            logger.exception('recommendations_state_save_failed', extra={'event': 'recommendations_state_save_failed'})
+
+    def _after_rollback(self, session, previous_transaction) -> None:
+        if previous_transaction.parent is None:
+            session.info.pop(self.pending_key, None)
+
+    @staticmethod
+    def _purchases(session, buyer_ids=None):
+        """(buyers, agents, purchase ids) arrays of active purchases (of buyer_ids, or everyone)."""
+        import numpy as np
+        from app.models import Purchase
+
+        statement = select(Purchase.buyer_id, Purchase.agent_id, Purchase.id).where(Purchase.is_active.is_(True))
+        if buyer_ids is not None:
+            statement = statement.where(Purchase.buyer_id.in_(buyer_ids))
+        rows = np.array(session.execute(statement).all(), dtype=np.int64).reshape(-1, 3)
+        return rows[:, 0], rows[:, 1], rows[:, 2]
+
+    def _fold_in_new_purchases(self, session, matrix: CoPurchaseMatrix):
+        import numpy as np
+        from app.models import Purchase
+
+        new_buyers = session.execute(
+            select(Purchase.buyer_id).where(Purchase.id > matrix.watermark).distinct()
+        ).scalars().all()
+        if not new_buyers:
+            return matrix, np.zeros(0, np.int64)
+
+        affected_agents = np.zeros(0, np.int64)
+        for offset in range(0, len(new_buyers), WRITE_BATCH_SIZE):
+            chunk = new_buyers[offset:offset + WRITE_BATCH_SIZE]
+            buyers, agents, ids = self._purchases(session, chunk)
+            watermark = max(matrix.watermark, int(ids.max()) if len(ids) else 0)
+            old = ids <= matrix.watermark
+            before = baskets(buyers[old], agents[old], ids[old])
+            after = baskets(buyers, agents, ids)
+            matrix = merge(matrix, before, after, watermark)
+            affected_agents = np.concatenate([affected_agents, after[1], before[1]])
+
+        # Every agent in a changed basket gained (or lost) a co-purchase
+        return matrix, np.unique(affected_agents)
+
+    def _write(self, session, matrix: CoPurchaseMatrix, affected) -> int:
+        import numpy as np
+        from app.models import AgentRecommendation
+
+        table = AgentRecommendation.__table__
+        connection = session.connection()
+        if affected is None:
+            connection.execute(delete(table))
+            agents = np.unique(matrix.pair_keys >> 32)
+        else:
+            agents = affected
+
+        top = top_similar(matrix, self.top_n, agents=None if affected is None else affected,
+                          min_shared=self.min_shared)
+        rows = [{'agent_id': int(a), 'position': int(p), 'recommended_agent_id': int(r),
+                 'score': float(s), 'shared_buyers': int(c)}
+                for a, p, r, s, c in zip(top['agent_id'], top['position'], top['recommended_agent_id'],
+                                         top['score'], top['shared_buyers'])]
+
+        if affected is not None:
+            ids = [int(a) for a in affected]
+            for offset in range(0, len(ids), WRITE_BATCH_SIZE):
+                connection.execute(delete(table).where(table.c.agent_id.in_(ids[offset:offset + WRITE_BATCH_SIZE])))
+        for offset in range(0, len(rows), WRITE_BATCH_SIZE):
+            connection.execute(insert(table), rows[offset:offset + WRITE_BATCH_SIZE])
+        return len(agents)
+
+
+# Shared instance, configured by create_app()
+recommendation_job = RecommendationJob()
@@ -0,0 +1,170 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Agent reviews - keyset pages and a star histogram on agent_stats
+Reviews are read newest first in pages of (created_at, id) keyset order, each page one query with
+the reviewers' names joined in, so no page costs more than the first. agent_stats holds how many
+visible reviews gave each star rating. Before a flush, the stored rows of the reviews it changes or
+deletes are read in one query (an expired object does not remember them); after it, the added,
+changed, hidden and deleted reviews become per-star deltas, applied with one UPDATE per agent in
+the same transaction, so concurrent reviews never overwrite each other's counts.
+"""
+import base64
+from collections import Counter, defaultdict
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+
+STARS = (1, 2, 3, 4, 5)
+
+# agent_stats column counting the visible reviews of each star rating
+RATING_COLUMNS = {stars: f'rating_{stars}_count' for stars in STARS}
+
+# Reviews per page (the detail page shows the first)
+REVIEW_PAGE_SIZE = 10
+MAX_REVIEW_PAGE_SIZE = 50
+
+
+def encode_cursor(created_at: datetime, review_id: int) -> str:
+    """Opaque position after a review, for the next page."""
+    return base64.urlsafe_b64encode(f'{created_at.isoformat()}|{review_id}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(created_at, id) of a cursor; raises ValueError when it is malformed."""
+    try:
+        created_at, review_id = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().split('|')
+        return datetime.fromisoformat(created_at), int(review_id)
+    except (UnicodeDecodeError, ValueError) as error:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from error
+
+
+def review_page(session, agent_id: int, limit: int = REVIEW_PAGE_SIZE, cursor: Optional[str] = None) -> Dict:
+    """
+    One page of an agent's visible reviews, newest first.
+
+    Args:
+        limit: Reviews per page (at most MAX_REVIEW_PAGE_SIZE)
+        cursor: next_cursor of the previous page; None for the first
+
+    Returns:
+        dict: reviews (list of dict), next_cursor (None on the last page)
+    """
+    from app.models import Review, User
+
+    limit = max(1, min(limit, MAX_REVIEW_PAGE_SIZE))
+    statement = select(
+        Review.id, Review.rating, Review.comment, Review.created_at, Review.updated_at, User.username
+    ).join(User, User.id == Review.reviewer_id).where(
+        Review.agent_id == agent_id, Review.is_visible.is_(True)
+    ).order_by(Review.created_at.desc(), Review.id.desc()).limit(limit + 1)
+    if cursor:
+        created_at, review_id = decode_cursor(cursor)
+        # The first condition seeks in ix_review_agent_visible_created; the second only settles ties
+        statement = statement.where(Review.created_at <= created_at,
+                                    (Review.created_at < created_at) | (Review.id < review_id))
+
+    rows = session.execute(statement).all()
+    last = rows[limit - 1] if len(rows) > limit else None
+    return {
+        'reviews': [{
+            'id': review_id,
+            'rating': rating,
+            'comment': comment,
+            'reviewer': username,
+            'created_at': created_at,
+            'updated_at': updated_at
+        } for review_id, rating, comment, created_at, updated_at, username in rows[:limit]],
+        'next_cursor': encode_cursor(last.created_at, last.id) if last else None
+    }
+
+
+def average_rating(histogram: Dict[int, int]) -> float:
+    """Mean star rating of a histogram, 0.0 without reviews."""
+    total = sum(histogram.values())
+    return round(sum(stars * count for stars, count in histogram.items()) / total, 2) if total else 0.0
+
+
+class RatingHistograms:
+    """Keeps the per-star review counts on agent_stats in step with the review table."""
+
+    def __init__(self):
+        self._listening = False
+
+    def init_app(self, app):
+        """Start applying review changes on flush."""
+        app.extensions['rating_histograms'] = self
+
+        if not self._listening:
+            event.listen(Session, 'before_flush', self._before_flush)
+            event.listen(Session, 'after_flush', self._after_flush)
+            self._listening = True
+
+    def apply(self, connection, deltas: Counter) -> None:
+        """Add deltas, keyed by (agent ID, stars), to the counts."""
+        from app.models import AgentStats
+
+        per_agent = defaultdict(dict)
+        for (agent_id, stars), amount in deltas.items():
+            if amount:
+                per_agent[agent_id][stars] = amount
+        for agent_id, amounts in sorted(per_agent.items()):
+            connection.execute(update(AgentStats).where(AgentStats.agent_id == agent_id).values({
+                RATING_COLUMNS[stars]: func.coalesce(getattr(AgentStats, RATING_COLUMNS[stars]), 0) + amount
+                for stars, amount in amounts.items()
+            }))
+
+    def rebuild(self, connection) -> None:
+        """Recount every histogram from the review table, e.g. after reviews edited directly in the database."""
+        from app.models import AgentStats, Review
+
+        connection.execute(update(AgentStats).values({
+            RATING_COLUMNS[stars]: select(func.count()).where(
+                Review.agent_id == AgentStats.agent_id, Review.is_visible.is_(True), Review.rating == stars
+            ).scalar_subquery()
+            for stars in STARS
+        }))
+
+    def _before_flush(self, session, flush_context, instances) -> None:
+        from app.models import Review
+
+        review_ids = [obj.id for obj in chain(session.dirty, session.deleted)
+                      if isinstance(obj, Review) and obj.id is not None]
+        if review_ids:
+            session.info['rating_histogram_stored'] = {
+                review_id: (agent_id, rating, visible) for review_id, agent_id, rating, visible in
+                session.connection().execute(select(Review.id, Review.agent_id, Review.rating, Review.is_visible)
+                                             .where(Review.id.in_(review_ids)))
+            }
+
+    def _after_flush(self, session, flush_context) -> None:
+        from app.models import AgentStats, Review
+
+        stored = session.info.pop('rating_histogram_stored', {})
+        deltas = Counter()
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if not isinstance(obj, Review):
+                continue
+            if obj.id in stored and obj not in session.new:
+                agent_id, stars, visible = stored[obj.id]
+                if visible is not False and stars in RATING_COLUMNS:
+                    deltas[(agent_id, stars)] -= 1
+            if obj not in session.deleted and obj.is_visible is not False and obj.rating in RATING_COLUMNS:
+                deltas[(obj.agent_id, obj.rating)] += 1
+        if not any(deltas.values()):
+            return
+
+        self.apply(session.connection(), deltas)
+        # Loaded stats objects read the new counts on next access
+        agent_ids = {agent_id for agent_id, _ in deltas}
+        for obj in session.identity_map.values():
+            if isinstance(obj, AgentStats) and obj.agent_id in agent_ids:
+                session.expire(obj, list(RATING_COLUMNS.values()))
+
+
+# Shared instance, configured by create_app()
+rating_histograms = RatingHistograms()
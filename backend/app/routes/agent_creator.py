@@ -6,12 +6,16 @@ Simplified agent creation routes
 Hybrid approach: web form, templates, and advanced .sagent upload
 """
 import json
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.models import Agent, AgentConfig, AgentPricing, AgentStats
 from app.security import InputValidator
 from app.agent_templates import get_all_templates, get_template
+from app.http_cache import http_cache
+from app.admission import admission, LLMAdmissionError
+from app.llm_service import LLMService
+from app.local_llm import LOCAL_API_KEY
 
 bp = Blueprint('agent_creator', __name__, url_prefix='/agent/create')
 
@@ -63,7 +67,7 @@ def from_scratch():
             return redirect(url_for('agent_creator.from_scratch'))
 
         llm_provider = data.get('llm_provider', 'anthropic')
-        if llm_provider not in ['anthropic', 'openai']:
+        if llm_provider not in LLMService.available_providers():
             flash('Invalid LLM provider', 'error')
             return redirect(url_for('agent_creator.from_scratch'))
 
@@ -144,6 +148,11 @@ def from_template():
         flash('You must be a seller to create agents', 'error')
         return redirect(url_for('main.index'))
 
+    # The templates ship with the code, so the release is their version
+    not_modified = http_cache.conditional()
+    if not_modified:
+        return not_modified
+
     templates = get_all_templates()
     return render_template('agent_creator/from_template.html', templates=templates)
 
@@ -233,6 +242,10 @@ def customize_template(template_id):
             flash(f'Error creating agent: {str(e)}', 'error')
             return redirect(url_for('agent_creator.customize_template', template_id=template_id))
 
+    not_modified = http_cache.conditional()
+    if not_modified:
+        return not_modified
+
     return render_template('agent_creator/customize_template.html', template=template, template_id=template_id)
 
 
@@ -253,7 +266,7 @@ def preview_agent():
     try:
         # Check if user has provided their own API key
         from flask import session
-        from app.llm_service import LLMService
+        from app.llm_cache import response_cache
         from app.security import APIKeyEncryption
 
         user_api_key = None
@@ -263,6 +276,10 @@ def preview_agent():
             provider_from_session = session.get('user_llm_provider', llm_provider)
             llm_provider = provider_from_session
 
+        llm_provider = current_app.config.get('LLM_PROVIDER_OVERRIDE') or llm_provider
+        if not user_api_key and llm_provider == 'local':
+            user_api_key = LOCAL_API_KEY
+
         if not user_api_key:
             return jsonify({
                 'error': 'Please provide your API key to test the agent',
@@ -270,14 +287,21 @@ def preview_agent():
             }), 403
 
         # Use LLM service to get response
-        llm_service = LLMService(llm_provider, user_api_key)
+        llm_service = LLMService(llm_provider, user_api_key, cache=response_cache,
+                                 admission=admission, user_id=current_user.id)
         result = llm_service.chat(system_prompt, conversation_history, user_message)
 
         return jsonify({
             'response': result['response'],
             'model': result['model'],
-            'usage': result['usage']
+            'usage': result['usage'],
+            'cached': result['cached']
         })
 
+    except LLMAdmissionError as e:
+        response = jsonify({'error': str(e), 'retryable': True})
+        response.headers['Retry-After'] = str(int(e.retry_after) + 1)
+        return response, 429
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -5,13 +5,27 @@
 Agent marketplace routes for browsing, creating, and managing agents
 """
 import os
+from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
 from app import db
-from app.models import Agent, Purchase, Review, AgentConfig, AgentPricing, AgentStats, AgentPackage
+from app.models import Agent, Purchase, Review, AgentConfig, AgentPricing, AgentStats, AgentPackage, MarketplaceListing
+from app.http_cache import http_cache
+from app.facets import PRICE_BAND_KEYS, count_rows, price_band, price_band_condition, stored_counts, summarize
+from app.listings import listings, shown_values
+from app.recommendations import also_bought, for_user
+from app.reviews import average_rating, review_page
+from app.search import semantic_search
+from app.similarity import similar_agents
+from app.suggest import suggestions
 from app.agent_package import AgentPackageValidator, AgentPackageExtractor
-from sqlalchemy import func
+from app.llm_router import MODEL_CATALOG, ROUTING_POLICIES
+from app.llm_service import LLMService
+from app.usage import get_usage_series, serialize_rollup, GRANULARITIES
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import contains_eager, joinedload
 
 bp = Blueprint('agents', __name__, url_prefix='/agents')
 
@@ -27,7 +41,128 @@ def marketplace():
     """Browse all approved agents."""
     category = request.args.get('category')
     search = request.args.get('search')
+    band = request.args.get('price_band')
+    if band not in PRICE_BAND_KEYS:
+        band = None
+    mode = semantic_search.mode(request.args.get('mode'))
+
+    if listings.enabled and http_cache.enabled:
+        # Validators from the read model's last change, before a single listing is read
+        last_modified = listings.last_modified(db.session)
+        parts = (mode,)
+        if search and mode == 'semantic':
+            # Results also follow this worker's copy of the search index, rebuilt on its own schedule
+            index_modified = semantic_search.index.modified_at
+            parts += (semantic_search.index.version,)
+            if index_modified and (last_modified is None or index_modified > last_modified):
+                last_modified = index_modified
+        not_modified = http_cache.conditional(*parts, last_modified=last_modified)
+        if not_modified:
+            return not_modified
+
+    scores = {}
+    if listings.enabled and search and mode == 'semantic':
+        # Nearest agents from the vector index merged with keyword matches, best first
+        scored = semantic_search.search(search, _listing_query(category, None, band),
+                                        _listing_query(category, search, band))
+        agents = [listing for listing, _ in scored]
+        scores = {listing.agent_id: score for listing, score in scored}
+    elif listings.enabled:
+        # One indexed read of the pre-joined read model
+        agents = _listing_query(category, search, band).order_by(
+            MarketplaceListing.ranking_score.desc(),
+            MarketplaceListing.average_rating.desc(),
+            MarketplaceListing.purchase_count.desc()
+        ).all()
+    else:
+        agents = [listings.get(agent) for agent in _joined_marketplace_query(category, search)]
+        if band:
+            agents = [listing for listing in agents if price_band(listing.price) == band]
+
+    if request.is_json:
+        if scores:
+            return jsonify({'agents': [dict(_listing_json(listing), score=scores[listing.agent_id])
+                                       for listing in agents], 'mode': mode}), 200
+        return jsonify({'agents': [_listing_json(listing) for listing in agents], 'mode': mode}), 200
+
+    return render_template('agents/marketplace.html', agents=agents, search_mode=mode)
+
+
+def _listing_json(listing):
+    """Marketplace card fields of a listing row."""
+    return {
+        'id': listing.agent_id,
+        'name': listing.name,
+        'description': listing.description,
+        'short_description': listing.short_description,
+        'category': listing.category,
+        'price': listing.price,
+        'currency': listing.currency,
+        'average_rating': listing.average_rating,
+        'purchase_count': listing.purchase_count,
+        'creator': listing.creator_username
+    }
+
+
+@bp.route('/recommendations')
+@login_required
+def recommendations():
+    """Agents bought together with the current user's purchases."""
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    return jsonify({
+        'recommendations': [dict(_listing_json(listing), score=score)
+                             for listing, score in for_user(db.session, current_user.id, limit)]
+    }), 200
+
+
+@bp.route('/facets')
+def facets():
+    """Category and price band counts for faceted navigation (takes the marketplace filters)."""
+    category = request.args.get('category')
+    search = request.args.get('search')
+    band = request.args.get('price_band')
+    if band not in PRICE_BAND_KEYS:
+        band = None
+
+    if listings.enabled and not search:
+        # Precomputed: one row per (category, price band), however many agents are listed
+        counts = stored_counts(db.session)
+    elif listings.enabled:
+        counts = count_rows(_listing_query(None, search, None).with_entities(
+            MarketplaceListing.category, MarketplaceListing.price
+        ))
+    else:
+        counts = count_rows((agent.category, agent.pricing.price if agent.pricing else 0.0)
+                            for agent in _joined_marketplace_query(None, search))
+
+    return jsonify(summarize(counts, category, band)), 200
+
+
+@bp.route('/suggest')
+def suggest():
+    """Agent names and categories starting with q, for search-as-you-type (no SQL once loaded)."""
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', 8, type=int), 20))
+    return jsonify(dict(suggestions.suggest(db.session, query, limit), query=query)), 200
+
+
+def _listing_query(category, search, band):
+    """Listing rows matching the marketplace filters."""
+    query = MarketplaceListing.query
+    if category:
+        query = query.filter_by(category=category)
+    if band:
+        query = query.filter(price_band_condition(MarketplaceListing.price, band))
+    if search:
+        # Match the full description, which the listing row only holds the start of
+        query = query.filter(MarketplaceListing.agent_id.in_(
+            select(Agent.id).where(Agent.name.ilike(f'%{search}%') | Agent.description.ilike(f'%{search}%'))
+        ))
+    return query
+
 
+def _joined_marketplace_query(category, search):
+    """Listed agents straight from the source tables (used while the read model is disabled)."""
     query = Agent.query.filter_by(is_approved=True, is_active=True)
 
     if category:
@@ -40,28 +175,14 @@ def marketplace():
         )
 
     # Order by stats (join with AgentStats table)
-    agents = query.join(AgentStats, Agent.id == AgentStats.agent_id, isouter=True).order_by(
+    return query.join(AgentStats, Agent.id == AgentStats.agent_id, isouter=True).options(
+        contains_eager(Agent.stats), joinedload(Agent.pricing), joinedload(Agent.creator)
+    ).order_by(
+        AgentStats.ranking_score.desc().nullslast(),
         AgentStats.average_rating.desc().nullslast(),
         AgentStats.purchase_count.desc().nullslast()
     ).all()
 
-    if request.is_json:
-        return jsonify({
-            'agents': [{
-                'id': agent.id,
-                'name': agent.name,
-                'description': agent.description,
-                'category': agent.category,
-                'price': agent.pricing.price if agent.pricing else 0.0,
-                'currency': agent.pricing.currency if agent.pricing else 'USD',
-                'average_rating': agent.stats.average_rating if agent.stats else 0.0,
-                'purchase_count': agent.stats.purchase_count if agent.stats else 0,
-                'creator': agent.creator.username
-            } for agent in agents]
-        }), 200
-
-    return render_template('agents/marketplace.html', agents=agents)
-
 
 @bp.route('/<int:agent_id>')
 def detail(agent_id):
@@ -77,10 +198,30 @@ def detail(agent_id):
             is_active=True
         ).first() is not None
 
-    # Get reviews
-    reviews = Review.query.filter_by(agent_id=agent_id, is_visible=True).order_by(
-        Review.created_at.desc()
-    ).all()
+    # Price, stats and creator from the read model
+    listing = listings.get(agent)
+
+    # "Customers also bought", precomputed by the recommendations job
+    related = also_bought(db.session, agent_id)
+
+    # Closest agents by content, which works before anyone has bought this one
+    similar = similar_agents.related(db.session, agent_id)
+
+    # Newest reviews only, reviewers joined in; older pages come from agents.reviews
+    reviews = review_page(db.session, agent_id)
+    histogram = agent.stats.rating_histogram if agent.stats else dict.fromkeys(range(1, 6), 0)
+
+    # Everything above is indexed reads; validators from their versions spare rendering the page.
+    # Listings count by the values shown, not updated_at, which the ranking job also moves
+    shown = [shown_values(item) for item in (listing, *related, *similar)]
+    changes = [agent.updated_at, *(review['updated_at'] for review in reviews['reviews'])]
+    not_modified = http_cache.conditional(
+        has_purchased, histogram, reviews['next_cursor'], shown,
+        [review['id'] for review in reviews['reviews']], changes,
+        last_modified=max(filter(None, changes), default=None)
+    )
+    if not_modified:
+        return not_modified
 
     if request.is_json:
         return jsonify({
@@ -89,24 +230,46 @@ def detail(agent_id):
                 'name': agent.name,
                 'description': agent.description,
                 'category': agent.category,
-                'price': agent.pricing.price if agent.pricing else 0.0,
-                'currency': agent.pricing.currency if agent.pricing else 'USD',
-                'average_rating': agent.stats.average_rating if agent.stats else 0.0,
-                'purchase_count': agent.stats.purchase_count if agent.stats else 0,
-                'creator': agent.creator.username,
+                'price': listing.price,
+                'currency': listing.currency,
+                'average_rating': listing.average_rating,
+                'purchase_count': listing.purchase_count,
+                'creator': listing.creator_username,
                 'created_at': agent.created_at.isoformat()
             },
             'has_purchased': has_purchased,
-            'reviews': [{
-                'id': review.id,
-                'rating': review.rating,
-                'comment': review.comment,
-                'reviewer': review.reviewer.username,
-                'created_at': review.created_at.isoformat()
-            } for review in reviews]
+            'also_bought': [_listing_json(listing) for listing in related],
+            'similar': [_listing_json(listing) for listing in similar],
+            'rating_histogram': histogram,
+            'review_count': sum(histogram.values()),
+            **_review_page_json(reviews)
         }), 200
 
-    return render_template('agents/detail.html', agent=agent, has_purchased=has_purchased, reviews=reviews)
+    return render_template('agents/detail.html', agent=agent, listing=listing, has_purchased=has_purchased,
+                           reviews=reviews['reviews'], next_cursor=reviews['next_cursor'], histogram=histogram,
+                           also_bought=related, similar=similar)
+
+
+@bp.route('/<int:agent_id>/reviews')
+def reviews(agent_id):
+    """Visible reviews of an agent, newest first, a page at a time (`limit`, `cursor` from next_cursor)."""
+    if db.session.get(Agent, agent_id) is None:
+        return jsonify({'error': 'Agent not found'}), 404
+    try:
+        page = review_page(db.session, agent_id, request.args.get('limit', 10, type=int), request.args.get('cursor'))
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    return jsonify(_review_page_json(page)), 200
+
+
+def _review_page_json(page):
+    """A review_page() result with dates as ISO strings."""
+    return {
+        'reviews': [dict(review, created_at=review['created_at'].isoformat(),
+                         updated_at=review['updated_at'] and review['updated_at'].isoformat())
+                    for review in page['reviews']],
+        'next_cursor': page['next_cursor']
+    }
 
 
 @bp.route('/create', methods=['GET', 'POST'])
@@ -126,6 +289,10 @@ def create():
         category = data.get('category')
         price = float(data.get('price', 0))
         llm_provider = data.get('llm_provider', 'anthropic')
+        cache_responses = data.get('cache_responses', True) in ['true', 'True', True, 1, '1']
+        llm_model = data.get('llm_model') or None
+        routing_policy = data.get('routing_policy', 'quality')
+        allow_costlier_failover = data.get('allow_costlier_failover', False) in ['true', 'True', True, 1, '1']
 
         if not name or not description or not system_prompt or not category:
             if request.is_json:
@@ -134,9 +301,15 @@ def create():
             return redirect(url_for('agents.create'))
 
         # Validate llm_provider
-        if llm_provider not in ['anthropic', 'openai']:
+        if llm_provider not in LLMService.available_providers():
             llm_provider = 'anthropic'
 
+        # Preferred model must belong to the chosen provider
+        if llm_model and MODEL_CATALOG.get(llm_model, {}).get('provider') != llm_provider:
+            llm_model = None
+        if routing_policy not in ROUTING_POLICIES:
+            routing_policy = 'quality'
+
         # Create agent (core info)
         agent = Agent(
             name=name,
@@ -152,7 +325,11 @@ def create():
         agent_config = AgentConfig(
             agent_id=agent.id,
             system_prompt=system_prompt,
-            llm_provider=llm_provider
+            llm_provider=llm_provider,
+            llm_model=llm_model,
+            routing_policy=routing_policy,
+            allow_costlier_failover=allow_costlier_failover,
+            cache_responses=cache_responses
         )
         db.session.add(agent_config)
 
@@ -265,6 +442,7 @@ def add_review(agent_id):
         # Update existing review
         existing_review.rating = rating
         existing_review.comment = comment
+        db.session.commit()
     else:
         # Create new review
         review = Review(
@@ -274,16 +452,19 @@ def add_review(agent_id):
             comment=comment
         )
         db.session.add(review)
-
-    db.session.commit()
-
-    # Recalculate average rating
-    avg_rating = db.session.query(func.avg(Review.rating)).filter_by(
-        agent_id=agent_id,
-        is_visible=True
-    ).scalar()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent submission won the unique (reviewer, agent) index; update that review instead
+            db.session.rollback()
+            existing_review = Review.query.filter_by(reviewer_id=current_user.id, agent_id=agent_id).one()
+            existing_review.rating = rating
+            existing_review.comment = comment
+            db.session.commit()
+
+    # The star histogram was updated with the review; the average follows from it
     if agent.stats:
-        agent.stats.average_rating = round(avg_rating, 2) if avg_rating else 0.0
+        agent.stats.average_rating = average_rating(agent.stats.rating_histogram)
     db.session.commit()
 
     if request.is_json:
@@ -301,7 +482,9 @@ def my_agents():
         flash('You must be a seller to view this page', 'error')
         return redirect(url_for('agents.marketplace'))
 
-    agents = Agent.query.filter_by(creator_id=current_user.id).order_by(
+    agents = Agent.query.filter_by(creator_id=current_user.id).options(
+        joinedload(Agent.pricing), joinedload(Agent.stats)
+    ).order_by(
         Agent.created_at.desc()
     ).all()
 
@@ -323,6 +506,66 @@ def my_agents():
     return render_template('agents/my_agents.html', agents=agents)
 
 
+def _usage_window():
+    """Parse ?granularity=hour|day&days=N for usage endpoints."""
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return None, None
+    try:
+        days = int(request.args.get('days', 30))
+    except ValueError:
+        return None, None
+    # Hourly series are capped at a week to keep payloads small
+    max_days = 7 if granularity == 'hour' else 366
+    days = max(1, min(days, max_days))
+    return granularity, datetime.utcnow() - timedelta(days=days)
+
+
+@bp.route('/my-agents/usage')
+@login_required
+def my_agents_usage():
+    """Token usage rollups for the current seller's agents (reads rollups only)."""
+    if not current_user.is_seller:
+        return jsonify({'error': 'You must be a seller to view usage'}), 403
+
+    granularity, since = _usage_window()
+    if granularity is None:
+        return jsonify({'error': 'Invalid granularity or days'}), 400
+
+    agent_ids = [row.id for row in Agent.query.with_entities(Agent.id).filter_by(creator_id=current_user.id)]
+
+    by_agent = {}
+    for rollup in get_usage_series('agent', agent_ids, granularity, since):
+        by_agent.setdefault(rollup.dimension_key, []).append(serialize_rollup(rollup))
+
+    return jsonify({
+        'granularity': granularity,
+        'since': since.isoformat(),
+        'totals': [serialize_rollup(r) for r in get_usage_series('creator', [current_user.id], granularity, since)],
+        'agents': by_agent
+    }), 200
+
+
+@bp.route('/<int:agent_id>/usage')
+@login_required
+def agent_usage(agent_id):
+    """Token usage rollups for one of the current seller's agents."""
+    agent = Agent.query.get_or_404(agent_id)
+    if agent.creator_id != current_user.id:
+        return jsonify({'error': 'You can only view usage for your own agents'}), 403
+
+    granularity, since = _usage_window()
+    if granularity is None:
+        return jsonify({'error': 'Invalid granularity or days'}), 400
+
+    return jsonify({
+        'agent_id': agent.id,
+        'granularity': granularity,
+        'since': since.isoformat(),
+        'usage': [serialize_rollup(r) for r in get_usage_series('agent', [agent.id], granularity, since)]
+    }), 200
+
+
 @bp.route('/my-purchases')
 @login_required
 def my_purchases():
@@ -330,7 +573,7 @@ def my_purchases():
     purchases = Purchase.query.filter_by(
         buyer_id=current_user.id,
         is_active=True
-    ).order_by(Purchase.purchased_at.desc()).all()
+    ).options(joinedload(Purchase.agent)).order_by(Purchase.purchased_at.desc()).all()
 
     if request.is_json:
         return jsonify({
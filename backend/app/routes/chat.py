@@ -4,14 +4,57 @@
 """
 Chat routes for interacting with AI agents
 """
-from flask import Blueprint, render_template, request, jsonify, session
+from flask import Blueprint, render_template, request, jsonify, session, current_app
 from flask_login import login_required, current_user
 from app.models import Agent, Purchase
 from app.llm_service import LLMService
+from app.llm_cache import response_cache
+from app.security import APIKeyEncryption
+from app.usage import usage_recorder
+from app.admission import admission, LLMAdmissionError
+from app.local_llm import LOCAL_API_KEY
+from app.llm_resilience import (
+    LLMAuthenticationError,
+    LLMRateLimitError,
+    LLMCircuitOpenError,
+    LLMOverloadedError,
+    LLMTimeoutError
+)
 
 bp = Blueprint('chat', __name__, url_prefix='/chat')
 
 
+def agent_provider(agent):
+    """Provider for an agent's chats; LLM_PROVIDER_OVERRIDE (e.g. 'local' offline) wins over the agent config."""
+    override = current_app.config.get('LLM_PROVIDER_OVERRIDE')
+    if override:
+        return override
+    return (agent.config.llm_provider if agent.config else None) or 'anthropic'
+
+
+def get_fallback_keys(data, primary_provider):
+    """
+    Collect API keys for other providers, used for failover.
+
+    Keys sent as {"fallback_api_keys": {"openai": "sk-..."}} are validated and kept
+    encrypted in the session so later messages can fail over too.
+    """
+    stored = dict(session.get('fallback_api_keys', {}))
+    for provider, key in (data.get('fallback_api_keys') or {}).items():
+        if isinstance(key, str) and LLMService.validate_api_key(provider, key):
+            stored[provider] = APIKeyEncryption.encrypt(key)
+    if stored:
+        session['fallback_api_keys'] = stored
+
+    keys = {}
+    for provider, encrypted_key in stored.items():
+        if provider != primary_provider:
+            key = APIKeyEncryption.decrypt(encrypted_key)
+            if key:
+                keys[provider] = key
+    return keys
+
+
 @bp.route('/agent/<int:agent_id>')
 @login_required
 def agent_chat(agent_id):
@@ -83,6 +126,11 @@ def send_message(agent_id):
         # Try to get from session
         api_key = session.get('anthropic_api_key')
 
+    # The local model runs without a key
+    llm_provider = agent_provider(agent)
+    if not api_key and llm_provider == 'local':
+        api_key = LOCAL_API_KEY
+
     if not api_key:
         return jsonify({'error': 'Please provide your Anthropic API key', 'require_api_key': True}), 401
 
@@ -95,15 +143,35 @@ def send_message(agent_id):
         if not agent.config:
             return jsonify({'error': 'Agent configuration not found'}), 500
 
-        # Determine LLM provider (use agent's preference or default to anthropic)
-        llm_provider = agent.config.llm_provider if agent.config.llm_provider else 'anthropic'
-
         # Initialize LLM service with provider
-        llm_service = LLMService(provider=llm_provider, api_key=api_key)
+        llm_service = LLMService(
+            provider=llm_provider,
+            api_key=api_key,
+            cache=response_cache,
+            model=agent.config.llm_model,
+            routing_policy=agent.config.routing_policy,
+            allow_costlier_failover=agent.config.allow_costlier_failover is True,
+            fallback_keys=get_fallback_keys(data, llm_provider),
+            admission=admission,
+            user_id=current_user.id
+        )
         result = llm_service.chat(
             system_prompt=agent.config.system_prompt,
             conversation_history=conversation_history,
-            user_message=user_message
+            user_message=user_message,
+            use_cache=agent.config.cache_responses is not False
+        )
+
+        # Ledger write happens off the request path
+        usage_recorder.record(
+            user_id=current_user.id,
+            agent_id=agent.id,
+            creator_id=agent.creator_id,
+            provider=result['provider'],
+            model=result['model'],
+            usage=result['usage'],
+            estimated_cost=result['estimated_cost'],
+            cached=result['cached']
         )
 
         # Update conversation history
@@ -123,9 +191,23 @@ def send_message(agent_id):
             'response': result['response'],
             'model': result['model'],
             'usage': result['usage'],
-            'provider': result['provider']
+            'provider': result['provider'],
+            'cached': result['cached'],
+            'failover': result['failover']
         }), 200
 
+    except LLMAuthenticationError:
+        session.pop('anthropic_api_key', None)
+        return jsonify({'error': f'Invalid API key. Please check your {LLMService.get_provider_name(llm_provider)} API key and try again.', 'require_api_key': True}), 401
+
+    except (LLMRateLimitError, LLMAdmissionError, LLMCircuitOpenError, LLMOverloadedError, LLMTimeoutError) as e:
+        # Provider is throttling or unhealthy, or we are - tell the client when to come back
+        status = {LLMRateLimitError: 429, LLMAdmissionError: 429, LLMTimeoutError: 504}.get(type(e), 503)
+        response = jsonify({'error': str(e), 'retryable': True})
+        if e.retry_after:
+            response.headers['Retry-After'] = str(int(e.retry_after) + 1)
+        return response, status
+
     except Exception as e:
         # Check if it's an authentication error
         error_str = str(e)
@@ -136,6 +218,18 @@ def send_message(agent_id):
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/agent/<int:agent_id>/stream', methods=['POST'])
+@login_required
+def stream_message(agent_id):
+    """
+    Streaming chat (server-sent events).
+
+    Served by the ASGI app (app.asgi) before requests reach Flask; the route is
+    registered here so rate limits and CSRF checks apply to it under the same name.
+    """
+    return jsonify({'error': 'Streaming chat requires the ASGI server mode'}), 501
+
+
 @bp.route('/agent/<int:agent_id>/clear', methods=['POST'])
 @login_required
 def clear_history(agent_id):
@@ -0,0 +1,103 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Semantic marketplace search - vector scores from a local index merged with keyword scores
+Agents' public text (name, category, description; never system prompts) is kept in its own
+AgentVectorIndex. A query is encoded with the same encoder, the closest SEARCH_CANDIDATES agents
+are taken from the index, and the ILIKE matches of keyword search are added. Each candidate then
+scores SEARCH_SEMANTIC_WEIGHT * cosine + (1 - SEARCH_SEMANTIC_WEIGHT) * keyword, where keyword is 1
+for a phrase match and otherwise the share of query words the listing contains. Intent queries
+("help me plan a trip") find agents that never contain the phrase, and exact matches stay on top.
+"""
+from typing import List, Tuple
+
+from app.similarity import AgentVectorIndex
+from app.vectors import tokenize
+
+SEARCH_MODES = ('keyword', 'semantic')
+
+
+def keyword_score(query_words: List[str], text: str) -> float:
+    """Share of the (distinct) query words found in text, both tokenized."""
+    wanted = set(query_words)
+    if not wanted:
+        return 0.0
+    return len(wanted & set(tokenize(text))) / len(wanted)
+
+
+class SemanticSearch(AgentVectorIndex):
+    """Public-text index of all agents; ranks marketplace search results."""
+
+    name = 'search'
+    index_name = 'search'
+    include_prompts = False
+
+    def __init__(self, semantic_weight: float = 0.7, candidates: int = 100, min_score: float = 0.15,
+                 default_mode: str = 'keyword', **settings):
+        super().__init__(**settings)
+        self.semantic_weight = semantic_weight
+        self.candidates = candidates
+        self.min_score = min_score
+        self.default_mode = default_mode
+
+    def init_app(self, app):
+        """Load settings from app config; rebuilds run every SEARCH_INTERVAL seconds."""
+        self.semantic_weight = app.config.get('SEARCH_SEMANTIC_WEIGHT', 0.7)
+        self.candidates = app.config.get('SEARCH_CANDIDATES', 100)
+        self.min_score = app.config.get('SEARCH_MIN_SCORE', 0.15)
+        self.default_mode = app.config.get('SEARCH_MODE', 'keyword')
+        super().init_app(app, interval=app.config.get('SEARCH_INTERVAL', 0.0))
+
+    def mode(self, requested) -> str:
+        """The search mode to use for a request's mode argument."""
+        return requested if requested in SEARCH_MODES else self.default_mode
+
+    def search(self, text: str, listed, keyword_matches) -> List[Tuple]:
+        """
+        Listings for a search, best first.
+
+        Args:
+            text: The search text
+            listed: Query of the listing rows allowed by the other filters (category, price band)
+            keyword_matches: The same query narrowed to keyword (ILIKE) matches
+
+        Returns:
+            list of (MarketplaceListing, score)
+        """
+        import numpy as np
+        from app.models import MarketplaceListing
+
+        query = self.encoder.encode([text])[0]
+        semantic = {}
+        if query.any():
+            semantic = {agent_id: score for agent_id, score in self.index.search(query, self.candidates)
+                        if score >= self.min_score}
+
+        rows = {listing.agent_id: listing for listing in keyword_matches.order_by(
+            MarketplaceListing.ranking_score.desc()
+        ).limit(self.candidates)}
+        phrase_matches = set(rows)
+        if semantic:
+            rows.update((listing.agent_id, listing) for listing in
+                        listed.filter(MarketplaceListing.agent_id.in_(list(semantic))))
+
+        words = tokenize(text)
+        results = []
+        for agent_id, listing in rows.items():
+            similarity = semantic.get(agent_id)
+            if similarity is None:
+                # A phrase match that was not among the nearest vectors
+                vector = self.index.vector(agent_id)
+                similarity = float(np.dot(vector, query)) if vector is not None else 0.0
+            keyword = 1.0 if agent_id in phrase_matches else keyword_score(
+                words, f'{listing.name} {listing.category} {listing.short_description}')
+            score = self.semantic_weight * similarity + (1 - self.semantic_weight) * keyword
+            results.append((listing, round(score, 6)))
+
+        results.sort(key=lambda result: (-result[1], -result[0].ranking_score, result[0].agent_id))
+        return results
+
+
+# Shared instance, configured by create_app()
+semantic_search = SemanticSearch()
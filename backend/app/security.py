@@ -5,10 +5,7 @@
 Security utilities for input validation, sanitization, and encryption
 """
 import re
-import bleach
-from cryptography.fernet import Fernet
 from flask import current_app
-from email_validator import validate_email, EmailNotValidError
 import base64
 import hashlib
 
@@ -25,6 +22,7 @@ class InputValidator:
         """Remove malicious HTML/JavaScript from user input"""
         if not text:
             return ''
+        import bleach  # deferred: only needed when HTML is submitted
         return bleach.clean(
             text,
             tags=InputValidator.ALLOWED_TAGS,
@@ -79,6 +77,8 @@ class InputValidator:
         if not email:
             return False, "Email is required"
 
+        from email_validator import validate_email, EmailNotValidError  # deferred: slow to import
+
         try:
             # Validate and normalize
             valid = validate_email(email, check_deliverability=False)
@@ -168,6 +168,12 @@ class APIKeyEncryption:
         key = hashlib.sha256(secret.encode()).digest()
         return base64.urlsafe_b64encode(key)
 
+    @staticmethod
+    def _fernet():
+        """Cipher for the app secret (cryptography is imported on first use, not at startup)"""
+        from cryptography.fernet import Fernet
+        return Fernet(APIKeyEncryption._get_key())
+
     @staticmethod
     def encrypt(api_key: str) -> str:
         """Encrypt API key for session storage"""
@@ -175,7 +181,7 @@ class APIKeyEncryption:
             return ''
 
         try:
-            f = Fernet(APIKeyEncryption._get_key())
+            f = APIKeyEncryption._fernet()
             encrypted = f.encrypt(api_key.encode())
             return encrypted.decode()
         except Exception as e:
@@ -189,7 +195,7 @@ class APIKeyEncryption:
             return ''
 
         try:
-            f = Fernet(APIKeyEncryption._get_key())
+            f = APIKeyEncryption._fernet()
             decrypted = f.decrypt(encrypted_key.encode())
             return decrypted.decode()
         except Exception as e:
@@ -0,0 +1,231 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Similar agents - nearest neighbours by content, for agents that have no purchases to go on yet
+Every agent's name, category, description and system prompt is encoded into a vector in a local
+VectorIndex (app.vectors). A session after_flush hook notes agents whose text changed, and after
+the commit their vectors are written, so new and uploaded agents appear right away. A periodic
+job rebuilds the whole index (SIMILARITY_INTERVAL), which also picks up edits made directly in
+the database. A worker that finds no index on disk builds it in its first run instead of waiting
+an interval; `python3 index_agents.py` rebuilds on demand.
+The indexing itself lives in AgentVectorIndex, which marketplace search (app.search) reuses.
+"""
+import logging
+import time
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, attributes
+
+from app.jobs import PeriodicJob
+
+logger = logging.getLogger(__name__)
+
+# Characters of each system prompt that are encoded (the opening sets an agent's purpose)
+PROMPT_LENGTH = 4000
+
+# Agents encoded per batch during a rebuild
+ENCODE_BATCH_SIZE = 500
+
+
+def agent_documents(connection, agent_ids: Optional[Iterable[int]] = None, newer_than: int = 0,
+                    prompts: bool = True) -> Dict[int, str]:
+    """Text to encode per agent (of agent_ids, or every agent with an ID above newer_than)."""
+    from app.models import Agent, AgentConfig
+
+    statement = select(
+        Agent.id, Agent.name, Agent.category, Agent.description, AgentConfig.system_prompt
+    ).outerjoin(AgentConfig, AgentConfig.agent_id == Agent.id).order_by(Agent.id)
+    if agent_ids is not None:
+        statement = statement.where(Agent.id.in_(list(agent_ids)))
+    if newer_than:
+        statement = statement.where(Agent.id > newer_than)
+    return {
+        agent_id: '\n'.join((name or '', category or '', description or '',
+                             (prompt or '')[:PROMPT_LENGTH] if prompts else ''))
+        for agent_id, name, category, description, prompt in connection.execute(statement)
+    }
+
+
+class AgentVectorIndex(PeriodicJob):
+    """
+    One vector index of agent text, written on commit and rebuilt by run().
+
+    Subclasses set name (job, log events and settings) and index_name (files), and say whether
+    system prompts are part of the text.
+    """
+
+    name = 'vectors'
+    index_name = 'agents'
+    include_prompts = True
+
+    def __init__(self, interval: float = 0.0, directory: str = 'vector_index', encoder: str = 'hashing',
+                 dim: int = 512):
+        super().__init__(interval)
+        self._configure(directory, encoder, dim)
+        self._listening = False
+
+    @property
+    def pending_key(self) -> str:
+        """Session.info key holding texts to index once the transaction commits."""
+        return f'{self.name}_pending'
+
+    def _configure(self, directory: str, encoder: str, dim: int, quantize: bool = False,
+                   ivf_lists: int = 0, probes: int = 32) -> None:
+        from app.vectors import VectorIndex
+
+        self.encoder_spec = encoder
+        self.dim = dim
+        # Vectors from another encoder (or hashing width) are not comparable, so they are not loaded
+        self.index = VectorIndex(directory, self.index_name, encoder_name=f'{encoder}-{dim}', quantize=quantize,
+                                 ivf_lists=ivf_lists, probes=probes)
+
+    @property
+    def encoder(self):
+        """The configured encoder, created on first use and shared by all indexes (a real model may be slow to load)."""
+        from app.vectors import load_encoder
+
+        return load_encoder(self.encoder_spec, self.dim)
+
+    def init_app(self, app, interval: float = 0.0):
+        """Load the shared VECTOR_* settings and start indexing agents on commit."""
+        self._configure(app.config.get('VECTOR_INDEX_DIR', 'vector_index'),
+                        app.config.get('VECTOR_ENCODER', 'hashing'),
+                        app.config.get('VECTOR_DIM', 512),
+                        quantize=app.config.get('VECTOR_QUANTIZE', False),
+                        ivf_lists=app.config.get('VECTOR_IVF_LISTS', 0),
+                        probes=app.config.get('VECTOR_IVF_PROBES', 32))
+        super().init_app(app, interval=interval)
+
+        if not self._listening:
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_soft_rollback', self._after_rollback)
+            self._listening = True
+
+    def run_at_start(self) -> bool:
+        """Build a missing index (fresh disk, changed encoder) in the worker's first run."""
+        return not self.index.exists
+
+    def run(self, session) -> int:
+        """
+        Re-encode every agent and swap in the new index.
+
+        Returns:
+            int: Agents indexed
+        """
+        import numpy as np
+
+        start = time.perf_counter()
+        documents = agent_documents(session.connection(), prompts=self.include_prompts)
+        agent_ids = list(documents)
+        texts = list(documents.values())
+        vectors = np.zeros((len(texts), self.encoder.dim), dtype=np.float32)
+        for offset in range(0, len(texts), ENCODE_BATCH_SIZE):
+            vectors[offset:offset + ENCODE_BATCH_SIZE] = self.encoder.encode(texts[offset:offset + ENCODE_BATCH_SIZE])
+        self.index.replace(agent_ids, vectors)
+
+        # Agents created while this ran were indexed on commit, then replaced above
+        created = agent_documents(session.connection(), newer_than=max(agent_ids, default=0),
+                                  prompts=self.include_prompts)
+        if created:
+            self.index.upsert(list(created), self.encoder.encode(list(created.values())))
+
+        self.last_run = datetime.utcnow()
+        logger.info(f'{self.name}_index_rebuilt', extra={
+            'event': f'{self.name}_index_rebuilt',
+            'agents': len(agent_ids),
+            'duration_ms': round((time.perf_counter() - start) * 1000, 1)
+        })
+        return len(agent_ids)
+
+    def _after_flush(self, session, flush_context) -> None:
+        from app.models import Agent, AgentConfig
+
+        changed, removed = set(), set()
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if isinstance(obj, Agent):
+                agent_id, fields = obj.id, ('name', 'category', 'description')
+            elif isinstance(obj, AgentConfig) and self.include_prompts:
+                agent_id, fields = obj.agent_id, ('system_prompt',)
+            else:
+                continue
+            # Approvals, counters and timestamps do not change what an agent is about
+            if obj in session.dirty and not any(attributes.get_history(obj, field).has_changes() for field in fields):
+                continue
+            if isinstance(obj, Agent) and obj in session.deleted:
+                removed.add(agent_id)
+            else:
+                changed.add(agent_id)
+        changed -= removed
+        changed.discard(None)
+        if not changed and not removed:
+            return
+
+        pending = session.info.setdefault(self.pending_key, {'documents': {}, 'removed': set()})
+        pending['documents'].update(agent_documents(session.connection(), changed, prompts=self.include_prompts))
+        pending['removed'] -= changed
+        pending['removed'] |= removed
+        for agent_id in removed:
+            pending['documents'].pop(agent_id, None)
+
+    def _after_commit(self, session) -> None:
+        pending = session.info.pop(self.pending_key, None)
+        if not pending:
+            return
+        # The database change is committed either way; a failed index write waits for the next rebuild
+        try:
+            if pending['documents']:
+                agent_ids = list(pending['documents'])
+                self.index.upsert(agent_ids, self.encoder.encode(list(pending['documents'].values())))
+            if pending['removed']:
+                self.index.remove(pending['removed'])
+        except Exception:
+            logger.exception(f'{self.name}_index_update_failed', extra={
+                'event': f'{self.name}_index_update_failed',
+                'agents': len(pending['documents']) + len(pending['removed'])
+            })
+
+    def _after_rollback(self, session, previous_transaction) -> None:
+        if previous_transaction.parent is None:
+            session.info.pop(self.pending_key, None)
+
+
+class SimilarAgents(AgentVectorIndex):
+    """Content index of all agents, system prompts included; serves related-agent lookups."""
+
+    name = 'similarity'
+    index_name = 'content'
+
+    def __init__(self, min_score: float = 0.1, **settings):
+        super().__init__(**settings)
+        self.min_score = min_score
+
+    def init_app(self, app):
+        """Load settings from app config; rebuilds run every SIMILARITY_INTERVAL seconds."""
+        self.min_score = app.config.get('SIMILARITY_MIN_SCORE', 0.1)
+        super().init_app(app, interval=app.config.get('SIMILARITY_INTERVAL', 0.0))
+
+    def related(self, session, agent_id: int, limit: int = 5) -> List:
+        """Listed agents closest in content to agent_id, best first."""
+        from app.models import MarketplaceListing
+
+        vector = self.index.vector(agent_id)
+        if vector is None:
+            return []
+        # Extra candidates make up for agents that are indexed but not listed
+        hits = [(candidate, score) for candidate, score in
+                self.index.search(vector, limit * 4, exclude=[agent_id]) if score >= self.min_score]
+        if not hits:
+            return []
+        rows = {listing.agent_id: listing for listing in session.execute(
+            select(MarketplaceListing).where(MarketplaceListing.agent_id.in_([candidate for candidate, _ in hits]))
+        ).scalars()}
+        return [rows[candidate] for candidate, _ in hits if candidate in rows][:limit]
+
+
+# Shared instance, configured by create_app()
+similar_agents = SimilarAgents()
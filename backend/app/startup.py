@@ -0,0 +1,40 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Startup timing - a per-phase breakdown of create_app(), logged once per worker boot
+"""
+import logging
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Splits startup into phases; each mark() closes the phase that began at the previous mark."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases: Dict[str, float] = {}
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def report(self) -> Dict[str, float]:
+        """Phase durations in milliseconds, plus the total."""
+        report = {phase: round(seconds * 1000, 1) for phase, seconds in self.phases.items()}
+        report['total'] = round((self._last - self.started) * 1000, 1)
+        return report
+
+    def log(self, app) -> Dict[str, float]:
+        """Log the breakdown as a structured event and keep it on the app."""
+        report = self.report()
+        app.extensions['startup_timings'] = report
+        logger.info('startup', extra={'event': 'startup', **{f'{phase}_ms': ms for phase, ms in report.items()}})
+        app.logger.info("Startup took %.1fms (%s)", report['total'],
+                        ', '.join(f'{phase} {ms:.1f}ms' for phase, ms in report.items() if phase != 'total'))
+        return report
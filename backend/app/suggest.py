@@ -0,0 +1,293 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Search-as-you-type suggestions - listed agents' names and categories by prefix, from memory
+Each worker keeps a sorted array of lowercased name keys, one per word start, so "pla" finds
+"Trip Planner" with a binary search and no SQL. Matches are ranked by popularity from AgentStats
+(purchases, then ranking score). The arrays are loaded on the first suggestion. After that, a
+session after_commit hook applies the agents a transaction approved, deactivated, renamed or
+sold, and every SUGGEST_INTERVAL seconds the worker reloads them in the background to pick up
+other workers' writes.
+"""
+import heapq
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, attributes
+
+from app.jobs import PeriodicJob
+
+logger = logging.getLogger(__name__)
+
+# Characters of a name kept per key (and of a query); longer prefixes match on these
+KEY_LENGTH = 48
+
+# Prefix results kept per worker until the next change
+RESULT_CACHE_SIZE = 2048
+
+# Prefixes matching more keys than this walk agents in popularity order instead of ranking the matches
+RANGE_SCAN_LIMIT = 4096
+
+WORD = re.compile(r'\w+')
+
+# Fields that decide whether and where an agent is suggested
+AGENT_FIELDS = ('name', 'category', 'is_approved', 'is_active')
+STATS_FIELDS = ('purchase_count', 'ranking_score')
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase words joined by single spaces ("Trip-Planner!" -> "trip planner")."""
+    return ' '.join(WORD.findall((text or '').lower()))
+
+
+def name_keys(name: str) -> List[str]:
+    """One key per word start of name, so any word (and what follows it) can be typed."""
+    text = normalize(name)
+    return [text[match.start():match.start() + KEY_LENGTH] for match in WORD.finditer(text)]
+
+
+def listed_agents(connection, agent_ids: Optional[Iterable[int]] = None) -> Dict[int, Optional[Tuple]]:
+    """
+    (name, category, purchase_count, ranking_score) per listed agent.
+
+    With agent_ids, agents that are not listed map to None, so callers can drop them.
+    """
+    from app.models import Agent, AgentStats
+
+    statement = select(
+        Agent.id, Agent.name, Agent.category,
+        func.coalesce(AgentStats.purchase_count, 0), func.coalesce(AgentStats.ranking_score, 0.0)
+    ).outerjoin(AgentStats, AgentStats.agent_id == Agent.id).where(
+        Agent.is_approved.is_(True), Agent.is_active.is_(True)
+    )
+    rows = {}
+    if agent_ids is not None:
+        agent_ids = list(agent_ids)
+        statement = statement.where(Agent.id.in_(agent_ids))
+        rows = dict.fromkeys(agent_ids)
+    rows.update((agent_id, (name, category, purchases, score))
+                for agent_id, name, category, purchases, score in connection.execute(statement))
+    return rows
+
+
+class _Snapshot(NamedTuple):
+    """
+    One loaded state of the index.
+
+    A change swaps in new key arrays and popularity order, so a reader never sees half of one.
+    The per-agent dicts are too large to copy per sale and are updated in place instead: entries
+    are added before any key refers to them and dropped after none does.
+    """
+    keys: List[str]  # Sorted name keys
+    ids: List[int]  # Agent of each key
+    agents: Dict[int, Tuple[str, str, str]]  # (name, category, ' ' + normalized name)
+    popularity: Dict[int, Tuple[int, float]]  # (purchase_count, ranking_score)
+    ranked: List[Tuple[int, float, int]]  # (-purchase_count, -ranking_score, agent ID), most popular first
+    categories: Counter  # Listed agents per category
+    results: Dict  # Cached results by (prefix, limit)
+
+
+class AgentSuggestions(PeriodicJob):
+    """Per-worker prefix index of listed agents; serves /agents/suggest."""
+
+    name = 'suggest'
+
+    def __init__(self, interval: float = 0.0):
+        super().__init__(interval)
+        self._snapshot: Optional[_Snapshot] = None
+        self._write_lock = threading.Lock()
+        self._listening = False
+
+    def init_app(self, app):
+        """Start applying committed changes; full reloads run every SUGGEST_INTERVAL seconds."""
+        # A new app may point at another database, so the index is loaded again on first use
+        self._snapshot = None
+        super().init_app(app, interval=app.config.get('SUGGEST_INTERVAL', 0.0))
+
+        if not self._listening:
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_soft_rollback', self._after_rollback)
+            self._listening = True
+
+    def suggest(self, session, text: str, limit: int = 8) -> Dict:
+        """
+        Listed agents with a name word starting with text, most popular first, and categories
+        starting with text, largest first.
+
+        Returns:
+            dict: agents (list of dict id, name, category), categories (list of dict value, count)
+        """
+        prefix = normalize(text)[:KEY_LENGTH]
+        if not prefix:
+            return {'agents': [], 'categories': []}
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.run(session)
+            snapshot = self._snapshot
+
+        result = snapshot.results.get((prefix, limit))
+        if result is None:
+            result = self._match(snapshot, prefix, limit)
+            if len(snapshot.results) >= RESULT_CACHE_SIZE:
+                snapshot.results.clear()
+            snapshot.results[(prefix, limit)] = result
+        return result
+
+    def run(self, session) -> int:
+        """
+        Load every listed agent from the database.
+
+        Returns:
+            int: Agents indexed
+        """
+        start = time.perf_counter()
+        # Held across the read so a commit applied meanwhile is not overwritten by older rows
+        with self._write_lock:
+            rows = listed_agents(session.connection())
+            entries = sorted((key, agent_id) for agent_id, (name, _, _, _) in rows.items()
+                             for key in name_keys(name))
+            self._snapshot = _Snapshot(
+                keys=[key for key, _ in entries],
+                ids=[agent_id for _, agent_id in entries],
+                agents={agent_id: (name, category, ' ' + normalize(name))
+                        for agent_id, (name, category, _, _) in rows.items()},
+                popularity={agent_id: (purchases, score) for agent_id, (_, _, purchases, score) in rows.items()},
+                ranked=sorted((-purchases, -score, agent_id) for agent_id, (_, _, purchases, score) in rows.items()),
+                categories=Counter(category for _, category, _, _ in rows.values()),
+                results={}
+            )
+
+        self.last_run = datetime.utcnow()
+        logger.info('suggest_index_loaded', extra={
+            'event': 'suggest_index_loaded',
+            'agents': len(rows),
+            'keys': len(entries),
+            'duration_ms': round((time.perf_counter() - start) * 1000, 1)
+        })
+        return len(rows)
+
+    @staticmethod
+    def _match(snapshot: _Snapshot, prefix: str, limit: int) -> Dict:
+        start = bisect_left(snapshot.keys, prefix)
+        end = bisect_left(snapshot.keys, prefix + '\uffff', start)
+        if end - start <= RANGE_SCAN_LIMIT:
+            # An agent with two matching words has two keys in the range
+            popularity = snapshot.popularity
+            matches = heapq.nlargest(limit, set(snapshot.ids[start:end]),
+                                     key=lambda agent_id: (*popularity.get(agent_id, (0, 0.0)), -agent_id))
+        else:
+            # A short prefix matches so many agents that the most popular ones come up within a few checks
+            word_start, matches = ' ' + prefix, []
+            for _, _, agent_id in snapshot.ranked:
+                if word_start in snapshot.agents.get(agent_id, ('', '', ''))[2]:
+                    matches.append(agent_id)
+                    if len(matches) == limit:
+                        break
+        categories = sorted(((category, count) for category, count in snapshot.categories.items()
+                             if count > 0 and normalize(category).startswith(prefix)),
+                            key=lambda item: (-item[1], item[0]))
+        # An agent unlisted since this snapshot was taken is no longer in agents
+        found = [(agent_id, snapshot.agents.get(agent_id)) for agent_id in matches]
+        return {
+            'agents': [{'id': agent_id, 'name': agent[0], 'category': agent[1]} for agent_id, agent in found if agent],
+            'categories': [{'value': category, 'count': count} for category, count in categories[:limit]]
+        }
+
+    def _apply(self, rows: Dict[int, Optional[Tuple]]) -> None:
+        """Replace the entries of the agents in rows (None: no longer listed)."""
+        with self._write_lock:
+            snapshot = self._snapshot
+            if snapshot is None:
+                return
+            agents, popularity = snapshot.agents, snapshot.popularity
+            ranked = list(snapshot.ranked)
+            categories = Counter(snapshot.categories)
+            # Most changes are sales, which leave the (large) key arrays as they are
+            removed, added, unlisted = [], [], []
+
+            for agent_id, row in rows.items():
+                previous = agents.get(agent_id)
+                previous_popularity = popularity.get(agent_id)
+                if previous_popularity is not None:
+                    purchases, score = previous_popularity
+                    del ranked[bisect_left(ranked, (-purchases, -score, agent_id))]
+                if previous is not None:
+                    categories[previous[1]] -= 1
+                    if row is None or row[0] != previous[0]:
+                        removed.extend((key, agent_id) for key in name_keys(previous[0]))
+                if row is None:
+                    unlisted.append(agent_id)
+                    continue
+                name, category, purchases, score = row
+                agents[agent_id] = (name, category, ' ' + normalize(name))
+                popularity[agent_id] = (purchases, score)
+                insort(ranked, (-purchases, -score, agent_id))
+                categories[category] += 1
+                if previous is None or name != previous[0]:
+                    added.extend((key, agent_id) for key in name_keys(name))
+
+            keys, ids = snapshot.keys, snapshot.ids
+            if removed or added:
+                keys, ids = list(keys), list(ids)
+                for key, agent_id in removed:
+                    index = bisect_left(keys, key)
+                    while index < len(keys) and keys[index] == key and ids[index] != agent_id:
+                        index += 1
+                    if index < len(keys) and keys[index] == key:
+                        del keys[index], ids[index]
+                for key, agent_id in added:
+                    index = bisect_left(keys, key)
+                    # Equal keys stay ordered by agent ID, as after a full load
+                    while index < len(keys) and keys[index] == key and ids[index] < agent_id:
+                        index += 1
+                    keys.insert(index, key)
+                    ids.insert(index, agent_id)
+
+            self._snapshot = _Snapshot(keys, ids, agents, popularity, ranked, categories, results={})
+            for agent_id in unlisted:
+                agents.pop(agent_id, None)
+                popularity.pop(agent_id, None)
+
+    def _after_flush(self, session, flush_context) -> None:
+        from app.models import Agent, AgentStats
+
+        if self._snapshot is None:
+            return
+        agent_ids = set()
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if isinstance(obj, Agent):
+                agent_id, fields = obj.id, AGENT_FIELDS
+            elif isinstance(obj, AgentStats):
+                agent_id, fields = obj.agent_id, STATS_FIELDS
+            else:
+                continue
+            # Descriptions, prompts and timestamps do not change what is suggested
+            if obj in session.dirty and not any(attributes.get_history(obj, field).has_changes() for field in fields):
+                continue
+            agent_ids.add(agent_id)
+        agent_ids.discard(None)
+        if agent_ids:
+            session.info.setdefault('suggest_pending', {}).update(listed_agents(session.connection(), agent_ids))
+
+    def _after_commit(self, session) -> None:
+        pending = session.info.pop('suggest_pending', None)
+        if pending:
+            self._apply(pending)
+
+    def _after_rollback(self, session, previous_transaction) -> None:
+        if previous_transaction.parent is None:
+            session.info.pop('suggest_pending', None)
+
+
+# Shared instance, configured by create_app()
+suggestions = AgentSuggestions()
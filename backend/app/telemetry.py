@@ -0,0 +1,270 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Lightweight metrics and structured telemetry events
+Prometheus text exposition without extra dependencies; values are per worker process
+"""
+import logging
+import threading
+from typing import Dict, Tuple, Optional
+
+from app.llm_router import estimate_cost
+
+logger = logging.getLogger(__name__)
+
+# Seconds - covers cached replies up to slow long-form completions
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+THROUGHPUT_BUCKETS = (5, 10, 25, 50, 75, 100, 150, 200, 400)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base class for labelled metrics."""
+
+    type_name = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values = {}
+
+    def samples(self):
+        """Yield (sample_name, labels, value) tuples."""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing value."""
+
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        for key, value in sorted(self._values.items()):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Gauge(Metric):
+    """Value that can go up and down."""
+
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        for key, value in sorted(self._values.items()):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    """Cumulative bucketed observations (quantiles are computed by Prometheus)."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state['count'] if state else 0
+
+    def samples(self):
+        for key, state in sorted(self._values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, state['counts']):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', dict(labels, le=_format_value(bound)), cumulative
+            yield f'{self.name}_sum', labels, state['sum']
+            yield f'{self.name}_count', labels, state['count']
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = metric_class(name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def reset(self) -> None:
+        """Zero every metric (keeps registrations)."""
+        for metric in self._metrics.values():
+            metric.reset()
+
+    def render(self) -> str:
+        lines = []
+        for name in sorted(self._metrics):
+            metric = self._metrics[name]
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type_name}')
+            for sample_name, labels, value in metric.samples():
+                lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# Shared registry for this worker
+registry = MetricsRegistry()
+
+LLM_REQUESTS = registry.counter(
+    'llm_requests_total', 'LLM provider calls by outcome', ('provider', 'model', 'status'))
+LLM_QUEUE_WAIT = registry.histogram(
+    'llm_queue_wait_seconds', 'Time from chat request to provider call start', ('provider', 'model'))
+LLM_TTFT = registry.histogram(
+    'llm_time_to_first_token_seconds', 'Time from provider call start to first token', ('provider', 'model'))
+LLM_DURATION = registry.histogram(
+    'llm_request_duration_seconds', 'Total provider call duration', ('provider', 'model'))
+LLM_TOKENS = registry.counter(
+    'llm_tokens_total', 'Tokens processed', ('provider', 'model', 'direction'))
+LLM_THROUGHPUT = registry.histogram(
+    'llm_output_tokens_per_second', 'Output token throughput per call', ('provider', 'model'),
+    buckets=THROUGHPUT_BUCKETS)
+LLM_COST = registry.counter(
+    'llm_estimated_cost_usd_total', 'Estimated spend at list prices', ('provider', 'model'))
+LLM_CACHE_LOOKUPS = registry.counter(
+    'llm_cache_lookups_total', 'Response cache lookups', ('result',))
+LLM_IN_FLIGHT = registry.gauge(
+    'llm_in_flight_requests', 'LLM calls currently admitted in this worker')
+LLM_ADMISSION_QUEUE = registry.gauge(
+    'llm_admission_queue_depth', 'LLM calls waiting for admission in this worker')
+LLM_ADMISSION_REJECTIONS = registry.counter(
+    'llm_admission_rejections_total', 'LLM calls turned away by the admission controller', ('reason',))
+
+
+def record_llm_call(provider: str, model: str, status: str, duration: float, queue_wait: float = 0.0,
+                    ttft: Optional[float] = None, usage: Optional[Dict] = None) -> Dict:
+    """
+    Record one provider call as metrics and a structured log event.
+
+    Args:
+        provider: Provider ID
+        model: Requested model (used for cost lookup)
+        status: 'ok' or the error class name
+        duration: Seconds spent in the provider call
+        queue_wait: Seconds between the chat request and the provider call
+        ttft: Seconds to first token (equals duration for non-streaming calls)
+        usage: {'input_tokens', 'output_tokens'} on success
+
+    Returns:
+        dict: The event fields that were logged
+    """
+    LLM_REQUESTS.inc(provider=provider, model=model, status=status)
+    LLM_QUEUE_WAIT.observe(queue_wait, provider=provider, model=model)
+    LLM_DURATION.observe(duration, provider=provider, model=model)
+
+    event = {
+        'event': 'llm_call',
+        'provider': provider,
+        'model': model,
+        'status': status,
+        'queue_wait_ms': round(queue_wait * 1000, 1),
+        'duration_ms': round(duration * 1000, 1)
+    }
+
+    if ttft is not None:
+        LLM_TTFT.observe(ttft, provider=provider, model=model)
+        event['ttft_ms'] = round(ttft * 1000, 1)
+
+    if usage:
+        input_tokens = usage.get('input_tokens', 0) or 0
+        output_tokens = usage.get('output_tokens', 0) or 0
+        LLM_TOKENS.inc(input_tokens, provider=provider, model=model, direction='input')
+        LLM_TOKENS.inc(output_tokens, provider=provider, model=model, direction='output')
+        event['input_tokens'] = input_tokens
+        event['output_tokens'] = output_tokens
+
+        # Streaming calls measure generation after the first token; otherwise the whole call
+        generation_time = duration - ttft if ttft is not None and ttft < duration else duration
+        if output_tokens and generation_time > 0:
+            tokens_per_second = output_tokens / generation_time
+            LLM_THROUGHPUT.observe(tokens_per_second, provider=provider, model=model)
+            event['output_tokens_per_second'] = round(tokens_per_second, 1)
+
+        cost = estimate_cost(model, input_tokens, output_tokens)
+        if cost is not None:
+            LLM_COST.inc(cost, provider=provider, model=model)
+            event['estimated_cost_usd'] = cost
+
+    logger.info('llm_call', extra=event)
+    return event
@@ -0,0 +1,262 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Usage ledger - token usage events written in batches off the request path
+Hourly/daily rollups per agent, creator and provider are maintained incrementally on flush
+"""
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert, update
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ('hour', 'day')
+DIMENSIONS = ('agent', 'creator', 'provider')
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its hour or day."""
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def aggregate_rollups(events: List[Dict]) -> Dict[tuple, Dict]:
+    """
+    Fold usage events into rollup deltas.
+
+    Returns:
+        dict: {(granularity, dimension, dimension_key, bucket_start): {counter: delta}}
+    """
+    deltas = {}
+    for event in events:
+        keys = {
+            'agent': str(event['agent_id']),
+            'creator': str(event['creator_id']),
+            'provider': event['provider']
+        }
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(event['created_at'], granularity)
+            for dimension in DIMENSIONS:
+                key = (granularity, dimension, keys[dimension], bucket)
+                delta = deltas.setdefault(key, {
+                    'request_count': 0, 'cached_count': 0,
+                    'input_tokens': 0, 'output_tokens': 0, 'estimated_cost': 0.0
+                })
+                delta['request_count'] += 1
+                delta['cached_count'] += 1 if event['cached'] else 0
+                delta['input_tokens'] += event['input_tokens']
+                delta['output_tokens'] += event['output_tokens']
+                delta['estimated_cost'] += event['estimated_cost']
+    return deltas
+
+
+class UsageRecorder:
+    """Buffers usage events in memory and flushes them to the database in batches."""
+
+    def __init__(self, flush_interval: float = 5.0, batch_size: int = 500, max_pending: int = 50000):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.enabled = True
+        self.dropped = 0
+
+        self._app = None
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self._stopping = threading.Event()
+        self._atexit_registered = False
+
+    def init_app(self, app):
+        """Configure from app config and register on the app."""
+        self._app = app
+        self.enabled = app.config.get('USAGE_LEDGER_ENABLED', True)
+        self.flush_interval = app.config.get('USAGE_FLUSH_INTERVAL', 5.0)
+        self.batch_size = app.config.get('USAGE_BATCH_SIZE', 500)
+        app.extensions['usage_recorder'] = self
+
+    def record(self, user_id: int, agent_id: int, creator_id: int, provider: str, model: Optional[str],
+               usage: Dict, estimated_cost: float = 0.0, cached: bool = False) -> None:
+        """Queue a usage event. Never touches the database on the caller's path."""
+        if not self.enabled:
+            return
+
+        event = {
+            'created_at': datetime.utcnow(),
+            'user_id': user_id,
+            'agent_id': agent_id,
+            'creator_id': creator_id,
+            'provider': provider,
+            'model': model,
+            'input_tokens': (usage or {}).get('input_tokens', 0) or 0,
+            'output_tokens': (usage or {}).get('output_tokens', 0) or 0,
+            'estimated_cost': estimated_cost or 0.0,
+            'cached': bool(cached)
+        }
+
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                # Database is falling behind; shed the oldest event rather than grow without bound
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append(event)
+
+        if self._app is not None and not self._app.testing and self.flush_interval > 0:
+            self._ensure_flusher()
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _take_batch(self) -> List[Dict]:
+        with self._lock:
+            count = min(self.batch_size, len(self._pending))
+            return [self._pending.popleft() for _ in range(count)]
+
+    def flush(self) -> int:
+        """
+        Write all pending events and their rollup deltas. Requires an app context.
+
+        Returns:
+            int: Number of events written
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                try:
+                    self._write_batch(batch)
+                    written += len(batch)
+                except Exception as e:
+                    from app import db
+                    db.session.rollback()
+                    # Put the batch back so it is retried on the next flush
+                    with self._lock:
+                        self._pending.extendleft(reversed(batch))
+                    logger.error(f"Usage ledger flush failed: {str(e)}")
+                    break
+        return written
+
+    def _write_batch(self, batch: List[Dict]) -> None:
+        from app import db
+        from app.models import UsageEvent
+
+        db.session.execute(insert(UsageEvent), batch)
+        for key, delta in aggregate_rollups(batch).items():
+            self._apply_rollup_delta(key, delta)
+        db.session.commit()
+
+    @staticmethod
+    def _apply_rollup_delta(key: tuple, delta: Dict) -> None:
+        """Add delta to a rollup row, creating it if needed (atomic upsert where supported)."""
+        from app import db
+        from app.models import UsageRollup
+
+        granularity, dimension, dimension_key, bucket = key
+        values = dict(granularity=granularity, dimension=dimension, dimension_key=dimension_key,
+                      bucket_start=bucket, **delta)
+        increments = {
+            column: getattr(UsageRollup, column) + amount
+            for column, amount in delta.items()
+        }
+
+        dialect = db.engine.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            statement = dialect_insert(UsageRollup).values(**values).on_conflict_do_update(
+                index_elements=['granularity', 'dimension', 'dimension_key', 'bucket_start'],
+                set_=increments
+            )
+            db.session.execute(statement)
+            return
+
+        result = db.session.execute(
+            update(UsageRollup).where(
+                UsageRollup.granularity == granularity,
+                UsageRollup.dimension == dimension,
+                UsageRollup.dimension_key == dimension_key,
+                UsageRollup.bucket_start == bucket
+            ).values(**increments)
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(UsageRollup).values(**values))
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._stopping.clear()
+            self._flusher = threading.Thread(target=self._run_flusher, name='usage-ledger-flusher', daemon=True)
+            self._flusher.start()
+            if not self._atexit_registered:
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+    def _run_flusher(self) -> None:
+        while not self._stopping.wait(self.flush_interval):
+            if not self._pending:
+                continue
+            with self._app.app_context():
+                self.flush()
+
+    def shutdown(self) -> None:
+        """Stop the background flusher and write whatever is left."""
+        self._stopping.set()
+        if self._app is not None and self._pending:
+            with self._app.app_context():
+                self.flush()
+
+
+def get_usage_series(dimension: str, keys: List[str], granularity: str = 'day', since: datetime = None) -> List:
+    """
+    Read rollup rows for the given dimension keys (never scans raw events).
+
+    Returns:
+        list of UsageRollup ordered by bucket
+    """
+    from app.models import UsageRollup
+
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unsupported granularity: {granularity}")
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"Unsupported dimension: {dimension}")
+    if not keys:
+        return []
+
+    query = UsageRollup.query.filter(
+        UsageRollup.granularity == granularity,
+        UsageRollup.dimension == dimension,
+        UsageRollup.dimension_key.in_([str(k) for k in keys])
+    )
+    if since is not None:
+        query = query.filter(UsageRollup.bucket_start >= bucket_start(since, granularity))
+    return query.order_by(UsageRollup.bucket_start.asc(), UsageRollup.dimension_key.asc()).all()
+
+
+def serialize_rollup(rollup) -> Dict:
+    return {
+        'bucket_start': rollup.bucket_start.isoformat(),
+        'requests': rollup.request_count,
+        'cached_requests': rollup.cached_count,
+        'input_tokens': rollup.input_tokens,
+        'output_tokens': rollup.output_tokens,
+        'estimated_cost': round(rollup.estimated_cost, 6)
+    }
+
+
+# Shared instance, configured by create_app()
+usage_recorder = UsageRecorder()
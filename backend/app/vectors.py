@@ -0,0 +1,468 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Local vector index - unit-length vectors in a memory-mapped file, searched by cosine top-k
+Each index is two files in its directory: <name>.<generation>.f32 (or .i8 when quantized) holds
+the rows, and <name>.meta.npz holds the agent ID of every row, the generation and settings that
+wrote them, and the IVF clusters when there are any. Adding agents appends rows before the ID
+file is swapped, and a rebuild writes a new generation, so readers in other workers never see
+IDs without vectors. Writers take a file lock.
+
+Text is turned into vectors by an encoder: an object with a dim attribute and an encode(texts)
+method returning an (n, dim) array. The built-in 'hashing' encoder is a deterministic stand-in
+(hashed word and word-pair counts) that needs no model download; VECTOR_ENCODER can name any
+'module:factory' that returns a real embedding model instead.
+"""
+import importlib
+import logging
+import os
+import re
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers in one process are still serialised by the thread lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Row ID of agents removed since the last rebuild (their rows are skipped until then)
+REMOVED = -1
+
+# Quantized rows converted per step of a search
+SCORE_BLOCK_ROWS = 4096
+
+# IVF lists are only trained when each would hold at least this many rows
+MIN_ROWS_PER_LIST = 16
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+STOP_WORDS = frozenset((
+    'a', 'about', 'all', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'for', 'from',
+    'get', 'has', 'have', 'how', 'i', 'if', 'in', 'into', 'is', 'it', 'its', 'me', 'my', 'of', 'on', 'or',
+    'our', 'so', 'that', 'the', 'their', 'them', 'then', 'this', 'to', 'up', 'us', 'was', 'we', 'what',
+    'when', 'which', 'will', 'with', 'you', 'your'
+))
+
+SUFFIXES = ('ings', 'ing', 'ers', 'er', 'ies', 'es', 'ed', 's')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words without stop words, with common suffixes cut (planning, planner -> plan)."""
+    return [_stem(word) for word in TOKEN_PATTERN.findall((text or '').lower()) if word not in STOP_WORDS]
+
+
+@lru_cache(maxsize=65536)
+def _stem(word: str) -> str:
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            # planner -> plann -> plan
+            if len(word) > 3 and word[-1] == word[-2]:
+                word = word[:-1]
+            break
+    return word
+
+
+class HashingEncoder:
+    """
+    Deterministic stand-in for an embedding model.
+
+    Words and adjacent word pairs are hashed into dim signed buckets, weighted 1 + log(count), and
+    the vector is scaled to unit length, so cosine similarity measures shared vocabulary.
+    """
+
+    name = 'hashing'
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def encode(self, texts: Sequence[str]):
+        import numpy as np
+
+        # Every feature occurrence as (row << 32 | hash); counting equal keys gives term counts per text
+        keys = []
+        for row, text in enumerate(texts):
+            words = tokenize(text)
+            features = words + [f'{first} {second}' for first, second in zip(words, words[1:])]
+            keys.extend((row << 32) | zlib.crc32(feature.encode('utf-8')) for feature in features)
+        keys, counts = np.unique(np.array(keys, dtype=np.int64), return_counts=True)
+        digests = keys & 0xFFFFFFFF
+        weights = (1.0 + np.log(counts)) * np.where(digests >> 31, 1.0, -1.0)
+        cells = (keys >> 32) * self.dim + digests % self.dim
+        vectors = np.bincount(cells, weights=weights, minlength=len(texts) * self.dim)
+        return normalize(vectors.astype(np.float32).reshape(len(texts), self.dim))
+
+
+ENCODERS = {'hashing': HashingEncoder}
+
+
+@lru_cache(maxsize=None)
+def load_encoder(spec: str = 'hashing', dim: int = 512):
+    """
+    Encoder named by spec: 'hashing', or 'package.module:factory' for a pluggable model.
+
+    The factory is called without arguments and must return an object with dim and encode(texts).
+    Each encoder is created once per process and shared.
+    """
+    if spec in ENCODERS:
+        return ENCODERS[spec](dim)
+    module_name, _, attribute = spec.partition(':')
+    if not attribute:
+        raise ValueError(f"Unknown encoder {spec!r} (use 'hashing' or 'module:factory')")
+    encoder = getattr(importlib.import_module(module_name), attribute)()
+    encoder.name = getattr(encoder, 'name', spec)
+    return encoder
+
+
+def normalize(vectors):
+    """Scale rows to unit length in place (zero rows stay zero)."""
+    import numpy as np
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def train_centroids(vectors, lists: int, iterations: int = 10, sample: int = 50000, seed: int = 0):
+    """
+    Spherical k-means centroids for an IVF index (unit-length rows, deterministic for a seed).
+
+    Trains on at most sample rows; each iteration assigns rows to their closest centroid and
+    moves every centroid to the normalized mean of its rows.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample:
+        vectors = vectors[np.sort(rng.choice(len(vectors), sample, replace=False))]
+    centroids = np.array(vectors[rng.choice(len(vectors), lists, replace=False)], dtype=np.float32)
+    for _ in range(iterations):
+        assignments = assign_lists(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        empty = ~sums.any(axis=1)
+        # Lists that lost all their rows restart from random rows
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign_lists(vectors, centroids, batch_size: int = 8192):
+    """Closest centroid of every row."""
+    import numpy as np
+
+    assignments = np.zeros(len(vectors), dtype=np.int32)
+    for offset in range(0, len(vectors), batch_size):
+        batch = np.asarray(vectors[offset:offset + batch_size], dtype=np.float32)
+        assignments[offset:offset + batch_size] = np.argmax(batch @ centroids.T, axis=1)
+    return assignments
+
+
+class _Snapshot(NamedTuple):
+    """One loaded generation of an index."""
+    ids: object
+    rows: object  # float32 rows, or int8 rows times scales
+    scales: object
+    centroids: object
+    bounds: object  # Rows [bounds[c], bounds[c + 1]) form IVF list c; rows from bounds[-1] on are the tail
+
+
+class VectorIndex:
+    """
+    Vectors for a set of agent IDs, kept in directory under name.
+
+    quantize stores each row as int8 times a float32 scale (a quarter of the size, scores off by
+    well under 1%). ivf_lists > 0 clusters the rows at each rebuild and stores every cluster
+    contiguously; a search then scores only the probes clusters closest to the query, plus the
+    tail of rows added or changed since the rebuild (an approximate search).
+    """
+
+    def __init__(self, directory: str, name: str, encoder_name: str = 'hashing', quantize: bool = False,
+                 ivf_lists: int = 0, probes: int = 32):
+        self.directory = directory
+        self.name = name
+        self.encoder_name = encoder_name
+        self.quantize = quantize
+        self.ivf_lists = ivf_lists
+        self.probes = probes
+
+        self._snapshot = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    @property
+    def meta_path(self) -> str:
+        return os.path.join(self.directory, f'{self.name}.meta.npz')
+
+    @property
+    def dtype(self) -> str:
+        return 'int8' if self.quantize else 'float32'
+
+    def _rows_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f'{self.name}.{generation}.{"i8" if self.quantize else "f32"}')
+
+    @property
+    def version(self) -> Optional[Tuple[int, int, int]]:
+        """Version of the index this worker serves; every write (here or in another worker) moves it."""
+        self._load()
+        return self._version
+
+    @property
+    def modified_at(self) -> Optional[datetime]:
+        """When the index this worker serves was last written (naive UTC), or None without one."""
+        version = self.version
+        return datetime.utcfromtimestamp(version[1] / 1e9) if version else None
+
+    @property
+    def exists(self) -> bool:
+        """Whether an index written with these settings is on disk (it may hold no agents)."""
+        return self._read_meta() is not None
+
+    def __len__(self) -> int:
+        snapshot = self._load()
+        return int((snapshot.ids != REMOVED).sum()) if snapshot else 0
+
+    def vector(self, agent_id: int):
+        """Stored vector of agent_id, or None."""
+        import numpy as np
+
+        snapshot = self._load()
+        if snapshot is None:
+            return None
+        rows = (snapshot.ids == agent_id).nonzero()[0]
+        if not len(rows):
+            return None
+        vector = np.array(snapshot.rows[rows[-1]], dtype=np.float32)
+        return vector * snapshot.scales[rows[-1]] if self.quantize else vector
+
+    def search(self, query, k: int, exclude: Iterable[int] = (),
+               probes: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        The k stored vectors most similar to query (unit length), best first.
+
+        probes overrides the number of IVF lists searched (ignored by flat indexes).
+
+        Returns:
+            list of (agent_id, cosine similarity)
+        """
+        import numpy as np
+
+        snapshot = self._load()
+        if snapshot is None or k <= 0:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+
+        if len(snapshot.centroids) == 0:
+            segments = [(0, len(snapshot.ids))]
+        else:
+            bounds = snapshot.bounds
+            closest = np.argsort(-(snapshot.centroids @ query))[:probes or self.probes]
+            segments = sorted((bounds[cluster], bounds[cluster + 1]) for cluster in closest)
+            segments.append((bounds[-1], len(snapshot.ids)))
+
+        ids = np.concatenate([snapshot.ids[start:end] for start, end in segments])
+        scores = np.concatenate([self._scores(snapshot, start, end, query) for start, end in segments])
+        skip = ids == REMOVED
+        exclude = list(exclude)
+        if exclude:
+            skip |= np.isin(ids, exclude)
+        scores[skip] = -np.inf
+
+        k = min(k, int((~skip).sum()))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((ids[top], -scores[top]))]
+        return [(int(ids[row]), round(float(scores[row]), 6)) for row in top]
+
+    def _scores(self, snapshot: _Snapshot, start: int, end: int, query):
+        """Scores of the contiguous rows [start, end)."""
+        import numpy as np
+
+        if not self.quantize:
+            return snapshot.rows[start:end] @ query
+        # Widen int8 rows a cache-sized block at a time instead of copying the whole range
+        scores = np.empty(end - start, dtype=np.float32)
+        for offset in range(start, end, SCORE_BLOCK_ROWS):
+            stop = min(offset + SCORE_BLOCK_ROWS, end)
+            scores[offset - start:stop - start] = snapshot.rows[offset:stop].astype(np.float32) @ query
+        return scores * snapshot.scales[start:end]
+
+    def upsert(self, agent_ids: Sequence[int], vectors) -> None:
+        """
+        Store vectors for agent_ids.
+
+        Flat indexes overwrite the rows of agents already indexed; clustered ones retire them and
+        append to the tail, since changed text may belong in another cluster.
+        """
+        import numpy as np
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._writing() as meta:
+            if meta is None or meta['dim'] != vectors.shape[1]:
+                self._write(np.asarray(agent_ids, dtype=np.int64), vectors)
+                return
+
+            ids, scales = meta['ids'].copy(), meta['scales'].copy()
+            clustered = len(meta['centroids']) > 0
+            encoded, new_scales = self._encode(vectors)
+
+            appended = []
+            stored = None
+            for index, agent_id in enumerate(agent_ids):
+                rows = (ids == agent_id).nonzero()[0]
+                if clustered or not len(rows):
+                    ids[rows] = REMOVED
+                    appended.append(index)
+                    continue
+                if stored is None:
+                    stored = np.memmap(self._rows_path(meta['generation']), dtype=self.dtype, mode='r+',
+                                       shape=(len(ids), meta['dim']))
+                stored[rows[-1]] = encoded[index]
+                if self.quantize:
+                    scales[rows[-1]] = new_scales[index]
+            if stored is not None:
+                stored.flush()
+                del stored
+
+            if appended:
+                with open(self._rows_path(meta['generation']), 'r+b') as handle:
+                    # Rows past the stored IDs are left over from an interrupted write
+                    handle.truncate(len(ids) * meta['dim'] * encoded.itemsize)
+                    handle.seek(0, os.SEEK_END)
+                    handle.write(encoded[appended].tobytes())
+                ids = np.concatenate([ids, np.asarray(agent_ids, dtype=np.int64)[appended]])
+                if self.quantize:
+                    scales = np.concatenate([scales, new_scales[appended]])
+            self._write_meta(dict(meta, ids=ids, scales=scales))
+
+    def remove(self, agent_ids: Iterable[int]) -> None:
+        """Stop returning agent_ids (their rows are dropped at the next rebuild)."""
+        import numpy as np
+
+        with self._writing() as meta:
+            if meta is None:
+                return
+            removed = np.isin(meta['ids'], list(agent_ids))
+            if removed.any():
+                ids = meta['ids'].copy()
+                ids[removed] = REMOVED
+                self._write_meta(dict(meta, ids=ids))
+
+    def replace(self, agent_ids: Sequence[int], vectors) -> None:
+        """Swap the whole index for agent_ids and vectors (a rebuild, which also reclusters)."""
+        import numpy as np
+
+        with self._writing():
+            self._write(np.asarray(agent_ids, dtype=np.int64), np.ascontiguousarray(vectors, dtype=np.float32))
+
+    def _encode(self, vectors):
+        """Rows as stored, and their scales (empty unless quantized)."""
+        import numpy as np
+
+        if not self.quantize:
+            return vectors, np.zeros(0, dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.zeros(0, dtype=np.float32)
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def _write(self, ids, vectors) -> None:
+        """New generation holding exactly ids and vectors; the previous one is deleted."""
+        import numpy as np
+
+        previous = self._read_meta()
+        generation = previous['generation'] + 1 if previous else 1
+        dim = vectors.shape[1] if vectors.ndim == 2 else 0
+
+        centroids = np.zeros((0, dim), dtype=np.float32)
+        bounds = np.zeros(1, dtype=np.int64)
+        # Too few rows per list and the clusters say nothing; such indexes stay flat
+        if self.ivf_lists and len(vectors) >= self.ivf_lists * MIN_ROWS_PER_LIST:
+            centroids = train_centroids(vectors, self.ivf_lists)
+            assignments = assign_lists(vectors, centroids)
+            order = np.argsort(assignments, kind='stable')
+            ids, vectors = ids[order], vectors[order]
+            bounds = np.searchsorted(assignments[order], np.arange(self.ivf_lists + 1))
+        else:
+            bounds[0] = len(ids)
+
+        encoded, scales = self._encode(vectors)
+        path = self._rows_path(generation)
+        with open(path + '.tmp', 'wb') as handle:
+            handle.write(encoded.tobytes())
+        os.replace(path + '.tmp', path)
+        self._write_meta({'ids': ids, 'generation': generation, 'dim': dim, 'scales': scales,
+                          'centroids': centroids, 'bounds': bounds})
+        if previous and os.path.exists(self._rows_path(previous['generation'])):
+            # Open maps in other workers keep the old file's data until they reload
+            os.remove(self._rows_path(previous['generation']))
+
+    def _write_meta(self, meta) -> None:
+        import numpy as np
+
+        temporary = self.meta_path + '.tmp.npz'
+        np.savez(temporary, encoder=self.encoder_name, dtype=self.dtype, **meta)
+        os.replace(temporary, self.meta_path)
+
+    def _read_meta(self) -> Optional[Dict]:
+        """The stored metadata, or None without an index written with these settings."""
+        import numpy as np
+
+        try:
+            with np.load(self.meta_path) as stored:
+                stored_with = (str(stored['encoder']), str(stored['dtype']))
+                if stored_with != (self.encoder_name, self.dtype):
+                    logger.warning('vector_index_settings_changed', extra={
+                        'event': 'vector_index_settings_changed', 'index': self.name,
+                        'stored': list(stored_with), 'configured': [self.encoder_name, self.dtype]
+                    })
+                    return None
+                return {
+                    'ids': stored['ids'], 'generation': int(stored['generation']), 'dim': int(stored['dim']),
+                    'scales': stored['scales'], 'centroids': stored['centroids'], 'bounds': stored['bounds']
+                }
+        except FileNotFoundError:
+            return None
+
+    def _load(self) -> Optional[_Snapshot]:
+        """The current generation, reloaded when another writer changed it."""
+        import numpy as np
+
+        try:
+            stat = os.stat(self.meta_path)
+        except FileNotFoundError:
+            self._snapshot = self._version = None
+            return None
+
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if version != self._version:
+            with self._lock:
+                meta = self._read_meta()
+                if meta is None or len(meta['ids']) == 0:
+                    self._snapshot = None
+                else:
+                    try:
+                        rows = np.memmap(self._rows_path(meta['generation']), dtype=self.dtype, mode='r',
+                                         shape=(len(meta['ids']), meta['dim']))
+                    except FileNotFoundError:
+                        # A rebuild replaced this generation after we read the IDs; retry on the next call
+                        return self._snapshot
+                    self._snapshot = _Snapshot(meta['ids'], rows, meta['scales'], meta['centroids'], meta['bounds'])
+                self._version = version
+        return self._snapshot
+
+    @contextmanager
+    def _writing(self):
+        """Hold the thread and file locks; yields the stored metadata, or None."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(os.path.join(self.directory, f'{self.name}.lock'), 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield self._read_meta()
@@ -0,0 +1,24 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Performance benchmarks for Special Agents
+
+    python -m benchmarks.seed      # synthetic catalog (10k agents, 1M purchases/reviews)
+    python -m benchmarks.server    # app on gevent with the local LLM provider
+    python -m benchmarks.run       # replay a traffic mix, report p50/p95/p99, compare to baseline
+"""
+import os
+
+DEFAULT_DATABASE_URL = 'sqlite:///benchmark.db'
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+MANIFEST_PATH = os.path.join(RESULTS_DIR, 'manifest.json')
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+
+def use_database(database_url: str) -> None:
+    """Point create_app() at the benchmark database (call before importing app)."""
+    os.environ['DATABASE_URL'] = database_url
+    # Benchmark runs must not write rate limit counters to the catalog database
+    os.environ.setdefault('RATELIMIT_STORAGE_URI', 'memory://')
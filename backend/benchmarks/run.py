@@ -0,0 +1,239 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Load generator - replays a traffic mix against a running server
+
+    python -m benchmarks.run --scenario mixed --concurrency 32 --duration 60
+    python -m benchmarks.run --scenario chat --save-baseline
+
+Each virtual user is a thread with its own logged-in session that picks
+operations by weight until the run ends. Requests made during the warmup are
+not measured. Results are written to benchmarks/results/ and compared with
+benchmarks/baseline.json when it exists; regressions exit with status 1.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zipfile
+from datetime import datetime
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import BASELINE_PATH, MANIFEST_PATH, RESULTS_DIR
+from benchmarks.stats import DEFAULT_TOLERANCE, compare, format_table, summarize
+
+# Operation weights per scenario
+SCENARIOS = {
+    'browse': {'marketplace': 50, 'detail': 50},
+    'chat': {'send_message': 100},
+    'upload': {'upload_package': 100},
+    'mixed': {'marketplace': 35, 'detail': 45, 'send_message': 15, 'upload_package': 5}
+}
+
+JSON_HEADERS = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+
+
+def build_package(rng: random.Random, categories: list) -> bytes:
+    """A small valid .sagent archive."""
+    name = f'Benchmark Upload {rng.randint(0, 10 ** 9)}'
+    agent_yaml = (
+        'version: "1.0"\n'
+        'metadata:\n'
+        f'  name: "{name}"\n'
+        '  version: "1.0.0"\n'
+        '  author: "benchmark"\n'
+        '  description: "Agent uploaded by the benchmark suite"\n'
+        f'  category: "{rng.choice(categories)}"\n'
+        '  tags: [benchmark]\n'
+        '  price: 1.99\n'
+        '  currency: "USD"\n'
+        'ethics:\n'
+        '  safe_for_children: true\n'
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('agent.yaml', agent_yaml)
+        archive.writestr('system_prompt.txt', 'You are a benchmark agent. Answer briefly and helpfully. ' * 5)
+        archive.writestr('README.md', f'# {name}\n')
+    return buffer.getvalue()
+
+
+class VirtualUser:
+    """One simulated client with its own session."""
+
+    def __init__(self, base_url: str, manifest: dict, weights: dict, rng: random.Random, timeout: float):
+        self.base_url = base_url.rstrip('/')
+        self.manifest = manifest
+        self.operations = list(weights)
+        self.weights = list(weights.values())
+        self.rng = rng
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.buyer = None
+        self.seller_session = None
+        # Keys are capped per key by admission control; real users each bring their own
+        self.api_key = f'sk-ant-benchmark-{rng.randint(0, 10 ** 9)}'
+
+    def _login(self, username: str) -> requests.Session:
+        session = requests.Session()
+        response = session.post(f'{self.base_url}/auth/login', headers=JSON_HEADERS, timeout=self.timeout,
+                                json={'username': username, 'password': self.manifest['password']})
+        response.raise_for_status()
+        return session
+
+    def setup(self) -> None:
+        if 'send_message' in self.operations:
+            username, agent_id = self.rng.choice(self.manifest['buyers'])
+            self.session = self._login(username)
+            self.buyer = agent_id
+        if 'upload_package' in self.operations:
+            self.seller_session = self._login(self.rng.choice(self.manifest['sellers']))
+
+    def _agent_id(self) -> int:
+        # Skewed towards low ids so some detail pages stay hot, like real traffic
+        first, last = self.manifest['agent_ids']
+        return first + min(int(self.rng.paretovariate(1.2)) - 1, last - first)
+
+    def marketplace(self):
+        params = {}
+        if self.rng.random() < 0.5:
+            params['category'] = self.rng.choice(self.manifest['categories'])
+        if self.rng.random() < 0.1:
+            params['search'] = self.rng.choice(self.manifest['search_terms'])
+        response = self.session.get(f'{self.base_url}/agents/', params=params, headers=JSON_HEADERS,
+                                    timeout=self.timeout)
+        return response.status_code == 200
+
+    def detail(self):
+        response = self.session.get(f'{self.base_url}/agents/{self._agent_id()}', headers=JSON_HEADERS,
+                                    timeout=self.timeout)
+        return response.status_code == 200
+
+    def send_message(self):
+        response = self.session.post(
+            f'{self.base_url}/chat/agent/{self.buyer}/message', headers=JSON_HEADERS, timeout=self.timeout,
+            json={'message': f'Benchmark question {self.rng.randint(0, 10 ** 6)}', 'api_key': self.api_key}
+        )
+        return response.status_code == 200
+
+    def upload_package(self):
+        response = self.seller_session.post(
+            f'{self.base_url}/agents/upload-package', timeout=self.timeout, allow_redirects=False,
+            files={'package': ('benchmark.sagent', build_package(self.rng, self.manifest['categories']))}
+        )
+        # Success redirects to the new agent's page, failures back to the form
+        return response.status_code == 302 and '/upload-package' not in response.headers.get('Location', '')
+
+    def run(self, measure_from: float, stop_at: float, samples: list, lock: threading.Lock) -> None:
+        local = []
+        while True:
+            started = time.perf_counter()
+            if started >= stop_at:
+                break
+            operation = self.rng.choices(self.operations, self.weights)[0]
+            try:
+                ok = getattr(self, operation)()
+            except requests.RequestException:
+                ok = False
+            if started >= measure_from:
+                local.append((operation, ok, time.perf_counter() - started))
+        with lock:
+            samples.extend(local)
+
+
+def run_load(base_url: str, manifest: dict, scenario: str, concurrency: int, duration: float,
+             warmup: float, seed: int = 42, timeout: float = 30.0) -> dict:
+    """Run a scenario and return its summary."""
+    weights = SCENARIOS[scenario]
+    users = [VirtualUser(base_url, manifest, weights, random.Random(seed + i), timeout) for i in range(concurrency)]
+    for user in users:
+        user.setup()
+
+    samples, lock = [], threading.Lock()
+    measure_from = time.perf_counter() + warmup
+    stop_at = measure_from + duration
+    threads = [threading.Thread(target=user.run, args=(measure_from, stop_at, samples, lock), daemon=True)
+               for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Requests still in flight at the deadline are counted, so measure to the real end
+    return summarize(samples, max(time.perf_counter() - measure_from, duration))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a traffic mix and report latency percentiles')
+    parser.add_argument('--target', default='http://127.0.0.1:5050')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='mixed')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30.0, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=5.0, help='Unmeasured seconds before the run')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--manifest', default=MANIFEST_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+    args = parser.parse_args(argv)
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+
+    print(f"Running '{args.scenario}' against {args.target}: {args.concurrency} users, "
+          f"{args.warmup:.0f}s warmup + {args.duration:.0f}s")
+    summary = run_load(args.target, manifest, args.scenario, args.concurrency, args.duration, args.warmup,
+                       seed=args.seed)
+    print(format_table(summary))
+
+    result = {
+        'scenario': args.scenario,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'recorded_at': datetime.utcnow().isoformat(),
+        'summary': summary
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_path = os.path.join(RESULTS_DIR, f"{args.scenario}-{datetime.utcnow():%Y%m%d-%H%M%S}.json")
+    with open(result_path, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {result_path}")
+
+    # Baselines are kept per scenario and concurrency; numbers from other mixes are not comparable
+    baseline_key = f'{args.scenario}@{args.concurrency}'
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    if args.save_baseline:
+        baselines[baseline_key] = summary
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"✓ Baseline saved for {baseline_key}")
+        return 0
+
+    if baseline_key not in baselines:
+        print(f"No baseline for {baseline_key}; run with --save-baseline to record one")
+        return 0
+
+    regressions = compare(baselines[baseline_key], summary, args.tolerance)
+    if regressions:
+        print(f"✗ Regressions against baseline (tolerance {args.tolerance:.0%}):")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    print(f"✓ Within {args.tolerance:.0%} of baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
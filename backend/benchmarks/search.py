@@ -0,0 +1,169 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Recall and latency of the vector index behind semantic search, on one CPU core
+
+    python -m benchmarks.search --agents 100000 --queries 500
+    python -m benchmarks.search --agents 100000 --ivf-lists 316 --probes 4 8 16 32
+
+Synthetic agent texts are encoded and written to a VectorIndex in a temporary directory, once
+flat and once per setting under test (int8 rows, IVF clusters). Queries are a few words from a
+random agent's text. Recall@k is the share of the exact flat float32 top k that a setting
+returns (ties included); latency covers encoding the query and searching, as one request would.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.seed import ADJECTIVES, CATEGORY_NOUNS
+from benchmarks.stats import percentile
+
+TOPICS = {
+    'productivity': ['calendar', 'email', 'meeting', 'deadline', 'notes', 'tasks', 'project', 'focus', 'routine'],
+    'education': ['math', 'physics', 'exam', 'homework', 'essay', 'language', 'history', 'lecture', 'python'],
+    'travel': ['trip', 'flight', 'hotel', 'itinerary', 'visa', 'beach', 'city', 'backpacking', 'holiday'],
+    'health': ['workout', 'running', 'diet', 'sleep', 'stress', 'yoga', 'protein', 'recovery', 'habits'],
+    'finance': ['budget', 'tax', 'savings', 'invest', 'retirement', 'debt', 'expenses', 'stocks', 'mortgage'],
+    'creative': ['story', 'poem', 'novel', 'screenplay', 'lyrics', 'character', 'plot', 'drawing', 'ideas']
+}
+FILLER = ['friendly', 'detailed', 'quick', 'step', 'guide', 'answers', 'explains', 'suggests', 'plans', 'reviews',
+          'beginner', 'advanced', 'daily', 'weekly', 'personal', 'simple', 'clear', 'practical', 'expert', 'tips']
+
+
+def synthetic_texts(count: int, rng: random.Random) -> List[str]:
+    """Agent texts in the shape the search index stores (name, category, description)."""
+    categories = list(CATEGORY_NOUNS)
+    texts = []
+    for number in range(count):
+        category = rng.choice(categories)
+        noun = rng.choice(CATEGORY_NOUNS[category])
+        # Topic words skew towards a few per category, as real catalogs do
+        topics = rng.choices(TOPICS[category], weights=range(len(TOPICS[category]), 0, -1), k=rng.randint(3, 8))
+        # A word from another category now and then, so categories overlap
+        topics.append(rng.choice(TOPICS[rng.choice(categories)]))
+        words = topics + rng.sample(FILLER, rng.randint(4, 10)) + [f'niche{rng.randint(0, count // 20)}']
+        rng.shuffle(words)
+        texts.append(f'{rng.choice(ADJECTIVES)} {noun.title()} {number}\n{category}\nA {noun} that '
+                     + ' '.join(words))
+    return texts
+
+
+def sample_queries(texts: List[str], count: int, rng: random.Random) -> List[str]:
+    """A few content words of random agents' texts (what a buyer describing a need would type)."""
+    queries = []
+    for text in rng.sample(texts, min(count, len(texts))):
+        words = text.split('\n')[-1].split()[3:]
+        queries.append(' '.join(rng.sample(words, min(len(words), rng.randint(2, 4)))))
+    return queries
+
+
+def measure(index, encoder, queries: List[str], exact: List[List], k: int, vectors, probes=None) -> Dict:
+    """
+    Recall@k against exact and per-query latency of one index setting.
+
+    Short texts tie often, so a hit counts when its exact float32 score (agent IDs are row + 1 in
+    vectors) reaches the exact k-th score, not only when it has the same agent ID.
+    """
+    latencies, found, expected_total = [], 0, 0
+    for query, expected in zip(queries, exact):
+        start = time.perf_counter()
+        encoded = encoder.encode([query])[0]
+        hits = index.search(encoded, k, probes=probes)
+        latencies.append(time.perf_counter() - start)
+        if expected:
+            threshold = expected[-1][1] - 1e-5
+            found += min(sum(1 for agent_id, _ in hits if vectors[agent_id - 1] @ encoded >= threshold),
+                         len(expected))
+            expected_total += len(expected)
+    latencies.sort()
+    return {
+        'recall': round(found / max(expected_total, 1), 4),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2)
+    }
+
+
+def run_benchmark(agents: int = 100000, queries: int = 500, k: int = 10, ivf_lists: int = 0,
+                  probes: List[int] = (4, 8, 16, 32), dim: int = 512, seed: int = 42, log=print) -> List[Dict]:
+    """
+    Build each index setting over the same synthetic catalog and measure it.
+
+    Returns:
+        list of dict per setting: setting, recall, p50_ms, p95_ms, build_s, size_mb
+    """
+    import numpy as np
+    from app.vectors import VectorIndex, load_encoder
+
+    rng = random.Random(seed)
+    encoder = load_encoder('hashing', dim)
+    texts = synthetic_texts(agents, rng)
+    query_texts = sample_queries(texts, queries, rng)
+    ivf_lists = ivf_lists or max(int(np.sqrt(agents)), 1)
+
+    start = time.perf_counter()
+    vectors = encoder.encode(texts)
+    log(f"  encoded {agents} agents in {time.perf_counter() - start:.1f}s")
+    agent_ids = np.arange(1, agents + 1)
+
+    directory = tempfile.mkdtemp(prefix='search-benchmark-')
+    results = []
+    try:
+        exact_index = VectorIndex(directory, 'flat')
+        exact_index.replace(agent_ids, vectors)
+        exact = [exact_index.search(encoder.encode([query])[0], k) for query in query_texts]
+
+        settings = [('flat float32', {}, [None]), ('flat int8', {'quantize': True}, [None]),
+                    (f'ivf{ivf_lists} float32', {'ivf_lists': ivf_lists}, probes),
+                    (f'ivf{ivf_lists} int8', {'ivf_lists': ivf_lists, 'quantize': True}, probes)]
+        for label, options, probe_counts in settings:
+            index = VectorIndex(directory, label.replace(' ', '-'), **options)
+            start = time.perf_counter()
+            index.replace(agent_ids, vectors)
+            build = time.perf_counter() - start
+            size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+                       if name.startswith(index.name + '.'))
+            for probe_count in probe_counts:
+                result = measure(index, encoder, query_texts, exact, k, vectors, probes=probe_count)
+                result.update(setting=label + (f' probes={probe_count}' if probe_count else ''),
+                              build_s=round(build, 2), size_mb=round(size / 1e6, 1))
+                log(f"  {result['setting']:<28} recall@{k} {result['recall']:.3f}  "
+                    f"p50 {result['p50_ms']:.2f}ms  p95 {result['p95_ms']:.2f}ms  "
+                    f"build {result['build_s']:.1f}s  {result['size_mb']}MB")
+                results.append(result)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Vector search recall and latency on one core')
+    parser.add_argument('--agents', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=10, help='Results per query (recall@k)')
+    parser.add_argument('--ivf-lists', type=int, default=0, help='IVF clusters (default: sqrt of --agents)')
+    parser.add_argument('--probes', type=int, nargs='+', default=[4, 8, 16, 32])
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    # One core: BLAS threads off before NumPy loads, and the process pinned where supported
+    for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[variable] = '1'
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+
+    print(f"Vector search: {args.agents} agents, {args.queries} queries, k={args.k}, one core")
+    run_benchmark(agents=args.agents, queries=args.queries, k=args.k, ivf_lists=args.ivf_lists,
+                  probes=args.probes, dim=args.dim, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
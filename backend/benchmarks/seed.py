@@ -0,0 +1,278 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Seed a synthetic marketplace catalog for benchmarks
+
+    python -m benchmarks.seed --agents 10000 --purchases 1000000 --reviews 1000000
+
+Agent popularity follows a Zipf-like curve, so a few agents carry thousands of
+purchases and reviews while most have a handful - the shape that exposes slow
+marketplace and detail pages. Rows are bulk inserted in batches.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import DEFAULT_DATABASE_URL, MANIFEST_PATH, RESULTS_DIR, use_database
+
+BENCHMARK_PASSWORD = 'Benchmark123'
+SEARCH_TERMS = ['planner', 'tutor', 'coach', 'assistant', 'writer', 'budget', 'fitness', 'travel', 'code', 'study']
+ADJECTIVES = ['Smart', 'Friendly', 'Expert', 'Quick', 'Patient', 'Creative', 'Precise', 'Helpful']
+CATEGORY_NOUNS = {
+    'productivity': ['planner', 'assistant', 'organizer'],
+    'education': ['tutor', 'study buddy', 'code mentor'],
+    'travel': ['travel planner', 'trip guide', 'itinerary builder'],
+    'health': ['fitness coach', 'meal planner', 'sleep coach'],
+    'finance': ['budget coach', 'tax helper', 'savings planner'],
+    'creative': ['writer', 'story coach', 'poetry partner']
+}
+
+
+def popularity_counts(total: int, buckets: int, cap: int, rng: random.Random, skew: float = 0.8) -> list:
+    """Split total into per-bucket counts following 1/rank^skew, each at most cap."""
+    weights = [1.0 / (rank ** skew) for rank in range(1, buckets + 1)]
+    rng.shuffle(weights)
+    scale = total / sum(weights)
+    counts = [min(int(w * scale), cap) for w in weights]
+
+    # Hand out what rounding and the cap left over
+    shortfall = min(total, buckets * cap) - sum(counts)
+    index = 0
+    while shortfall > 0:
+        if counts[index % buckets] < cap:
+            counts[index % buckets] += 1
+            shortfall -= 1
+        index += 1
+    return counts
+
+
+def _insert(db, model, rows):
+    if rows:
+        db.session.execute(insert(model), rows)
+
+
+def seed_catalog(db, agents: int = 10000, users: int = 50000, purchases: int = 1000000,
+                 reviews: int = 1000000, seed: int = 42, batch_size: int = 10000, log=print) -> dict:
+    """
+    Bulk insert a synthetic catalog into the current app's database.
+
+    Args:
+        db: Flask-SQLAlchemy instance (inside an app context)
+        agents: Number of approved, active agents
+        users: Number of users; one in ten is a seller
+        purchases: Total purchases, one per (buyer, agent) pair
+        reviews: Total reviews, each by a buyer of the agent (at most one per purchase)
+        seed: Random seed, so runs are reproducible
+        batch_size: Rows per INSERT batch
+        log: Progress callback
+
+    Returns:
+        dict: Manifest the load generator uses (credentials, sample buyers, sellers, search terms)
+    """
+    from app.models import User, Agent, AgentConfig, AgentPricing, AgentStats, Purchase, Review
+    from app import bcrypt
+    from app.listings import listings
+    from app.ranking import ranking_job
+    from app.recommendations import recommendation_job
+    from app.search import semantic_search
+    from app.similarity import similar_agents
+
+    if reviews > purchases:
+        raise ValueError('Every review needs a purchase: reviews must not exceed purchases')
+    if purchases > agents * users:
+        raise ValueError('Not enough users for that many distinct purchases')
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    started = time.perf_counter()
+
+    first_user = (db.session.query(func.max(User.id)).scalar() or 0) + 1
+    first_agent = (db.session.query(func.max(Agent.id)).scalar() or 0) + 1
+    run_tag = f'{seed}_{first_user}'
+
+    # One hash for everyone; bcrypt per user would dominate seeding time
+    password_hash = bcrypt.generate_password_hash(BENCHMARK_PASSWORD).decode('utf-8')
+    seller_count = max(users // 10, 1)
+    user_ids = list(range(first_user, first_user + users))
+    seller_ids = user_ids[:seller_count]
+
+    rows = []
+    for offset, user_id in enumerate(user_ids):
+        rows.append({
+            'id': user_id,
+            'username': f'bench_{run_tag}_{offset}',
+            'email': f'bench_{run_tag}_{offset}@example.com',
+            'password_hash': password_hash,
+            'is_seller': offset < seller_count,
+            'created_at': now - timedelta(days=rng.randint(0, 720))
+        })
+        if len(rows) >= batch_size:
+            _insert(db, User, rows)
+            rows = []
+    _insert(db, User, rows)
+    log(f"  users: {users}")
+
+    categories = list(CATEGORY_NOUNS)
+    agent_ids = list(range(first_agent, first_agent + agents))
+    agent_rows, config_rows, pricing_rows = [], [], []
+    prices = {}
+    for agent_id in agent_ids:
+        category = rng.choice(categories)
+        noun = rng.choice(CATEGORY_NOUNS[category])
+        name = f'{rng.choice(ADJECTIVES)} {noun.title()} {agent_id}'
+        prices[agent_id] = round(rng.choice([0.0, 0.99, 1.99, 4.99, 9.99, 19.99, 49.99]), 2)
+        agent_rows.append({
+            'id': agent_id,
+            'name': name,
+            'description': f'A {noun} agent that helps with {category} tasks. ' * 4,
+            'category': category,
+            'creator_id': rng.choice(seller_ids),
+            'created_at': now - timedelta(days=rng.randint(0, 720)),
+            'updated_at': now,
+            'is_active': True,
+            'is_approved': True
+        })
+        config_rows.append({
+            'agent_id': agent_id,
+            'system_prompt': f'You are {name}, a {noun}. Help the user with {category} questions.',
+            'llm_provider': 'anthropic',
+            'routing_policy': 'quality',
+            'creation_mode': 'web_form',
+            'cache_responses': True
+        })
+        pricing_rows.append({'agent_id': agent_id, 'price': prices[agent_id], 'currency': 'USD'})
+        if len(agent_rows) >= batch_size:
+            _insert(db, Agent, agent_rows)
+            _insert(db, AgentConfig, config_rows)
+            _insert(db, AgentPricing, pricing_rows)
+            agent_rows, config_rows, pricing_rows = [], [], []
+    _insert(db, Agent, agent_rows)
+    _insert(db, AgentConfig, config_rows)
+    _insert(db, AgentPricing, pricing_rows)
+    log(f"  agents: {agents}")
+
+    purchase_counts = popularity_counts(purchases, agents, users, rng)
+    # Reviews follow purchases; popular agents are reviewed in proportion
+    review_ratio = reviews / purchases if purchases else 0.0
+    review_counts = [int(count * review_ratio) for count in purchase_counts]
+    shortfall = reviews - sum(review_counts)
+    for index in sorted(range(agents), key=lambda i: purchase_counts[i] - review_counts[i], reverse=True):
+        if shortfall <= 0:
+            break
+        if review_counts[index] < purchase_counts[index]:
+            review_counts[index] += 1
+            shortfall -= 1
+
+    purchase_rows, review_rows, stats_rows = [], [], []
+    sample_buyers = {}
+    for agent_id, purchase_count, review_count in zip(agent_ids, purchase_counts, review_counts):
+        buyers = rng.sample(user_ids, purchase_count)
+        quality = rng.uniform(2.5, 4.8)
+        rating_total = 0
+        histogram = [0] * 5
+        for position, buyer_id in enumerate(buyers):
+            purchased_at = now - timedelta(minutes=rng.randint(0, 525600))
+            purchase_rows.append({
+                'buyer_id': buyer_id,
+                'agent_id': agent_id,
+                'price_paid': prices[agent_id],
+                'currency': 'USD',
+                'purchased_at': purchased_at,
+                'is_active': True
+            })
+            if position < review_count:
+                rating = min(max(int(round(rng.gauss(quality, 1.0))), 1), 5)
+                rating_total += rating
+                histogram[rating - 1] += 1
+                review_rows.append({
+                    'agent_id': agent_id,
+                    'reviewer_id': buyer_id,
+                    'rating': rating,
+                    'comment': f'Rated {rating} stars. ' * rng.randint(1, 6),
+                    'created_at': purchased_at + timedelta(days=rng.randint(0, 30)),
+                    'updated_at': now,
+                    'is_visible': True
+                })
+            # One buyer per agent, so chat traffic spreads over the catalog
+            if position == 0 and len(sample_buyers) < 1000 and buyer_id not in sample_buyers:
+                sample_buyers[buyer_id] = agent_id
+
+        stats_rows.append({
+            'agent_id': agent_id,
+            'purchase_count': purchase_count,
+            'average_rating': round(rating_total / review_count, 2) if review_count else 0.0,
+            **{f'rating_{stars}_count': count for stars, count in enumerate(histogram, 1)}
+        })
+
+        if len(purchase_rows) >= batch_size:
+            _insert(db, Purchase, purchase_rows)
+            _insert(db, Review, review_rows)
+            purchase_rows, review_rows = [], []
+    _insert(db, Purchase, purchase_rows)
+    _insert(db, Review, review_rows)
+    _insert(db, AgentStats, stats_rows)
+    log(f"  purchases: {purchases}, reviews: {reviews}")
+
+    # Core inserts skip the ORM flush hooks that keep derived tables and indexes current, so build them here
+    log(f"  marketplace listings: {listings.rebuild(db.session.connection())}")
+    log(f"  ranked agents: {ranking_job.run(db.session)}")
+    log(f"  recommendation lists: {recommendation_job.run(db.session, full=True)}")
+    log(f"  similar agents index: {similar_agents.run(db.session)}")
+    log(f"  search index: {semantic_search.run(db.session)}")
+    db.session.commit()
+    log(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    usernames = {row_id: f'bench_{run_tag}_{row_id - first_user}' for row_id in sample_buyers}
+    return {
+        'password': BENCHMARK_PASSWORD,
+        'agent_ids': [agent_ids[0], agent_ids[-1]],
+        'categories': categories,
+        'search_terms': SEARCH_TERMS,
+        'buyers': [[usernames[buyer_id], agent_id] for buyer_id, agent_id in sample_buyers.items()],
+        'sellers': [f'bench_{run_tag}_{seller_id - first_user}' for seller_id in seller_ids[:200]]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Seed a synthetic catalog for benchmarks')
+    parser.add_argument('--database-url', default=os.getenv('BENCHMARK_DATABASE_URL', DEFAULT_DATABASE_URL))
+    parser.add_argument('--agents', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--purchases', type=int, default=1000000)
+    parser.add_argument('--reviews', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--reset', action='store_true', help='Drop and recreate all tables first')
+    args = parser.parse_args(argv)
+
+    use_database(args.database_url)
+    from app import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        if args.reset:
+            print("Resetting benchmark database...")
+            db.drop_all()
+            db.create_all()
+
+        print(f"Seeding {args.database_url}...")
+        manifest = seed_catalog(db, agents=args.agents, users=args.users, purchases=args.purchases,
+                                reviews=args.reviews, seed=args.seed, batch_size=args.batch_size)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✓ Manifest written to {MANIFEST_PATH}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Benchmark server - the app on gevent (as run.py serves it) with every chat on the local LLM provider
+
+    python -m benchmarks.server --port 5050 --llm-ttft-ms 400 --llm-tokens-per-second 60
+
+Rate limits and CSRF are off by default: the load generator is one client
+replaying many users, and neither is what a throughput benchmark measures.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import DEFAULT_DATABASE_URL, use_database
+
+
+def create_benchmark_app(rate_limits: bool = False):
+    """create_app() configured for load testing."""
+    from app import create_app, limiter
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    limiter.enabled = rate_limits
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the app for benchmarks')
+    parser.add_argument('--database-url', default=os.getenv('BENCHMARK_DATABASE_URL', DEFAULT_DATABASE_URL))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--llm-ttft-ms', type=float, default=400.0, help='Local model time to first token')
+    parser.add_argument('--llm-tokens-per-second', type=float, default=60.0)
+    parser.add_argument('--llm-response-tokens', type=int, default=64)
+    parser.add_argument('--llm-error-rate', type=float, default=0.0, help='Fraction of calls that fail (0.0-1.0)')
+    parser.add_argument('--rate-limits', action='store_true', help='Keep rate limiting on')
+    args = parser.parse_args(argv)
+
+    use_database(args.database_url)
+    os.environ.update({
+        'LLM_PROVIDER_OVERRIDE': 'local',
+        'LLM_LOCAL_ENABLED': 'True',
+        'LLM_LOCAL_TTFT_MS': str(args.llm_ttft_ms),
+        'LLM_LOCAL_TOKENS_PER_SECOND': str(args.llm_tokens_per_second),
+        'LLM_LOCAL_RESPONSE_TOKENS': str(args.llm_response_tokens),
+        'LLM_LOCAL_ERROR_RATE': str(args.llm_error_rate)
+    })
+    app = create_benchmark_app(args.rate_limits)
+
+    from gevent.pywsgi import WSGIServer
+
+    print(f"Benchmark server on http://{args.host}:{args.port} ({args.database_url})")
+    print(f"Local LLM: {args.llm_ttft_ms:.0f}ms to first token, {args.llm_tokens_per_second:.0f} tokens/s, "
+          f"{args.llm_error_rate:.0%} errors")
+    # No access log: writing a line per request would skew the numbers
+    WSGIServer((args.host, args.port), app, log=None).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
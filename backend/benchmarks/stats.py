@@ -0,0 +1,96 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Latency percentiles, run summaries and baseline comparison for benchmarks
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+PERCENTILES = (50, 95, 99)
+
+# A run regresses when p95 latency grows or throughput drops by more than this fraction
+DEFAULT_TOLERANCE = 0.10
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of an ascending list (0.0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+
+def _summarize_group(samples: List[Tuple[str, bool, float]], duration: float) -> Dict:
+    latencies = sorted(latency for _, _, latency in samples)
+    errors = sum(1 for _, ok, _ in samples if not ok)
+    summary = {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'throughput_rps': round(len(samples) / duration, 2) if duration > 0 else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0
+    }
+    for pct in PERCENTILES:
+        summary[f'p{pct}_ms'] = round(percentile(latencies, pct) * 1000, 2)
+    return summary
+
+
+def summarize(samples: Iterable[Tuple[str, bool, float]], duration: float) -> Dict:
+    """
+    Summarize a run.
+
+    Args:
+        samples: (operation, succeeded, latency seconds) per request
+        duration: Measured wall-clock seconds
+
+    Returns:
+        dict: {'total': {...}, 'operations': {operation: {...}}} with requests, errors,
+              error_rate, throughput_rps, mean_ms and p50/p95/p99_ms
+    """
+    samples = list(samples)
+    by_operation = defaultdict(list)
+    for sample in samples:
+        by_operation[sample[0]].append(sample)
+
+    return {
+        'total': _summarize_group(samples, duration),
+        'operations': {name: _summarize_group(group, duration) for name, group in sorted(by_operation.items())}
+    }
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    Regressions of current against baseline, per operation and overall.
+
+    Returns:
+        list: Human-readable regression descriptions (empty when within tolerance)
+    """
+    regressions = []
+    pairs = [('total', baseline.get('total'), current.get('total'))]
+    for name, base in baseline.get('operations', {}).items():
+        pairs.append((name, base, current.get('operations', {}).get(name)))
+
+    for name, base, now in pairs:
+        if not base or not now:
+            continue
+        if base['p95_ms'] > 0 and now['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']:.1f}ms -> {now['p95_ms']:.1f}ms")
+        if base['throughput_rps'] > 0 and now['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput_rps']:.1f} -> {now['throughput_rps']:.1f} req/s")
+        if now['error_rate'] > base['error_rate'] + tolerance / 10:
+            regressions.append(f"{name}: error rate {base['error_rate']:.2%} -> {now['error_rate']:.2%}")
+    return regressions
+
+
+def format_table(summary: Dict) -> str:
+    """Fixed-width report of a summary."""
+    header = f"{'operation':<16}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    lines = [header, '-' * len(header)]
+    rows = list(summary['operations'].items()) + [('total', summary['total'])]
+    for name, stats in rows:
+        lines.append(f"{name:<16}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput_rps']:>10.1f}"
+                     f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+    return '\n'.join(lines)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Rebuild the local vector indexes of agents (similar agents, semantic search) from the database
+
+    python3 index_agents.py
+"""
+import argparse
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.search import semantic_search
+from app.similarity import similar_agents
+
+
+def main(argv=None):
+    argparse.ArgumentParser(description='Agent vector index').parse_args(argv)
+
+    # Never touch the schema from here; that is migrate.py's job
+    os.environ.setdefault('DB_CREATE_ALL', 'False')
+    app = create_app()
+    with app.app_context():
+        for index in (similar_agents, semantic_search):
+            indexed = index.run(db.session)
+            print(f"Indexed {indexed} agents for {index.name} in {index.index.directory}")
+        db.session.rollback()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
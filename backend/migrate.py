@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Apply versioned schema migrations (the Procfile runs this before the web workers start)
+
+    python3 migrate.py            # apply pending migrations
+    python3 migrate.py --plan     # show pending migrations and their SQL without changing anything
+    python3 migrate.py --status   # list applied and pending versions
+"""
+import argparse
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Workers create nothing at boot; the schema is the runner's job
+os.environ.setdefault('DB_CREATE_ALL', 'False')
+
+from app import create_app, db
+from app.migrations import MigrationRunner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Apply database migrations')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--plan', action='store_true', help='Dry run: print the SQL pending migrations would run')
+    mode.add_argument('--status', action='store_true', help='List applied and pending migrations')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        runner = MigrationRunner(db.engine, db.metadata)
+
+        if args.status:
+            applied = runner.applied_versions()
+            for migration in runner.migrations:
+                state = f"applied {applied[migration.version]:%Y-%m-%d %H:%M}" if migration.version in applied else 'pending'
+                print(f"{migration.version:04d}_{migration.name:<32} {state}")
+            return 0
+
+        if args.plan:
+            plan = runner.plan()
+            if not plan:
+                print("Database schema is up to date")
+            for step in plan:
+                mode = '' if step['transactional'] else ' (outside a transaction)'
+                print(f"{step['version']:04d}_{step['name']}: {step['description']}{mode}")
+                for statement in step['statements'] or ['-- nothing to do']:
+                    print(f"    {statement};" if not statement.startswith('--') else f"    {statement}")
+            return 0
+
+        runner.upgrade()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Recompute marketplace ranking scores, or compare orderings under different weights
+
+    python3 rank.py                                   # score every agent now (RANKING_* weights)
+    python3 rank.py --compare --prior-weight 25       # how would the ordering change? (writes nothing)
+    python3 rank.py --compare --half-life-days 30 --as-of 2025-06-01 --top 10
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.ranking import compare_orderings, compute_scores, load_signals, ranking_job
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Marketplace ranking scores')
+    parser.add_argument('--compare', action='store_true',
+                        help='Replay scoring with candidate weights and compare with the configured ones')
+    parser.add_argument('--prior-weight', type=float, help='Candidate RANKING_PRIOR_WEIGHT')
+    parser.add_argument('--half-life-days', type=float, help='Candidate RANKING_HALF_LIFE_DAYS')
+    parser.add_argument('--popularity-weight', type=float, help='Candidate RANKING_POPULARITY_WEIGHT')
+    parser.add_argument('--as-of', type=datetime.fromisoformat, help='Only count events before this date')
+    parser.add_argument('--top', type=int, default=20, help='Agents to show per ordering')
+    args = parser.parse_args(argv)
+
+    # Never touch the schema from here; that is migrate.py's job
+    os.environ.setdefault('DB_CREATE_ALL', 'False')
+    app = create_app()
+    with app.app_context():
+        if not args.compare:
+            scored = ranking_job.run(db.session, as_of=args.as_of)
+            db.session.commit()
+            print(f"Scored {scored} agents")
+            return 0
+
+        baseline = ranking_job.weights
+        candidate = baseline._replace(**{
+            name: value for name, value in (('prior_weight', args.prior_weight),
+                                            ('half_life_days', args.half_life_days),
+                                            ('popularity_weight', args.popularity_weight))
+            if value is not None
+        })
+        signals = load_signals(db.session, as_of=args.as_of)
+        result = compare_orderings(signals['agent_ids'], compute_scores(signals, baseline),
+                                   compute_scores(signals, candidate), top=args.top)
+
+        print(f"baseline:  {dict(baseline._asdict())}")
+        print(f"candidate: {dict(candidate._asdict())}")
+        print(f"{'#':>3}  {'baseline':>10}  {'candidate':>10}")
+        for position, (old, new) in enumerate(zip(result['baseline_top'], result['candidate_top']), 1):
+            print(f"{position:>3}  {old:>10}  {new:>10}")
+        print(f"top-{args.top} overlap {result['top_overlap']:.0%}, spearman {result['spearman']:.4f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Update "customers also bought" lists from purchases
+
+    python3 recommend.py            # fold in purchases since the last run (full rebuild if none saved)
+    python3 recommend.py --full     # rebuild the co-purchase matrix from every active purchase
+"""
+import argparse
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.recommendations import recommendation_job
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Co-purchase recommendations')
+    parser.add_argument('--full', action='store_true', help='Rebuild from scratch (also drops refunded purchases)')
+    args = parser.parse_args(argv)
+
+    # Never touch the schema from here; that is migrate.py's job
+    os.environ.setdefault('DB_CREATE_ALL', 'False')
+    app = create_app()
+    with app.app_context():
+        updated = recommendation_job.run(db.session, full=args.full)
+        db.session.commit()
+        print(f"Updated recommendations for {updated} agents")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
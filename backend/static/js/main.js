@@ -40,3 +40,37 @@ function validateForm(formId) {
 function confirmAction(message) {
     return confirm(message);
 }
+
+// Search-as-you-type: fill an input's datalist from its data-suggest-url
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('input[data-suggest-url]').forEach(input => {
+        const list = document.getElementById(input.getAttribute('list'));
+        let timer = null;
+        let controller = null;
+
+        input.addEventListener('input', () => {
+            clearTimeout(timer);
+            timer = setTimeout(() => {
+                const query = input.value.trim();
+                if (!query) {
+                    list.replaceChildren();
+                    return;
+                }
+                // Only the latest keystroke's answer is shown
+                if (controller) controller.abort();
+                controller = new AbortController();
+                fetch(`${input.dataset.suggestUrl}?q=${encodeURIComponent(query)}`, {signal: controller.signal})
+                    .then(response => response.json())
+                    .then(data => {
+                        list.replaceChildren(...data.agents.map(agent => {
+                            const option = document.createElement('option');
+                            option.value = agent.name;
+                            option.label = agent.category;
+                            return option;
+                        }));
+                    })
+                    .catch(() => {});
+            }, 100);
+        });
+    });
+});
@@ -7,18 +7,27 @@ Pytest fixtures and configuration
 import pytest
 import sys
 import os
+from contextlib import contextmanager
 from unittest.mock import MagicMock
+from flask_login.utils import _create_identifier
 
 # Add app to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Keep rate limit counters per test run instead of in the shared database
+os.environ.setdefault('RATELIMIT_STORAGE_URI', 'memory://')
+
 from app import create_app, db as _db
 from app.models import User, Agent, AgentConfig, AgentPricing, AgentStats, Purchase, Review
+from app.query_stats import track_queries
 
 
 @pytest.fixture(scope='function')
-def app():
+def app(tmp_path, monkeypatch):
     """Create application for testing"""
+    # Vector indexes and the co-purchase matrix are files; give each test its own
+    monkeypatch.setenv('VECTOR_INDEX_DIR', str(tmp_path / 'vector_index'))
+    monkeypatch.setenv('RECOMMENDATIONS_DIR', str(tmp_path / 'recommendations'))
     app = create_app()
     app.config['TESTING'] = True
     app.config['WTF_CSRF_ENABLED'] = False
@@ -116,10 +125,38 @@ def agent(db, seller):
 
 
 @pytest.fixture
-def authenticated_client(client, user, app):
-    """Create authenticated test client"""
+def listed_agent(db, seller):
+    """Factory for marketplace agents by seller, with pricing and stats; each is committed.
+
+        tutor = listed_agent('Tutor', category='education', price=5.0, purchase_count=3)
+    """
+    def make(name, description=None, category='education', price=5.0, prompt=None, approved=True, **stats):
+        agent = Agent(name=name, description=description or f'{name} agent', category=category,
+                      creator_id=seller.id, is_approved=approved, is_active=True)
+        db.session.add(agent)
+        db.session.flush()
+        if prompt is not None:
+            db.session.add(AgentConfig(agent_id=agent.id, system_prompt=prompt))
+        db.session.add_all([AgentPricing(agent_id=agent.id, price=price), AgentStats(agent_id=agent.id, **stats)])
+        db.session.commit()
+        return agent
+
+    return make
+
+
+def _login(client, user):
+    """Log user in on the test client (session_protection='strong' needs the session identifier)"""
+    with client.application.test_request_context(environ_base=client.environ_base):
+        identifier = _create_identifier()
     with client.session_transaction() as sess:
         sess['_user_id'] = str(user.id)
+        sess['_id'] = identifier
+
+
+@pytest.fixture
+def authenticated_client(client, user, app):
+    """Create authenticated test client"""
+    _login(client, user)
     # Store user_id for tests that need it
     client.application.test_user_id = user.id
     return client
@@ -128,6 +165,23 @@ def authenticated_client(client, user, app):
 @pytest.fixture
 def seller_client(client, seller):
     """Create authenticated seller client"""
-    with client.session_transaction() as sess:
-        sess['_user_id'] = str(seller.id)
+    _login(client, seller)
     return client
+
+
+@pytest.fixture
+def query_budget():
+    """Fail the test when the block issues more SQL statements than budgeted.
+
+        with query_budget(4):
+            client.get('/agents/marketplace')
+    """
+    @contextmanager
+    def budget(max_queries):
+        with track_queries(record_statements=True) as tracker:
+            yield tracker
+        if tracker.count > max_queries:
+            statements = '\n'.join(f'  {statement}' for statement, _ in tracker.statements)
+            pytest.fail(f'{tracker.count} queries issued, budget is {max_queries}:\n{statements}')
+
+    return budget
@@ -0,0 +1,234 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for LLM call admission control
+"""
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from app.admission import AdmissionController, LLMAdmissionError, key_fingerprint
+from app.llm_service import LLMService
+from app.telemetry import registry, LLM_ADMISSION_REJECTIONS, LLM_IN_FLIGHT
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    registry.reset()
+    yield
+    registry.reset()
+
+
+def wait_in_background(controller, user_key, api_key=None, timeout=5.0):
+    """Start an acquire() in a thread; returns (thread, outcome list)."""
+    outcome = []
+
+    def run():
+        try:
+            outcome.append(controller.acquire(user_key, api_key, timeout=timeout))
+        except LLMAdmissionError as e:
+            outcome.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def wait_for_queue(controller, depth):
+    for _ in range(200):
+        if controller.stats()['queued'] == depth:
+            return
+        time.sleep(0.005)
+    raise AssertionError(f"queue never reached {depth}")
+
+
+class TestAdmissionController:
+    """Test caps, queueing and rejection"""
+
+    def test_admits_under_caps(self):
+        controller = AdmissionController(max_in_flight=2)
+        ticket = controller.acquire('u1', 'sk-1')
+        assert controller.stats()['in_flight'] == 1
+        assert LLM_IN_FLIGHT.value() == 1
+
+        controller.release(ticket)
+        assert controller.stats()['in_flight'] == 0
+
+    def test_per_user_cap_queues_then_times_out(self):
+        controller = AdmissionController(max_per_user=1)
+        controller.acquire('u1')
+
+        with pytest.raises(LLMAdmissionError) as exc_info:
+            controller.acquire('u1', timeout=0.01)
+        assert exc_info.value.reason == 'queue_timeout'
+        assert exc_info.value.retry_after >= 1.0
+        assert controller.stats()['queued'] == 0
+        assert LLM_ADMISSION_REJECTIONS.value(reason='queue_timeout') == 1
+
+    def test_per_key_cap_spans_users(self):
+        controller = AdmissionController(max_per_key=1)
+        controller.acquire('u1', 'sk-shared')
+        with pytest.raises(LLMAdmissionError):
+            controller.acquire('u2', 'sk-shared', timeout=0.01)
+        controller.acquire('u2', 'sk-other')
+
+    def test_release_admits_queued_waiter(self):
+        controller = AdmissionController(max_in_flight=1)
+        ticket = controller.acquire('u1')
+        thread, outcome = wait_in_background(controller, 'u2')
+        wait_for_queue(controller, 1)
+
+        controller.release(ticket)
+        thread.join(2)
+        assert outcome == [('u2', None)]
+        assert controller.stats()['in_flight'] == 1
+
+    def test_blocked_user_does_not_hold_up_others(self):
+        controller = AdmissionController(max_in_flight=2, max_per_user=1)
+        heavy = controller.acquire('heavy')
+        other = controller.acquire('other')
+
+        heavy_thread, heavy_outcome = wait_in_background(controller, 'heavy')
+        wait_for_queue(controller, 1)
+        light_thread, light_outcome = wait_in_background(controller, 'light')
+        wait_for_queue(controller, 2)
+
+        # The freed slot goes to the oldest waiter that is allowed to run
+        controller.release(other)
+        light_thread.join(2)
+        assert light_outcome == [('light', None)]
+        assert heavy_outcome == []
+
+        controller.release(heavy)
+        heavy_thread.join(2)
+        assert heavy_outcome == [('heavy', None)]
+
+    def test_queue_budget_rejects_immediately(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=1)
+        controller.acquire('u1')
+        thread, _ = wait_in_background(controller, 'u2', timeout=0.5)
+        wait_for_queue(controller, 1)
+
+        with pytest.raises(LLMAdmissionError) as exc_info:
+            controller.acquire('u3')
+        assert exc_info.value.reason == 'queue_full'
+        thread.join(2)
+
+    def test_per_user_queue_budget(self):
+        controller = AdmissionController(max_per_user=1, max_queue_per_user=1)
+        controller.acquire('u1')
+        thread, _ = wait_in_background(controller, 'u1', timeout=0.5)
+        wait_for_queue(controller, 1)
+
+        with pytest.raises(LLMAdmissionError) as exc_info:
+            controller.acquire('u1')
+        assert exc_info.value.reason == 'user_queue_full'
+        thread.join(2)
+
+    def test_killed_waiter_leaves_the_queue(self):
+        import gevent
+
+        controller = AdmissionController(max_in_flight=1)
+        holder = controller.acquire('u1')
+        with patch.object(threading.Event, 'wait', side_effect=gevent.Timeout()):
+            with pytest.raises(gevent.Timeout):
+                controller.acquire('u2')
+        assert controller.stats()['queued'] == 0
+
+        controller.release(holder)
+        assert controller.stats()['in_flight'] == 0
+
+    def test_slot_granted_to_killed_waiter_is_returned(self):
+        import gevent
+
+        controller = AdmissionController(max_in_flight=1)
+        holder = controller.acquire('u1')
+
+        def admitted_then_killed(event, timeout=None):
+            controller.release(holder)
+            raise gevent.Timeout()
+
+        with patch.object(threading.Event, 'wait', admitted_then_killed):
+            with pytest.raises(gevent.Timeout):
+                controller.acquire('u2')
+        assert controller.stats()['in_flight'] == 0
+        assert controller.stats()['queued'] == 0
+
+    def test_disabled_admits_everything(self):
+        controller = AdmissionController(max_in_flight=0, enabled=False)
+        with controller.admit('u1'):
+            assert controller.stats()['in_flight'] == 0
+
+    def test_admit_releases_on_error(self):
+        controller = AdmissionController()
+        with pytest.raises(RuntimeError):
+            with controller.admit('u1', 'sk-1'):
+                raise RuntimeError('provider blew up')
+        assert controller.stats()['in_flight'] == 0
+
+    def test_key_fingerprint(self):
+        assert key_fingerprint(None) is None
+        assert key_fingerprint('sk-ant-secret') == key_fingerprint('sk-ant-secret')
+        assert 'secret' not in key_fingerprint('sk-ant-secret')
+
+    def test_init_app_reads_config(self, app):
+        app.config['LLM_MAX_IN_FLIGHT'] = 3
+        app.config['LLM_MAX_IN_FLIGHT_PER_USER'] = 1
+        controller = AdmissionController()
+        controller.init_app(app)
+
+        assert controller.max_in_flight == 3
+        assert controller.max_per_user == 1
+        assert app.extensions['llm_admission'] is controller
+
+
+class TestServiceAdmission:
+    """Test LLMService integration"""
+
+    @patch('anthropic.Anthropic')
+    @patch('app.llm_service.AnthropicProvider.chat')
+    def test_chat_holds_slot_during_call(self, mock_chat, mock_anthropic):
+        controller = AdmissionController()
+        seen = []
+        mock_chat.side_effect = lambda *args, **kwargs: seen.append(controller.stats()['in_flight']) or {
+            'response': 'Hi', 'model': 'claude-3-5-sonnet-20241022', 'usage': {}
+        }
+
+        service = LLMService('anthropic', 'sk-ant-test', admission=controller, user_id=1)
+        service.chat('System', [], 'Hi')
+
+        assert seen == [1]
+        assert controller.stats()['in_flight'] == 0
+
+    @patch('anthropic.Anthropic')
+    @patch('app.llm_service.AnthropicProvider.chat')
+    def test_chat_rejected_when_user_at_cap(self, mock_chat, mock_anthropic):
+        controller = AdmissionController(max_per_user=1, queue_timeout=0.01)
+        controller.acquire(1)
+
+        service = LLMService('anthropic', 'sk-ant-test', admission=controller, user_id=1)
+        with pytest.raises(LLMAdmissionError):
+            service.chat('System', [], 'Hi')
+        mock_chat.assert_not_called()
+
+
+class TestChatRouteAdmission:
+    """Test the 429 response"""
+
+    @patch('anthropic.Anthropic')
+    def test_rejected_call_returns_429(self, mock_anthropic, authenticated_client, user, agent, db):
+        from app.models import Purchase
+        db.session.add(Purchase(buyer_id=user.id, agent_id=agent.id, price_paid=0))
+        db.session.commit()
+
+        error = LLMAdmissionError('Chat is busy right now. Please retry shortly.', 'queue_timeout', retry_after=10.0)
+        with patch.object(LLMService, 'chat', side_effect=error):
+            response = authenticated_client.post(
+                f'/chat/agent/{agent.id}/message',
+                json={'message': 'Hi', 'api_key': 'sk-ant-test'}
+            )
+
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '11'
+        assert response.get_json()['retryable'] is True
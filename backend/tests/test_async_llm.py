@@ -0,0 +1,425 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for the async streaming chat path and the ASGI server mode
+"""
+import asyncio
+import json
+import threading
+import pytest
+from unittest.mock import patch
+
+from app.admission import AdmissionController, LLMAdmissionError
+from app.asgi import PooledWsgiInstance, clean_history, create_asgi_app
+from app.async_llm import AsyncAnthropicProvider, AsyncLLMService, AsyncOpenAIProvider
+from app.llm_resilience import (
+    CircuitBreaker,
+    LLMAuthenticationError,
+    LLMOverloadedError,
+    RetryPolicy,
+    acall_with_resilience,
+    resilience
+)
+from app.models import Purchase
+
+
+@pytest.fixture(autouse=True)
+def reset_resilience():
+    resilience.reset()
+    yield
+    resilience.reset()
+
+
+def fake_stream(*chunks, fail_with=None):
+    """Replacement for AsyncLLMProvider.stream yielding the given text chunks."""
+    async def stream(self, system_prompt, messages, max_tokens=4096):
+        for chunk in chunks:
+            yield {'text': chunk}
+        if fail_with is not None:
+            raise fail_with
+        yield {'model': self.model, 'usage': {'input_tokens': 3, 'output_tokens': len(chunks), 'total_tokens': 3 + len(chunks)}}
+    return stream
+
+
+async def collect(events):
+    return [event async for event in events]
+
+
+class TestAsyncResilience:
+    """Test the coroutine retry loop"""
+
+    def test_retries_then_succeeds(self):
+        attempts = []
+
+        async def func(remaining):
+            attempts.append(remaining)
+            if len(attempts) < 2:
+                raise LLMOverloadedError('busy')
+            return 'ok'
+
+        async def no_sleep(delay):
+            pass
+
+        result = asyncio.run(acall_with_resilience(
+            func, provider='anthropic', breaker=CircuitBreaker('test'), policy=RetryPolicy(max_attempts=3),
+            classify=lambda e: e, sleep=no_sleep
+        ))
+        assert result == 'ok'
+        assert len(attempts) == 2
+
+    def test_non_retryable_error_raises(self):
+        async def func(remaining):
+            raise LLMAuthenticationError('bad key')
+
+        with pytest.raises(LLMAuthenticationError):
+            asyncio.run(acall_with_resilience(
+                func, provider='anthropic', breaker=CircuitBreaker('test'), policy=RetryPolicy(),
+                classify=lambda e: e
+            ))
+
+    def test_cancellation_releases_probe_slot(self):
+        breaker = CircuitBreaker('test', half_open_max_calls=1)
+        breaker.state = breaker.HALF_OPEN
+
+        async def func(remaining):
+            await asyncio.sleep(10)
+
+        async def run():
+            task = asyncio.ensure_future(acall_with_resilience(
+                func, provider='anthropic', breaker=breaker, policy=RetryPolicy(), classify=lambda e: e
+            ))
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        assert breaker.allow_request() is True
+
+
+class TestAsyncAdmission:
+    """Test coroutine waiters on the shared admission controller"""
+
+    def test_waiter_admitted_on_release(self):
+        controller = AdmissionController(max_per_user=1)
+
+        async def run():
+            ticket = await controller.acquire_async('u1')
+            waiter = asyncio.ensure_future(controller.acquire_async('u1', timeout=5))
+            await asyncio.sleep(0.01)
+            assert controller.stats()['queued'] == 1
+            controller.release(ticket)
+            controller.release(await waiter)
+
+        asyncio.run(run())
+        assert controller.stats() == {'enabled': True, 'in_flight': 0, 'queued': 0, 'max_in_flight': 32}
+
+    def test_queue_timeout(self):
+        controller = AdmissionController(max_per_user=1)
+
+        async def run():
+            await controller.acquire_async('u1')
+            with pytest.raises(LLMAdmissionError) as excinfo:
+                await controller.acquire_async('u1', timeout=0.01)
+            return excinfo.value
+
+        assert asyncio.run(run()).reason == 'queue_timeout'
+        assert controller.stats()['queued'] == 0
+
+    def test_cancelled_waiter_leaves_queue(self):
+        controller = AdmissionController(max_per_user=1)
+
+        async def run():
+            await controller.acquire_async('u1')
+            waiter = asyncio.ensure_future(controller.acquire_async('u1', timeout=5))
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+
+        asyncio.run(run())
+        assert controller.stats()['queued'] == 0
+        assert controller.stats()['in_flight'] == 1
+
+
+@patch('anthropic.AsyncAnthropic')
+@patch('openai.AsyncOpenAI')
+class TestAsyncLLMService:
+    """Test streaming chat with failover before the first token"""
+
+    def test_streams_deltas_then_result(self, mock_openai, mock_anthropic):
+        service = AsyncLLMService('anthropic', 'sk-ant-test')
+        with patch.object(AsyncAnthropicProvider, 'stream', fake_stream('Hel', 'lo')):
+            events = asyncio.run(collect(service.stream_chat('System', [], 'Hi', use_cache=False)))
+
+        assert [e['text'] for e in events if e['type'] == 'delta'] == ['Hel', 'lo']
+        done = events[-1]
+        assert done['type'] == 'done'
+        assert done['response'] == 'Hello'
+        assert done['provider'] == 'anthropic'
+        assert done['usage']['output_tokens'] == 2
+
+    def test_fails_over_before_first_token(self, mock_openai, mock_anthropic):
+        service = AsyncLLMService('anthropic', 'sk-ant-test', fallback_keys={'openai': 'sk-test'})
+        with patch.object(AsyncAnthropicProvider, 'stream', fake_stream(fail_with=LLMOverloadedError('busy'))), \
+                patch.object(AsyncOpenAIProvider, 'stream', fake_stream('From GPT')):
+            result = asyncio.run(service.chat('System', [], 'Hi', use_cache=False))
+
+        assert result['response'] == 'From GPT'
+        assert result['failover'] is True
+
+    def test_error_after_first_token_ends_stream(self, mock_openai, mock_anthropic):
+        service = AsyncLLMService('anthropic', 'sk-ant-test', fallback_keys={'openai': 'sk-test'})
+        received = []
+
+        async def run():
+            async for event in service.stream_chat('System', [], 'Hi', use_cache=False):
+                received.append(event)
+
+        with patch.object(AsyncAnthropicProvider, 'stream', fake_stream('partial', fail_with=LLMOverloadedError('busy'))), \
+                patch.object(AsyncOpenAIProvider, 'stream') as openai_stream:
+            with pytest.raises(LLMOverloadedError):
+                asyncio.run(run())
+
+        assert received == [{'type': 'delta', 'text': 'partial'}]
+        openai_stream.assert_not_called()
+
+    def test_cache_hits_need_a_working_key(self, mock_openai, mock_anthropic):
+        from app.llm_cache import LLMResponseCache
+        cache = LLMResponseCache(enabled=True)
+        with patch.object(AsyncAnthropicProvider, 'stream', fake_stream('Paid answer')):
+            asyncio.run(AsyncLLMService('anthropic', 'sk-ant-paying', cache=cache).chat('System', [], 'Hi'))
+
+        with patch.object(AsyncAnthropicProvider, 'stream', fake_stream(fail_with=LLMAuthenticationError('bad key'))):
+            with pytest.raises(LLMAuthenticationError):
+                asyncio.run(AsyncLLMService('anthropic', 'sk-ant-bogus', cache=cache).chat('System', [], 'Hi'))
+        assert asyncio.run(AsyncLLMService('anthropic', 'sk-ant-paying', cache=cache).chat('System', [], 'Hi'))['cached']
+
+    def test_admission_slot_released_after_stream(self, mock_openai, mock_anthropic):
+        controller = AdmissionController()
+        service = AsyncLLMService('anthropic', 'sk-ant-test', admission=controller, user_id=1)
+        with patch.object(AsyncAnthropicProvider, 'stream', fake_stream('ok')):
+            asyncio.run(service.chat('System', [], 'Hi', use_cache=False))
+        assert controller.stats()['in_flight'] == 0
+
+
+class ASGIClient:
+    """Drives an ASGI app with one request and records what it sends."""
+
+    def __init__(self, asgi_app, cookie=None, user_agent=None):
+        self.asgi_app = asgi_app
+        self.cookie = cookie
+        self.user_agent = user_agent
+
+    def scope(self, method, path):
+        headers = [(b'content-type', b'application/json')]
+        if self.cookie:
+            headers.append((b'cookie', f'session={self.cookie}'.encode()))
+        if self.user_agent:
+            headers.append((b'user-agent', self.user_agent.encode()))
+        return {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': headers, 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80)
+        }
+
+    def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else b''
+        scope = self.scope(method, path)
+        sent = []
+
+        async def run():
+            delivered = asyncio.Event()
+
+            async def receive():
+                if not delivered.is_set():
+                    delivered.set()
+                    return {'type': 'http.request', 'body': body, 'more_body': False}
+                # Client stays connected until the response is complete
+                await asyncio.sleep(3600)
+
+            async def send(message):
+                sent.append(message)
+
+            await self.asgi_app(scope, receive, send)
+
+        asyncio.run(run())
+        start = sent[0]
+        headers = {k.decode(): v.decode() for k, v in start['headers']}
+        body = b''.join(m.get('body', b'') for m in sent[1:])
+        return start['status'], headers, body
+
+
+def sse_events(body):
+    events = []
+    for block in body.decode().strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+@pytest.fixture
+def asgi_client(app, authenticated_client):
+    cookie = authenticated_client.get_cookie('session').value
+    return ASGIClient(create_asgi_app(app), cookie=cookie,
+                      user_agent=authenticated_client.environ_base['HTTP_USER_AGENT'])
+
+
+@pytest.fixture
+def purchase(db, user, agent):
+    purchase = Purchase(buyer_id=user.id, agent_id=agent.id, price_paid=9.99, is_active=True)
+    db.session.add(purchase)
+    db.session.commit()
+    return purchase
+
+
+@patch('anthropic.AsyncAnthropic')
+class TestASGIApp:
+    """Test the ASGI server mode"""
+
+    def test_other_routes_go_to_flask(self, mock_anthropic, app):
+        status, _, body = ASGIClient(create_asgi_app(app)).request('GET', '/health')
+        assert status == 200
+        assert json.loads(body)['status'] == 'healthy'
+
+    def test_stream_requires_login(self, mock_anthropic, app, agent):
+        status, _, _ = ASGIClient(create_asgi_app(app)).request('POST', f'/chat/agent/{agent.id}/stream',
+                                                                {'message': 'Hi'})
+        assert status == 401
+
+    def test_stream_requires_purchase(self, mock_anthropic, asgi_client, agent):
+        status, _, body = asgi_client.request('POST', f'/chat/agent/{agent.id}/stream',
+                                              {'message': 'Hi', 'api_key': 'sk-ant-test'})
+        assert status == 403
+
+    def test_streams_server_sent_events(self, mock_anthropic, asgi_client, agent, purchase):
+        history = [{'role': 'user', 'content': 'Earlier'}, {'role': 'assistant', 'content': 'Reply'}]
+        with patch.object(AsyncAnthropicProvider, 'stream', fake_stream('Hel', 'lo')), \
+                patch('app.asgi.usage_recorder.record') as record:
+            status, headers, body = asgi_client.request(
+                'POST', f'/chat/agent/{agent.id}/stream',
+                {'message': 'Hi', 'api_key': 'sk-ant-test', 'conversation_history': history}
+            )
+
+        assert status == 200, body
+        assert headers['content-type'].startswith('text/event-stream')
+        events = sse_events(body)
+        assert events[:2] == [('delta', {'text': 'Hel'}), ('delta', {'text': 'lo'})]
+        assert events[-1][0] == 'done'
+        assert events[-1][1]['response'] == 'Hello'
+        assert record.call_args.kwargs['agent_id'] == agent.id
+
+    def test_admission_rejection_is_429(self, mock_anthropic, asgi_client, agent, purchase):
+        rejected = LLMAdmissionError('busy', 'queue_full', retry_after=1.0)
+        with patch('app.asgi.AsyncLLMService.stream_chat', side_effect=lambda *a, **k: _raise_async(rejected)):
+            status, headers, body = asgi_client.request('POST', f'/chat/agent/{agent.id}/stream',
+                                                        {'message': 'Hi', 'api_key': 'sk-ant-test'})
+        assert status == 429
+        assert headers['retry-after'] == '2'
+        assert json.loads(body)['retryable'] is True
+
+    def test_error_after_first_token_is_sent_in_band(self, mock_anthropic, asgi_client, agent, purchase):
+        with patch.object(AsyncAnthropicProvider, 'stream', fake_stream('part', fail_with=LLMOverloadedError('busy'))):
+            status, _, body = asgi_client.request('POST', f'/chat/agent/{agent.id}/stream',
+                                                  {'message': 'Hi', 'api_key': 'sk-ant-test'})
+        assert status == 200
+        assert sse_events(body)[-1] == ('error', {'error': 'busy', 'retryable': True})
+
+    def test_unexpected_error_before_first_token_is_500(self, mock_anthropic, asgi_client, agent, purchase):
+        with patch('app.asgi.AsyncLLMService.stream_chat', side_effect=lambda *a, **k: _raise_async(KeyError('x'))):
+            status, headers, body = asgi_client.request('POST', f'/chat/agent/{agent.id}/stream',
+                                                        {'message': 'Hi', 'api_key': 'sk-ant-test'})
+        assert status == 500
+        assert json.loads(body) == {'error': 'Chat failed'}
+
+    def test_unexpected_error_after_first_token_is_sent_in_band(self, mock_anthropic, asgi_client, agent, purchase):
+        with patch.object(AsyncAnthropicProvider, 'stream', fake_stream('part', fail_with=KeyError('x'))):
+            status, _, body = asgi_client.request('POST', f'/chat/agent/{agent.id}/stream',
+                                                  {'message': 'Hi', 'api_key': 'sk-ant-test'})
+        assert status == 200
+        assert sse_events(body)[-1] == ('error', {'error': 'Chat failed', 'retryable': False})
+
+    def test_disconnect_before_first_token_stops_the_wait(self, mock_anthropic, asgi_client, agent, purchase):
+        closed = []
+
+        async def stalled(*args, **kwargs):
+            try:
+                await asyncio.sleep(3600)
+                yield {'type': 'delta', 'text': 'late'}
+            finally:
+                closed.append(True)
+
+        payload = json.dumps({'message': 'Hi', 'api_key': 'sk-ant-test'}).encode()
+        messages = iter([{'type': 'http.request', 'body': payload}, {'type': 'http.disconnect'}])
+        sent = []
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = asgi_client.scope('POST', f'/chat/agent/{agent.id}/stream')
+        with patch('app.asgi.AsyncLLMService.stream_chat', side_effect=stalled):
+            asyncio.run(asyncio.wait_for(asgi_client.asgi_app(scope, receive, send), 5))
+        assert sent == []
+        assert closed == [True]
+
+    def test_flask_requests_use_the_pooled_runner(self, mock_anthropic, app):
+        # Fails if asgiref's WsgiToAsgiInstance stops handing the buffered body to run_wsgi_app
+        with patch.object(PooledWsgiInstance, '_run_wsgi_app', autospec=True,
+                          side_effect=PooledWsgiInstance._run_wsgi_app) as run:
+            status, _, _ = ASGIClient(create_asgi_app(app)).request('GET', '/health')
+        assert status == 200
+        run.assert_called_once()
+
+    def test_flask_requests_run_concurrently(self, mock_anthropic, app):
+        # Both requests must be inside the route at once for either to get past the barrier
+        barrier = threading.Barrier(2, timeout=5)
+
+        @app.route('/test/barrier')
+        def wait_at_barrier():
+            barrier.wait()
+            return 'ok'
+
+        client = ASGIClient(create_asgi_app(app))
+
+        async def both():
+            return await asyncio.gather(*(asyncio.to_thread(client.request, 'GET', '/test/barrier') for _ in range(2)))
+
+        assert [status for status, _, _ in asyncio.run(both())] == [200, 200]
+
+    def test_lifespan_flushes_usage_on_shutdown(self, mock_anthropic, app):
+        messages = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        sent = []
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        with patch('app.asgi.usage_recorder.shutdown') as shutdown:
+            asyncio.run(create_asgi_app(app)({'type': 'lifespan'}, receive, send))
+        assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+        shutdown.assert_called_once()
+
+
+async def _raise_async(error):
+    raise error
+    yield  # pragma: no cover
+
+
+class TestCleanHistory:
+    """Test validation of client-held history"""
+
+    def test_drops_malformed_turns(self):
+        history = [{'role': 'system', 'content': 'x'}, {'role': 'user', 'content': 1}, 'bad',
+                   {'role': 'user', 'content': 'ok', 'extra': True}]
+        assert clean_history(history) == [{'role': 'user', 'content': 'ok'}]
+
+    def test_keeps_last_twenty(self):
+        history = [{'role': 'user', 'content': str(i)} for i in range(30)]
+        assert clean_history(history)[0]['content'] == '10'
+        assert clean_history('nope') == []
@@ -0,0 +1,102 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for the benchmark suite (seeding, load generator, statistics)
+"""
+import io
+import random
+import zipfile
+import pytest
+
+from app.agent_package import AgentPackageValidator
+from app.models import (
+    Agent, AgentRecommendation, AgentStats, MarketplaceFacetCount, MarketplaceListing, Purchase, Review, User
+)
+from app.search import semantic_search
+from app.similarity import similar_agents
+from benchmarks.run import build_package
+from benchmarks.seed import popularity_counts, seed_catalog
+from benchmarks.stats import compare, percentile, summarize
+
+
+class TestStats:
+    """Test percentiles, summaries and baseline comparison"""
+
+    def test_percentile_interpolates(self):
+        values = [0.1, 0.2, 0.3, 0.4, 0.5]
+        assert percentile(values, 50) == 0.3
+        assert percentile(values, 100) == 0.5
+        assert percentile(values, 95) == pytest.approx(0.48)
+        assert percentile([], 99) == 0.0
+
+    def test_summarize_per_operation(self):
+        samples = [('detail', True, 0.1), ('detail', False, 0.3), ('marketplace', True, 0.2)]
+        summary = summarize(samples, duration=2.0)
+
+        assert summary['total']['requests'] == 3
+        assert summary['total']['throughput_rps'] == 1.5
+        assert summary['operations']['detail']['errors'] == 1
+        assert summary['operations']['detail']['error_rate'] == 0.5
+        assert summary['operations']['marketplace']['p50_ms'] == 200.0
+
+    def test_compare_flags_regressions(self):
+        base = summarize([('detail', True, 0.1)] * 100, duration=10.0)
+        slower = summarize([('detail', True, 0.2)] * 50, duration=10.0)
+
+        regressions = compare(base, slower)
+        assert any('detail: p95' in r for r in regressions)
+        assert any('throughput' in r for r in regressions)
+        assert compare(base, base) == []
+
+
+class TestSeed:
+    """Test the synthetic catalog"""
+
+    def test_popularity_counts(self):
+        counts = popularity_counts(1000, 50, cap=100, rng=random.Random(1))
+        assert sum(counts) == 1000
+        assert max(counts) <= 100
+        assert max(counts) > 5 * min(counts)
+
+    def test_seed_catalog(self, db):
+        manifest = seed_catalog(db, agents=20, users=50, purchases=300, reviews=200, batch_size=64,
+                                log=lambda message: None)
+
+        assert Agent.query.count() == 20
+        assert User.query.count() == 50
+        assert Purchase.query.count() == 300
+        assert Review.query.count() == 200
+
+        # Reviews are by buyers, and stats match the rows
+        review = Review.query.first()
+        assert Purchase.query.filter_by(agent_id=review.agent_id, buyer_id=review.reviewer_id).count() == 1
+        stats = AgentStats.query.filter_by(agent_id=review.agent_id).one()
+        assert stats.purchase_count == Purchase.query.filter_by(agent_id=review.agent_id).count()
+
+        # Derived tables the flush hooks would have kept current
+        assert MarketplaceListing.query.count() == 20
+        assert sum(count.agent_count for count in MarketplaceFacetCount.query) == 20
+        assert MarketplaceListing.query.filter(MarketplaceListing.ranking_score > 0).count() == 20
+        assert AgentRecommendation.query.count() > 0
+        assert len(similar_agents.index) == 20
+        assert len(semantic_search.index) == 20
+
+        username, agent_id = manifest['buyers'][0]
+        buyer = User.query.filter_by(username=username).one()
+        assert buyer.check_password(manifest['password'])
+        assert Purchase.query.filter_by(buyer_id=buyer.id, agent_id=agent_id).count() == 1
+
+    def test_rejects_more_reviews_than_purchases(self, db):
+        with pytest.raises(ValueError):
+            seed_catalog(db, agents=2, users=2, purchases=2, reviews=3)
+
+
+class TestLoadGenerator:
+    """Test load generator helpers"""
+
+    def test_generated_package_is_valid(self, tmp_path):
+        path = tmp_path / 'bench.sagent'
+        path.write_bytes(build_package(random.Random(1), ['education']))
+        assert zipfile.is_zipfile(io.BytesIO(path.read_bytes()))
+        assert AgentPackageValidator().validate_package(str(path))['valid'] is True
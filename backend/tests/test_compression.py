@@ -0,0 +1,146 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for response compression
+"""
+import gzip
+import zlib
+
+import pytest
+from flask import Response, jsonify
+
+from app import compression as compression_module
+from app.compression import compressed_chunks, compression, gzip_encoder
+
+GZIP = {'Accept-Encoding': 'gzip, deflate'}
+
+
+@pytest.fixture
+def routes(app):
+    """Test-only routes, added before the first request."""
+    @app.route('/test/stream')
+    def stream():
+        return Response((f'line {number}\n' for number in range(200)), mimetype='text/plain')
+
+    @app.route('/test/encoded')
+    def encoded():
+        response = Response(gzip.compress(b'x' * 2000), mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+        return response
+
+    @app.route('/test/no-transform')
+    def no_transform():
+        response = jsonify({'data': 'x' * 2000})
+        response.headers['Cache-Control'] = 'no-transform'
+        return response
+
+    @app.route('/test/image')
+    def image():
+        return Response(b'\x89PNG' + b'\x00' * 2000, mimetype='image/png')
+
+
+class TestBufferedResponses:
+    """Test compressing whole bodies"""
+
+    def test_page_is_gzipped(self, client, agent):
+        plain = client.get('/agents/')
+        compressed = client.get('/agents/', headers=GZIP)
+
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(compressed.data) == plain.data
+        assert int(compressed.headers['Content-Length']) == len(compressed.data) < len(plain.data)
+        assert 'Accept-Encoding' in compressed.vary and 'Accept-Encoding' in plain.vary
+        assert 'Content-Encoding' not in plain.headers
+
+    def test_small_bodies_are_sent_as_is(self, client, agent):
+        response = client.get(f'/agents/{agent.id}/reviews', headers=GZIP)
+        assert len(response.data) < compression.min_size
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_json() == {'reviews': [], 'next_cursor': None}
+
+    def test_refused_encodings(self, client, agent):
+        assert 'Content-Encoding' not in client.get('/agents/', headers={'Accept-Encoding': 'gzip;q=0'}).headers
+        assert 'Content-Encoding' not in client.get('/agents/', headers={'Accept-Encoding': 'identity'}).headers
+        any_encoding = client.get('/agents/', headers={'Accept-Encoding': '*'})
+        assert any_encoding.headers['Content-Encoding'] == compression.encodings[0]
+
+    def test_brotli_is_preferred_when_installed(self, client, agent):
+        brotli = pytest.importorskip('brotli')
+        response = client.get('/agents/', headers={'Accept-Encoding': 'gzip, br'})
+        assert response.headers['Content-Encoding'] == 'br'
+        assert brotli.decompress(response.data) == client.get('/agents/').data
+
+    def test_gzip_only_without_brotli(self, client, agent, monkeypatch):
+        monkeypatch.setattr(compression_module, 'brotli', None)
+        response = client.get('/agents/', headers={'Accept-Encoding': 'br'})
+        assert 'Content-Encoding' not in response.headers
+        assert client.get('/agents/', headers={'Accept-Encoding': 'br, gzip'}).headers['Content-Encoding'] == 'gzip'
+
+    def test_static_file(self, client):
+        plain = client.get('/static/css/style.css')
+        compressed = client.get('/static/css/style.css', headers=GZIP)
+        assert gzip.decompress(compressed.data) == plain.data
+        assert compressed.headers['ETag'].startswith('W/')
+        assert 'Accept-Ranges' not in compressed.headers
+        plain.close()
+        compressed.close()
+
+    def test_revalidation_keeps_working(self, client, agent):
+        first = client.get('/agents/', headers=GZIP)
+        again = client.get('/agents/', headers=dict(GZIP, **{'If-None-Match': first.headers['ETag']}))
+        assert again.status_code == 304
+        assert 'Content-Encoding' not in again.headers
+        assert 'Accept-Encoding' in again.vary
+
+    def test_disabled(self, client, agent, monkeypatch):
+        monkeypatch.setattr(compression, 'enabled', False)
+        assert 'Content-Encoding' not in client.get('/agents/', headers=GZIP).headers
+
+
+class TestLeftAlone:
+    """Test responses that must not be compressed"""
+
+    def test_already_encoded_is_not_compressed_twice(self, client, routes):
+        response = client.get('/test/encoded', headers=GZIP)
+        assert gzip.decompress(response.data) == b'x' * 2000
+
+    def test_no_transform(self, client, routes):
+        response = client.get('/test/no-transform', headers=GZIP)
+        assert 'Content-Encoding' not in response.headers
+
+    def test_types_outside_the_allowlist(self, client, routes):
+        response = client.get('/test/image', headers=GZIP)
+        assert 'Content-Encoding' not in response.headers
+        assert 'Accept-Encoding' not in response.vary
+
+
+class TestStreaming:
+    """Test streamed bodies"""
+
+    def test_each_chunk_is_flushed(self):
+        chunks = [b'first chunk ', b'', b'second chunk ', b'third']
+        decoder = zlib.decompressobj(31)
+        pieces = list(compressed_chunks(iter(chunks), gzip_encoder(6)))
+
+        # Every piece but the trailer decodes to its chunk on arrival, without waiting for the next
+        assert [decoder.decompress(piece) for piece in pieces[:-1]] == [b'first chunk ', b'second chunk ', b'third']
+        assert decoder.decompress(pieces[-1]) == b''
+        assert decoder.eof
+
+    def test_source_is_closed(self):
+        closed = []
+
+        class Source(list):
+            def close(self):
+                closed.append(True)
+
+        source = Source([b'data'])
+        list(compressed_chunks(iter(source), gzip_encoder(6), source))
+        assert closed == [True]
+
+    def test_streamed_route(self, client, routes):
+        response = client.get('/test/stream', headers=GZIP)
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Length' not in response.headers
+        assert gzip.decompress(response.data) == ''.join(f'line {number}\n' for number in range(200)).encode()
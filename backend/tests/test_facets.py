@@ -0,0 +1,130 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for marketplace facets
+"""
+from importlib import import_module
+
+import pytest
+from sqlalchemy import text
+
+from app.facets import price_band, stored_counts
+from app.listings import listings
+from app.migrations import Operations
+from app.models import MarketplaceFacetCount
+
+JSON = {'Content-Type': 'application/json'}
+
+
+@pytest.fixture(autouse=True)
+def read_model_enabled():
+    listings.enabled = True
+    yield
+    listings.enabled = True
+
+
+@pytest.fixture
+def catalog(listed_agent):
+    """Education: free, 5.0, 25.0; travel: 5.0, 80.0"""
+    return {name: listed_agent(name, category=category, price=price)
+            for name, category, price in [('Tutor', 'education', 0.0), ('Flashcards', 'education', 5.0),
+                                          ('Essay coach', 'education', 25.0), ('Planner', 'travel', 5.0),
+                                          ('Concierge', 'travel', 80.0)]}
+
+
+def facet_counts(client, query=''):
+    response = client.get(f'/agents/facets{query}', headers=JSON)
+    assert response.status_code == 200
+    data = response.get_json()
+    return ({c['value']: c['count'] for c in data['categories']},
+            {b['value']: b['count'] for b in data['price_bands']},
+            data['total'])
+
+
+class TestPriceBands:
+    """Test band boundaries"""
+
+    @pytest.mark.parametrize('price,band', [(None, 'free'), (0.0, 'free'), (0.5, 'under_10'), (10.0, '10_to_50'),
+                                            (49.99, '10_to_50'), (50.0, '50_plus')])
+    def test_band(self, price, band):
+        assert price_band(price) == band
+
+
+class TestMaintenance:
+    """Counts follow the listing"""
+
+    def test_counts_track_approval_price_and_category(self, db, catalog):
+        assert stored_counts(db.session)[('education', 'under_10')] == 1
+
+        catalog['Flashcards'].pricing.price = 60.0
+        catalog['Planner'].category = 'education'
+        catalog['Concierge'].is_active = False
+        db.session.commit()
+
+        counts = stored_counts(db.session)
+        assert counts[('education', '50_plus')] == 1
+        assert counts[('education', 'under_10')] == 1
+        assert counts[('travel', 'under_10')] == 0
+        assert ('travel', '50_plus') not in counts
+
+    def test_stats_updates_leave_counts_alone(self, db, catalog, query_budget):
+        catalog['Tutor'].stats.purchase_count = 3
+        with query_budget(5):  # UPDATE, listing SELECT / DELETE / INSERT / SELECT, no facet writes
+            db.session.commit()
+
+    def test_rebuild_matches_incremental_counts(self, db, catalog):
+        incremental = stored_counts(db.session)
+        db.session.execute(MarketplaceFacetCount.__table__.delete())
+        listings.rebuild(db.session.connection())
+        assert stored_counts(db.session) == incremental
+
+
+class TestFacetEndpoint:
+    """Test /agents/facets"""
+
+    def test_all_listed_agents(self, client, catalog):
+        categories, bands, total = facet_counts(client)
+        assert categories == {'education': 3, 'travel': 2}
+        assert bands == {'free': 1, 'under_10': 2, '10_to_50': 1, '50_plus': 1}
+        assert total == 5
+
+    def test_each_facet_ignores_its_own_selection(self, client, catalog):
+        categories, bands, total = facet_counts(client, '?category=travel&price_band=under_10')
+        assert categories == {'education': 1, 'travel': 1}
+        assert bands == {'free': 0, 'under_10': 1, '10_to_50': 0, '50_plus': 1}
+        assert total == 1
+
+    def test_reads_precomputed_counts_only(self, client, catalog, query_budget):
+        with query_budget(1) as tracker:
+            facet_counts(client)
+        assert 'marketplace_facet_count' in tracker.statements[0][0]
+
+    def test_combined_with_search(self, client, catalog):
+        categories, bands, total = facet_counts(client, '?search=planner')
+        assert categories == {'travel': 1}
+        assert total == 1
+
+    def test_same_counts_without_read_model(self, client, catalog):
+        expected = facet_counts(client, '?category=education')
+        listings.enabled = False
+        assert facet_counts(client, '?category=education') == expected
+
+    def test_marketplace_price_band_filter(self, client, catalog):
+        response = client.get('/agents/?price_band=under_10&category=education', headers=JSON)
+        assert [agent['name'] for agent in response.get_json()['agents']] == ['Flashcards']
+
+        listings.enabled = False
+        response = client.get('/agents/?price_band=under_10&category=education', headers=JSON)
+        assert [agent['name'] for agent in response.get_json()['agents']] == ['Flashcards']
+
+
+class TestMigration:
+    """Test filling counts from an existing listing table"""
+
+    def test_counts_match_rebuild(self, db, catalog):
+        expected = stored_counts(db.session)
+        db.session.execute(text('DELETE FROM marketplace_facet_count'))
+        import_module('app.migrations.versions.0007_marketplace_facets').upgrade(
+            Operations(db.session.connection(), db.metadata))
+        assert stored_counts(db.session) == expected
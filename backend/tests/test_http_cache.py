@@ -0,0 +1,216 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for HTTP conditional requests on the catalog pages
+"""
+import numpy as np
+import pytest
+from flask import g
+
+from app import ranking
+from app.http_cache import http_cache
+from app.listings import listings
+from app.models import Purchase, Review
+from app.ranking import ranking_job
+from tests.conftest import _login
+
+JSON = {'Content-Type': 'application/json'}
+
+
+def revalidate(client, url, response, **headers):
+    """GET url again with the validators of an earlier response."""
+    return client.get(url, headers=dict(headers, **{'If-None-Match': response.headers['ETag']}))
+
+
+class TestMarketplace:
+    """Test validators on /agents/"""
+
+    def test_repeat_get_is_not_modified(self, client, agent):
+        first = client.get('/agents/')
+        assert first.status_code == 200
+        assert first.headers['ETag'].startswith('W/"')
+        assert first.headers['Cache-Control'] == 'public, no-cache'
+        assert {'Cookie', 'Content-Type'} <= set(first.vary)
+
+        again = revalidate(client, '/agents/', first)
+        assert again.status_code == 304
+        assert again.data == b''
+        assert again.headers['ETag'] == first.headers['ETag']
+        assert again.headers['Cache-Control'] == 'public, no-cache'
+
+        since = client.get('/agents/', headers={'If-Modified-Since': first.headers['Last-Modified']})
+        assert since.status_code == 304
+
+    def test_not_modified_reads_only_the_version(self, client, agent, query_budget):
+        first = client.get('/agents/')
+        with query_budget(1):
+            assert revalidate(client, '/agents/', first).status_code == 304
+
+    def test_representations_have_their_own_tags(self, client, agent):
+        html = client.get('/agents/')
+        tags = {html.headers['ETag'],
+                client.get('/agents/', headers=JSON).headers['ETag'],
+                client.get('/agents/?category=education').headers['ETag']}
+        assert len(tags) == 3
+        assert revalidate(client, '/agents/', html, **JSON).status_code == 200
+
+    def test_semantic_search_follows_the_index(self, client, db, agent):
+        from app.search import semantic_search
+
+        url = '/agents/?search=test&mode=semantic'
+        first = client.get(url)
+        assert revalidate(client, url, first).status_code == 304
+
+        # A rebuild (here or by another worker) changes the results without touching a listing
+        semantic_search.run(db.session)
+        assert revalidate(client, url, first).status_code == 200
+
+    def test_listing_changes(self, client, db, agent, seller):
+        first = client.get('/agents/')
+        agent.pricing.price = 19.99
+        db.session.commit()
+        priced = revalidate(client, '/agents/', first)
+        assert priced.status_code == 200
+
+        # Leaving the marketplace deletes the row; the facet count's stamp still moves
+        before = listings.last_modified(db.session)
+        agent.is_active = False
+        db.session.commit()
+        assert listings.last_modified(db.session) > before
+        assert revalidate(client, '/agents/', priced).status_code == 200
+
+    def test_ranking_run_changes_the_order_version(self, client, db, agent):
+        first = client.get('/agents/')
+        ranking_job.run(db.session)
+        db.session.commit()
+        ranked = revalidate(client, '/agents/', first)
+        assert ranked.status_code == 200
+
+        # Scores that did not move leave the version alone
+        ranking_job.run(db.session)
+        db.session.commit()
+        assert revalidate(client, '/agents/', ranked).status_code == 304
+
+    def test_small_score_changes_add_up(self, client, db, listed_agent, monkeypatch):
+        leader, follower = listed_agent('Leader'), listed_agent('Follower')
+        scores = {leader.id: 1.0015, follower.id: 1.0}
+        monkeypatch.setattr(ranking, 'compute_scores',
+                            lambda signals, weights: np.array([scores[int(i)] for i in signals['agent_ids']]))
+        ranking_job.run(db.session)
+        db.session.commit()
+        first = client.get('/agents/', headers=JSON)
+        assert [agent['name'] for agent in first.get_json()['agents']] == ['Leader', 'Follower']
+
+        # Each run moves the follower less than SCORE_EPSILON; together they overtake the leader
+        for _ in range(2):
+            scores[follower.id] += 0.0009
+            ranking_job.run(db.session)
+            db.session.commit()
+        reordered = revalidate(client, '/agents/', first, **JSON)
+        assert reordered.status_code == 200
+        assert [agent['name'] for agent in reordered.get_json()['agents']] == ['Follower', 'Leader']
+
+    def test_signed_in_responses_are_private(self, app, client, agent, user):
+        anonymous = app.test_client().get('/agents/')
+        # Requests share the fixture's app context, where flask_login keeps the user it loaded
+        g.pop('_login_user', None)
+        _login(client, user)
+        signed_in = client.get('/agents/')
+        assert signed_in.headers['Cache-Control'] == 'private, no-cache'
+        assert signed_in.headers['ETag'] != anonymous.headers['ETag']
+        assert revalidate(client, '/agents/', anonymous).status_code == 200
+
+    def test_pending_flash_is_never_cached(self, client, agent):
+        first = client.get('/agents/')
+        with client.session_transaction() as sess:
+            sess['_flashes'] = [('success', 'Saved')]
+        response = revalidate(client, '/agents/', first)
+        assert response.status_code == 200
+        assert 'ETag' not in response.headers
+
+    def test_disabled(self, client, agent, monkeypatch):
+        monkeypatch.setattr(http_cache, 'enabled', False)
+        assert 'ETag' not in client.get('/agents/').headers
+
+    def test_max_age_for_anonymous_visitors(self, client, agent, monkeypatch):
+        monkeypatch.setattr(http_cache, 'max_age', 60)
+        assert client.get('/agents/').headers['Cache-Control'] == 'public, max-age=60'
+
+
+class TestDetail:
+    """Test validators on /agents/<id>"""
+
+    def test_repeat_get_is_not_modified(self, client, agent):
+        url = f'/agents/{agent.id}'
+        first = client.get(url, headers=JSON)
+        again = revalidate(client, url, first, **JSON)
+        assert again.status_code == 304
+        assert client.get('/agents/9999', headers={'If-None-Match': first.headers['ETag']}).status_code == 404
+
+    def test_ranking_run_leaves_the_page_alone(self, client, db, agent):
+        url = f'/agents/{agent.id}'
+        first = client.get(url)
+        ranking_job.run(db.session)
+        db.session.commit()
+        assert revalidate(client, url, first).status_code == 304
+
+        agent.pricing.price = 19.99
+        db.session.commit()
+        assert revalidate(client, url, first).status_code == 200
+
+    def test_new_and_edited_reviews(self, client, db, agent, user):
+        url = f'/agents/{agent.id}'
+        first = client.get(url)
+        review = Review(agent_id=agent.id, reviewer_id=user.id, rating=4, comment='Good')
+        db.session.add(review)
+        db.session.commit()
+        reviewed = revalidate(client, url, first)
+        assert reviewed.status_code == 200
+
+        review.comment = 'Very good'
+        db.session.commit()
+        assert revalidate(client, url, reviewed).status_code == 200
+
+    def test_purchase_changes_the_buyers_page(self, authenticated_client, db, agent, user):
+        url = f'/agents/{agent.id}'
+        first = authenticated_client.get(url)
+        assert first.headers['Cache-Control'] == 'private, no-cache'
+        assert revalidate(authenticated_client, url, first).status_code == 304
+
+        db.session.add(Purchase(buyer_id=user.id, agent_id=agent.id, price_paid=9.99))
+        db.session.commit()
+        assert revalidate(authenticated_client, url, first).status_code == 200
+
+
+class TestTemplates:
+    """Test validators on the agent template pages"""
+
+    @pytest.mark.parametrize('url', ['/agent/create/from-template', '/agent/create/from-template/math_tutor'])
+    def test_repeat_get_is_not_modified(self, seller_client, url):
+        first = seller_client.get(url)
+        assert first.status_code == 200
+        assert first.headers['Cache-Control'] == 'private, no-cache'
+        assert revalidate(seller_client, url, first).status_code == 304
+
+    def test_buyers_are_still_redirected(self, authenticated_client):
+        response = authenticated_client.get('/agent/create/from-template')
+        assert response.status_code == 302
+        assert 'ETag' not in response.headers
+
+
+class TestRelease:
+    """Test the release part of every tag"""
+
+    def test_fingerprint_is_stable(self, app):
+        token, modified = http_cache.release()
+        http_cache.init_app(app)
+        assert http_cache.release() == (token, modified)
+        assert modified is not None
+
+    def test_configured_version(self, app, client, agent):
+        first = client.get('/agents/')
+        app.config['HTTP_CACHE_VERSION'] = 'release-42'
+        http_cache.init_app(app)
+        assert http_cache.release()[0] == 'release-42'
+        assert revalidate(client, '/agents/', first).status_code == 200
@@ -0,0 +1,121 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Query plan tests - the hot filters must be served by the composite indexes
+
+Set TEST_POSTGRES_URL to also check the plans on PostgreSQL.
+"""
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.exc import IntegrityError
+
+from app import db as _db
+from app.models import Agent, AgentStats, MarketplaceListing, Purchase, Review
+
+POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+# Statement builders mirroring the routes, paired with the index each one must use
+HOT_QUERIES = {
+    'purchase_access': (
+        lambda: select(Purchase).filter_by(buyer_id=1, agent_id=2, is_active=True).limit(1),
+        'ix_purchase_buyer_agent_active'
+    ),
+    'my_purchases': (
+        lambda: select(Purchase).filter_by(buyer_id=1, is_active=True).order_by(Purchase.purchased_at.desc()),
+        'ix_purchase_buyer_active_purchased'
+    ),
+    'agent_reviews': (
+        lambda: select(Review).filter_by(agent_id=1, is_visible=True).where(
+            Review.created_at <= datetime(2025, 1, 1), (Review.created_at < datetime(2025, 1, 1)) | (Review.id < 50)
+        ).order_by(Review.created_at.desc(), Review.id.desc()),
+        'ix_review_agent_visible_created'
+    ),
+    'existing_review': (
+        lambda: select(Review).filter_by(reviewer_id=1, agent_id=2).limit(1),
+        'uq_review_reviewer_agent'
+    ),
+    'marketplace_category': (
+        lambda: select(Agent).filter_by(is_approved=True, is_active=True, category='coding').outerjoin(
+            AgentStats, Agent.id == AgentStats.agent_id
+        ).order_by(AgentStats.average_rating.desc(), AgentStats.purchase_count.desc()),
+        'ix_agent_listing'
+    ),
+    'listing_last_modified': (
+        lambda: select(func.max(MarketplaceListing.updated_at)),
+        'ix_marketplace_listing_updated'
+    ),
+}
+
+
+def explain(connection, statement):
+    """Query plan text for statement, one line per plan node."""
+    sql = str(statement.compile(connection, compile_kwargs={'literal_binds': True}))
+    if connection.dialect.name == 'sqlite':
+        return '\n'.join(row.detail for row in connection.execute(text(f'EXPLAIN QUERY PLAN {sql}')))
+    return '\n'.join(row[0] for row in connection.execute(text(f'EXPLAIN {sql}')))
+
+
+class TestSQLitePlans:
+    """Test the plans on SQLite"""
+
+    @pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+    def test_hot_query_uses_index(self, db, name):
+        build, index = HOT_QUERIES[name]
+        plan = explain(db.session.connection(), build())
+        assert index in plan
+
+    def test_sorted_queries_need_no_sort_step(self, db):
+        for name in ('my_purchases', 'agent_reviews'):
+            build, _ = HOT_QUERIES[name]
+            assert 'TEMP B-TREE' not in explain(db.session.connection(), build())
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason='TEST_POSTGRES_URL not set')
+class TestPostgresPlans:
+    """Test the plans on PostgreSQL (in a throwaway schema)"""
+
+    @pytest.fixture
+    def connection(self):
+        engine = create_engine(POSTGRES_URL)
+        with engine.connect() as conn:
+            conn.execute(text('CREATE SCHEMA index_plan_test'))
+            conn.execute(text('SET search_path TO index_plan_test'))
+            _db.metadata.create_all(conn)
+            # Empty tables are cheapest to scan; make the planner show which index it would use
+            conn.execute(text('SET enable_seqscan = off'))
+            yield conn
+            conn.rollback()
+        engine.dispose()
+
+    @pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+    def test_hot_query_uses_index(self, connection, name):
+        build, index = HOT_QUERIES[name]
+        assert index in explain(connection, build())
+
+
+class TestReviewUniqueness:
+    """Test one review per user per agent"""
+
+    def test_second_review_row_is_rejected(self, db, user, agent):
+        db.session.add(Review(agent_id=agent.id, reviewer_id=user.id, rating=5))
+        db.session.commit()
+
+        db.session.add(Review(agent_id=agent.id, reviewer_id=user.id, rating=1))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+    def test_resubmitting_updates_the_review(self, authenticated_client, db, user, agent):
+        db.session.add(Purchase(buyer_id=user.id, agent_id=agent.id, price_paid=0.0))
+        db.session.commit()
+
+        for rating in (2, 4):
+            response = authenticated_client.post(f'/agents/{agent.id}/review', json={'rating': rating})
+            assert response.status_code == 201
+
+        reviews = Review.query.filter_by(reviewer_id=user.id, agent_id=agent.id).all()
+        assert [r.rating for r in reviews] == [4]
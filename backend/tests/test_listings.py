@@ -0,0 +1,135 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for the marketplace listing read model
+"""
+import pytest
+
+from app.http_cache import http_cache
+from app.listings import SHORT_DESCRIPTION_LENGTH, listings
+from app.models import MarketplaceListing
+
+JSON = {'Content-Type': 'application/json'}
+
+
+@pytest.fixture(autouse=True)
+def read_model_enabled():
+    listings.enabled = True
+    yield
+    listings.enabled = True
+
+
+def listing_row(db, agent_id):
+    db.session.expire_all()
+    return db.session.get(MarketplaceListing, agent_id)
+
+
+class TestMaintenance:
+    """Rows follow writes to the source tables"""
+
+    def test_new_agent_is_listed(self, db, agent, seller):
+        row = listing_row(db, agent.id)
+        assert (row.name, row.category, row.price, row.currency, row.creator_username) == \
+            ('Test Agent', 'education', 9.99, 'USD', seller.username)
+
+    def test_long_description_is_shortened(self, db, listed_agent):
+        agent = listed_agent('Verbose', description='x' * 1000)
+        row = listing_row(db, agent.id)
+        assert len(row.short_description) == SHORT_DESCRIPTION_LENGTH
+        assert row.description == 'x' * 1000
+
+    def test_stats_and_pricing_changes(self, db, agent):
+        agent.stats.purchase_count = 7
+        agent.pricing.price = 19.0
+        db.session.commit()
+
+        row = listing_row(db, agent.id)
+        assert (row.purchase_count, row.price) == (7, 19.0)
+
+    def test_creator_rename(self, db, agent, seller):
+        seller.username = 'renamed'
+        db.session.commit()
+        assert listing_row(db, agent.id).creator_username == 'renamed'
+
+    def test_unapproved_and_deactivated_agents_are_not_listed(self, db, listed_agent, agent):
+        pending = listed_agent('Pending', approved=False)
+        assert listing_row(db, pending.id) is None
+
+        pending.is_approved = True
+        db.session.commit()
+        assert listing_row(db, pending.id) is not None
+
+        agent.is_active = False
+        db.session.commit()
+        assert listing_row(db, agent.id) is None
+
+    def test_rolled_back_write_leaves_row_unchanged(self, db, agent):
+        agent.name = 'Renamed'
+        db.session.flush()
+        db.session.rollback()
+        assert listing_row(db, agent.id).name == 'Test Agent'
+
+    def test_purchase_and_review_routes(self, authenticated_client, db, user, agent):
+        authenticated_client.post(f'/agents/{agent.id}/purchase', headers=JSON)
+        authenticated_client.post(f'/agents/{agent.id}/review', json={'rating': 4})
+
+        row = listing_row(db, agent.id)
+        assert (row.purchase_count, row.average_rating) == (1, 4.0)
+
+    def test_rebuild(self, db, listed_agent):
+        for name in ('One', 'Two'):
+            listed_agent(name)
+        db.session.execute(MarketplaceListing.__table__.delete())
+
+        assert listings.rebuild(db.session.connection()) == 2
+        assert MarketplaceListing.query.count() == 2
+
+
+class TestReads:
+    """Listing pages read from the read model"""
+
+    @pytest.fixture
+    def catalog(self, db, listed_agent):
+        listed_agent('Popular', average_rating=4.8, purchase_count=120)
+        listed_agent('Newcomer', average_rating=4.8, purchase_count=2, category='travel',
+                     description='Plans trips ' + 'padding ' * 60 + 'itinerary')
+        listed_agent('Unrated')
+        db.session.expire_all()
+
+    def names(self, client, query=''):
+        response = client.get(f'/agents/{query}', headers=JSON)
+        assert response.status_code == 200
+        return [agent['name'] for agent in response.get_json()['agents']]
+
+    def test_ordering_filter_and_search(self, client, catalog):
+        assert self.names(client) == ['Popular', 'Newcomer', 'Unrated']
+        assert self.names(client, '?category=travel') == ['Newcomer']
+        # Beyond the stored short description
+        assert self.names(client, '?search=itinerary') == ['Newcomer']
+
+    def test_json_keeps_the_full_description(self, client, listed_agent):
+        listed_agent('Verbose', description='x' * 1000)
+        card = client.get('/agents/', headers=JSON).get_json()['agents'][0]
+        assert card['description'] == 'x' * 1000
+        assert card['short_description'] == 'x' * SHORT_DESCRIPTION_LENGTH
+
+    def test_marketplace_is_one_query(self, client, catalog, query_budget, monkeypatch):
+        # Not counting the validators' version read (see test_http_cache)
+        monkeypatch.setattr(http_cache, 'enabled', False)
+        with query_budget(1):
+            assert len(self.names(client)) == 3
+
+    def test_disabled_read_model_gives_same_listing(self, client, catalog):
+        listings.enabled = False
+        assert self.names(client) == ['Popular', 'Newcomer', 'Unrated']
+
+    def test_marketplace_page_renders(self, client, catalog):
+        response = client.get('/agents/')
+        assert b'Popular' in response.data
+
+    def test_detail_of_unlisted_agent(self, client, seller, listed_agent):
+        pending = listed_agent('Pending', approved=False)
+        response = client.get(f'/agents/{pending.id}', headers=JSON)
+        assert response.get_json()['agent']['price'] == 5.0
+        assert response.get_json()['agent']['creator'] == seller.username
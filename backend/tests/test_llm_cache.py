@@ -0,0 +1,246 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for the LLM response cache
+"""
+import pytest
+from unittest.mock import patch
+from app.llm_cache import LLMResponseCache, MemoryCacheBackend, DatabaseCacheBackend
+from app.llm_resilience import LLMAuthenticationError
+from app.llm_service import LLMService
+from app.models import User
+
+
+class TestCacheKey:
+    """Test request normalization and hashing"""
+
+    def test_same_request_same_key(self):
+        messages = [{'role': 'user', 'content': 'Hi'}]
+        key1 = LLMResponseCache.make_key('anthropic', 'model', 'System', messages, 4096)
+        key2 = LLMResponseCache.make_key('anthropic', 'model', 'System', list(messages), 4096)
+        assert key1 == key2
+        assert len(key1) == 64
+
+    def test_whitespace_is_normalized(self):
+        key1 = LLMResponseCache.make_key('anthropic', 'model', 'System ', [{'role': 'user', 'content': ' Hi\n'}], 4096)
+        key2 = LLMResponseCache.make_key('anthropic', 'model', 'System', [{'role': 'User', 'content': 'Hi'}], 4096)
+        assert key1 == key2
+
+    def test_different_model_different_key(self):
+        messages = [{'role': 'user', 'content': 'Hi'}]
+        key1 = LLMResponseCache.make_key('anthropic', 'model-a', 'System', messages, 4096)
+        key2 = LLMResponseCache.make_key('anthropic', 'model-b', 'System', messages, 4096)
+        assert key1 != key2
+
+    def test_history_changes_key(self):
+        key1 = LLMResponseCache.make_key('openai', 'gpt-4o', 'S', [{'role': 'user', 'content': 'Hi'}], 4096)
+        key2 = LLMResponseCache.make_key('openai', 'gpt-4o', 'S', [
+            {'role': 'assistant', 'content': 'Hello'},
+            {'role': 'user', 'content': 'Hi'}
+        ], 4096)
+        assert key1 != key2
+
+
+class TestMemoryCacheBackend:
+    """Test in-process LRU backend"""
+
+    def test_set_and_get(self):
+        backend = MemoryCacheBackend()
+        backend.set('k', {'response': 'x'}, ttl=60)
+        assert backend.get('k') == {'response': 'x'}
+
+    def test_missing_key(self):
+        assert MemoryCacheBackend().get('missing') is None
+
+    def test_expired_entry(self):
+        backend = MemoryCacheBackend()
+        with patch('app.llm_cache.time.monotonic', return_value=1000.0):
+            backend.set('k', {'response': 'x'}, ttl=10)
+        with patch('app.llm_cache.time.monotonic', return_value=1011.0):
+            assert backend.get('k') is None
+        assert len(backend) == 0
+
+    def test_lru_eviction(self):
+        backend = MemoryCacheBackend(max_entries=2)
+        backend.set('a', {'response': 'a'}, ttl=60)
+        backend.set('b', {'response': 'b'}, ttl=60)
+        backend.get('a')  # 'b' is now least recently used
+        backend.set('c', {'response': 'c'}, ttl=60)
+
+        assert backend.get('b') is None
+        assert backend.get('a') is not None
+        assert backend.get('c') is not None
+        assert backend.evictions == 1
+
+    def test_clear(self):
+        backend = MemoryCacheBackend()
+        backend.set('k', {'response': 'x'}, ttl=60)
+        backend.clear()
+        assert len(backend) == 0
+
+
+class TestDatabaseCacheBackend:
+    """Test shared database backend"""
+
+    def test_set_and_get(self, db):
+        backend = DatabaseCacheBackend()
+        backend.set('k' * 64, {'response': 'x', 'model': 'm'}, ttl=60)
+        assert backend.get('k' * 64) == {'response': 'x', 'model': 'm'}
+        assert len(backend) == 1
+
+    def test_overwrite(self, db):
+        backend = DatabaseCacheBackend()
+        backend.set('k', {'response': 'old'}, ttl=60)
+        backend.set('k', {'response': 'new'}, ttl=60)
+        assert backend.get('k') == {'response': 'new'}
+        assert len(backend) == 1
+
+    def test_same_key_stored_twice(self, db):
+        # Two workers missing on the same prompt both store the response
+        first, second = DatabaseCacheBackend(), DatabaseCacheBackend()
+        first.set('k', {'response': 'first'}, ttl=60)
+        second.set('k', {'response': 'second'}, ttl=60)
+        assert first.get('k') == {'response': 'second'}
+        assert len(first) == 1
+        # The request's session was never involved, so it still works
+        assert User.query.count() == 0
+
+    def test_route_session_is_left_alone(self, db):
+        db.session.add(User(username='pending', email='pending@example.com', password_hash='unused'))
+        backend = DatabaseCacheBackend()
+        backend.set('k', {'response': 'x'}, ttl=60)
+        backend.get('k')
+        db.session.rollback()
+        assert User.query.count() == 0
+        assert backend.get('k') == {'response': 'x'}
+
+    def test_expired_entry_removed(self, db):
+        backend = DatabaseCacheBackend()
+        backend.set('k', {'response': 'x'}, ttl=-1)
+        assert backend.get('k') is None
+        assert len(backend) == 0
+
+    def test_prune_enforces_max_entries(self, db):
+        backend = DatabaseCacheBackend(max_entries=2)
+        for key in ['a', 'b', 'c']:
+            backend.set(key, {'response': key}, ttl=60)
+        backend.prune()
+
+        assert len(backend) == 2
+        assert backend.get('a') is None
+        assert backend.evictions == 1
+
+    def test_clear(self, db):
+        backend = DatabaseCacheBackend()
+        backend.set('k', {'response': 'x'}, ttl=60)
+        backend.clear()
+        assert len(backend) == 0
+
+
+class TestLLMResponseCache:
+    """Test cache front-end and LLMService integration"""
+
+    def test_hit_and_miss_counters(self):
+        cache = LLMResponseCache(enabled=True)
+        assert cache.get('k') is None
+        cache.set('k', {'response': 'x'})
+        assert cache.get('k') == {'response': 'x'}
+
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+
+    def test_backend_failure_is_a_miss(self):
+        cache = LLMResponseCache(enabled=True)
+        with patch.object(cache.backend, 'get', side_effect=RuntimeError('down')):
+            assert cache.get('k') is None
+        assert cache.misses == 1
+
+    def test_init_app_reads_config(self, app):
+        app.config['LLM_CACHE_ENABLED'] = True
+        app.config['LLM_CACHE_BACKEND'] = 'database'
+        app.config['LLM_CACHE_TTL'] = 30
+        cache = LLMResponseCache()
+        cache.init_app(app)
+
+        assert cache.enabled is True
+        assert cache.ttl == 30
+        assert isinstance(cache.backend, DatabaseCacheBackend)
+        assert app.extensions['llm_cache'] is cache
+
+    def test_init_app_rejects_unknown_backend(self, app):
+        app.config['LLM_CACHE_BACKEND'] = 'nope'
+        with pytest.raises(ValueError, match="Unsupported LLM cache backend"):
+            LLMResponseCache().init_app(app)
+
+    @patch('anthropic.Anthropic')
+    @patch('app.llm_service.AnthropicProvider.chat')
+    def test_service_serves_repeat_from_cache(self, mock_chat, mock_anthropic):
+        mock_chat.return_value = {
+            'response': 'Hello!',
+            'model': 'claude-3-5-sonnet',
+            'usage': {'input_tokens': 10, 'output_tokens': 5, 'total_tokens': 15}
+        }
+        cache = LLMResponseCache(enabled=True)
+        service = LLMService('anthropic', 'sk-ant-test', cache=cache)
+
+        first = service.chat('You are helpful', [], 'Hi')
+        second = service.chat('You are helpful', [], 'Hi')
+
+        assert mock_chat.call_count == 1
+        assert first['cached'] is False
+        assert second['cached'] is True
+        assert second['response'] == 'Hello!'
+        assert second['usage']['total_tokens'] == 0
+
+    @patch('anthropic.Anthropic')
+    @patch('app.llm_service.AnthropicProvider.chat')
+    def test_invalid_key_is_not_served_from_cache(self, mock_chat, mock_anthropic):
+        mock_chat.return_value = {'response': 'Paid answer', 'model': 'm', 'usage': {}}
+        cache = LLMResponseCache(enabled=True)
+        LLMService('anthropic', 'sk-ant-paying', cache=cache).chat('S', [], 'Hi')
+
+        # A made-up key reaches the provider, which rejects it
+        mock_chat.side_effect = LLMAuthenticationError('Invalid API key')
+        bogus = LLMService('anthropic', 'sk-ant-bogus', cache=cache)
+        with pytest.raises(LLMAuthenticationError):
+            bogus.chat('S', [], 'Hi')
+        with pytest.raises(LLMAuthenticationError):
+            bogus.chat('S', [], 'Hi')
+        assert mock_chat.call_count == 3
+        assert cache.stats()['hits'] == 0
+
+    def test_verified_keys_are_stored_hashed(self):
+        cache = LLMResponseCache(enabled=True)
+        assert cache.has_verified_key('anthropic', 'sk-ant-test') is False
+        cache.verify_key('anthropic', 'sk-ant-test')
+
+        assert cache.has_verified_key('anthropic', 'sk-ant-test') is True
+        assert cache.has_verified_key('openai', 'sk-ant-test') is False
+        assert not any('sk-ant-test' in key for key in cache.backend._entries)
+
+    @patch('anthropic.Anthropic')
+    @patch('app.llm_service.AnthropicProvider.chat')
+    def test_service_bypass(self, mock_chat, mock_anthropic):
+        mock_chat.return_value = {'response': 'Hello!', 'model': 'm', 'usage': {}}
+        cache = LLMResponseCache(enabled=True)
+        service = LLMService('anthropic', 'sk-ant-test', cache=cache)
+
+        service.chat('S', [], 'Hi', use_cache=False)
+        service.chat('S', [], 'Hi', use_cache=False)
+
+        assert mock_chat.call_count == 2
+        assert cache.stats()['misses'] == 0
+
+    @patch('anthropic.Anthropic')
+    @patch('app.llm_service.AnthropicProvider.chat')
+    def test_disabled_cache_is_ignored(self, mock_chat, mock_anthropic):
+        mock_chat.return_value = {'response': 'Hello!', 'model': 'm', 'usage': {}}
+        service = LLMService('anthropic', 'sk-ant-test', cache=LLMResponseCache(enabled=False))
+
+        service.chat('S', [], 'Hi')
+        service.chat('S', [], 'Hi')
+
+        assert mock_chat.call_count == 2
@@ -0,0 +1,270 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for LLM retry, backoff and circuit breaker policy
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+from app.llm_resilience import (
+    LLMError,
+    LLMAuthenticationError,
+    LLMBadRequestError,
+    LLMRateLimitError,
+    LLMOverloadedError,
+    LLMTimeoutError,
+    LLMConnectionError,
+    LLMCircuitOpenError,
+    CircuitBreaker,
+    RetryPolicy,
+    ResilienceSettings,
+    call_with_resilience,
+    classify_error,
+    parse_retry_after,
+    resilience
+)
+from app.llm_service import AnthropicProvider
+
+
+class FakeStatusError(Exception):
+    """Mimics an SDK APIStatusError"""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f'status {status_code}')
+        self.status_code = status_code
+        self.response = MagicMock(headers=headers or {})
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+def run(func, breaker=None, policy=None, deadline=None, sleep=None):
+    return call_with_resilience(
+        func,
+        provider='anthropic',
+        breaker=breaker or CircuitBreaker('anthropic'),
+        policy=policy or RetryPolicy(max_attempts=3),
+        classify=lambda e: classify_error(e, 'anthropic', 'Claude'),
+        deadline=deadline,
+        sleep=sleep or (lambda seconds: None)
+    )
+
+
+class TestClassifyError:
+    """Test mapping of SDK exceptions to typed errors"""
+
+    @pytest.mark.parametrize('status_code,expected', [
+        (401, LLMAuthenticationError),
+        (403, LLMAuthenticationError),
+        (400, LLMBadRequestError),
+        (429, LLMRateLimitError),
+        (500, LLMOverloadedError),
+        (529, LLMOverloadedError),
+    ])
+    def test_status_codes(self, status_code, expected):
+        error = classify_error(FakeStatusError(status_code), 'anthropic', 'Claude')
+        assert type(error) is expected
+        assert error.status_code == status_code
+        assert 'Failed to communicate with Claude' in str(error)
+
+    def test_timeout_and_connection(self):
+        assert isinstance(classify_error(APITimeoutError('slow'), 'openai', 'GPT'), LLMTimeoutError)
+        assert isinstance(classify_error(APIConnectionError('down'), 'openai', 'GPT'), LLMConnectionError)
+
+    def test_unknown_error_not_retryable(self):
+        error = classify_error(Exception('boom'), 'openai', 'GPT')
+        assert type(error) is LLMError
+        assert error.retryable is False
+
+    def test_retry_after_header(self):
+        error = classify_error(FakeStatusError(429, {'retry-after': '7'}), 'anthropic', 'Claude')
+        assert error.retry_after == 7.0
+
+
+class TestParseRetryAfter:
+    """Test retry-after header parsing"""
+
+    def test_seconds(self):
+        assert parse_retry_after({'retry-after': '3'}) == 3.0
+
+    def test_milliseconds_preferred(self):
+        assert parse_retry_after({'retry-after-ms': '1500', 'retry-after': '3'}) == 1.5
+
+    def test_http_date_in_past(self):
+        assert parse_retry_after({'retry-after': 'Wed, 21 Oct 2015 07:28:00 GMT'}) == 0.0
+
+    def test_missing_or_invalid(self):
+        assert parse_retry_after(None) is None
+        assert parse_retry_after({}) is None
+        assert parse_retry_after({'retry-after': 'soon'}) is None
+
+
+class TestRetryPolicy:
+    """Test backoff computation"""
+
+    def test_backoff_is_bounded(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=4.0)
+        for attempt in range(1, 10):
+            assert 0 <= policy.compute_delay(attempt) <= 4.0
+
+    def test_retry_after_is_honored(self):
+        policy = RetryPolicy(base_delay=0.1, max_delay=0.2)
+        assert policy.compute_delay(1, retry_after=5.0) == 5.0
+
+
+class TestCircuitBreaker:
+    """Test breaker state transitions"""
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker('p', failure_threshold=2, recovery_timeout=30)
+        breaker.record_failure()
+        assert breaker.allow_request() is True
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.allow_request() is False
+        assert breaker.retry_in() > 0
+
+    def test_half_open_probe_closes_on_success(self):
+        breaker = CircuitBreaker('p', failure_threshold=1, recovery_timeout=10)
+        with patch('app.llm_resilience.time.monotonic', return_value=100.0):
+            breaker.record_failure()
+        with patch('app.llm_resilience.time.monotonic', return_value=111.0):
+            assert breaker.allow_request() is True
+            assert breaker.state == CircuitBreaker.HALF_OPEN
+            # Only one probe at a time
+            assert breaker.allow_request() is False
+            breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.failure_count == 0
+
+    def test_half_open_probe_reopens_on_failure(self):
+        breaker = CircuitBreaker('p', failure_threshold=3, recovery_timeout=10)
+        breaker.state = CircuitBreaker.HALF_OPEN
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_release_frees_probe_slot(self):
+        breaker = CircuitBreaker('p')
+        breaker.state = CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request() is True
+        breaker.release()
+        assert breaker.allow_request() is True
+
+
+class TestCallWithResilience:
+    """Test the retry loop"""
+
+    def test_success_first_try(self):
+        func = MagicMock(return_value='ok')
+        assert run(func) == 'ok'
+        assert func.call_count == 1
+
+    def test_retries_overloaded_then_succeeds(self):
+        func = MagicMock(side_effect=[FakeStatusError(529), 'ok'])
+        sleep = MagicMock()
+        assert run(func, sleep=sleep) == 'ok'
+        assert func.call_count == 2
+        assert sleep.call_count == 1
+
+    def test_does_not_retry_auth_errors(self):
+        func = MagicMock(side_effect=FakeStatusError(401))
+        with pytest.raises(LLMAuthenticationError):
+            run(func)
+        assert func.call_count == 1
+
+    def test_gives_up_after_max_attempts(self):
+        func = MagicMock(side_effect=FakeStatusError(429))
+        with pytest.raises(LLMRateLimitError):
+            run(func, policy=RetryPolicy(max_attempts=3))
+        assert func.call_count == 3
+
+    def test_sleeps_for_retry_after(self):
+        func = MagicMock(side_effect=[FakeStatusError(429, {'retry-after': '2'}), 'ok'])
+        sleep = MagicMock()
+        run(func, sleep=sleep, policy=RetryPolicy(base_delay=0.01, max_delay=0.01))
+        sleep.assert_called_once_with(2.0)
+
+    def test_stops_when_backoff_exceeds_deadline(self):
+        func = MagicMock(side_effect=FakeStatusError(429, {'retry-after': '30'}))
+        with pytest.raises(LLMRateLimitError):
+            run(func, deadline=5.0)
+        assert func.call_count == 1
+
+    def test_passes_remaining_deadline(self):
+        func = MagicMock(return_value='ok')
+        run(func, deadline=10.0)
+        remaining = func.call_args[0][0]
+        assert 0 < remaining <= 10.0
+
+    def test_open_circuit_fails_fast(self):
+        breaker = CircuitBreaker('anthropic', failure_threshold=1)
+        breaker.record_failure()
+        func = MagicMock()
+        with pytest.raises(LLMCircuitOpenError) as exc_info:
+            run(func, breaker=breaker)
+        assert func.call_count == 0
+        assert exc_info.value.retry_after > 0
+
+    def test_provider_faults_trip_breaker(self):
+        breaker = CircuitBreaker('anthropic', failure_threshold=2)
+        func = MagicMock(side_effect=FakeStatusError(503))
+        with pytest.raises(LLMOverloadedError):
+            run(func, breaker=breaker, policy=RetryPolicy(max_attempts=2))
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_rate_limits_do_not_trip_breaker(self):
+        breaker = CircuitBreaker('anthropic', failure_threshold=1)
+        func = MagicMock(side_effect=FakeStatusError(429))
+        with pytest.raises(LLMRateLimitError):
+            run(func, breaker=breaker, policy=RetryPolicy(max_attempts=1))
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_killed_probe_gives_back_its_slot(self):
+        import gevent
+
+        breaker = CircuitBreaker('anthropic')
+        breaker.state = CircuitBreaker.HALF_OPEN
+        func = MagicMock(side_effect=gevent.Timeout())
+        with pytest.raises(gevent.Timeout):
+            run(func, breaker=breaker)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request() is True
+
+
+class TestResilienceSettings:
+    """Test configuration and provider wiring"""
+
+    def test_init_app_reads_config(self, app):
+        app.config['LLM_MAX_ATTEMPTS'] = 5
+        app.config['LLM_TIMEOUT_SECONDS'] = 12.0
+        app.config['LLM_CIRCUIT_FAILURE_THRESHOLD'] = 9
+        settings = ResilienceSettings()
+        settings.init_app(app)
+
+        assert settings.retry_policy.max_attempts == 5
+        assert settings.timeout == 12.0
+        assert settings.breaker_for('openai').failure_threshold == 9
+        assert settings.breaker_for('openai') is settings.breaker_for('openai')
+
+    @patch('anthropic.Anthropic')
+    def test_provider_retries_transient_errors(self, mock_anthropic_client):
+        mock_response = MagicMock()
+        mock_response.content = [MagicMock(text='Recovered')]
+        mock_response.usage = MagicMock(input_tokens=1, output_tokens=1)
+
+        mock_client = MagicMock()
+        mock_client.messages.create.side_effect = [FakeStatusError(529), mock_response]
+        mock_anthropic_client.return_value = mock_client
+
+        resilience.reset()
+        provider = AnthropicProvider('sk-ant-test', retry_policy=RetryPolicy(base_delay=0, max_delay=0), timeout=30)
+        result = provider.chat('System', [{'role': 'user', 'content': 'Hi'}])
+
+        assert result['response'] == 'Recovered'
+        assert mock_client.messages.create.call_count == 2
+        assert 'timeout' in mock_client.messages.create.call_args.kwargs
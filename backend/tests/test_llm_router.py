@@ -0,0 +1,88 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for model routing
+"""
+from app.llm_router import ModelRouter, Route, estimate_tokens, list_price, models_for_provider, MODEL_CATALOG
+
+
+class TestEstimateTokens:
+    """Test prompt size heuristic"""
+
+    def test_empty(self):
+        assert estimate_tokens('', []) == 0
+
+    def test_counts_system_and_messages(self):
+        tokens = estimate_tokens('a' * 400, [{'role': 'user', 'content': 'b' * 400}])
+        assert tokens == 204
+
+
+class TestModelRouter:
+    """Test model ranking and route planning"""
+
+    def test_catalog_providers(self):
+        assert 'claude-3-5-sonnet-20241022' in models_for_provider('anthropic')
+        assert 'gpt-4o' in models_for_provider('openai')
+        assert all(info['provider'] in ('anthropic', 'openai', 'local') for info in MODEL_CATALOG.values())
+
+    def test_quality_policy_keeps_current_defaults(self):
+        router = ModelRouter()
+        assert router.rank_models('anthropic')[0] == 'claude-3-5-sonnet-20241022'
+        assert router.rank_models('openai')[0] == 'gpt-4o'
+
+    def test_latency_policy_prefers_small_models(self):
+        router = ModelRouter(policy='latency')
+        assert router.rank_models('anthropic')[0] == 'claude-3-5-haiku-20241022'
+
+    def test_cost_policy(self):
+        router = ModelRouter(policy='cost')
+        assert router.rank_models('openai')[0] == 'gpt-4o-mini'
+
+    def test_unknown_policy_falls_back_to_quality(self):
+        assert ModelRouter(policy='fastest').policy == 'quality'
+
+    def test_preferred_model_first(self):
+        router = ModelRouter(policy='latency', preferred_model='claude-3-5-sonnet-20241022')
+        assert router.rank_models('anthropic')[0] == 'claude-3-5-sonnet-20241022'
+
+    def test_unknown_preferred_model_ignored(self):
+        assert ModelRouter(preferred_model='made-up').preferred_model is None
+
+    def test_large_prompt_skips_small_context_models(self):
+        router = ModelRouter(policy='cost', preferred_model='gpt-3.5-turbo')
+        ranked = router.rank_models('openai', needed_tokens=50000)
+        assert 'gpt-3.5-turbo' not in ranked
+
+    def test_oversized_prompt_returns_largest_context(self):
+        ranked = ModelRouter().rank_models('openai', needed_tokens=10_000_000)
+        assert len(ranked) == 1
+        assert MODEL_CATALOG[ranked[0]]['context_window'] == 128000
+
+    def test_plan_single_provider(self):
+        routes = ModelRouter().plan('anthropic', ['anthropic'])
+        assert routes == [
+            Route('anthropic', 'claude-3-5-sonnet-20241022'),
+            Route('anthropic', 'claude-3-5-haiku-20241022')
+        ]
+
+    def test_plan_fails_over_to_other_provider_first(self):
+        routes = ModelRouter().plan('anthropic', ['anthropic', 'openai'])
+        assert routes[0] == Route('anthropic', 'claude-3-5-sonnet-20241022')
+        assert routes[1] == Route('openai', 'gpt-4o')
+        assert routes[2].provider == 'anthropic'
+
+    def test_failover_never_costs_more_than_the_primary(self):
+        routes = ModelRouter().plan('openai', ['openai', 'anthropic'])
+        assert routes[0] == Route('openai', 'gpt-4o')
+        # 3.5 Sonnet is the better match but pricier than gpt-4o
+        assert routes[1] == Route('anthropic', 'claude-3-5-haiku-20241022')
+        assert all(list_price(route.model) <= list_price('gpt-4o') for route in routes)
+
+    def test_costlier_failover_is_opt_in(self):
+        routes = ModelRouter(allow_costlier=True).plan('openai', ['openai', 'anthropic'])
+        assert routes[1] == Route('anthropic', 'claude-3-5-sonnet-20241022')
+
+    def test_plan_respects_max_routes(self):
+        routes = ModelRouter(max_routes=1).plan('openai', ['openai', 'anthropic'])
+        assert routes == [Route('openai', 'gpt-4o')]
@@ -8,6 +8,7 @@ Fast, isolated tests with mocked API calls
 import pytest
 from unittest.mock import Mock, MagicMock, patch
 from app.llm_service import LLMService, AnthropicProvider, OpenAIProvider
+from app.llm_resilience import LLMOverloadedError, LLMAuthenticationError, LLMCircuitOpenError
 
 
 class TestLLMService:
@@ -89,6 +90,83 @@ class TestLLMService:
         assert result['provider'] == 'anthropic'
         assert 'usage' in result
 
+    @patch('anthropic.Anthropic')
+    @patch('openai.OpenAI')
+    def test_chat_fails_over_to_other_provider(self, mock_openai, mock_anthropic):
+        service = LLMService('anthropic', 'sk-ant-test', fallback_keys={'openai': 'sk-test'})
+
+        with patch.object(AnthropicProvider, 'chat', side_effect=LLMOverloadedError('overloaded')), \
+                patch.object(OpenAIProvider, 'chat', return_value={'response': 'From GPT', 'model': 'gpt-4o', 'usage': {}}):
+            result = service.chat('System', [], 'Hi')
+
+        assert result['response'] == 'From GPT'
+        assert result['provider'] == 'openai'
+        assert result['failover'] is True
+
+    @patch('anthropic.Anthropic')
+    def test_chat_fails_over_to_other_model(self, mock_anthropic):
+        service = LLMService('anthropic', 'sk-ant-test')
+        calls = []
+
+        def fake_chat(provider, system_prompt, messages, max_tokens=4096):
+            calls.append(provider.model)
+            if len(calls) == 1:
+                raise LLMCircuitOpenError('open')
+            return {'response': 'ok', 'model': provider.model, 'usage': {}}
+
+        with patch.object(AnthropicProvider, 'chat', autospec=True, side_effect=fake_chat):
+            result = service.chat('System', [], 'Hi')
+
+        assert calls == ['claude-3-5-sonnet-20241022', 'claude-3-5-haiku-20241022']
+        assert result['failover'] is True
+
+    @patch('anthropic.Anthropic')
+    @patch('openai.OpenAI')
+    def test_chat_does_not_fail_over_on_primary_auth_error(self, mock_openai, mock_anthropic):
+        service = LLMService('anthropic', 'sk-ant-test', fallback_keys={'openai': 'sk-test'})
+
+        with patch.object(AnthropicProvider, 'chat', side_effect=LLMAuthenticationError('bad key')), \
+                patch.object(OpenAIProvider, 'chat') as openai_chat:
+            with pytest.raises(LLMAuthenticationError):
+                service.chat('System', [], 'Hi')
+
+        openai_chat.assert_not_called()
+
+    @patch('anthropic.Anthropic')
+    def test_chat_raises_primary_error_when_all_routes_fail(self, mock_anthropic):
+        service = LLMService('anthropic', 'sk-ant-test')
+        primary_error = LLMOverloadedError('primary down')
+
+        with patch.object(AnthropicProvider, 'chat', side_effect=[primary_error, LLMOverloadedError('also down')]):
+            with pytest.raises(LLMOverloadedError, match='primary down'):
+                service.chat('System', [], 'Hi')
+
+    @patch('anthropic.Anthropic')
+    def test_chat_uses_routing_policy(self, mock_anthropic):
+        service = LLMService('anthropic', 'sk-ant-test', routing_policy='latency')
+
+        with patch.object(AnthropicProvider, 'chat', autospec=True,
+                          side_effect=lambda provider, *args, **kwargs: {'response': 'ok', 'model': provider.model, 'usage': {}}):
+            result = service.chat('System', [], 'Hi')
+
+        assert result['model'] == 'claude-3-5-haiku-20241022'
+        assert result['failover'] is False
+
+    @patch('anthropic.Anthropic')
+    @patch('openai.OpenAI')
+    def test_costlier_failover_needs_agent_opt_in(self, mock_openai, mock_anthropic):
+        service = LLMService('openai', 'sk-test', fallback_keys={'anthropic': 'sk-ant-test'})
+        assert service._plan('System', [], 'Hi')[1][1].model == 'claude-3-5-haiku-20241022'
+
+        service = LLMService('openai', 'sk-test', fallback_keys={'anthropic': 'sk-ant-test'},
+                             allow_costlier_failover=True)
+        assert service._plan('System', [], 'Hi')[1][1].model == 'claude-3-5-sonnet-20241022'
+
+    def test_unsupported_fallback_provider_ignored(self):
+        with patch('anthropic.Anthropic'):
+            service = LLMService('anthropic', 'sk-ant-test', fallback_keys={'mystery': 'key'})
+        assert list(service.api_keys) == ['anthropic']
+
 
 class TestAnthropicProvider:
     """Test Anthropic provider"""
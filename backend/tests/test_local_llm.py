@@ -0,0 +1,157 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for the local (offline) LLM provider
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from app.async_llm import AsyncLLMService
+from app.llm_resilience import LLMOverloadedError, LLMRateLimitError, LLMTimeoutError, RetryPolicy, resilience
+from app.llm_service import LLMService, LocalProvider
+from app.local_llm import LocalLLMSettings, local_completion, local_llm
+from app.models import Purchase
+
+
+@pytest.fixture(autouse=True)
+def fast_local_llm():
+    """Instant local model with no injected errors; restores the shared settings afterwards."""
+    saved = dict(vars(local_llm))
+    local_llm.enabled = True
+    local_llm.ttft = 0.0
+    local_llm.tokens_per_second = 0.0
+    local_llm.error_rate = 0.0
+    resilience.reset()
+    yield local_llm
+    vars(local_llm).update(saved)
+    resilience.reset()
+
+
+class TestLocalCompletion:
+    """Test deterministic responses"""
+
+    def test_same_prompt_same_answer(self):
+        messages = [{'role': 'user', 'content': 'Hi'}]
+        first = local_completion('System', messages, 10)
+        assert first == local_completion('System', messages, 10)
+        assert len(first) == 10
+        assert local_completion('System', [{'role': 'user', 'content': 'Bye'}], 10) != first
+
+    def test_generation_time(self):
+        settings = LocalLLMSettings(ttft=0.5, tokens_per_second=20)
+        assert settings.token_delay == 0.05
+        assert settings.generation_time(10) == pytest.approx(1.0)
+
+    def test_rejects_unknown_error_type(self, app):
+        app.config['LLM_LOCAL_ERROR_TYPE'] = 'gremlins'
+        with pytest.raises(ValueError):
+            LocalLLMSettings().init_app(app)
+
+
+class TestLocalProvider:
+    """Test the local provider through LLMService"""
+
+    def test_chat_without_network(self, fast_local_llm):
+        fast_local_llm.response_tokens = 12
+        result = LLMService('local', 'local').chat('System', [], 'Hi', use_cache=False)
+
+        assert result['provider'] == 'local'
+        assert result['model'] == 'local-standard'
+        assert result['usage']['output_tokens'] == 12
+        assert result['estimated_cost'] == 0.0
+        assert result['response'] == LLMService('local', 'local').chat('System', [], 'Hi', use_cache=False)['response']
+
+    def test_simulated_latency(self, fast_local_llm):
+        fast_local_llm.ttft = 0.3
+        fast_local_llm.tokens_per_second = 10
+        fast_local_llm.response_tokens = 5
+        with patch('app.llm_service.time.sleep') as sleep:
+            LocalProvider('local').chat('System', [{'role': 'user', 'content': 'Hi'}])
+        sleep.assert_called_once_with(pytest.approx(0.8))
+
+    def test_deadline_shorter_than_generation_times_out(self, fast_local_llm):
+        fast_local_llm.ttft = 5.0
+        provider = LocalProvider('local', retry_policy=RetryPolicy(max_attempts=1), timeout=0.01)
+        with patch('app.llm_service.time.sleep'):
+            with pytest.raises(LLMTimeoutError):
+                provider.chat('System', [{'role': 'user', 'content': 'Hi'}])
+
+    def test_injected_errors_are_retried(self, fast_local_llm):
+        fast_local_llm.error_rate = 1.0
+        fast_local_llm.error_type = 'rate_limit'
+        real_maybe_fail = fast_local_llm.maybe_fail
+        calls = []
+
+        def fail_once():
+            calls.append(1)
+            if len(calls) == 1:
+                real_maybe_fail()
+
+        provider = LocalProvider('local', retry_policy=RetryPolicy(max_attempts=3, base_delay=0.0))
+        with patch.object(fast_local_llm, 'maybe_fail', side_effect=fail_once):
+            result = provider.chat('System', [{'role': 'user', 'content': 'Hi'}])
+        assert len(calls) == 2
+        assert result['response']
+
+    def test_injected_errors_surface_when_persistent(self, fast_local_llm):
+        fast_local_llm.error_rate = 1.0
+        provider = LocalProvider('local', retry_policy=RetryPolicy(max_attempts=2, base_delay=0.0))
+        with pytest.raises(LLMOverloadedError):
+            provider.chat('System', [{'role': 'user', 'content': 'Hi'}])
+
+    def test_disabled_provider_is_unavailable(self, fast_local_llm):
+        fast_local_llm.enabled = False
+        assert 'local' not in LLMService.available_providers()
+        assert LLMService.validate_api_key('local', 'anything') is False
+        with pytest.raises(ValueError):
+            LLMService('local', 'local')
+
+
+class TestLocalStreaming:
+    """Test token-by-token streaming on the async path"""
+
+    def test_streams_each_token(self, fast_local_llm):
+        fast_local_llm.response_tokens = 4
+
+        async def collect():
+            return [e async for e in AsyncLLMService('local', 'local').stream_chat('System', [], 'Hi', use_cache=False)]
+
+        events = asyncio.run(collect())
+        deltas = [e['text'] for e in events if e['type'] == 'delta']
+        assert len(deltas) == 4
+        assert events[-1]['response'] == ''.join(deltas)
+        assert events[-1]['usage']['output_tokens'] == 4
+
+    def test_stream_error_before_first_token(self, fast_local_llm):
+        fast_local_llm.error_rate = 1.0
+        fast_local_llm.error_type = 'rate_limit'
+        resilience.retry_policy = RetryPolicy(max_attempts=1)
+        try:
+            with pytest.raises(LLMRateLimitError):
+                asyncio.run(AsyncLLMService('local', 'local').chat('System', [], 'Hi', use_cache=False))
+        finally:
+            resilience.retry_policy = RetryPolicy()
+
+
+class TestLocalChatRoute:
+    """Test selecting the local provider per agent or by config"""
+
+    def test_local_agent_needs_no_api_key(self, authenticated_client, db, user, agent):
+        agent.config.llm_provider = 'local'
+        db.session.add(Purchase(buyer_id=user.id, agent_id=agent.id, price_paid=9.99, is_active=True))
+        db.session.commit()
+
+        response = authenticated_client.post(f'/chat/agent/{agent.id}/message', json={'message': 'Hi'})
+        assert response.status_code == 200
+        assert response.get_json()['provider'] == 'local'
+
+    def test_provider_override(self, app, authenticated_client, db, user, agent):
+        app.config['LLM_PROVIDER_OVERRIDE'] = 'local'
+        db.session.add(Purchase(buyer_id=user.id, agent_id=agent.id, price_paid=9.99, is_active=True))
+        db.session.commit()
+
+        response = authenticated_client.post(f'/chat/agent/{agent.id}/message', json={'message': 'Hi'})
+        assert response.status_code == 200
+        assert response.get_json()['provider'] == 'local'
@@ -0,0 +1,242 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for the versioned migration runner
+"""
+import types
+import pytest
+from unittest.mock import MagicMock
+from sqlalchemy import create_engine, inspect, text
+
+from app import db
+from app.migrations import Migration, MigrationRunner, Operations, VERSION_TABLE, discover
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+def columns(engine, table):
+    return {c['name'] for c in inspect(engine).get_columns(table)}
+
+
+def migration(version, upgrade, transactional=True, doc='Test migration'):
+    module = types.ModuleType(f'm{version}', doc)
+    module.upgrade = upgrade
+    module.TRANSACTIONAL = transactional
+    return Migration(version, f'test_{version}', module)
+
+
+class TestDiscovery:
+    """Test finding and ordering migrations"""
+
+    def test_versions_are_ordered_and_unique(self):
+        migrations = discover()
+        versions = [m.version for m in migrations]
+        assert versions == sorted(set(versions))
+        assert migrations[0].name == 'baseline'
+        assert all(m.description for m in migrations)
+
+
+class TestMigrationRunner:
+    """Test applying migrations"""
+
+    def test_fresh_database(self, engine):
+        runner = MigrationRunner(engine, db.metadata)
+        applied = runner.upgrade(log=lambda message: None)
+
+        tables = inspect(engine).get_table_names()
+        assert {'user', 'agent', 'agent_config', 'purchase', VERSION_TABLE} <= set(tables)
+        assert [m.version for m in applied] == [m.version for m in discover()]
+        assert set(runner.applied_versions()) == {m.version for m in discover()}
+
+    def test_up_to_date_database_is_a_no_op(self, engine):
+        runner = MigrationRunner(engine, db.metadata)
+        runner.upgrade(log=lambda message: None)
+        messages = []
+        assert runner.upgrade(log=messages.append) == []
+        assert messages == ['Database schema is up to date']
+
+    def test_legacy_database_gets_missing_columns(self, engine):
+        with engine.begin() as conn:
+            conn.execute(text('CREATE TABLE agent_config (id INTEGER PRIMARY KEY, agent_id INTEGER NOT NULL, '
+                              'system_prompt TEXT NOT NULL, llm_provider VARCHAR(50) NOT NULL)'))
+            conn.execute(text("INSERT INTO agent_config (agent_id, system_prompt, llm_provider) "
+                              "VALUES (1, 'Prompt', 'anthropic')"))
+
+        MigrationRunner(engine, db.metadata).upgrade(log=lambda message: None)
+
+        assert {'creation_mode', 'cache_responses', 'llm_model', 'routing_policy',
+                'allow_costlier_failover'} <= columns(engine, 'agent_config')
+        with engine.connect() as conn:
+            row = conn.execute(text('SELECT creation_mode, routing_policy FROM agent_config')).one()
+        assert tuple(row) == ('web_form', 'quality')
+
+    def test_duplicate_reviews_are_collapsed_before_unique_index(self, engine):
+        with engine.begin() as conn:
+            conn.execute(text('CREATE TABLE review (id INTEGER PRIMARY KEY, agent_id INTEGER NOT NULL, '
+                              'reviewer_id INTEGER NOT NULL, rating INTEGER NOT NULL, comment TEXT, '
+                              'created_at DATETIME, updated_at DATETIME, is_visible BOOLEAN)'))
+            conn.execute(text('INSERT INTO review (agent_id, reviewer_id, rating, is_visible) '
+                              'VALUES (1, 1, 3, 1), (1, 1, 5, 1), (1, 2, 2, 1), (2, 3, 4, 1)'))
+            conn.execute(text('CREATE TABLE agent_stats (id INTEGER PRIMARY KEY, agent_id INTEGER NOT NULL, '
+                              'purchase_count INTEGER, average_rating FLOAT)'))
+            conn.execute(text('INSERT INTO agent_stats (agent_id, purchase_count, average_rating) '
+                              'VALUES (1, 3, 3.33), (2, 1, 4.0)'))
+
+        MigrationRunner(engine, db.metadata).upgrade(log=lambda message: None)
+
+        assert 'uq_review_reviewer_agent' in {i['name'] for i in inspect(engine).get_indexes('review')}
+        with engine.connect() as conn:
+            assert conn.execute(text('SELECT rating FROM review ORDER BY id')).scalars().all() == [5, 2, 4]
+            averages = conn.execute(text('SELECT average_rating FROM agent_stats ORDER BY agent_id')).scalars()
+            assert averages.all() == [3.5, 4.0]
+
+    def test_listing_read_model_is_filled(self, engine):
+        db.metadata.create_all(engine, tables=[db.metadata.tables[name] for name in ('user', 'agent')])
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO user (username, email, password_hash) VALUES ('maker', 'm@x.io', 'x')"))
+            conn.execute(text("INSERT INTO agent (name, description, category, creator_id, is_approved, is_active) "
+                              "VALUES ('Listed', 'Desc', 'travel', 1, 1, 1), ('Pending', 'Desc', 'travel', 1, 0, 1)"))
+
+        MigrationRunner(engine, db.metadata).upgrade(log=lambda message: None)
+
+        with engine.connect() as conn:
+            rows = conn.execute(text('SELECT name, description, price, creator_username '
+                                     'FROM marketplace_listing')).all()
+        assert [tuple(row) for row in rows] == [('Listed', 'Desc', 0.0, 'maker')]
+
+    def test_listing_description_is_backfilled(self, engine):
+        db.metadata.create_all(engine, tables=[db.metadata.tables[name] for name in ('user', 'agent')])
+        with engine.begin() as conn:
+            conn.execute(text('CREATE TABLE marketplace_listing (agent_id INTEGER PRIMARY KEY, name VARCHAR(200), '
+                              'short_description VARCHAR(300))'))
+            conn.execute(text("INSERT INTO agent (id, name, description, category, creator_id) "
+                              "VALUES (1, 'Verbose', :description, 'travel', 1)"), {'description': 'x' * 400})
+            conn.execute(text("INSERT INTO marketplace_listing VALUES (1, 'Verbose', :short)"), {'short': 'x' * 300})
+
+        migrations = [m for m in discover() if m.name == 'listing_description']
+        MigrationRunner(engine, db.metadata, migrations=migrations).upgrade(log=lambda message: None)
+
+        with engine.connect() as conn:
+            assert conn.execute(text('SELECT description FROM marketplace_listing')).scalar() == 'x' * 400
+
+    def test_rating_histogram_is_counted(self, engine):
+        with engine.begin() as conn:
+            conn.execute(text('CREATE TABLE agent_stats (id INTEGER PRIMARY KEY, agent_id INTEGER NOT NULL, '
+                              'purchase_count INTEGER, average_rating FLOAT)'))
+            conn.execute(text('INSERT INTO agent_stats (agent_id, purchase_count) VALUES (1, 3), (2, 0)'))
+        db.metadata.create_all(engine, tables=[db.metadata.tables['review']])
+        with engine.begin() as conn:
+            conn.execute(text('INSERT INTO review (agent_id, reviewer_id, rating, is_visible) '
+                              'VALUES (1, 1, 5, 1), (1, 2, 5, 1), (1, 3, 2, 1), (1, 4, 1, 0)'))
+
+        MigrationRunner(engine, db.metadata).upgrade(log=lambda message: None)
+
+        with engine.connect() as conn:
+            rows = conn.execute(text('SELECT rating_1_count, rating_2_count, rating_3_count, rating_4_count, '
+                                     'rating_5_count FROM agent_stats ORDER BY agent_id')).all()
+        assert [tuple(row) for row in rows] == [(0, 1, 0, 0, 2), (0, 0, 0, 0, 0)]
+
+    def test_rate_limit_counter_table(self, engine):
+        migrations = [m for m in discover() if m.name == 'rate_limit_counter']
+        MigrationRunner(engine, db.metadata, migrations=migrations).upgrade(log=lambda message: None)
+        assert 'rate_limit_counter' in inspect(engine).get_table_names()
+
+    def test_failed_migration_is_rolled_back(self, engine):
+        with engine.begin() as conn:
+            conn.execute(text('CREATE TABLE item (id INTEGER PRIMARY KEY, flag INTEGER)'))
+
+        def broken(op):
+            op.execute('INSERT INTO item (flag) VALUES (1)')
+            raise RuntimeError('boom')
+
+        runner = MigrationRunner(engine, db.metadata, migrations=[migration(1, broken)])
+        with pytest.raises(RuntimeError):
+            runner.upgrade(log=lambda message: None)
+
+        assert runner.applied_versions() == {}
+        with engine.connect() as conn:
+            assert conn.execute(text('SELECT COUNT(*) FROM item')).scalar() == 0
+
+    def test_plan_changes_nothing(self, engine):
+        plan = MigrationRunner(engine, db.metadata).plan()
+
+        assert inspect(engine).get_table_names() == []
+        baseline = plan[0]
+        assert baseline['name'] == 'baseline'
+        assert any(s.startswith('CREATE TABLE agent ') for s in baseline['statements'])
+        assert any(s.startswith('CREATE INDEX ix_agent_category') for s in baseline['statements'])
+
+
+class TestOperations:
+    """Test online-safe operations"""
+
+    def test_backfill_in_throttled_batches(self, engine):
+        with engine.begin() as conn:
+            conn.execute(text('CREATE TABLE item (id INTEGER PRIMARY KEY, flag INTEGER)'))
+            for i in range(25):
+                conn.execute(text('INSERT INTO item (flag) VALUES (NULL)'))
+
+        pauses = []
+
+        def backfill(op):
+            assert op.backfill('item', 'flag = :value', 'flag IS NULL', batch_size=10, pause=0.5, value=1) == 25
+
+        runner = MigrationRunner(engine, db.metadata, migrations=[migration(1, backfill, transactional=False)],
+                                 sleep=pauses.append)
+        runner.upgrade(log=lambda message: None)
+
+        assert pauses == [0.5, 0.5]
+        with engine.connect() as conn:
+            assert conn.execute(text('SELECT COUNT(*) FROM item WHERE flag = 1')).scalar() == 25
+
+    def test_delete_in_throttled_batches(self, engine):
+        with engine.begin() as conn:
+            conn.execute(text('CREATE TABLE item (id INTEGER PRIMARY KEY, flag INTEGER)'))
+            for i in range(25):
+                conn.execute(text('INSERT INTO item (flag) VALUES (:flag)'), {'flag': i % 5})
+
+        pauses = []
+
+        def delete(op):
+            assert op.delete_rows('item', 'flag > 0', batch_size=10, pause=0.5) == 20
+
+        runner = MigrationRunner(engine, db.metadata, migrations=[migration(1, delete, transactional=False)],
+                                 sleep=pauses.append)
+        runner.upgrade(log=lambda message: None)
+
+        assert pauses == [0.5, 0.5]
+        with engine.connect() as conn:
+            assert conn.execute(text('SELECT COUNT(*) FROM item')).scalar() == 5
+
+    def test_postgres_indexes_build_concurrently_outside_transactions(self):
+        connection = MagicMock()
+        connection.dialect.name = 'postgresql'
+
+        op = Operations(connection, db.metadata, transactional=False, dry_run=True)
+        op.create_index('ix_purchase_buyer', 'purchase', ['buyer_id', 'purchased_at'])
+        op.drop_index('ix_old')
+        assert op.statements == [
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_purchase_buyer" ON "purchase" (buyer_id, purchased_at)',
+            'DROP INDEX CONCURRENTLY IF EXISTS "ix_old"'
+        ]
+
+        op = Operations(connection, db.metadata, transactional=True, dry_run=True)
+        op.create_index('ix_review_unique', 'review', ['agent_id', 'reviewer_id'], unique=True)
+        assert op.statements == ['CREATE UNIQUE INDEX IF NOT EXISTS "ix_review_unique" ON "review" (agent_id, reviewer_id)']
+
+    def test_index_is_idempotent(self, engine):
+        def add_index(op):
+            op.create_tables('user')
+            op.create_index('ix_user_created', 'user', ['created_at'])
+            op.create_index('ix_user_created', 'user', ['created_at'])
+            assert op.has_index('user', 'ix_user_created')
+
+        MigrationRunner(engine, db.metadata, migrations=[migration(1, add_index, transactional=False)]).upgrade(
+            log=lambda message: None)
+        assert 'ix_user_created' in {i['name'] for i in inspect(engine).get_indexes('user')}
@@ -0,0 +1,137 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for the sampling request profiler
+"""
+import os
+import signal
+import sys
+import time
+import pytest
+from collections import Counter
+from unittest.mock import patch
+
+import gevent
+
+from app.profiling import PROFILE_HEADER, RequestProfiler, StackSampler, collapse, profiler
+
+
+@pytest.fixture
+def profile_dir(tmp_path):
+    """Point the shared profiler at a temporary directory; restore settings afterwards."""
+    saved = dict(vars(profiler))
+    profiler.output_dir = str(tmp_path)
+    yield tmp_path
+    vars(profiler).update(saved)
+
+
+@pytest.fixture
+def sampler_class():
+    """StackSampler replaced by one that never collects samples."""
+    with patch('app.profiling.StackSampler') as sampler_class:
+        sampler_class.return_value.start.return_value.stop.return_value = Counter()
+        yield sampler_class
+
+
+def read_profiles(directory):
+    return {name: (directory / name).read_text() for name in os.listdir(directory)}
+
+
+class TestStackSampler:
+    """Test stack capture"""
+
+    def test_collapse_orders_root_to_leaf(self):
+        def leaf():
+            return collapse(sys._getframe(), 'route')
+
+        stack = leaf().split(';')
+        assert stack[0] == 'route'
+        assert stack[-1] == f'{__name__}:TestStackSampler.test_collapse_orders_root_to_leaf.<locals>.leaf'
+        assert stack[-2] == f'{__name__}:TestStackSampler.test_collapse_orders_root_to_leaf'
+
+    def test_samples_running_thread(self):
+        sampler = StackSampler('busy', interval=0.001).start()
+        deadline = time.perf_counter() + 0.1
+        while time.perf_counter() < deadline:
+            pass
+        samples = sampler.stop()
+
+        assert sum(samples.values()) > 0
+        assert all(stack.startswith('busy;') for stack in samples)
+        assert any('test_samples_running_thread' in stack for stack in samples)
+
+    def test_samples_switched_out_greenlet(self):
+        def request_greenlet():
+            gevent.sleep(0.05)
+
+        glet = gevent.spawn(request_greenlet)
+        gevent.sleep(0)  # let it start and block
+        sampler = StackSampler('io', interval=0.001)
+        sampler.greenlet = glet
+        sampler.sample()
+        glet.join()
+
+        stack = next(iter(sampler.stop()))
+        assert stack.startswith('io;')
+        assert 'request_greenlet' in stack
+
+    def test_no_samples_after_stop(self):
+        sampler = StackSampler('route', interval=1.0)
+        sampler.stop()
+        sampler.sample()
+        assert sampler.samples == Counter()
+
+
+class TestRequestProfiler:
+    """Test request selection, output files and runtime toggling"""
+
+    def test_disabled_profiles_nothing(self, client, profile_dir, sampler_class):
+        profiler.enabled = False
+        profiler.token = ''
+        client.get('/health')
+        sampler_class.assert_not_called()
+
+    def test_sampled_requests_write_collapsed_stacks(self, client, profile_dir):
+        profiler.enabled = True
+        profiler.sample_rate = 1.0
+        with patch.object(StackSampler, 'stop', return_value=Counter({'health_check;a:b;c:d': 3})):
+            client.get('/health')
+
+        profiles = read_profiles(profile_dir)
+        assert list(profiles) == [f'health_check.{os.getpid()}.collapsed']
+        assert profiles[f'health_check.{os.getpid()}.collapsed'] == 'health_check;a:b;c:d 3\n'
+
+    def test_sample_rate(self, client, profile_dir, sampler_class):
+        profiler.enabled = True
+        profiler.sample_rate = 0.5
+        with patch('app.profiling.random.random', side_effect=[0.7, 0.2]):
+            client.get('/health')
+            client.get('/health')
+        assert sampler_class.call_count == 1
+
+    def test_admin_token_forces_profile(self, client, profile_dir, sampler_class):
+        profiler.enabled = False
+        profiler.token = 'secret-profile-token'
+        client.get('/health', headers={PROFILE_HEADER: 'wrong'})
+        assert sampler_class.call_count == 0
+        client.get('/health', headers={PROFILE_HEADER: 'secret-profile-token'})
+        assert sampler_class.call_count == 1
+
+    def test_signal_toggles_sampling(self, profile_dir):
+        if not hasattr(signal, 'SIGUSR2'):
+            pytest.skip('SIGUSR2 not available')
+        previous = signal.getsignal(signal.SIGUSR2)
+        settings = RequestProfiler()
+        try:
+            settings.install_signal()
+            os.kill(os.getpid(), signal.SIGUSR2)
+            assert settings.enabled is True
+            os.kill(os.getpid(), signal.SIGUSR2)
+            assert settings.enabled is False
+        finally:
+            signal.signal(signal.SIGUSR2, previous)
+
+    def test_profile_path_is_safe(self, profile_dir):
+        assert os.path.basename(profiler.profile_path('../agents.detail')).startswith('.._agents.detail.')
+        assert profiler.write('route', Counter()) is None
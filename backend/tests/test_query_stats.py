@@ -0,0 +1,104 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for SQL query instrumentation and route query budgets
+"""
+import logging
+import pytest
+from sqlalchemy import text
+
+from app.models import Purchase
+from app.query_stats import DB_QUERIES, DB_SLOW_QUERIES, query_stats, track_queries
+from app.telemetry import registry
+from tests.conftest import _login
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    registry.reset()
+    yield
+    registry.reset()
+
+
+@pytest.fixture
+def catalog(db, user, listed_agent):
+    """Several agents, each bought by user, so N+1 patterns would show up as extra queries."""
+    for i in range(5):
+        agent = listed_agent(f'Agent {i}', price=4.99, purchase_count=1)
+        db.session.add(Purchase(buyer_id=user.id, agent_id=agent.id, price_paid=4.99, is_active=True))
+    db.session.commit()
+    db.session.expire_all()
+
+
+class TestQueryTracker:
+    """Test statement counting"""
+
+    def test_counts_statements_in_block(self, db):
+        with track_queries(record_statements=True) as outer:
+            db.session.execute(text('SELECT 1'))
+            with track_queries() as inner:
+                db.session.execute(text('SELECT 2'))
+
+        assert outer.count == 2
+        assert inner.count == 1
+        assert outer.duration > 0
+        assert outer.statements[0][0] == 'SELECT 1'
+        assert inner.statements == []
+
+    def test_slow_statements_are_logged(self, db, caplog):
+        query_stats.slow_query_ms = 0
+        with caplog.at_level(logging.WARNING, logger='app.query_stats'):
+            db.session.execute(text('SELECT 1'))
+
+        record = next(r for r in caplog.records if getattr(r, 'statement', None) == 'SELECT 1')
+        assert record.getMessage() == 'slow_query'
+        assert DB_SLOW_QUERIES.value(endpoint=record.endpoint) >= 1
+
+
+class TestRequestInstrumentation:
+    """Test per-request headers and metrics"""
+
+    def test_debug_headers(self, client, catalog):
+        response = client.get('/agents/', headers={'Content-Type': 'application/json'})
+        assert int(response.headers['X-DB-Query-Count']) >= 1
+        assert float(response.headers['X-DB-Query-Time-Ms']) >= 0
+
+    def test_no_headers_when_disabled(self, client, catalog):
+        query_stats.headers = False
+        response = client.get('/agents/')
+        assert 'X-DB-Query-Count' not in response.headers
+
+    def test_request_metrics(self, client, catalog):
+        client.get('/agents/')
+        client.get('/agents/')
+        assert DB_QUERIES.count(endpoint='agents.marketplace') == 2
+        assert 'db_query_seconds_per_request_count{endpoint="agents.marketplace"} 2' in registry.render()
+
+
+class TestQueryBudgets:
+    """Listing pages load related rows eagerly, so queries do not grow with results"""
+
+    JSON = {'Content-Type': 'application/json'}
+
+    def test_budget_fixture_fails_when_exceeded(self, db, query_budget):
+        with pytest.raises(pytest.fail.Exception, match='2 queries issued, budget is 1'):
+            with query_budget(1):
+                db.session.execute(text('SELECT 1'))
+                db.session.execute(text('SELECT 2'))
+
+    def test_marketplace(self, client, catalog, query_budget):
+        with query_budget(2):
+            response = client.get('/agents/', headers=self.JSON)
+        assert len(response.get_json()['agents']) == 5
+
+    def test_my_agents(self, client, catalog, seller, query_budget):
+        _login(client, seller)
+        with query_budget(2):
+            response = client.get('/agents/my-agents', headers=self.JSON)
+        assert len(response.get_json()['agents']) == 5
+
+    def test_my_purchases(self, authenticated_client, catalog, query_budget):
+        with query_budget(2):
+            response = authenticated_client.get('/agents/my-purchases', headers=self.JSON)
+        assert len(response.get_json()['purchases']) == 5
@@ -0,0 +1,176 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for marketplace ranking
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import rank
+from app.models import MarketplaceListing, Purchase, Review, User
+from app.ranking import RankingJob, RankingWeights, compare_orderings, compute_scores, load_signals, ranking_job
+
+JSON = {'Content-Type': 'application/json'}
+EMPTY = np.zeros(0)
+
+
+def signals(agent_ids, reviews=(), purchases=()):
+    """Build signals from (agent_id, age_days, count, rating_sum) reviews and (agent_id, age_days, count) purchases."""
+    reviews = np.array(reviews, dtype=np.float64).reshape(-1, 4)
+    purchases = np.array(purchases, dtype=np.float64).reshape(-1, 3)
+    return {
+        'agent_ids': np.array(agent_ids, dtype=np.int64),
+        'review_agent': reviews[:, 0].astype(np.int64), 'review_age': reviews[:, 1],
+        'review_count': reviews[:, 2], 'review_sum': reviews[:, 3],
+        'purchase_agent': purchases[:, 0].astype(np.int64), 'purchase_age': purchases[:, 1],
+        'purchase_count': purchases[:, 2]
+    }
+
+
+class TestScores:
+    """Test the scoring formula"""
+
+    def test_single_review_does_not_beat_a_popular_agent(self):
+        data = signals([1, 2], reviews=[(1, 0, 1, 5), (2, 0, 50, 240)], purchases=[(2, 0, 200)])
+        one_review, popular = compute_scores(data)
+        assert popular > one_review
+
+    def test_recent_reviews_weigh_more(self):
+        data = signals([1, 2, 3], reviews=[(1, 0, 20, 100), (2, 365, 20, 100), (3, 0, 20, 40)])
+        recent, old, _ = compute_scores(data, RankingWeights(popularity_weight=0.0))
+        assert recent > old
+
+    def test_unreviewed_agents_get_the_marketplace_mean(self):
+        data = signals([1, 2], reviews=[(1, 0, 4, 16)])
+        _, unreviewed = compute_scores(data, RankingWeights(popularity_weight=0.0))
+        assert unreviewed == pytest.approx(4 / 5)
+
+    def test_events_of_unknown_agents_are_ignored(self):
+        data = signals([1, 3], reviews=[(2, 0, 100, 100), (9, 0, 1, 5)])
+        assert list(compute_scores(data)) == list(compute_scores(signals([1, 3])))
+
+    def test_no_agents(self):
+        assert len(compute_scores(signals([]))) == 0
+
+    def test_compare_orderings(self):
+        ids = np.array([1, 2, 3])
+        same = compare_orderings(ids, np.array([0.9, 0.5, 0.1]), np.array([0.8, 0.4, 0.2]), top=2)
+        assert (same['baseline_top'], same['top_overlap'], same['spearman']) == ([1, 2], 1.0, 1.0)
+
+        reversed_ = compare_orderings(ids, np.array([0.9, 0.5, 0.1]), np.array([0.1, 0.5, 0.9]), top=1)
+        assert (reversed_['candidate_top'], reversed_['top_overlap'], reversed_['spearman']) == ([3], 0.0, -1.0)
+
+
+class TestJob:
+    """Test loading signals and storing scores"""
+
+    @pytest.fixture
+    def ranked_catalog(self, db, listed_agent):
+        """'Lucky' has one 5-star review; 'Solid' has many 4-5 star reviews and purchases."""
+        now = datetime.utcnow()
+        agents = {name: listed_agent(name, price=1.0) for name in ('Lucky', 'Solid')}
+
+        buyers = [User(username=f'buyer{i}', email=f'buyer{i}@example.com', password_hash='x') for i in range(12)]
+        db.session.add_all(buyers)
+        db.session.flush()
+        db.session.add(Review(agent_id=agents['Lucky'].id, reviewer_id=buyers[0].id, rating=5, created_at=now))
+        for i, buyer in enumerate(buyers):
+            db.session.add(Review(agent_id=agents['Solid'].id, reviewer_id=buyer.id, rating=5 if i % 5 else 4,
+                                  created_at=now - timedelta(days=i)))
+            db.session.add(Purchase(agent_id=agents['Solid'].id, buyer_id=buyer.id, price_paid=1.0,
+                                    purchased_at=now - timedelta(days=i)))
+        agents['Lucky'].stats.average_rating = 5.0
+        agents['Solid'].stats.average_rating = 4.83
+        db.session.commit()
+        return agents
+
+    def test_load_signals(self, db, ranked_catalog):
+        data = load_signals(db.session)
+        assert data['review_count'].sum() == 13
+        assert data['purchase_count'].sum() == 12
+        assert data['review_age'].min() == 0
+
+        data = load_signals(db.session, as_of=datetime.utcnow() - timedelta(days=5))
+        assert data['review_count'].sum() == 7
+
+    def test_run_stores_scores_and_reorders_marketplace(self, client, db, ranked_catalog):
+        names = lambda: [a['name'] for a in client.get('/agents/', headers=JSON).get_json()['agents']]
+        assert names() == ['Lucky', 'Solid']
+
+        assert ranking_job.run(db.session) == 2
+        db.session.commit()
+
+        db.session.expire_all()
+        stats = {name: agent.stats.ranking_score for name, agent in ranked_catalog.items()}
+        assert stats['Solid'] > stats['Lucky'] > 0
+        assert db.session.get(MarketplaceListing, ranked_catalog['Solid'].id).ranking_score == stats['Solid']
+        assert names() == ['Solid', 'Lucky']
+
+    def test_listing_refresh_keeps_score(self, db, ranked_catalog):
+        ranking_job.run(db.session)
+        db.session.commit()
+        solid = ranked_catalog['Solid']
+        solid.name = 'Solid v2'
+        db.session.commit()
+        assert db.session.get(MarketplaceListing, solid.id).ranking_score == solid.stats.ranking_score > 0
+
+
+class TestScheduling:
+    """Test configuration"""
+
+    def test_weights_from_config(self, app):
+        assert ranking_job.weights == RankingWeights()
+        app.config['RANKING_PRIOR_WEIGHT'] = 3.0
+        assert RankingWeights.from_config(app.config).prior_weight == 3.0
+
+    def test_scheduler_waits_for_requests_and_skips_tests(self, app, client):
+        app.config['RANKING_INTERVAL'] = 60.0
+        job = RankingJob()
+        job.init_app(app)
+        client.get('/health')
+        assert job._thread is None
+
+    def test_runs_on_a_thread_of_its_own(self, app, monkeypatch):
+        ran_on = []
+        ran = threading.Event()
+
+        class Probe(RankingJob):
+            def run(self, session, as_of=None):
+                ran_on.append(threading.get_ident())
+                ran.set()
+                return 0
+
+        job = Probe()
+        job.init_app(app)
+        job.interval = 0.01
+        monkeypatch.setattr(app, 'testing', False)
+        job._ensure_scheduler()
+        assert ran.wait(5)
+
+        job.stop()
+        deadline = time.monotonic() + 5
+        while job._thread is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert job._thread is None
+        assert ran_on[0] != threading.get_ident()
+
+
+class TestCommandLine:
+    """Test rank.py"""
+
+    @pytest.fixture
+    def database_url(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'rank.db'}")
+        monkeypatch.setenv('DB_CREATE_ALL', 'True')
+
+    def test_score_and_compare(self, database_url, capsys):
+        assert rank.main([]) == 0
+        assert 'Scored 0 agents' in capsys.readouterr().out
+
+        assert rank.main(['--compare', '--prior-weight', '2', '--as-of', '2025-01-01']) == 0
+        assert "'prior_weight': 2.0" in capsys.readouterr().out
@@ -0,0 +1,159 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for the shared rate limit storage and request cost weights
+"""
+import pytest
+from unittest.mock import patch
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import SlidingWindowCounterRateLimiter
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import StaticPool
+
+from app.models import RateLimitCounter
+from app.rate_limit import DatabaseStorage, request_cost
+
+
+@pytest.fixture
+def engine():
+    """In-memory database standing in for the shared store (the table comes from a migration)"""
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    RateLimitCounter.__table__.create(engine)
+    return engine
+
+
+def stored_count(engine, key):
+    with engine.connect() as connection:
+        return connection.execute(
+            select(func.coalesce(func.sum(RateLimitCounter.count), 0)).where(RateLimitCounter.limit_key == key)
+        ).scalar()
+
+
+class TestDatabaseStorage:
+    """Test batched counters shared between workers"""
+
+    def test_registered_scheme(self, engine):
+        storage = storage_from_string('database://', engine=engine)
+        assert isinstance(storage, DatabaseStorage)
+        assert storage.check() is True
+
+    def test_requires_url_or_engine(self):
+        with pytest.raises(ValueError):
+            DatabaseStorage('database://')
+
+    def test_increments_are_batched(self, engine):
+        storage = DatabaseStorage(engine=engine, sync_interval=3600)
+        storage.sync()
+
+        for _ in range(3):
+            storage.incr('k', 60)
+        assert storage.get('k') == 3
+        assert stored_count(engine, 'k') == 0
+
+        storage.sync()
+        assert stored_count(engine, 'k') == 3
+        assert storage.get('k') == 3
+
+    def test_workers_share_counts(self, engine):
+        worker_a = DatabaseStorage(engine=engine, sync_interval=0)
+        worker_b = DatabaseStorage(engine=engine, sync_interval=0)
+
+        worker_a.incr('k', 60, amount=2)
+        worker_b.incr('k', 60)
+        worker_a.sync()
+
+        assert worker_a.get('k') == 3
+        assert worker_b.get('k') == 3
+
+    def test_only_keys_in_use_are_refreshed(self, engine):
+        storage = DatabaseStorage(engine=engine, sync_interval=3600)
+        storage.incr('idle', 60)
+        storage.incr('busy', 60)
+        storage.sync()
+
+        storage.get('busy')
+        with patch.object(storage, '_read_counts', wraps=storage._read_counts) as read_counts:
+            storage.sync()
+        assert set(read_counts.call_args.args[1]) == {'busy'}
+        assert set(storage._shared) == {'busy'}
+
+        # An idle key is read again on the sync after its next use
+        storage.get('idle')
+        storage.sync()
+        assert storage.get('idle') == 1
+
+    def test_expired_window_restarts(self, engine):
+        storage = DatabaseStorage(engine=engine, sync_interval=0)
+        with patch('app.rate_limit.time.time', return_value=1000.0):
+            storage.incr('k', 10, amount=5)
+            storage.sync()
+        with patch('app.rate_limit.time.time', return_value=1011.0):
+            assert storage.get('k') == 0
+            storage.incr('k', 10)
+            storage.sync()
+            assert storage.get('k') == 1
+            assert storage.get_expiry('k') == 1021.0
+
+    def test_clear_and_reset(self, engine):
+        storage = DatabaseStorage(engine=engine, sync_interval=0)
+        storage.incr('a', 60)
+        storage.incr('b', 60)
+        storage.sync()
+
+        storage.clear('a')
+        assert storage.get('a') == 0
+        assert stored_count(engine, 'a') == 0
+
+        storage.reset()
+        assert storage.get('b') == 0
+
+    def test_failed_sync_keeps_pending_hits(self, engine):
+        storage = DatabaseStorage(engine=engine, sync_interval=3600)
+        storage.incr('k', 60, amount=4)
+
+        with patch.object(storage, '_apply_increments', side_effect=OperationalError('UPSERT', {}, Exception('down'))):
+            storage.sync()
+        assert storage.get('k') == 4
+
+        storage.sync()
+        assert stored_count(engine, 'k') == 4
+
+    def test_sliding_window_limit_across_workers(self, engine):
+        limit = parse('5 per minute')
+        worker_a = SlidingWindowCounterRateLimiter(DatabaseStorage(engine=engine, sync_interval=0))
+        worker_b = SlidingWindowCounterRateLimiter(DatabaseStorage(engine=engine, sync_interval=0))
+
+        assert worker_a.hit(limit, 'client', cost=3) is True
+        assert worker_b.hit(limit, 'client', cost=2) is True
+        assert worker_a.hit(limit, 'client') is False
+        assert worker_b.test(limit, 'client') is False
+        assert worker_a.get_window_stats(limit, 'client').remaining == 0
+
+
+class TestAppStorage:
+    """Test the limiter storage create_app configures"""
+
+    def test_counters_use_the_app_database(self, monkeypatch):
+        from app import create_app, db, limiter
+
+        monkeypatch.setenv('RATELIMIT_STORAGE_URI', 'database://')
+        app = create_app()
+        with app.app_context():
+            assert isinstance(limiter.storage, DatabaseStorage)
+            assert limiter.storage.engine is db.engine
+
+
+class TestRequestCost:
+    """Test per-endpoint cost weights"""
+
+    @pytest.mark.parametrize('path', ['/chat/agent/1/message', '/agent/create/preview'])
+    def test_llm_endpoints_cost_more(self, app, path):
+        with app.test_request_context(path, method='POST'):
+            assert request_cost() == app.config['RATELIMIT_LLM_COST']
+
+    def test_browsing_costs_one(self, app):
+        with app.test_request_context('/health'):
+            assert request_cost() == 1
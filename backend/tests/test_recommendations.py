@@ -0,0 +1,171 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for co-purchase recommendations
+"""
+import numpy as np
+import pytest
+
+import recommend
+from app.models import AgentRecommendation, Purchase, User
+from app.recommendations import (CoPurchaseMatrix, baskets, build_matrix, co_purchase_pairs, recommendation_job,
+                                 top_similar)
+from tests.conftest import _login
+
+JSON = {'Content-Type': 'application/json'}
+
+
+def arrays(*rows):
+    """(buyers, agents, purchase ids) from (buyer, agent) rows; IDs follow row order."""
+    data = np.array(rows, dtype=np.int64).reshape(-1, 2)
+    return data[:, 0], data[:, 1], np.arange(1, len(data) + 1, dtype=np.int64)
+
+
+def pairs(keys):
+    return sorted((int(k >> 32), int(k & 0xFFFFFFFF)) for k in keys)
+
+
+@pytest.fixture(autouse=True)
+def job(app):
+    # After create_app(), whose init_app() resets min_shared from config
+    recommendation_job.min_shared = 1
+    yield recommendation_job
+    recommendation_job.min_shared = 2
+
+
+class TestMatrix:
+    """Test building the co-occurrence matrix"""
+
+    def test_pairs_within_baskets(self):
+        buyers, agents = baskets(*arrays((1, 10), (1, 11), (2, 11), (2, 12), (1, 10)))
+        assert pairs(co_purchase_pairs(buyers, agents)) == [(10, 11), (11, 10), (11, 12), (12, 11)]
+
+    def test_basket_keeps_newest_purchases(self):
+        buyers, agents = baskets(*arrays((1, 10), (1, 11), (1, 12)), max_basket=2)
+        assert sorted(agents) == [11, 12]
+
+    def test_cosine_top_n(self):
+        # 10 and 11 share both buyers; 10 and 12 share one of three
+        matrix = build_matrix(*arrays((1, 10), (1, 11), (2, 10), (2, 11), (2, 12), (3, 12), (4, 12)))
+        top = top_similar(matrix, top_n=1)
+        assert dict(zip(top['agent_id'], top['recommended_agent_id'])) == {10: 11, 11: 10, 12: 10}
+        assert top['score'][0] == pytest.approx(1.0)
+
+    def test_min_shared_buyers(self):
+        matrix = build_matrix(*arrays((1, 10), (1, 11)))
+        assert len(top_similar(matrix, top_n=5, min_shared=2)['agent_id']) == 0
+
+    def test_save_and_load(self, tmp_path):
+        matrix = build_matrix(*arrays((1, 10), (1, 11)))
+        path = str(tmp_path / 'm.npz')
+        matrix.save(path)
+        loaded = CoPurchaseMatrix.load(path)
+        assert pairs(loaded.pair_keys) == pairs(matrix.pair_keys)
+        assert loaded.watermark == 2
+        assert CoPurchaseMatrix.load(str(tmp_path / 'missing.npz')) is None
+
+
+class TestJob:
+    """Test the job against the database"""
+
+    @pytest.fixture
+    def shop(self, db, listed_agent):
+        agents = [listed_agent(f'Agent {i}', price=1.0) for i in range(4)]
+        buyers = [User(username=f'shopper{i}', email=f'shopper{i}@example.com', password_hash='x') for i in range(3)]
+        db.session.add_all(buyers)
+        db.session.commit()
+        return agents, buyers
+
+    def buy(self, db, buyer, *agents):
+        for agent in agents:
+            db.session.add(Purchase(buyer_id=buyer.id, agent_id=agent.id, price_paid=1.0))
+        db.session.commit()
+
+    def stored(self, db):
+        return sorted((r.agent_id, r.position, r.recommended_agent_id)
+                      for r in AgentRecommendation.query.all())
+
+    def test_incremental_matches_full_rebuild(self, db, job, shop):
+        agents, buyers = shop
+        self.buy(db, buyers[0], agents[0], agents[1])
+        assert job.run(db.session) == 2
+        db.session.commit()
+
+        self.buy(db, buyers[1], agents[0], agents[2])
+        self.buy(db, buyers[0], agents[3])
+        assert job.run(db.session) == 4
+        db.session.commit()
+        incremental = CoPurchaseMatrix.load(job.state_path)
+        stored = self.stored(db)
+
+        job.run(db.session, full=True)
+        db.session.commit()
+        full = CoPurchaseMatrix.load(job.state_path)
+        assert pairs(incremental.pair_keys) == pairs(full.pair_keys)
+        assert list(incremental.pair_counts) == list(full.pair_counts)
+        assert stored == self.stored(db)
+
+    def test_no_new_purchases(self, db, job, shop):
+        agents, buyers = shop
+        self.buy(db, buyers[0], agents[0], agents[1])
+        job.run(db.session)
+        db.session.commit()
+        assert job.run(db.session) == 0
+
+    def test_state_is_saved_only_with_the_lists(self, db, job, shop):
+        agents, buyers = shop
+        self.buy(db, buyers[0], agents[0], agents[1])
+        job.run(db.session)
+        assert CoPurchaseMatrix.load(job.state_path) is None
+
+        # A failed commit leaves the watermark behind, so the next run folds the purchases in again
+        db.session.rollback()
+        assert CoPurchaseMatrix.load(job.state_path) is None
+        assert job.run(db.session) == 2
+        db.session.commit()
+        assert CoPurchaseMatrix.load(job.state_path).watermark == max(p.id for p in Purchase.query)
+        assert len(self.stored(db)) == 2
+
+    def test_stale_matrix_is_rebuilt(self, db, job, shop):
+        agents, buyers = shop
+        self.buy(db, buyers[0], agents[0], agents[1])
+        job.run(db.session)
+        db.session.commit()
+        job.rebuild_hours = 0
+        try:
+            self.buy(db, buyers[1], agents[2])
+            assert job.run(db.session) == 2  # Full rebuild: every agent with a co-purchase
+        finally:
+            job.rebuild_hours = 24.0
+
+    def test_detail_and_user_recommendations(self, client, db, job, shop, query_budget):
+        agents, buyers = shop
+        self.buy(db, buyers[0], agents[0], agents[1], agents[2])
+        self.buy(db, buyers[1], agents[0], agents[1])
+        self.buy(db, buyers[2], agents[0])
+        job.run(db.session)
+        db.session.commit()
+        _login(client, buyers[2])
+
+        detail = client.get(f'/agents/{agents[0].id}', headers=JSON).get_json()
+        assert [a['name'] for a in detail['also_bought']] == ['Agent 1', 'Agent 2']
+        assert b'Customers Also Bought' in client.get(f'/agents/{agents[0].id}').data
+
+        db.session.expire_all()
+        with query_budget(4):
+            response = client.get('/agents/recommendations', headers=JSON)
+        recommended = response.get_json()['recommendations']
+        assert [a['name'] for a in recommended] == ['Agent 1', 'Agent 2']
+        assert recommended[0]['score'] > recommended[1]['score']
+
+    def test_user_without_purchases(self, authenticated_client):
+        response = authenticated_client.get('/agents/recommendations', headers=JSON)
+        assert response.get_json() == {'recommendations': []}
+
+    def test_command_line(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'recommend.db'}")
+        monkeypatch.setenv('DB_CREATE_ALL', 'True')
+        monkeypatch.setenv('RECOMMENDATIONS_DIR', str(tmp_path / 'state'))
+        assert recommend.main(['--full']) == 0
+        assert 'Updated recommendations for 0 agents' in capsys.readouterr().out
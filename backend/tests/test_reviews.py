@@ -0,0 +1,140 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for paginated reviews and the star rating histogram
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.models import AgentStats, Purchase, Review, User
+from app.reviews import average_rating, decode_cursor, encode_cursor, rating_histograms
+
+JSON = {'Content-Type': 'application/json'}
+
+
+@pytest.fixture
+def reviewers(db):
+    # Never logged in, so no (slow) password hashing
+    users = [User(username=f'reviewer{number}', email=f'reviewer{number}@example.com', password_hash='unused')
+             for number in range(30)]
+    db.session.add_all(users)
+    db.session.commit()
+    return users
+
+
+def add_reviews(db, agent, reviewers, ratings, start=datetime(2025, 1, 1)):
+    """One review per rating, an hour apart; every third review shares the previous one's timestamp."""
+    reviews = [Review(agent_id=agent.id, reviewer_id=reviewer.id, rating=rating, comment=f'Review {number}',
+                      created_at=start + timedelta(hours=number - number % 3 // 2))
+               for number, (reviewer, rating) in enumerate(zip(reviewers, ratings))]
+    db.session.add_all(reviews)
+    db.session.commit()
+    return reviews
+
+
+def histogram(db, agent):
+    return db.session.get(AgentStats, agent.stats.id).rating_histogram
+
+
+class TestHistogram:
+    """Test the counts kept on agent_stats"""
+
+    def test_new_reviews_are_counted(self, db, agent, reviewers):
+        add_reviews(db, agent, reviewers, [5, 5, 4, 1])
+        assert histogram(db, agent) == {1: 1, 2: 0, 3: 0, 4: 1, 5: 2}
+        assert agent.stats.review_count == 4
+
+    def test_changed_hidden_and_deleted_reviews(self, db, agent, reviewers):
+        first, second, third = add_reviews(db, agent, reviewers, [5, 4, 3])
+        first.rating = 2
+        second.is_visible = False
+        db.session.delete(third)
+        db.session.commit()
+        assert histogram(db, agent) == {1: 0, 2: 1, 3: 0, 4: 0, 5: 0}
+
+        second.is_visible = True
+        second.comment = 'Edited'
+        db.session.commit()
+        assert histogram(db, agent) == {1: 0, 2: 1, 3: 0, 4: 1, 5: 0}
+
+    def test_rolled_back_review_is_not_counted(self, db, agent, reviewers):
+        db.session.add(Review(agent_id=agent.id, reviewer_id=reviewers[0].id, rating=5))
+        db.session.flush()
+        db.session.rollback()
+        assert histogram(db, agent)[5] == 0
+
+    def test_rebuild(self, db, agent, reviewers):
+        add_reviews(db, agent, reviewers, [3, 3])
+        db.session.execute(update(AgentStats).values(rating_3_count=0))
+        rating_histograms.rebuild(db.session.connection())
+        db.session.commit()
+        assert histogram(db, agent)[3] == 2
+
+    def test_average_rating(self):
+        assert average_rating({1: 1, 2: 0, 3: 0, 4: 0, 5: 2}) == 3.67
+        assert average_rating(dict.fromkeys(range(1, 6), 0)) == 0.0
+
+    def test_review_route_updates_average(self, authenticated_client, db, user, agent):
+        db.session.add(Purchase(buyer_id=user.id, agent_id=agent.id, price_paid=9.99))
+        db.session.commit()
+        authenticated_client.post(f'/agents/{agent.id}/review', json={'rating': 4})
+        authenticated_client.post(f'/agents/{agent.id}/review', json={'rating': 2})
+
+        detail = authenticated_client.get(f'/agents/{agent.id}', headers=JSON).get_json()
+        assert detail['rating_histogram'] == {'1': 0, '2': 1, '3': 0, '4': 0, '5': 0}
+        assert detail['review_count'] == 1
+        assert detail['agent']['average_rating'] == 2.0
+
+
+class TestPages:
+    """Test /agents/<id>/reviews and the detail page"""
+
+    def test_cursor_round_trip(self):
+        created_at = datetime(2025, 3, 1, 12, 30, 5, 123)
+        assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+        with pytest.raises(ValueError):
+            decode_cursor('not-a-cursor')
+
+    def test_pages_cover_every_review_once(self, client, db, agent, reviewers):
+        reviews = add_reviews(db, agent, reviewers, [5] * 25)
+        reviews[3].is_visible = False
+        db.session.commit()
+
+        seen, cursor = [], None
+        while True:
+            page = client.get(f'/agents/{agent.id}/reviews', query_string={'limit': 10, 'cursor': cursor or ''})
+            data = page.get_json()
+            seen.extend(review['id'] for review in data['reviews'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+
+        expected = sorted((review for review in reviews if review.is_visible),
+                          key=lambda review: (review.created_at, review.id), reverse=True)
+        assert seen == [review.id for review in expected]
+        assert data['reviews'][-1]['reviewer'] == 'reviewer0'
+
+    def test_bad_requests(self, client, agent):
+        assert client.get(f'/agents/{agent.id}/reviews?cursor=bogus').status_code == 400
+        assert client.get('/agents/9999/reviews').status_code == 404
+
+    def test_detail_payload_is_constant(self, client, db, agent, reviewers, query_budget):
+        with query_budget(20) as few:
+            client.get(f'/agents/{agent.id}', headers=JSON)
+        add_reviews(db, agent, reviewers, [4] * 30)
+        with query_budget(20) as many:
+            detail = client.get(f'/agents/{agent.id}', headers=JSON).get_json()
+
+        assert many.count == few.count
+        assert len(detail['reviews']) == 10 and detail['next_cursor']
+        assert detail['rating_histogram']['4'] == 30
+
+    def test_detail_page(self, client, db, agent, reviewers):
+        add_reviews(db, agent, reviewers, [5] * 12)
+        page = client.get(f'/agents/{agent.id}').data
+        assert b'rating-histogram' in page
+        assert b'More reviews' in page
+        assert page.count(b'class="review"') == 10
@@ -0,0 +1,108 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for semantic marketplace search and its benchmark
+"""
+import random
+
+import pytest
+
+from app.search import keyword_score, semantic_search
+from app.vectors import tokenize
+from benchmarks.search import run_benchmark, sample_queries, synthetic_texts
+
+JSON = {'Content-Type': 'application/json'}
+
+CATALOG = [
+    ('Trip Planner', 'travel', 'Builds day-by-day itineraries and plans trips abroad', 'You plan trips.'),
+    ('Flight Finder', 'travel', 'Compares flights and hotel prices', 'You find cheap flights.'),
+    ('Tax Assistant', 'finance', 'Explains tax returns and deductions', 'You know quantum tax law.'),
+    ('Budget Coach', 'finance', 'Helps you plan a monthly budget', 'You coach budgeting.'),
+]
+
+
+@pytest.fixture
+def catalog(listed_agent):
+    return [listed_agent(name, description=description, category=category, prompt=prompt)
+            for name, category, description, prompt in CATALOG]
+
+
+def search(client, text, **filters):
+    response = client.get('/agents/', query_string=dict(search=text, mode='semantic', **filters), headers=JSON)
+    return response.get_json()
+
+
+class TestScoring:
+    """Test keyword scores and modes"""
+
+    def test_keyword_score(self):
+        words = tokenize('plan a trip')
+        assert keyword_score(words, 'Trip Planner: plans trips') == 1.0
+        assert keyword_score(words, 'Trip guide') == 0.5
+        assert keyword_score([], 'anything') == 0.0
+
+    def test_mode(self):
+        assert semantic_search.mode('semantic') == 'semantic'
+        assert semantic_search.mode('fuzzy') == semantic_search.mode(None) == 'keyword'
+
+
+class TestSemanticSearch:
+    """Test /agents/?search=...&mode=semantic"""
+
+    def test_intent_query(self, client, catalog):
+        # No agent contains the phrase, so keyword search finds nothing
+        assert client.get('/agents/?search=help me plan a trip', headers=JSON).get_json()['agents'] == []
+
+        result = search(client, 'help me plan a trip')
+        assert result['mode'] == 'semantic'
+        assert result['agents'][0]['name'] == 'Trip Planner'
+        scores = [agent['score'] for agent in result['agents']]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_phrase_match_kept(self, client, catalog):
+        names = [agent['name'] for agent in search(client, 'hotel prices')['agents']]
+        assert names[0] == 'Flight Finder'
+
+    def test_filters_apply(self, client, catalog):
+        names = [agent['name'] for agent in search(client, 'plan', category='finance')['agents']]
+        assert names == ['Budget Coach']
+
+    def test_system_prompts_not_searched(self, client, catalog):
+        assert search(client, 'quantum')['agents'] == []
+
+    def test_unlisted_agents_hidden(self, client, db, catalog):
+        catalog[0].is_active = False
+        db.session.commit()
+        assert 'Trip Planner' not in [agent['name'] for agent in search(client, 'plan a trip')['agents']]
+
+    def test_default_mode(self, client, catalog):
+        semantic_search.default_mode = 'semantic'
+        try:
+            result = client.get('/agents/?search=help me plan a trip', headers=JSON).get_json()
+        finally:
+            semantic_search.default_mode = 'keyword'
+        assert result['agents'][0]['name'] == 'Trip Planner'
+
+    def test_search_form(self, client, catalog):
+        page = client.get('/agents/?search=trip&mode=semantic').data
+        assert b'value="semantic" selected' in page
+        assert b'Trip Planner' in page
+
+
+class TestBenchmark:
+    """Test the recall and latency benchmark at a small size"""
+
+    def test_synthetic_catalog(self):
+        rng = random.Random(1)
+        texts = synthetic_texts(50, rng)
+        assert len(set(texts)) == 50
+        assert all(len(query.split()) >= 2 for query in sample_queries(texts, 10, rng))
+
+    def test_run_benchmark(self):
+        results = run_benchmark(agents=400, queries=20, ivf_lists=4, probes=[1, 4], dim=64, log=lambda message: None)
+        recall = {result['setting']: result['recall'] for result in results}
+        assert recall['flat float32'] == 1.0
+        assert recall['ivf4 float32 probes=4'] == 1.0  # Every cluster probed is exact
+        assert recall['ivf4 float32 probes=1'] <= 1.0
+        assert all(result['p95_ms'] >= result['p50_ms'] > 0 for result in results)
@@ -0,0 +1,265 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for the content vector index and similar agents
+"""
+import threading
+
+import numpy as np
+import pytest
+
+import index_agents
+from app.similarity import SimilarAgents, similar_agents
+from app.vectors import HashingEncoder, VectorIndex, load_encoder, normalize, tokenize
+
+JSON = {'Content-Type': 'application/json'}
+
+CATALOG = [
+    ('Trip Planner', 'travel', 'Plans trips, flights and hotel stays for your holidays',
+     'You plan travel itineraries: flights, hotels and day trips.'),
+    ('Holiday Helper', 'travel', 'Finds hotels and flights for a holiday on a budget',
+     'You help travellers book hotels and flights.'),
+    ('Tax Assistant', 'finance', 'Explains tax returns and deductions',
+     'You answer questions about income tax and deductions.'),
+    ('Essay Coach', 'education', 'Gives feedback on essays and writing structure',
+     'You review student essays.'),
+]
+
+
+class StubEncoder:
+    """Pluggable encoder loaded by test_load_encoder."""
+    dim = 3
+
+    def encode(self, texts):
+        return np.ones((len(texts), 3), dtype=np.float32) / np.sqrt(3)
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class TestEncoder:
+    """Test tokenizing and the hashing encoder"""
+
+    def test_tokenize(self):
+        assert tokenize('Planning a trip with the planners!') == ['plan', 'trip', 'plan']
+
+    def test_deterministic_unit_vectors(self):
+        encoder = HashingEncoder(dim=64)
+        first, second = encoder.encode(['Plan my holiday trip', 'Plan my holiday trip'])
+        assert np.array_equal(first, second)
+        assert np.linalg.norm(first) == pytest.approx(1.0)
+        assert not encoder.encode(['the and of'])[0].any()
+
+    def test_shared_vocabulary_is_closer(self):
+        trip, holiday, tax = HashingEncoder().encode(['Plans trips and hotel stays', 'Hotel stays for trips',
+                                                      'Income tax deductions'])
+        assert trip @ holiday > trip @ tax
+
+    def test_load_encoder(self):
+        assert load_encoder('hashing', 32).dim == 32
+        custom = load_encoder('tests.test_similarity:StubEncoder')
+        assert custom.dim == 3 and custom.name == 'tests.test_similarity:StubEncoder'
+        with pytest.raises(ValueError):
+            load_encoder('word2vec')
+
+
+class TestVectorIndex:
+    """Test the memory-mapped index"""
+
+    @pytest.fixture
+    def index(self, tmp_path):
+        return VectorIndex(str(tmp_path), 'test')
+
+    def test_empty(self, index):
+        assert len(index) == 0
+        assert not index.exists
+        assert index.search(unit(1, 0), 5) == []
+        assert index.vector(1) is None
+
+    def test_search_top_k(self, index):
+        index.upsert([1, 2, 3], np.stack([unit(1, 0), unit(1, 1), unit(0, 1)]))
+        assert [agent_id for agent_id, _ in index.search(unit(1, 0), 2)] == [1, 2]
+        assert index.search(unit(1, 0), 5, exclude=[1])[0] == (2, pytest.approx(0.707107))
+
+    def test_upsert_overwrites_and_appends(self, index):
+        index.upsert([1, 2], np.stack([unit(1, 0), unit(0, 1)]))
+        index.upsert([2, 3], np.stack([unit(1, 0), unit(1, 1)]))
+        assert len(index) == 3
+        assert np.allclose(index.vector(2), unit(1, 0))
+
+    def test_remove_and_replace(self, index, tmp_path):
+        index.upsert([1, 2], np.stack([unit(1, 0), unit(0, 1)]))
+        index.remove([1])
+        assert index.vector(1) is None
+        assert [agent_id for agent_id, _ in index.search(unit(1, 0), 5)] == [2]
+
+        index.replace([7], np.stack([unit(1, 1)]))
+        assert [agent_id for agent_id, _ in index.search(unit(1, 0), 5)] == [7]
+        assert sorted(path.name for path in tmp_path.glob('test.*.f32')) == ['test.2.f32']
+
+    def test_other_worker_sees_writes(self, index, tmp_path):
+        reader = VectorIndex(str(tmp_path), 'test')
+        index.upsert([1], np.stack([unit(1, 0)]))
+        assert len(reader) == 1
+        index.upsert([2], np.stack([unit(0, 1)]))
+        assert [agent_id for agent_id, _ in reader.search(unit(0, 1), 1)] == [2]
+
+    def test_interrupted_append_is_discarded(self, index, tmp_path):
+        index.upsert([1], np.stack([unit(1, 0)]))
+        with open(tmp_path / 'test.1.f32', 'ab') as handle:
+            handle.write(unit(0, 1).tobytes())  # Rows written, IDs never swapped
+        index.upsert([2], np.stack([unit(1, 1)]))
+        assert np.allclose(index.vector(2), unit(1, 1))
+
+    def test_other_encoder_is_ignored(self, index, tmp_path):
+        index.upsert([1], np.stack([unit(1, 0)]))
+        assert index.exists
+        other = VectorIndex(str(tmp_path), 'test', encoder_name='other')
+        assert len(other) == 0
+        assert not other.exists
+
+
+class TestScaledIndex:
+    """Test int8 rows and IVF clusters"""
+
+    @pytest.fixture
+    def clusters(self):
+        # 8 well separated directions, 40 noisy vectors around each
+        rng = np.random.default_rng(0)
+        centers = normalize(rng.normal(size=(8, 32)).astype(np.float32))
+        vectors = normalize(np.repeat(centers, 40, axis=0) + rng.normal(scale=0.05, size=(320, 32)).astype(np.float32))
+        return np.arange(1, 321), vectors, centers
+
+    def test_quantized_scores(self, tmp_path, clusters):
+        ids, vectors, centers = clusters
+        flat, quantized = VectorIndex(str(tmp_path), 'flat'), VectorIndex(str(tmp_path), 'int8', quantize=True)
+        flat.replace(ids, vectors)
+        quantized.replace(ids, vectors)
+        assert (tmp_path / 'int8.1.i8').stat().st_size == 320 * 32
+        assert np.allclose(quantized.vector(5), vectors[4], atol=0.01)
+
+        exact = dict(flat.search(centers[0], 10))
+        for agent_id, score in quantized.search(centers[0], 10):
+            assert score == pytest.approx(exact.get(agent_id, score), abs=0.01)
+
+    def test_ivf_probes_closest_clusters(self, tmp_path, clusters):
+        ids, vectors, centers = clusters
+        flat, ivf = VectorIndex(str(tmp_path), 'flat'), VectorIndex(str(tmp_path), 'ivf', ivf_lists=8, probes=1)
+        flat.replace(ids, vectors)
+        ivf.replace(ids, vectors)
+        for center in centers:
+            assert ivf.search(center, 10) == flat.search(center, 10)
+        assert len(ivf.search(centers[0], 100)) == 40  # One cluster scored
+        assert len(ivf.search(centers[0], 100, probes=8)) == 100
+
+    def test_ivf_tail(self, tmp_path, clusters):
+        ids, vectors, centers = clusters
+        ivf = VectorIndex(str(tmp_path), 'ivf', ivf_lists=8, probes=1)
+        ivf.replace(ids, vectors)
+
+        # A new agent and a changed one join the tail, which every search scores
+        ivf.upsert([1000, 1], np.stack([centers[3], centers[5]]))
+        assert ivf.search(centers[3], 1)[0][0] == 1000
+        assert 1 in [agent_id for agent_id, _ in ivf.search(centers[5], 100)]
+        assert np.allclose(ivf.vector(1), centers[5])
+        assert len(ivf) == 321
+
+    def test_small_index_stays_flat(self, tmp_path, clusters):
+        ids, vectors, centers = clusters
+        ivf = VectorIndex(str(tmp_path), 'ivf', ivf_lists=100)
+        ivf.replace(ids, vectors)
+        assert len(ivf.search(centers[0], 1000)) == 320
+
+
+class TestSimilarAgents:
+    """Test indexing agents and the related-agents panel"""
+
+    @pytest.fixture
+    def catalog(self, listed_agent):
+        return [listed_agent(name, description=description, category=category, prompt=prompt)
+                for name, category, description, prompt in CATALOG]
+
+    def test_indexed_on_commit(self, db, catalog):
+        assert len(similar_agents.index) == 4
+        related = similar_agents.related(db.session, catalog[0].id)
+        assert related[0].name == 'Holiday Helper'
+        assert catalog[0].id not in [listing.agent_id for listing in related]
+
+    def test_system_prompt_edit_reindexes(self, db, catalog):
+        before = similar_agents.index.vector(catalog[3].id)
+        catalog[3].config.system_prompt = 'You plan trips, flights and hotels.'
+        db.session.commit()
+        assert not np.array_equal(before, similar_agents.index.vector(catalog[3].id))
+
+    def test_rollback_discards_pending(self, db, catalog):
+        before = similar_agents.index.vector(catalog[2].id)
+        catalog[2].description = 'Plans trips and hotels'
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+        assert np.array_equal(before, similar_agents.index.vector(catalog[2].id))
+
+    def test_only_listed_agents_are_shown(self, db, catalog):
+        catalog[1].is_approved = False
+        db.session.commit()
+        assert 'Holiday Helper' not in [listing.name for listing in similar_agents.related(db.session, catalog[0].id)]
+
+    def test_deleted_agent_is_removed(self, db, catalog):
+        agent_id = catalog[3].id
+        db.session.delete(catalog[3])
+        db.session.commit()
+        assert similar_agents.index.vector(agent_id) is None
+
+    def test_min_score(self, db, catalog):
+        similar_agents.min_score = 0.99
+        try:
+            assert similar_agents.related(db.session, catalog[0].id) == []
+        finally:
+            similar_agents.min_score = 0.1
+
+    def test_rebuild(self, db, catalog):
+        similar_agents.index.replace([], np.zeros((0, similar_agents.dim), dtype=np.float32))
+        assert similar_agents.run(db.session) == 4
+        assert similar_agents.related(db.session, catalog[0].id)[0].name == 'Holiday Helper'
+
+    def test_missing_index_is_built_without_waiting(self, app, tmp_path, monkeypatch):
+        ran = threading.Event()
+
+        class Probe(SimilarAgents):
+            def run(self, session):
+                ran.set()
+                return 0
+
+        job = Probe(interval=3600.0, directory=str(tmp_path / 'fresh'))
+        job._app = app
+        monkeypatch.setattr(app, 'testing', False)
+        assert job.run_at_start()
+        job._ensure_scheduler()
+        try:
+            assert ran.wait(5)
+        finally:
+            job.stop()
+
+    def test_created_agent_is_indexed(self, seller_client, catalog):
+        response = seller_client.post('/agents/create', json={
+            'name': 'Weekend Getaways', 'description': 'Plans weekend trips and hotel stays',
+            'category': 'travel', 'system_prompt': 'You plan short trips.', 'price': 3
+        })
+        agent_id = response.get_json()['agent_id']
+        assert similar_agents.index.vector(agent_id) is not None
+
+    def test_detail_panel(self, client, catalog):
+        detail = client.get(f'/agents/{catalog[0].id}', headers=JSON).get_json()
+        assert detail['similar'][0]['name'] == 'Holiday Helper'
+        assert b'Similar Agents' in client.get(f'/agents/{catalog[0].id}').data
+
+    def test_command_line(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'index.db'}")
+        monkeypatch.setenv('DB_CREATE_ALL', 'True')
+        monkeypatch.setenv('VECTOR_INDEX_DIR', str(tmp_path / 'vector_index'))
+        assert index_agents.main([]) == 0
+        output = capsys.readouterr().out
+        assert 'Indexed 0 agents for similarity' in output and 'Indexed 0 agents for search' in output
@@ -0,0 +1,98 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for app startup (timing, schema creation, deferred imports)
+"""
+import os
+import subprocess
+import sys
+import pytest
+from sqlalchemy import create_engine, inspect
+
+from app import create_app
+from app.startup import StartupTimer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed by some requests, so they must not load while workers boot
+DEFERRED_MODULES = ('anthropic', 'openai', 'bleach', 'cryptography', 'email_validator', 'yaml', 'numpy')
+
+
+@pytest.fixture
+def database_url(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'startup.db'}"
+    monkeypatch.setenv('DATABASE_URL', url)
+    return url
+
+
+def table_names(url):
+    engine = create_engine(url)
+    try:
+        return inspect(engine).get_table_names()
+    finally:
+        engine.dispose()
+
+
+class TestStartupTimer:
+    """Test the phase breakdown"""
+
+    def test_phases_add_up(self):
+        timer = StartupTimer()
+        timer.mark('config')
+        timer.mark('extensions')
+        report = timer.report()
+
+        assert list(report) == ['config', 'extensions', 'total']
+        assert report['total'] >= report['config'] + report['extensions'] - 0.2
+
+    def test_create_app_reports_timings(self, database_url):
+        app = create_app()
+        timings = app.extensions['startup_timings']
+        for phase in ('config', 'extensions', 'blueprints', 'handlers', 'schema', 'total'):
+            assert phase in timings
+
+
+class TestSchemaCreation:
+    """Test DB_CREATE_ALL"""
+
+    def test_boot_creates_tables_by_default(self, database_url):
+        create_app()
+        assert 'agent' in table_names(database_url)
+
+    def test_boot_skips_schema_when_disabled(self, database_url, monkeypatch):
+        monkeypatch.setenv('DB_CREATE_ALL', 'False')
+        app = create_app()
+        assert table_names(database_url) == []
+        assert 'schema' not in app.extensions['startup_timings']
+
+
+class TestProviderOverride:
+    """Test LLM_PROVIDER_OVERRIDE is checked at boot"""
+
+    def test_local_override_needs_the_local_provider(self, database_url, monkeypatch):
+        monkeypatch.setenv('LLM_PROVIDER_OVERRIDE', 'local')
+        monkeypatch.setenv('LLM_LOCAL_ENABLED', 'False')
+        with pytest.raises(ValueError, match='LLM_LOCAL_ENABLED'):
+            create_app()
+
+        monkeypatch.setenv('LLM_LOCAL_ENABLED', 'True')
+        assert create_app().config['LLM_PROVIDER_OVERRIDE'] == 'local'
+
+    def test_unknown_override(self, database_url, monkeypatch):
+        monkeypatch.setenv('LLM_PROVIDER_OVERRIDE', 'gemini')
+        with pytest.raises(ValueError, match="'gemini' is not an available provider"):
+            create_app()
+
+
+class TestDeferredImports:
+    """Heavy optional libraries load on first use, not at boot"""
+
+    def test_create_app_does_not_import_heavy_modules(self, database_url):
+        code = (
+            "import sys; from app import create_app; create_app(); "
+            f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, capture_output=True,
+                                text=True, check=True, env=dict(os.environ, DB_CREATE_ALL='False'))
+        assert result.stdout.strip() == ''
@@ -0,0 +1,128 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for search-as-you-type suggestions
+"""
+import pytest
+from sqlalchemy import update
+
+from app.models import Agent
+from app import suggest as suggest_module
+from app.suggest import name_keys, normalize, suggestions
+
+
+@pytest.fixture
+def catalog(listed_agent):
+    return {name: listed_agent(name, category=category, purchase_count=purchases)
+            for name, category, purchases in [('Trip Planner', 'travel', 5), ('Travel Buddy', 'travel', 20),
+                                              ('Tax Assistant', 'finance', 50), ('Planet Facts', 'education', 1)]}
+
+
+def suggest(client, query, **params):
+    response = client.get('/agents/suggest', query_string=dict(q=query, **params))
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def names(client, query, **params):
+    return [agent['name'] for agent in suggest(client, query, **params)['agents']]
+
+
+class TestKeys:
+    """Test normalizing names into prefix keys"""
+
+    def test_normalize(self):
+        assert normalize('  Trip-Planner!  Pro ') == 'trip planner pro'
+        assert normalize(None) == ''
+
+    def test_name_keys(self):
+        assert name_keys('Trip Planner Pro') == ['trip planner pro', 'planner pro', 'pro']
+
+
+class TestSuggest:
+    """Test /agents/suggest"""
+
+    def test_prefix_of_any_word(self, client, catalog):
+        assert names(client, 'pla') == ['Trip Planner', 'Planet Facts']
+        assert names(client, 'trip pl') == ['Trip Planner']
+        assert names(client, 'PLANN') == ['Trip Planner']
+        assert names(client, 'zebra') == []
+
+    def test_ranked_by_popularity(self, client, catalog):
+        assert names(client, 't') == ['Tax Assistant', 'Travel Buddy', 'Trip Planner']
+        assert names(client, 't', limit=2) == ['Tax Assistant', 'Travel Buddy']
+
+    def test_broad_prefix_walks_popularity_order(self, client, catalog, monkeypatch):
+        monkeypatch.setattr(suggest_module, 'RANGE_SCAN_LIMIT', 0)
+        assert names(client, 't') == ['Tax Assistant', 'Travel Buddy', 'Trip Planner']
+        assert names(client, 'trip pl') == ['Trip Planner']
+        assert names(client, 'rip') == []
+
+    def test_categories(self, client, catalog):
+        result = suggest(client, 'tra')
+        assert result['categories'] == [{'value': 'travel', 'count': 2}]
+        assert result['query'] == 'tra'
+
+    def test_empty_query(self, client, catalog):
+        assert suggest(client, '  ') == {'agents': [], 'categories': [], 'query': '  '}
+
+    def test_no_sql_once_loaded(self, client, catalog, query_budget):
+        names(client, 'pla')
+        with query_budget(0):
+            assert names(client, 'plann') == ['Trip Planner']
+            assert names(client, 'plann') == ['Trip Planner']
+
+
+class TestIncrementalRefresh:
+    """Test committed changes reaching the loaded index"""
+
+    @pytest.fixture(autouse=True)
+    def loaded(self, client, catalog):
+        names(client, 'a')
+
+    def test_approval_and_deactivation(self, client, db, catalog, listed_agent):
+        agent = listed_agent('Planning Poker', description='Estimates', category='productivity', approved=False)
+        assert names(client, 'plann') == ['Trip Planner']
+
+        agent.is_approved = True
+        db.session.commit()
+        assert names(client, 'plann') == ['Trip Planner', 'Planning Poker']
+        assert suggest(client, 'prod')['categories'] == [{'value': 'productivity', 'count': 1}]
+
+        catalog['Trip Planner'].is_active = False
+        db.session.commit()
+        assert names(client, 'plann') == ['Planning Poker']
+        assert names(client, 'trip') == []
+
+    def test_rename(self, client, db, catalog):
+        catalog['Planet Facts'].name = 'Space Facts'
+        db.session.commit()
+        assert names(client, 'plane') == []
+        assert names(client, 'spa') == ['Space Facts']
+
+    def test_sales_reorder(self, client, db, catalog):
+        catalog['Trip Planner'].stats.purchase_count = 100
+        db.session.commit()
+        assert names(client, 't') == ['Trip Planner', 'Tax Assistant', 'Travel Buddy']
+
+    def test_deleted_agent(self, client, db, catalog):
+        db.session.delete(catalog['Tax Assistant'])
+        db.session.commit()
+        assert names(client, 'tax') == []
+
+    def test_rollback_discards_pending(self, client, db, catalog):
+        catalog['Travel Buddy'].is_active = False
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+        assert names(client, 'travel') == ['Travel Buddy']
+
+    def test_reload_sees_other_writers(self, client, db, catalog):
+        # A bulk UPDATE skips the ORM hooks, like a write made by another worker
+        db.session.execute(update(Agent).where(Agent.id == catalog['Trip Planner'].id).values(is_active=False))
+        db.session.commit()
+        assert names(client, 'trip') == ['Trip Planner']
+
+        assert suggestions.run(db.session) == 3
+        assert names(client, 'trip') == []
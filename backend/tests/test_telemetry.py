@@ -0,0 +1,145 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Unit tests for metrics and LLM telemetry
+"""
+import logging
+import pytest
+from unittest.mock import patch
+from app.telemetry import MetricsRegistry, registry, record_llm_call, LLM_REQUESTS, LLM_TOKENS, LLM_COST, LLM_DURATION
+from app.llm_router import estimate_cost
+from app.llm_service import LLMService
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    registry.reset()
+    yield
+    registry.reset()
+
+
+class TestMetricsRegistry:
+    """Test metric types and exposition format"""
+
+    def test_counter_render(self):
+        reg = MetricsRegistry()
+        counter = reg.counter('things_total', 'Things', ('kind',))
+        counter.inc(kind='a')
+        counter.inc(2, kind='a')
+
+        output = reg.render()
+        assert '# TYPE things_total counter' in output
+        assert 'things_total{kind="a"} 3' in output
+
+    def test_counter_requires_labels(self):
+        counter = MetricsRegistry().counter('x_total', 'X', ('kind',))
+        with pytest.raises(ValueError):
+            counter.inc(other='a')
+
+    def test_histogram_buckets_are_cumulative(self):
+        reg = MetricsRegistry()
+        histogram = reg.histogram('latency_seconds', 'Latency', buckets=(1.0, 5.0))
+        histogram.observe(0.5)
+        histogram.observe(3.0)
+        histogram.observe(10.0)
+
+        output = reg.render()
+        assert 'latency_seconds_bucket{le="1"} 1' in output
+        assert 'latency_seconds_bucket{le="5"} 2' in output
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in output
+        assert 'latency_seconds_sum 13.5' in output
+        assert 'latency_seconds_count 3' in output
+
+    def test_gauge_goes_up_and_down(self):
+        reg = MetricsRegistry()
+        gauge = reg.gauge('in_flight', 'In flight')
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        assert gauge.value() == 1
+
+        gauge.set(7)
+        output = reg.render()
+        assert '# TYPE in_flight gauge' in output
+        assert 'in_flight 7' in output
+
+    def test_label_values_escaped(self):
+        reg = MetricsRegistry()
+        reg.counter('x_total', 'X', ('v',)).inc(v='a"b')
+        assert 'x_total{v="a\\"b"} 1' in reg.render()
+
+    def test_register_is_idempotent(self):
+        reg = MetricsRegistry()
+        assert reg.counter('x_total', 'X') is reg.counter('x_total', 'X')
+
+
+class TestRecordLLMCall:
+    """Test LLM call instrumentation"""
+
+    def test_records_usage_and_cost(self):
+        event = record_llm_call('openai', 'gpt-4o', 'ok', duration=2.0, queue_wait=0.1, ttft=2.0,
+                                usage={'input_tokens': 1000, 'output_tokens': 500})
+
+        assert LLM_REQUESTS.value(provider='openai', model='gpt-4o', status='ok') == 1
+        assert LLM_TOKENS.value(provider='openai', model='gpt-4o', direction='output') == 500
+        assert LLM_COST.value(provider='openai', model='gpt-4o') == pytest.approx(0.0075)
+        assert event['output_tokens_per_second'] == 250.0
+        assert event['queue_wait_ms'] == 100.0
+
+    def test_streaming_throughput_excludes_ttft(self):
+        event = record_llm_call('anthropic', 'claude-3-5-haiku-20241022', 'ok', duration=3.0, ttft=1.0,
+                                usage={'input_tokens': 10, 'output_tokens': 100})
+        assert event['output_tokens_per_second'] == 50.0
+
+    def test_error_without_usage(self):
+        event = record_llm_call('anthropic', 'm', 'LLMTimeoutError', duration=5.0)
+        assert 'input_tokens' not in event
+        assert LLM_DURATION.count(provider='anthropic', model='m') == 1
+
+    def test_structured_log_event(self, caplog):
+        with caplog.at_level(logging.INFO, logger='app.telemetry'):
+            record_llm_call('openai', 'gpt-4o', 'ok', duration=1.0, usage={'input_tokens': 1, 'output_tokens': 1})
+        record = caplog.records[-1]
+        assert record.getMessage() == 'llm_call'
+        assert record.provider == 'openai'
+        assert record.duration_ms == 1000.0
+
+    def test_estimate_cost_unknown_model(self):
+        assert estimate_cost('unknown', 10, 10) is None
+
+    @patch('anthropic.Anthropic')
+    @patch('app.llm_service.AnthropicProvider.chat')
+    def test_service_records_calls(self, mock_chat, mock_anthropic):
+        mock_chat.return_value = {
+            'response': 'Hello!', 'model': 'claude-3-5-sonnet-20241022',
+            'usage': {'input_tokens': 10, 'output_tokens': 5, 'total_tokens': 15}
+        }
+        LLMService('anthropic', 'sk-ant-test').chat('System', [], 'Hi')
+
+        assert LLM_REQUESTS.value(provider='anthropic', model='claude-3-5-sonnet-20241022', status='ok') == 1
+
+
+class TestMetricsEndpoint:
+    """Test /metrics access control"""
+
+    def test_local_scrape(self, client):
+        record_llm_call('openai', 'gpt-4o', 'ok', duration=1.0)
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        assert b'llm_requests_total{provider="openai",model="gpt-4o",status="ok"} 1' in response.data
+
+    def test_remote_scrape_rejected(self, client):
+        response = client.get('/metrics', environ_base={'REMOTE_ADDR': '10.1.2.3'})
+        assert response.status_code == 404
+
+    def test_remote_scrape_with_token(self, app, client):
+        app.config['METRICS_TOKEN'] = 'scrape-secret'
+        response = client.get('/metrics', environ_base={'REMOTE_ADDR': '10.1.2.3'},
+                              headers={'Authorization': 'Bearer scrape-secret'})
+        assert response.status_code == 200
+
+    def test_disabled(self, app, client):
+        app.config['METRICS_ENABLED'] = False
+        assert client.get('/metrics').status_code == 404
@@ -0,0 +1,168 @@
+# Copyright (c) 2025 Special Agents
+# Licensed under MIT License - See LICENSE file for details
+
+"""
+Tests for the usage ledger and rollups
+"""
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from app.models import UsageEvent, UsageRollup
+from app.usage import UsageRecorder, aggregate_rollups, bucket_start, get_usage_series
+
+
+def make_recorder(app):
+    recorder = UsageRecorder()
+    recorder.init_app(app)
+    return recorder
+
+
+def record(recorder, agent, user_id, **overrides):
+    kwargs = dict(
+        user_id=user_id, agent_id=agent.id, creator_id=agent.creator_id, provider='anthropic',
+        model='claude-3-5-sonnet-20241022', usage={'input_tokens': 100, 'output_tokens': 50},
+        estimated_cost=0.001, cached=False
+    )
+    kwargs.update(overrides)
+    recorder.record(**kwargs)
+
+
+class TestRollupAggregation:
+    """Test pure rollup helpers"""
+
+    def test_bucket_start(self):
+        ts = datetime(2025, 3, 4, 15, 42, 7, 123)
+        assert bucket_start(ts, 'hour') == datetime(2025, 3, 4, 15)
+        assert bucket_start(ts, 'day') == datetime(2025, 3, 4)
+
+    def test_aggregate_folds_events(self):
+        ts = datetime(2025, 3, 4, 15, 42)
+        events = [
+            {'created_at': ts, 'agent_id': 1, 'creator_id': 9, 'provider': 'openai',
+             'input_tokens': 10, 'output_tokens': 5, 'estimated_cost': 0.5, 'cached': False},
+            {'created_at': ts, 'agent_id': 1, 'creator_id': 9, 'provider': 'openai',
+             'input_tokens': 0, 'output_tokens': 0, 'estimated_cost': 0.0, 'cached': True},
+        ]
+        deltas = aggregate_rollups(events)
+
+        # 2 granularities x 3 dimensions
+        assert len(deltas) == 6
+        agent_hour = deltas[('hour', 'agent', '1', datetime(2025, 3, 4, 15))]
+        assert agent_hour['request_count'] == 2
+        assert agent_hour['cached_count'] == 1
+        assert agent_hour['input_tokens'] == 10
+
+
+class TestUsageRecorder:
+    """Test batching and flushing"""
+
+    def test_record_does_not_write(self, app, db, agent, user):
+        recorder = make_recorder(app)
+        record(recorder, agent, user.id)
+
+        assert recorder.pending() == 1
+        assert UsageEvent.query.count() == 0
+
+    def test_flush_writes_events_and_rollups(self, app, db, agent, user):
+        recorder = make_recorder(app)
+        record(recorder, agent, user.id)
+        record(recorder, agent, user.id, cached=True, usage={}, estimated_cost=0.0)
+
+        assert recorder.flush() == 2
+        assert UsageEvent.query.count() == 2
+        assert recorder.pending() == 0
+
+        rollup = UsageRollup.query.filter_by(granularity='day', dimension='agent', dimension_key=str(agent.id)).one()
+        assert rollup.request_count == 2
+        assert rollup.cached_count == 1
+        assert rollup.input_tokens == 100
+
+    def test_rollups_are_incremental(self, app, db, agent, user):
+        recorder = make_recorder(app)
+        record(recorder, agent, user.id)
+        recorder.flush()
+        record(recorder, agent, user.id)
+        recorder.flush()
+
+        rollup = UsageRollup.query.filter_by(granularity='hour', dimension='provider', dimension_key='anthropic').one()
+        assert rollup.request_count == 2
+        assert rollup.output_tokens == 100
+        assert rollup.estimated_cost == pytest.approx(0.002)
+
+    def test_small_batches(self, app, db, agent, user):
+        recorder = make_recorder(app)
+        recorder.batch_size = 2
+        for _ in range(5):
+            record(recorder, agent, user.id)
+
+        assert recorder.flush() == 5
+        assert UsageEvent.query.count() == 5
+
+    def test_failed_flush_requeues(self, app, db, agent, user):
+        recorder = make_recorder(app)
+        record(recorder, agent, user.id)
+
+        with patch.object(UsageRecorder, '_write_batch', side_effect=RuntimeError('db down')):
+            assert recorder.flush() == 0
+        assert recorder.pending() == 1
+
+        assert recorder.flush() == 1
+
+    def test_sheds_oldest_when_full(self, app, agent, user):
+        recorder = make_recorder(app)
+        recorder.max_pending = 2
+        for _ in range(3):
+            record(recorder, agent, user.id)
+
+        assert recorder.pending() == 2
+        assert recorder.dropped == 1
+
+    def test_disabled(self, app, agent, user):
+        recorder = make_recorder(app)
+        recorder.enabled = False
+        record(recorder, agent, user.id)
+        assert recorder.pending() == 0
+
+    def test_shutdown_flushes(self, app, db, agent, user):
+        recorder = make_recorder(app)
+        record(recorder, agent, user.id)
+        recorder.shutdown()
+        assert UsageEvent.query.count() == 1
+
+    def test_get_usage_series_validates(self, db):
+        with pytest.raises(ValueError):
+            get_usage_series('agent', [1], granularity='minute')
+        with pytest.raises(ValueError):
+            get_usage_series('user', [1])
+        assert get_usage_series('agent', []) == []
+
+
+class TestUsageEndpoints:
+    """Test seller-facing usage routes"""
+
+    def test_my_agents_usage(self, app, db, agent, user, seller_client):
+        recorder = make_recorder(app)
+        record(recorder, agent, user.id)
+        recorder.flush()
+
+        response = seller_client.get('/agents/my-agents/usage?granularity=hour&days=1')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['totals'][0]['requests'] == 1
+        assert data['agents'][str(agent.id)][0]['input_tokens'] == 100
+
+    def test_agent_usage(self, app, db, agent, user, seller_client):
+        recorder = make_recorder(app)
+        record(recorder, agent, user.id)
+        recorder.flush()
+
+        response = seller_client.get(f'/agents/{agent.id}/usage')
+        assert response.status_code == 200
+        assert response.get_json()['usage'][0]['requests'] == 1
+
+    def test_invalid_granularity(self, seller_client, agent):
+        assert seller_client.get('/agents/my-agents/usage?granularity=minute').status_code == 400
+
+    def test_buyers_cannot_view(self, authenticated_client, agent):
+        assert authenticated_client.get('/agents/my-agents/usage').status_code == 403
+        assert authenticated_client.get(f'/agents/{agent.id}/usage').status_code == 403